@@ -19,20 +19,27 @@ if received directly from Google. Use is subject to terms of use available at
 https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
 """
 
-from collections.abc import Callable, Sequence
+from collections.abc import Hashable, Iterable, Iterator, Sequence
+import collections
+import concurrent.futures
+import contextlib
 import csv
 import dataclasses
 import datetime
 import functools
+import json
 import multiprocessing
 import os
 import pathlib
+import queue
 import shutil
 import string
 import textwrap
+import threading
 import time
+import traceback
 import typing
-from typing import overload
+from typing import Literal, Self, overload
 
 from absl import app
 from absl import flags
@@ -43,6 +50,7 @@ import alphafold3.cpp
 from alphafold3.data import featurisation
 from alphafold3.data import pipeline
 from alphafold3.jax.attention import attention
+from alphafold3.model import conformer_cache
 from alphafold3.model import features
 from alphafold3.model import model
 from alphafold3.model import params
@@ -72,6 +80,16 @@ _INPUT_DIR = flags.DEFINE_string(
     None,
     'Path to the directory containing input JSON files.',
 )
+_SPOOL_DIR = flags.DEFINE_string(
+    'spool_dir',
+    None,
+    'Path to a spool directory to serve fold jobs from, instead of processing'
+    ' --json_path or --input_dir. The model is loaded and compiled for all'
+    ' --buckets once, then input JSON files moved into the `incoming`'
+    ' subdirectory are processed until a file named `stop` is created in the'
+    ' spool directory. The queue depth and job latencies are written to'
+    ' `status.json`.',
+)
 _OUTPUT_DIR = flags.DEFINE_string(
     'output_dir',
     None,
@@ -82,6 +100,14 @@ MODEL_DIR = flags.DEFINE_string(
     _DEFAULT_MODEL_DIR.as_posix(),
     'Path to the model to use for inference.',
 )
+_CACHE_DECOMPRESSED_MODEL_PARAMS = flags.DEFINE_bool(
+    'cache_decompressed_model_params',
+    False,
+    'Whether to store compressed model parameters decompressed in a'
+    ' memory-mapped file in --model_dir when first loaded, so that later runs'
+    ' load them without decompressing. Requires write access to --model_dir'
+    ' and as much free space as the size of the decompressed parameters.',
+)
 
 # Control which stages to run.
 _RUN_DATA_PIPELINE = flags.DEFINE_bool(
@@ -176,6 +202,14 @@ _SEQRES_DATABASE_PATH = flags.DEFINE_string(
     '${DB_DIR}/pdb_seqres.fasta',
     'PDB sequence database path, used for template search.',
 )
+_TEMPLATE_METADATA_INDEX_PATH = flags.DEFINE_string(
+    'template_metadata_index_path',
+    None,
+    'Optional path to a metadata index of the PDB database mmCIF files, built'
+    ' with `python -m alphafold3.data.template_metadata_index`. If set, the'
+    ' release date, sequence and unresolved residues of template hits are read'
+    ' from the index instead of parsing the mmCIF file of every hit.',
+)
 
 # Number of CPUs to use for MSA tools.
 _JACKHMMER_N_CPU = flags.DEFINE_integer(
@@ -190,6 +224,105 @@ _NHMMER_N_CPU = flags.DEFINE_integer(
     'Number of CPUs to use for Nhmmer. Default to min(cpu_count, 8). Going'
     ' beyond 8 CPUs provides very little additional speedup.',
 )
+_HMMSEARCH_N_CPU = flags.DEFINE_integer(
+    'hmmsearch_n_cpu',
+    min(multiprocessing.cpu_count(), 8),
+    'Number of CPUs to use for Hmmsearch in the template search. Default to'
+    ' min(cpu_count, 8).',
+    lower_bound=1,
+)
+_USE_DATABASE_SHARDS = flags.DEFINE_bool(
+    'use_database_shards',
+    False,
+    'Whether to search the shards of the Jackhmmer databases concurrently, for'
+    ' the databases sharded with `python -m alphafold3.data.database_shards'
+    ' <database_path> <num_shards>`. The --jackhmmer_n_cpu CPUs of a search'
+    ' are split among its shards, so they can usefully be set beyond 8.',
+)
+_SEARCH_N_CPU = flags.DEFINE_integer(
+    'search_n_cpu',
+    multiprocessing.cpu_count(),
+    'Total number of CPUs shared by the MSA and template searches, which run'
+    ' concurrently. A single search uses at most --jackhmmer_n_cpu,'
+    ' --nhmmer_n_cpu or --hmmsearch_n_cpu CPUs, fewer if running it would'
+    ' exceed this budget. Default to cpu_count.',
+    lower_bound=1,
+)
+_SEARCH_CPU_LOCK_FILE = flags.DEFINE_string(
+    'search_cpu_lock_file',
+    None,
+    'Optional path to a lock file shared by all AlphaFold 3 processes running'
+    ' on the same host. If set, the CPUs used by the searches of all these'
+    ' processes are accounted for in the file, so that together they use at'
+    ' most as many CPUs as the host has.',
+)
+_TEMPLATE_SEARCH_BATCH_SIZE = flags.DEFINE_integer(
+    'template_search_batch_size',
+    1,
+    'Maximum number of template searches of chains processed concurrently (see'
+    ' --data_pipeline_n_workers) that are run as a single Hmmsearch, which'
+    ' reads the PDB seqres database only once. The template hits are the same'
+    ' as without batching.',
+    lower_bound=1,
+)
+_TEMPLATE_SEARCH_BATCH_WAIT_SECONDS = flags.DEFINE_float(
+    'template_search_batch_wait_seconds',
+    30.0,
+    'If --template_search_batch_size is greater than 1, how long the first'
+    ' template search of a batch waits for other searches to join it.',
+    lower_bound=0.0,
+)
+_DATA_PIPELINE_N_WORKERS = flags.DEFINE_integer(
+    'data_pipeline_n_workers',
+    1,
+    'Number of chains to run the data pipeline on concurrently. If greater than'
+    ' 1, the data pipeline is run for the chains of all fold inputs upfront,'
+    ' processing identical chains only once, and each fold input proceeds to'
+    ' inference as soon as all of its chains are processed.',
+    lower_bound=1,
+)
+
+# Persistent cache of MSA and template search results.
+_SEARCH_CACHE_DIR = flags.DEFINE_string(
+    'search_cache_dir',
+    None,
+    'Optional path to a directory for a persistent cache of MSA and template'
+    ' search results. The cache can be shared by many concurrently running'
+    ' processes, also on shared network storage.',
+)
+_SEARCH_CACHE_MAX_SIZE_GB = flags.DEFINE_float(
+    'search_cache_max_size_gb',
+    100.0,
+    'Maximum size of the persistent search cache in GB. Least recently used'
+    ' search results are evicted when exceeded.',
+    lower_bound=0.0,
+)
+
+# Staging of the databases on fast storage.
+_DATABASE_STAGING_DIR = flags.DEFINE_string(
+    'database_staging_dir',
+    None,
+    'Optional path to a directory on fast storage, e.g. a tmpfs or a local SSD,'
+    ' the sequence databases are copied to before they are searched. Copies'
+    ' from earlier runs are reused. Databases that do not fit in'
+    ' --database_staging_max_size_gb or in the free space of the directory are'
+    ' searched in place.',
+)
+_DATABASE_STAGING_MAX_SIZE_GB = flags.DEFINE_float(
+    'database_staging_max_size_gb',
+    None,
+    'Maximum total size in GB of the databases copied to'
+    ' --database_staging_dir. If not set, limited only by its free space.',
+    lower_bound=0.0,
+)
+_WARM_DATABASE_PAGE_CACHE = flags.DEFINE_bool(
+    'warm_database_page_cache',
+    False,
+    'Whether to read the sequence databases in the background, while the model'
+    ' is loaded and earlier fold inputs are processed, to load them into the'
+    ' page cache before they are searched. The cold and warm read throughput'
+    ' of each database is printed.',
+)
 
 # Template search configuration.
 _MAX_TEMPLATE_DATE = flags.DEFINE_string(
@@ -209,6 +342,56 @@ _CONFORMER_MAX_ITERATIONS = flags.DEFINE_integer(
     'Optional override for maximum number of iterations to run for RDKit '
     'conformer search.',
 )
+_CONFORMER_CACHE_DIR = flags.DEFINE_string(
+    'conformer_cache_dir',
+    None,
+    'Optional directory of a persistent cache of the reference conformers'
+    ' generated by RDKit, shared across runs. Conformers are cached under the'
+    ' component, the random seed and the maximum number of iterations, so'
+    ' cached conformers are identical to generated ones.',
+)
+
+# Overlapping featurisation, inference and output writing.
+_FEATURISATION_N_WORKERS = flags.DEFINE_integer(
+    'featurisation_n_workers',
+    1,
+    'Number of threads featurising seeds ahead of model inference, also of the'
+    ' next fold input.',
+    lower_bound=1,
+)
+_FEATURISATION_N_PROCESSES = flags.DEFINE_integer(
+    'featurisation_n_processes',
+    1,
+    'Number of worker processes generating the RDKit reference conformers of'
+    ' the residues of an input in parallel, shared by all featurisation'
+    ' threads. If 1, conformers are generated in the featurisation threads.'
+    ' The features are identical either way.',
+    lower_bound=1,
+)
+_OUTPUT_WRITER_N_WORKERS = flags.DEFINE_integer(
+    'output_writer_n_workers',
+    1,
+    'Number of threads extracting inference results and writing outputs while'
+    ' model inference runs on the next seed.',
+    lower_bound=1,
+)
+_OUTPUT_WRITER_N_PROCESSES = flags.DEFINE_integer(
+    'output_writer_n_processes',
+    1,
+    'Number of worker processes post-processing the samples (building the'
+    ' mmCIF and encoding the confidences) and writing their outputs in'
+    ' parallel, shared by the output writer threads. If 1, samples are'
+    ' post-processed one by one in the output writer threads.',
+    lower_bound=1,
+)
+_MAX_QUEUED_EXAMPLES = flags.DEFINE_integer(
+    'max_queued_examples',
+    2,
+    'Maximum number of featurised examples waiting for model inference, and of'
+    ' inference results waiting to be written, per fold input. Bounds the host'
+    ' memory used by overlapping the stages.',
+    lower_bound=1,
+)
 
 # JAX inference performance tuning.
 _JAX_COMPILATION_CACHE_DIR = flags.DEFINE_string(
@@ -252,12 +435,60 @@ _NUM_RECYCLES = flags.DEFINE_integer(
     'Number of recycles to use during inference.',
     lower_bound=1,
 )
+_RECYCLING_TOLERANCE = flags.DEFINE_float(
+    'recycling_tolerance',
+    None,
+    'If set, recycling stops early once the change between two trunk passes,'
+    ' see --recycling_convergence_metric, is at most this tolerance, after at'
+    ' least --min_num_recycles and at most --num_recycles recycles. The number'
+    ' of recycles used is saved in the summary confidences. If not set,'
+    ' --num_recycles recycles are always used.',
+    lower_bound=0.0,
+)
+_RECYCLING_CONVERGENCE_METRIC = flags.DEFINE_enum(
+    'recycling_convergence_metric',
+    'embeddings',
+    ['embeddings', 'distogram'],
+    "How the change between two trunk passes is measured. 'embeddings' is the"
+    ' larger of the relative RMS changes of the single and pair embeddings,'
+    " 'distogram' is the mean absolute change of the contact probabilities of"
+    ' the distogram head.',
+)
+_MIN_NUM_RECYCLES = flags.DEFINE_integer(
+    'min_num_recycles',
+    1,
+    'Minimum number of recycles when --recycling_tolerance is set. At least'
+    ' one recycle is needed to compare two trunk passes.',
+    lower_bound=1,
+)
 _NUM_DIFFUSION_SAMPLES = flags.DEFINE_integer(
     'num_diffusion_samples',
     5,
     'Number of diffusion samples to generate.',
     lower_bound=1,
 )
+_NUM_DIFFUSION_STEPS = flags.DEFINE_integer(
+    'num_diffusion_steps',
+    200,
+    'Number of denoising steps of each diffusion sample. Fewer steps are'
+    ' faster but less accurate, see --diffusion_solver.',
+    lower_bound=1,
+)
+_DIFFUSION_SCHEDULE_EXPONENT = flags.DEFINE_float(
+    'diffusion_schedule_exponent',
+    7.0,
+    'Exponent of the diffusion noise schedule. Larger exponents spend more'
+    ' steps at low noise levels.',
+    lower_bound=1.0,
+)
+_DIFFUSION_SOLVER = flags.DEFINE_enum(
+    'diffusion_solver',
+    'euler',
+    ['euler', 'heun'],
+    "How diffusion steps are integrated. 'heun' corrects each step with a"
+    ' second evaluation of the denoiser, so it takes about twice as long per'
+    ' step but is more accurate with few steps.',
+)
 _NUM_SEEDS = flags.DEFINE_integer(
     'num_seeds',
     None,
@@ -276,6 +507,13 @@ _SAVE_EMBEDDINGS = flags.DEFINE_bool(
     False,
     'Whether to save the final trunk single and pair embeddings in the output.',
 )
+_SAVE_CONFIDENCES_NPZ = flags.DEFINE_bool(
+    'save_confidences_npz',
+    False,
+    'Whether to also save the full confidences of each sample in a compact,'
+    ' quantised npz file next to the confidences JSON, which is faster to load'
+    ' than the JSON.',
+)
 _FORCE_OUTPUT_DIR = flags.DEFINE_bool(
     'force_output_dir',
     False,
@@ -289,7 +527,15 @@ def make_model_config(
     *,
     flash_attention_implementation: attention.Implementation = 'triton',
     num_diffusion_samples: int = 5,
+    num_diffusion_steps: int = 200,
+    diffusion_schedule_exponent: float = 7.0,
+    diffusion_solver: Literal['euler', 'heun'] = 'euler',
     num_recycles: int = 10,
+    recycling_tolerance: float | None = None,
+    recycling_convergence_metric: Literal[
+        'embeddings', 'distogram'
+    ] = 'embeddings',
+    min_num_recycles: int = 1,
     return_embeddings: bool = False,
 ) -> model.Model.Config:
   """Returns a model config with some defaults overridden."""
@@ -298,11 +544,23 @@ def make_model_config(
       flash_attention_implementation
   )
   config.heads.diffusion.eval.num_samples = num_diffusion_samples
+  config.heads.diffusion.eval.steps = num_diffusion_steps
+  config.heads.diffusion.eval.schedule_exponent = diffusion_schedule_exponent
+  config.heads.diffusion.eval.solver = diffusion_solver
   config.num_recycles = num_recycles
+  config.recycling_tolerance = recycling_tolerance
+  config.recycling_convergence_metric = recycling_convergence_metric
+  config.min_num_recycles = min_num_recycles
   config.return_embeddings = return_embeddings
   return config
 
 
+def _input_shapes(featurised_example: features.BatchDict) -> Hashable:
+  """Returns the structure, shapes and dtypes of a featurised example."""
+  leaves, treedef = jax.tree.flatten(featurised_example)
+  return treedef, tuple((leaf.shape, leaf.dtype) for leaf in leaves)
+
+
 class ModelRunner:
   """Helper class to run structure prediction stages."""
 
@@ -311,42 +569,70 @@ class ModelRunner:
       config: model.Model.Config,
       device: jax.Device,
       model_dir: pathlib.Path,
+      cache_decompressed_params: bool = False,
   ):
     self._model_config = config
     self._device = device
     self._model_dir = model_dir
+    self._cache_decompressed_params = cache_decompressed_params
+    # Models compiled ahead of time, keyed by the shapes of their inputs.
+    self._compiled: dict[Hashable, jax.stages.Compiled] = {}
 
   @functools.cached_property
   def model_params(self) -> hk.Params:
-    """Loads model parameters from the model directory."""
-    return params.get_model_haiku_params(model_dir=self._model_dir)
+    """Loads model parameters from the model directory onto the device."""
+    return params.get_model_haiku_params(
+        model_dir=self._model_dir,
+        device=self._device,
+        cache_decompressed=self._cache_decompressed_params,
+    )
 
   @functools.cached_property
-  def _model(
-      self,
-  ) -> Callable[[jnp.ndarray, features.BatchDict], model.ModelResult]:
-    """Loads model parameters and returns a jitted model forward pass."""
+  def _model(self) -> jax.stages.Wrapped:
+    """Returns a jitted model forward pass, taking params, key and batch."""
 
     @hk.transform
     def forward_fn(batch):
       return model.Model(self._model_config)(batch)
 
-    return functools.partial(
-        jax.jit(forward_fn.apply, device=self._device), self.model_params
-    )
+    return jax.jit(forward_fn.apply, device=self._device)
 
-  def run_inference(
-      self, featurised_example: features.BatchDict, rng_key: jnp.ndarray
-  ) -> model.ModelResult:
-    """Computes a forward pass of the model on a featurised example."""
-    featurised_example = jax.device_put(
+  def _put_on_device(
+      self, featurised_example: features.BatchDict
+  ) -> features.BatchDict:
+    return jax.device_put(
         jax.tree_util.tree_map(
             jnp.asarray, utils.remove_invalidly_typed_feats(featurised_example)
         ),
         self._device,
     )
 
-    result = self._model(rng_key, featurised_example)
+  def compile(self, featurised_example: features.BatchDict) -> None:
+    """Compiles the model ahead of time for the shapes of an example.
+
+    Inference on examples with the same shapes, e.g. padded to the same bucket,
+    then runs the compiled model without tracing and compiling it again.
+
+    Args:
+      featurised_example: An example with the shapes to compile the model for.
+    """
+    featurised_example = self._put_on_device(featurised_example)
+    shapes = _input_shapes(featurised_example)
+    if shapes not in self._compiled:
+      self._compiled[shapes] = self._model.lower(
+          self.model_params, jax.random.PRNGKey(0), featurised_example
+      ).compile()
+
+  def run_inference(
+      self, featurised_example: features.BatchDict, rng_key: jnp.ndarray
+  ) -> model.ModelResult:
+    """Computes a forward pass of the model on a featurised example."""
+    featurised_example = self._put_on_device(featurised_example)
+
+    forward = self._compiled.get(
+        _input_shapes(featurised_example), self._model
+    )
+    result = forward(self.model_params, rng_key, featurised_example)
     result = jax.tree.map(np.asarray, result)
     result = jax.tree.map(
         lambda x: x.astype(jnp.float32) if x.dtype == jnp.bfloat16 else x,
@@ -398,71 +684,461 @@ class ResultsForSeed:
   embeddings: dict[str, np.ndarray] | None = None
 
 
-def predict_structure(
-    fold_input: folding_input.Input,
-    model_runner: ModelRunner,
-    buckets: Sequence[int] | None = None,
-    ref_max_modified_date: datetime.date | None = None,
-    conformer_max_iterations: int | None = None,
-) -> Sequence[ResultsForSeed]:
-  """Runs the full inference pipeline to predict structures for each seed."""
+@dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
+class _Featurised:
+  """A featurised example for a single seed."""
 
-  print(f'Featurising data with {len(fold_input.rng_seeds)} seed(s)...')
-  featurisation_start_time = time.time()
-  ccd = chemical_components.cached_ccd(user_ccd=fold_input.user_ccd)
-  featurised_examples = featurisation.featurise_input(
-      fold_input=fold_input,
-      buckets=buckets,
-      ccd=ccd,
-      verbose=True,
-      ref_max_modified_date=ref_max_modified_date,
-      conformer_max_iterations=conformer_max_iterations,
-  )
-  print(
-      f'Featurising data with {len(fold_input.rng_seeds)} seed(s) took'
-      f' {time.time() - featurisation_start_time:.2f} seconds.'
-  )
-  print(
-      'Running model inference and extracting output structure samples with'
-      f' {len(fold_input.rng_seeds)} seed(s)...'
-  )
-  all_inference_start_time = time.time()
-  all_inference_results = []
-  for seed, example in zip(fold_input.rng_seeds, featurised_examples):
-    print(f'Running model inference with seed {seed}...')
-    inference_start_time = time.time()
-    rng_key = jax.random.PRNGKey(seed)
-    result = model_runner.run_inference(example, rng_key)
+  seed: int
+  example: features.BatchDict
+  featurisation_time: float
+
+
+class _FeaturisationJob:
+  """Featurises the seeds of a fold input in a thread pool, in seed order.
+
+  At most `max_queued` seeds are featurised ahead of the consumer, so that only
+  a bounded number of featurised examples is held in memory.
+  """
+
+  def __init__(
+      self,
+      fold_input: folding_input.Input,
+      executor: concurrent.futures.Executor,
+      max_queued: int,
+      buckets: Sequence[int] | None,
+      ref_max_modified_date: datetime.date | None,
+      conformer_max_iterations: int | None,
+      conformer_cache_dir: str | None,
+      featurisation_n_processes: int,
+  ):
+    self._executor = executor
+    self._max_queued = max_queued
+    self._conformer_cache_dir = conformer_cache_dir
+    self._featurisation_n_processes = featurisation_n_processes
+    self._featuriser = executor.submit(
+        self._make_featuriser,
+        fold_input=fold_input,
+        buckets=buckets,
+        ref_max_modified_date=ref_max_modified_date,
+        conformer_max_iterations=conformer_max_iterations,
+    )
+    self._seeds = iter(fold_input.rng_seeds)
+    self._all_submitted = False
+    self._queue = collections.deque()
+    self._fill_queue()
+
+  def _make_featuriser(
+      self,
+      fold_input: folding_input.Input,
+      buckets: Sequence[int] | None,
+      ref_max_modified_date: datetime.date | None,
+      conformer_max_iterations: int | None,
+  ) -> tuple[featurisation.SeedFeaturiser, float]:
+    start_time = time.time()
+    print(f'Featurising seed-independent data of {fold_input.name}...')
+    featuriser = featurisation.SeedFeaturiser(
+        fold_input=fold_input,
+        ccd=chemical_components.cached_ccd(user_ccd=fold_input.user_ccd),
+        buckets=buckets,
+        ref_max_modified_date=ref_max_modified_date,
+        conformer_max_iterations=conformer_max_iterations,
+        conformer_cache_dir=self._conformer_cache_dir,
+        n_worker_processes=self._featurisation_n_processes,
+    )
+    featurisation_time = time.time() - start_time
+    print(
+        f'Featurising seed-independent data of {fold_input.name} took'
+        f' {featurisation_time:.2f} seconds.'
+    )
+    return featuriser, featurisation_time
+
+  def _featurise(self, seed: int) -> _Featurised:
+    # The featuriser was submitted first, so it is already running or done.
+    featuriser, _ = self._featuriser.result()
+    start_time = time.time()
+    example = featuriser.featurise(seed)
+    featurisation_time = time.time() - start_time
     print(
-        f'Running model inference with seed {seed} took'
-        f' {time.time() - inference_start_time:.2f} seconds.'
+        f'Featurising data with seed {seed} took'
+        f' {featurisation_time:.2f} seconds.'
+    )
+    stats = conformer_cache.get_cache(self._conformer_cache_dir).stats
+    print(
+        f'Reference conformer cache hit rate so far: {stats.hit_rate:.1%}'
+        f' ({stats.memory_hits} in memory, {stats.disk_hits} on disk,'
+        f' {stats.misses} misses).'
+    )
+    return _Featurised(
+        seed=seed, example=example, featurisation_time=featurisation_time
+    )
+
+  def _fill_queue(self) -> None:
+    while len(self._queue) < self._max_queued:
+      seed = next(self._seeds, None)
+      if seed is None:
+        self._all_submitted = True
+        break
+      self._queue.append(self._executor.submit(self._featurise, seed))
+
+  @property
+  def all_submitted(self) -> bool:
+    """Whether all seeds have been submitted to the executor."""
+    return self._all_submitted
+
+  @property
+  def seed_independent_featurisation_time(self) -> float:
+    return self._featuriser.result()[1]
+
+  def __iter__(self) -> Iterator[_Featurised]:
+    while self._queue:
+      featurised = self._queue.popleft().result()
+      self._fill_queue()
+      yield featurised
+
+  def cancel(self) -> None:
+    self._featuriser.cancel()
+    for future in self._queue:
+      future.cancel()
+
+
+class InferencePipeline:
+  """Overlaps featurisation, model inference and output writing.
+
+  Seeds are featurised in a thread pool ahead of model inference, so that the
+  device runs inference back-to-back. Featurisation of the next fold input can
+  be started early with `prefetch`, and starts once all seeds of the fold input
+  being predicted have been submitted, so that they don't wait behind it.
+  Extracting the inference results and writing the outputs of each seed runs
+  concurrently in another thread pool.
+  At most `max_queued` featurised examples and `max_queued` unwritten results
+  are held in memory per fold input.
+  """
+
+  def __init__(
+      self,
+      model_runner: ModelRunner,
+      buckets: Sequence[int] | None = None,
+      ref_max_modified_date: datetime.date | None = None,
+      conformer_max_iterations: int | None = None,
+      conformer_cache_dir: str | None = None,
+      featurisation_n_workers: int = 1,
+      featurisation_n_processes: int = 1,
+      output_writer_n_workers: int = 1,
+      output_writer_n_processes: int = 1,
+      max_queued: int = 2,
+      save_confidences_npz: bool = False,
+  ):
+    """Initializes the pipeline.
+
+    Args:
+      model_runner: Model runner to use.
+      buckets: See `process_fold_input`.
+      ref_max_modified_date: See `process_fold_input`.
+      conformer_max_iterations: See `process_fold_input`.
+      conformer_cache_dir: Optional directory of a persistent cache of the
+        reference conformers, shared across runs.
+      featurisation_n_workers: Number of threads featurising seeds.
+      featurisation_n_processes: Number of worker processes generating
+        reference conformers, shared by the featurisation threads.
+      output_writer_n_workers: Number of threads writing outputs.
+      output_writer_n_processes: Number of worker processes post-processing
+        and writing the samples in parallel, shared by the output writer
+        threads. If 1, samples are written in the output writer threads.
+      max_queued: Maximum number of featurised examples waiting for inference
+        and of inference results waiting to be written, per fold input.
+      save_confidences_npz: Whether to also write the full confidences of each
+        sample as a compact npz file.
+    """
+    if max_queued < 1:
+      raise ValueError(f'max_queued must be at least 1: {max_queued}')
+    self._model_runner = model_runner
+    self._buckets = buckets
+    self._ref_max_modified_date = ref_max_modified_date
+    self._conformer_max_iterations = conformer_max_iterations
+    self._conformer_cache_dir = conformer_cache_dir
+    self._featurisation_n_processes = featurisation_n_processes
+    self._max_queued = max_queued
+    self._save_confidences_npz = save_confidences_npz
+    self._featurisation_executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=featurisation_n_workers, thread_name_prefix='featurisation'
+    )
+    self._writer_executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=output_writer_n_workers, thread_name_prefix='output_writer'
+    )
+    self._writer_process_pool = None
+    if output_writer_n_processes > 1:
+      # Spawned, as forking a process that has started threads is unsafe.
+      self._writer_process_pool = concurrent.futures.ProcessPoolExecutor(
+          max_workers=output_writer_n_processes,
+          mp_context=multiprocessing.get_context('spawn'),
+      )
+    self._prefetched: dict[folding_input.Input, _FeaturisationJob] = {}
+    # Fold inputs to prefetch once all seeds of the current job are submitted.
+    self._deferred_prefetches: list[folding_input.Input] = []
+    self._current_job: _FeaturisationJob | None = None
+    self._lock = threading.Lock()
+
+  def __enter__(self) -> Self:
+    return self
+
+  def __exit__(self, *exc_info) -> None:
+    self.close()
+
+  def close(self) -> None:
+    """Cancels prefetched featurisation and shuts down the thread pools."""
+    self.cancel_prefetches()
+    self._featurisation_executor.shutdown(cancel_futures=True)
+    self._writer_executor.shutdown()
+    if self._writer_process_pool is not None:
+      self._writer_process_pool.shutdown()
+
+  def _start_featurisation(
+      self, fold_input: folding_input.Input
+  ) -> _FeaturisationJob:
+    return _FeaturisationJob(
+        fold_input=fold_input,
+        executor=self._featurisation_executor,
+        max_queued=self._max_queued,
+        buckets=self._buckets,
+        ref_max_modified_date=self._ref_max_modified_date,
+        conformer_max_iterations=self._conformer_max_iterations,
+        conformer_cache_dir=self._conformer_cache_dir,
+        featurisation_n_processes=self._featurisation_n_processes,
     )
-    print(f'Extracting inference results with seed {seed}...')
-    extract_structures = time.time()
+
+  def prefetch(self, fold_input: folding_input.Input) -> None:
+    """Starts featurising a fold input that will be predicted later.
+
+    If a fold input is being predicted, featurisation starts once all of its
+    seeds have been submitted for featurisation.
+
+    Args:
+      fold_input: The fold input to featurise.
+    """
+    with self._lock:
+      if (
+          fold_input in self._prefetched
+          or fold_input in self._deferred_prefetches
+      ):
+        return
+      self._deferred_prefetches.append(fold_input)
+    self._start_deferred_prefetches()
+
+  def cancel_prefetches(self) -> None:
+    """Cancels and forgets the fold inputs prefetched but not predicted yet."""
+    with self._lock:
+      for job in self._prefetched.values():
+        job.cancel()
+      self._prefetched.clear()
+      self._deferred_prefetches.clear()
+
+  def _start_deferred_prefetches(self) -> None:
+    """Starts deferred prefetches unless the current job has seeds pending."""
+    with self._lock:
+      if self._current_job is not None and not self._current_job.all_submitted:
+        return
+      for fold_input in self._deferred_prefetches:
+        self._prefetched[fold_input] = self._start_featurisation(fold_input)
+      self._deferred_prefetches.clear()
+
+  def _extract_and_write(
+      self,
+      fold_input: folding_input.Input,
+      featurised: _Featurised,
+      result: model.ModelResult,
+      output_dir: os.PathLike[str] | str | None,
+  ) -> tuple[ResultsForSeed, float]:
+    """Extracts the inference results of a seed and writes its outputs."""
+    start_time = time.time()
     inference_results, embeddings = (
-        model_runner.extract_inference_results_and_maybe_embeddings(
-            batch=example, result=result, target_name=fold_input.name
+        self._model_runner.extract_inference_results_and_maybe_embeddings(
+            batch=featurised.example, result=result, target_name=fold_input.name
         )
     )
+    results_for_seed = ResultsForSeed(
+        seed=featurised.seed,
+        inference_results=inference_results,
+        full_fold_input=fold_input,
+        embeddings=embeddings,
+    )
+    if output_dir is not None:
+      write_seed_outputs(
+          results_for_seed=results_for_seed,
+          output_dir=output_dir,
+          job_name=fold_input.sanitised_name(),
+          save_confidences_npz=self._save_confidences_npz,
+          executor=self._writer_process_pool,
+      )
+    writing_time = time.time() - start_time
     print(
-        f'Extracting {len(inference_results)} inference samples with'
-        f' seed {seed} took {time.time() - extract_structures:.2f} seconds.'
+        f'Extracting and writing {len(inference_results)} inference samples'
+        f' with seed {featurised.seed} took {writing_time:.2f} seconds.'
     )
+    return results_for_seed, writing_time
+
+  def compile_buckets(self) -> None:
+    """Compiles the model ahead of time for all buckets.
+
+    Featurised examples are padded to the size of their bucket, so that the
+    model is compiled once per bucket, for the shapes of a dummy input padded
+    to the bucket. Compiling all buckets upfront keeps the compilation time out
+    of the latency of the first fold inputs of each size.
+    """
+    if not self._buckets:
+      raise ValueError('Buckets must be set to compile the model upfront.')
+    ccd = chemical_components.cached_ccd()
+    for bucket in self._buckets:
+      print(f'Compiling model for bucket {bucket}...')
+      start_time = time.time()
+      dummy_input = folding_input.Input(
+          name=f'compile_bucket_{bucket}',
+          chains=[
+              folding_input.ProteinChain(
+                  id='A',
+                  sequence='G',
+                  ptms=[],
+                  unpaired_msa='',
+                  paired_msa='',
+                  templates=[],
+              )
+          ],
+          rng_seeds=[0],
+      )
+      # With a single bucket, the dummy input is padded to its size.
+      example = featurisation.SeedFeaturiser(
+          fold_input=dummy_input, ccd=ccd, buckets=[bucket]
+      ).featurise(rng_seed=0)
+      self._model_runner.compile(example)
+      print(
+          f'Compiling model for bucket {bucket} took'
+          f' {time.time() - start_time:.2f} seconds.'
+      )
 
-    all_inference_results.append(
-        ResultsForSeed(
-            seed=seed,
-            inference_results=inference_results,
-            full_fold_input=fold_input,
-            embeddings=embeddings,
+  def predict_structure(
+      self,
+      fold_input: folding_input.Input,
+      output_dir: os.PathLike[str] | str | None = None,
+  ) -> Sequence[ResultsForSeed]:
+    """Predicts structures for each seed and optionally writes the outputs.
+
+    Args:
+      fold_input: Fold input to predict, must include the results of running
+        the data pipeline.
+      output_dir: If set, the outputs of all seeds, the top ranked sample and
+        the ranking scores are written to this directory.
+
+    Returns:
+      The inference results for each seed.
+    """
+    start_time = time.time()
+    with self._lock:
+      job = self._prefetched.pop(fold_input, None)
+      if fold_input in self._deferred_prefetches:
+        self._deferred_prefetches.remove(fold_input)
+      if job is None:
+        job = self._start_featurisation(fold_input)
+      self._current_job = job
+
+    num_seeds = len(fold_input.rng_seeds)
+    print(
+        f'Featurising, running model inference and extracting output'
+        f' structure samples with {num_seeds} seed(s)...'
+    )
+    featurisation_time = 0.0
+    waiting_time = 0.0
+    inference_time = 0.0
+    pending_writes = collections.deque()
+    all_results = []
+    try:
+      featurised_iter = iter(job)
+      while True:
+        # Time spent here is time the device idles, waiting for featurisation.
+        wait_start_time = time.time()
+        featurised = next(featurised_iter, None)
+        waiting_time += time.time() - wait_start_time
+        self._start_deferred_prefetches()
+        if featurised is None:
+          break
+        featurisation_time += featurised.featurisation_time
+
+        seed = featurised.seed
+        print(f'Running model inference with seed {seed}...')
+        inference_start_time = time.time()
+        result = self._model_runner.run_inference(
+            featurised.example, jax.random.PRNGKey(seed)
+        )
+        seed_inference_time = time.time() - inference_start_time
+        inference_time += seed_inference_time
+        recycles = (
+            f' ({int(result["num_recycles"])} recycles)'
+            if 'num_recycles' in result
+            else ''
+        )
+        print(
+            f'Running model inference with seed {seed} took'
+            f' {seed_inference_time:.2f} seconds{recycles}.'
         )
+
+        if len(pending_writes) >= self._max_queued:
+          all_results.append(pending_writes.popleft().result())
+        pending_writes.append(
+            self._writer_executor.submit(
+                self._extract_and_write,
+                fold_input=fold_input,
+                featurised=featurised,
+                result=result,
+                output_dir=output_dir,
+            )
+        )
+        del featurised, result
+      all_results.extend(future.result() for future in pending_writes)
+    except BaseException:
+      job.cancel()
+      for future in pending_writes:
+        future.cancel()
+      raise
+    finally:
+      with self._lock:
+        self._current_job = None
+      self._start_deferred_prefetches()
+
+    all_inference_results = [results for results, _ in all_results]
+    writing_time = sum(writing_time for _, writing_time in all_results)
+    if output_dir is not None:
+      write_top_ranked_outputs(
+          all_inference_results=all_inference_results,
+          output_dir=output_dir,
+          job_name=fold_input.sanitised_name(),
+          save_confidences_npz=self._save_confidences_npz,
+      )
+    featurisation_time += job.seed_independent_featurisation_time
+
+    print(
+        f'Predicting structures with {num_seeds} seed(s) took'
+        f' {time.time() - start_time:.2f} seconds. Time spent per stage:'
+        f' featurisation {featurisation_time:.2f} seconds, model inference'
+        f' {inference_time:.2f} seconds, waiting for featurisation'
+        f' {waiting_time:.2f} seconds, extracting and writing outputs'
+        f' {writing_time:.2f} seconds.'
     )
-  print(
-      'Running model inference and extracting output structures with'
-      f' {len(fold_input.rng_seeds)} seed(s) took'
-      f' {time.time() - all_inference_start_time:.2f} seconds.'
-  )
-  return all_inference_results
+    return all_inference_results
+
+
+def predict_structure(
+    fold_input: folding_input.Input,
+    model_runner: ModelRunner,
+    buckets: Sequence[int] | None = None,
+    ref_max_modified_date: datetime.date | None = None,
+    conformer_max_iterations: int | None = None,
+) -> Sequence[ResultsForSeed]:
+  """Runs the full inference pipeline to predict structures for each seed."""
+  with InferencePipeline(
+      model_runner=model_runner,
+      buckets=buckets,
+      ref_max_modified_date=ref_max_modified_date,
+      conformer_max_iterations=conformer_max_iterations,
+  ) as inference_pipeline:
+    return inference_pipeline.predict_structure(fold_input)
 
 
 def write_fold_input_json(
@@ -477,15 +1153,118 @@ def write_fold_input_json(
     f.write(fold_input.to_json())
 
 
-def write_outputs(
+def _sample_dir_and_name(
+    output_dir: os.PathLike[str] | str,
+    job_name: str,
+    seed: int,
+    sample_idx: int,
+) -> tuple[str, str]:
+  """Returns the output directory and the file name prefix of a sample."""
+  return (
+      os.path.join(output_dir, f'seed-{seed}_sample-{sample_idx}'),
+      f'{job_name}_seed-{seed}_sample-{sample_idx}',
+  )
+
+
+def _start_seed_outputs(
+    results_for_seed: ResultsForSeed,
+    output_dir: os.PathLike[str] | str,
+    job_name: str,
+    save_confidences_npz: bool,
+    executor: concurrent.futures.Executor | None,
+) -> list[concurrent.futures.Future[None]]:
+  """Writes the outputs of a seed, returns the pending sample outputs."""
+  seed = results_for_seed.seed
+  pending = []
+  for sample_idx, result in enumerate(results_for_seed.inference_results):
+    sample_dir, name = _sample_dir_and_name(
+        output_dir, job_name, seed, sample_idx
+    )
+    os.makedirs(sample_dir, exist_ok=True)
+    write_output = functools.partial(
+        post_processing.write_output,
+        inference_result=result,
+        output_dir=sample_dir,
+        name=name,
+        save_confidences_npz=save_confidences_npz,
+    )
+    if executor is None:
+      write_output()
+    else:
+      pending.append(executor.submit(write_output))
+
+  if embeddings := results_for_seed.embeddings:
+    embeddings_dir = os.path.join(output_dir, f'seed-{seed}_embeddings')
+    os.makedirs(embeddings_dir, exist_ok=True)
+    post_processing.write_embeddings(
+        embeddings=embeddings,
+        output_dir=embeddings_dir,
+        name=f'{job_name}_seed-{seed}',
+    )
+  return pending
+
+
+def write_seed_outputs(
+    results_for_seed: ResultsForSeed,
+    output_dir: os.PathLike[str] | str,
+    job_name: str,
+    save_confidences_npz: bool = False,
+    executor: concurrent.futures.Executor | None = None,
+) -> None:
+  """Writes the outputs of all samples of a single seed.
+
+  Args:
+    results_for_seed: The inference results of the seed.
+    output_dir: The output directory of the fold input.
+    job_name: The sanitised name of the fold input.
+    save_confidences_npz: Whether to also write the full confidences of each
+      sample as a compact npz file.
+    executor: Optional executor, e.g. a process pool, that post-processes and
+      writes the samples in parallel. If None, they are written one by one.
+  """
+  for future in _start_seed_outputs(
+      results_for_seed=results_for_seed,
+      output_dir=output_dir,
+      job_name=job_name,
+      save_confidences_npz=save_confidences_npz,
+      executor=executor,
+  ):
+    future.result()
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+  """Hard links `src` to `dst`, or copies it if hard links are unsupported."""
+  tmp_dst = f'{dst}.tmp'
+  try:
+    os.link(src, tmp_dst)
+  except OSError:
+    shutil.copyfile(src, tmp_dst)
+  os.replace(tmp_dst, dst)
+
+
+def write_top_ranked_outputs(
     all_inference_results: Sequence[ResultsForSeed],
     output_dir: os.PathLike[str] | str,
     job_name: str,
+    save_confidences_npz: bool = False,
 ) -> None:
-  """Writes outputs to the specified output directory."""
+  """Writes the top ranked sample across all seeds and the ranking scores.
+
+  The outputs of the top ranked sample written by `write_seed_outputs` are
+  reused, so that the sample is not post-processed again. If they are missing,
+  the sample is post-processed.
+
+  Args:
+    all_inference_results: The inference results of all seeds.
+    output_dir: The output directory of the fold input.
+    job_name: The sanitised name of the fold input.
+    save_confidences_npz: Whether to also write the full confidences of the
+      top ranked sample as a compact npz file.
+  """
   ranking_scores = []
   max_ranking_score = None
   max_ranking_result = None
+  max_ranking_sample = None
 
   output_terms = (
       pathlib.Path(alphafold3.cpp.__file__).parent / 'OUTPUT_TERMS_OF_USE.md'
@@ -495,36 +1274,40 @@ def write_outputs(
   for results_for_seed in all_inference_results:
     seed = results_for_seed.seed
     for sample_idx, result in enumerate(results_for_seed.inference_results):
-      sample_dir = os.path.join(output_dir, f'seed-{seed}_sample-{sample_idx}')
-      os.makedirs(sample_dir, exist_ok=True)
-      post_processing.write_output(
-          inference_result=result,
-          output_dir=sample_dir,
-          name=f'{job_name}_seed-{seed}_sample-{sample_idx}',
-      )
       ranking_score = float(result.metadata['ranking_score'])
       ranking_scores.append((seed, sample_idx, ranking_score))
       if max_ranking_score is None or ranking_score > max_ranking_score:
         max_ranking_score = ranking_score
         max_ranking_result = result
-
-    if embeddings := results_for_seed.embeddings:
-      embeddings_dir = os.path.join(output_dir, f'seed-{seed}_embeddings')
-      os.makedirs(embeddings_dir, exist_ok=True)
-      post_processing.write_embeddings(
-          embeddings=embeddings,
-          output_dir=embeddings_dir,
-          name=f'{job_name}_seed-{seed}',
-      )
+        max_ranking_sample = (seed, sample_idx)
 
   if max_ranking_result is not None:  # True iff ranking_scores non-empty.
-    post_processing.write_output(
-        inference_result=max_ranking_result,
-        output_dir=output_dir,
-        # The output terms of use are the same for all seeds/samples.
-        terms_of_use=output_terms,
-        name=job_name,
+    sample_dir, sample_name = _sample_dir_and_name(
+        output_dir, job_name, *max_ranking_sample
     )
+    suffixes = ['model.cif', 'summary_confidences.json', 'confidences.json']
+    if save_confidences_npz:
+      suffixes.append('confidences.npz')
+    sample_paths = [
+        os.path.join(sample_dir, f'{sample_name}_{suffix}')
+        for suffix in suffixes
+    ]
+    if all(os.path.exists(path) for path in sample_paths):
+      for suffix, sample_path in zip(suffixes, sample_paths, strict=True):
+        _link_or_copy(
+            sample_path, os.path.join(output_dir, f'{job_name}_{suffix}')
+        )
+      # The output terms of use are the same for all seeds/samples.
+      with open(os.path.join(output_dir, 'TERMS_OF_USE.md'), 'wt') as f:
+        f.write(output_terms)
+    else:
+      post_processing.write_output(
+          inference_result=max_ranking_result,
+          output_dir=output_dir,
+          terms_of_use=output_terms,
+          name=job_name,
+          save_confidences_npz=save_confidences_npz,
+      )
     # Save csv of ranking scores with seeds and sample indices, to allow easier
     # comparison of ranking scores across different runs.
     with open(
@@ -535,6 +1318,50 @@ def write_outputs(
       writer.writerows(ranking_scores)
 
 
+def write_outputs(
+    all_inference_results: Sequence[ResultsForSeed],
+    output_dir: os.PathLike[str] | str,
+    job_name: str,
+    save_confidences_npz: bool = False,
+    executor: concurrent.futures.Executor | None = None,
+) -> None:
+  """Writes outputs to the specified output directory.
+
+  Every sample is post-processed once, the outputs of the top ranked sample are
+  reused for its copy in the output directory.
+
+  Args:
+    all_inference_results: The inference results of all seeds.
+    output_dir: The output directory of the fold input.
+    job_name: The sanitised name of the fold input.
+    save_confidences_npz: Whether to also write the full confidences of each
+      sample as a compact npz file.
+    executor: Optional executor, e.g. a process pool, that post-processes and
+      writes the samples of all seeds in parallel. If None, they are written
+      one by one.
+  """
+  os.makedirs(output_dir, exist_ok=True)
+  pending = []
+  for results_for_seed in all_inference_results:
+    pending.extend(
+        _start_seed_outputs(
+            results_for_seed=results_for_seed,
+            output_dir=output_dir,
+            job_name=job_name,
+            save_confidences_npz=save_confidences_npz,
+            executor=executor,
+        )
+    )
+  for future in pending:
+    future.result()
+  write_top_ranked_outputs(
+      all_inference_results=all_inference_results,
+      output_dir=output_dir,
+      job_name=job_name,
+      save_confidences_npz=save_confidences_npz,
+  )
+
+
 def replace_db_dir(path_with_db_dir: str, db_dirs: Sequence[str]) -> str:
   """Replaces the DB_DIR placeholder in a path with the given DB_DIR."""
   template = string.Template(path_with_db_dir)
@@ -561,6 +1388,7 @@ def process_fold_input(
     ref_max_modified_date: datetime.date | None = None,
     conformer_max_iterations: int | None = None,
     force_output_dir: bool = False,
+    inference_pipeline: InferencePipeline | None = None,
 ) -> folding_input.Input:
   ...
 
@@ -575,6 +1403,7 @@ def process_fold_input(
     ref_max_modified_date: datetime.date | None = None,
     conformer_max_iterations: int | None = None,
     force_output_dir: bool = False,
+    inference_pipeline: InferencePipeline | None = None,
 ) -> Sequence[ResultsForSeed]:
   ...
 
@@ -588,6 +1417,7 @@ def process_fold_input(
     ref_max_modified_date: datetime.date | None = None,
     conformer_max_iterations: int | None = None,
     force_output_dir: bool = False,
+    inference_pipeline: InferencePipeline | None = None,
 ) -> folding_input.Input | Sequence[ResultsForSeed]:
   """Runs data pipeline and/or inference on a single fold input.
 
@@ -613,6 +1443,9 @@ def process_fold_input(
       existing one is non-empty. Instead use the existing output directory and
       potentially overwrite existing files. If False, create a new timestamped
       output directory instead if the existing one is non-empty.
+    inference_pipeline: Inference pipeline of the model runner to use, which
+      may already have started featurising the fold input. If None, a new one
+      is created and the featurisation options above are used.
 
   Returns:
     The processed fold input, or the inference results for each seed.
@@ -656,34 +1489,351 @@ def process_fold_input(
         f'Predicting 3D structure for {fold_input.name} with'
         f' {len(fold_input.rng_seeds)} seed(s)...'
     )
-    all_inference_results = predict_structure(
-        fold_input=fold_input,
-        model_runner=model_runner,
-        buckets=buckets,
-        ref_max_modified_date=ref_max_modified_date,
-        conformer_max_iterations=conformer_max_iterations,
-    )
-    print(f'Writing outputs with {len(fold_input.rng_seeds)} seed(s)...')
-    write_outputs(
-        all_inference_results=all_inference_results,
-        output_dir=output_dir,
-        job_name=fold_input.sanitised_name(),
-    )
+    with contextlib.ExitStack() as stack:
+      if inference_pipeline is None:
+        inference_pipeline = stack.enter_context(
+            InferencePipeline(
+                model_runner=model_runner,
+                buckets=buckets,
+                ref_max_modified_date=ref_max_modified_date,
+                conformer_max_iterations=conformer_max_iterations,
+            )
+        )
+      all_inference_results = inference_pipeline.predict_structure(
+          fold_input=fold_input, output_dir=output_dir
+      )
     output = all_inference_results
 
   print(f'Fold job {fold_input.name} done, output written to {output_dir}\n')
   return output
 
 
+def _expand_seeds(
+    fold_inputs: Iterable[folding_input.Input], num_seeds: int
+) -> Iterator[folding_input.Input]:
+  """Expands each fold input to the given number of seeds."""
+  for fold_input in fold_inputs:
+    print(f'Expanding fold job {fold_input.name} to {num_seeds} seeds')
+    yield fold_input.with_multiple_seeds(num_seeds)
+
+
+def _prefetch_next(
+    fold_inputs: Iterable[folding_input.Input],
+    inference_pipeline: InferencePipeline,
+) -> Iterator[folding_input.Input]:
+  """Yields fold inputs, featurising the next one in the background.
+
+  Fold inputs are pulled from `fold_inputs` in a background thread, so that
+  producing the next fold input (e.g. running its data pipeline) doesn't delay
+  inference on the current one. Once the generator is closed, e.g. because
+  processing a fold input failed, the background thread stops and fold inputs
+  prefetched but not yielded yet are cancelled.
+
+  Args:
+    fold_inputs: Fold inputs that include the results of the data pipeline.
+    inference_pipeline: The pipeline to prefetch the fold inputs with.
+
+  Yields:
+    The fold inputs, in order.
+  """
+  prefetched = queue.Queue()
+  consumed = threading.Semaphore(0)
+  stopped = threading.Event()
+  # Guards prefetching against cancelling the prefetches once stopped.
+  lock = threading.Lock()
+  done = object()
+
+  def produce():
+    try:
+      for fold_input in fold_inputs:
+        with lock:
+          if stopped.is_set():
+            return
+          inference_pipeline.prefetch(fold_input)
+        prefetched.put(fold_input)
+        # Fetch the next fold input only once this one is being processed.
+        consumed.acquire()
+        if stopped.is_set():
+          return
+    except Exception as e:  # pylint: disable=broad-exception-caught
+      prefetched.put(e)
+    else:
+      prefetched.put(done)
+
+  threading.Thread(
+      target=produce, name='fold_input_prefetch', daemon=True
+  ).start()
+  try:
+    while (item := prefetched.get()) is not done:
+      consumed.release()
+      if isinstance(item, Exception):
+        raise item
+      yield item
+  finally:
+    with lock:
+      stopped.set()
+      inference_pipeline.cancel_prefetches()
+    # Wakes up the background thread if it waits for a fold input to be used.
+    consumed.release()
+
+
+def _process_fold_inputs(
+    fold_inputs: Iterable[folding_input.Input],
+    data_pipeline_config: pipeline.DataPipelineConfig | None,
+    model_runner: ModelRunner | None,
+    inference_pipeline: InferencePipeline | None,
+    max_template_date: datetime.date,
+) -> int:
+  """Processes fold inputs as configured by the flags.
+
+  Args:
+    fold_inputs: The fold inputs to process.
+    data_pipeline_config: Data pipeline config to use. If None, skip the data
+      pipeline.
+    model_runner: Model runner to use. If None, skip inference.
+    inference_pipeline: Inference pipeline of the model runner.
+    max_template_date: The maximum template and reference structure date.
+
+  Returns:
+    The number of processed fold inputs.
+  """
+  if _NUM_SEEDS.value is not None:
+    fold_inputs = _expand_seeds(fold_inputs, _NUM_SEEDS.value)
+
+  if data_pipeline_config is not None and _DATA_PIPELINE_N_WORKERS.value > 1:
+    # Run the data pipeline for all fold inputs in a worker pool. The fold
+    # inputs then skip the data pipeline in process_fold_input.
+    fold_inputs = pipeline.DataPipeline(data_pipeline_config).process_many(
+        fold_inputs, max_workers=_DATA_PIPELINE_N_WORKERS.value
+    )
+    data_pipeline_config = None
+
+  num_fold_inputs = 0
+  with contextlib.ExitStack() as stack:
+    if inference_pipeline is not None and data_pipeline_config is None:
+      # Fold inputs are ready for featurisation, so the next one can be
+      # featurised while running inference on the current one. Closing the
+      # generator stops prefetching if processing a fold input fails.
+      fold_inputs = stack.enter_context(
+          contextlib.closing(_prefetch_next(fold_inputs, inference_pipeline))
+      )
+
+    for fold_input in fold_inputs:
+      process_fold_input(
+          fold_input=fold_input,
+          data_pipeline_config=data_pipeline_config,
+          model_runner=model_runner,
+          output_dir=os.path.join(
+              _OUTPUT_DIR.value, fold_input.sanitised_name()
+          ),
+          buckets=tuple(int(bucket) for bucket in _BUCKETS.value),
+          ref_max_modified_date=max_template_date,
+          conformer_max_iterations=_CONFORMER_MAX_ITERATIONS.value,
+          force_output_dir=_FORCE_OUTPUT_DIR.value,
+          inference_pipeline=inference_pipeline,
+      )
+      num_fold_inputs += 1
+  return num_fold_inputs
+
+
+@dataclasses.dataclass(slots=True, kw_only=True)
+class SpoolJob:
+  """A fold job submitted to a spool directory."""
+
+  name: str
+  submitted_time: float
+  start_time: float
+  end_time: float | None = None
+  error: str | None = None
+
+  @property
+  def status(self) -> str:
+    if self.end_time is None:
+      return 'running'
+    return 'done' if self.error is None else 'failed'
+
+  def to_dict(self) -> dict[str, str | float | None]:
+    end_time = self.end_time if self.end_time is not None else time.time()
+    return {
+        'name': self.name,
+        'status': self.status,
+        'queued_seconds': self.start_time - self.submitted_time,
+        'processing_seconds': end_time - self.start_time,
+        'latency_seconds': end_time - self.submitted_time,
+        'error': self.error,
+    }
+
+
+class SpoolDir:
+  """A directory through which fold jobs are submitted to a server.
+
+  Fold jobs are JSON files in the format of `--json_path`, submitted by moving
+  them to the `incoming` subdirectory. Files should be written elsewhere on the
+  same filesystem (or to a name starting with a dot) and then renamed, so that
+  they are never read partially written. Jobs are processed oldest first. A job
+  file is moved to `running` while it is processed, then to `done` or, with an
+  error message in `<name>.error`, to `failed`. The queue depth and the latency
+  of recent jobs are written to `status.json`. Creating a file named `stop`
+  stops the server once the running job is done.
+
+  Many servers can share a spool directory, e.g. one per GPU, as jobs are
+  claimed atomically. The status is then of the server that last updated it.
+  """
+
+  def __init__(
+      self,
+      path: os.PathLike[str] | str,
+      poll_interval_seconds: float = 1.0,
+      max_history: int = 100,
+  ):
+    """Initializes the spool directory, creating its subdirectories.
+
+    Args:
+      path: The path of the spool directory.
+      poll_interval_seconds: How often to check for new jobs when idle.
+      max_history: The number of finished jobs to report in the status.
+    """
+    self._path = pathlib.Path(path)
+    self._poll_interval_seconds = poll_interval_seconds
+    for subdir in ('incoming', 'running', 'done', 'failed'):
+      (self._path / subdir).mkdir(parents=True, exist_ok=True)
+    self._history = collections.deque(maxlen=max_history)
+    self._num_done = 0
+    self._num_failed = 0
+    self._current_job: SpoolJob | None = None
+
+  def _queued(self) -> list[pathlib.Path]:
+    """Returns the queued job files, oldest first."""
+    queued = []
+    # Renaming a file updates its ctime, i.e. it is the submission time.
+    for path in (self._path / 'incoming').glob('[!.]*.json'):
+      try:
+        queued.append((path.stat().st_ctime, path.name, path))
+      except FileNotFoundError:
+        continue  # Claimed by another server.
+    return [path for _, _, path in sorted(queued)]
+
+  def _write_status(self, queue_depth: int) -> None:
+    status = {
+        'pid': os.getpid(),
+        'queue_depth': queue_depth,
+        'num_done': self._num_done,
+        'num_failed': self._num_failed,
+        'running': (
+            self._current_job.to_dict() if self._current_job else None
+        ),
+        'recent_jobs': [job.to_dict() for job in reversed(self._history)],
+    }
+    # Write to a temporary file and rename, so that readers never see a
+    # partially written status.
+    tmp_path = self._path / f'.status.json.{os.getpid()}.tmp'
+    tmp_path.write_text(json.dumps(status, indent=1))
+    os.replace(tmp_path, self._path / 'status.json')
+
+  def _claim(self) -> tuple[SpoolJob, pathlib.Path] | None:
+    """Claims the oldest queued job, if any."""
+    queued = self._queued()
+    for path in queued:
+      running_path = self._path / 'running' / path.name
+      try:
+        submitted_time = path.stat().st_ctime
+        os.rename(path, running_path)
+      except FileNotFoundError:
+        continue  # Claimed by another server.
+      job = SpoolJob(
+          name=path.name, submitted_time=submitted_time, start_time=time.time()
+      )
+      self._current_job = job
+      self._write_status(queue_depth=len(queued) - 1)
+      return job, running_path
+    return None
+
+  def jobs(self) -> Iterator[tuple[SpoolJob, pathlib.Path]]:
+    """Yields claimed jobs and their files, until stopped.
+
+    Each job must be reported as finished with `finish` before the next one is
+    claimed.
+
+    Yields:
+      The claimed job and the path of its JSON file.
+    """
+    self._write_status(queue_depth=len(self._queued()))
+    while not (self._path / 'stop').exists():
+      if (claimed := self._claim()) is not None:
+        yield claimed
+        if self._current_job is not None:
+          raise RuntimeError(f'Job {self._current_job.name} was not finished.')
+      else:
+        time.sleep(self._poll_interval_seconds)
+    print(f'Stopping, found {self._path / "stop"}.')
+
+  def finish(self, job: SpoolJob, error: str | None = None) -> None:
+    """Moves a claimed job to `done` or `failed`, and records its latency."""
+    job.end_time = time.time()
+    job.error = error
+    running_path = self._path / 'running' / job.name
+    os.rename(running_path, self._path / job.status / job.name)
+    if error is None:
+      self._num_done += 1
+    else:
+      self._num_failed += 1
+      (self._path / 'failed' / f'{job.name}.error').write_text(error)
+    self._history.append(job)
+    self._current_job = None
+    self._write_status(queue_depth=len(self._queued()))
+    job_dict = job.to_dict()
+    print(
+        f'Job {job.name} {job.status}, latency'
+        f' {job_dict["latency_seconds"]:.2f} seconds (queued'
+        f' {job_dict["queued_seconds"]:.2f} seconds, processing'
+        f' {job_dict["processing_seconds"]:.2f} seconds).'
+    )
+
+
+def _serve(
+    spool_dir: SpoolDir,
+    data_pipeline_config: pipeline.DataPipelineConfig | None,
+    model_runner: ModelRunner | None,
+    inference_pipeline: InferencePipeline | None,
+    max_template_date: datetime.date,
+) -> int:
+  """Processes the jobs submitted to a spool directory, until stopped."""
+  num_fold_inputs = 0
+  for job, job_path in spool_dir.jobs():
+    print(f'\nProcessing job {job.name}...')
+    try:
+      num_fold_inputs += _process_fold_inputs(
+          fold_inputs=folding_input.load_fold_inputs_from_path(job_path),
+          data_pipeline_config=data_pipeline_config,
+          model_runner=model_runner,
+          inference_pipeline=inference_pipeline,
+          max_template_date=max_template_date,
+      )
+    except Exception:  # pylint: disable=broad-exception-caught
+      error = traceback.format_exc()
+      print(f'Job {job.name} failed:\n{error}')
+      if inference_pipeline is not None:
+        # Don't hold on to the featurisation of the rest of the failed job.
+        inference_pipeline.cancel_prefetches()
+      spool_dir.finish(job, error=error)
+    else:
+      spool_dir.finish(job)
+  return num_fold_inputs
+
+
 def main(_):
   if _JAX_COMPILATION_CACHE_DIR.value is not None:
     jax.config.update(
         'jax_compilation_cache_dir', _JAX_COMPILATION_CACHE_DIR.value
     )
 
-  if _JSON_PATH.value is None == _INPUT_DIR.value is None:
+  num_inputs = sum(
+      flag.value is not None for flag in (_JSON_PATH, _INPUT_DIR, _SPOOL_DIR)
+  )
+  if num_inputs != 1:
     raise ValueError(
-        'Exactly one of --json_path or --input_dir must be specified.'
+        'Exactly one of --json_path, --input_dir or --spool_dir must be'
+        ' specified.'
     )
 
   if not _RUN_INFERENCE.value and not _RUN_DATA_PIPELINE.value:
@@ -700,9 +1850,12 @@ def main(_):
     fold_inputs = folding_input.load_fold_inputs_from_path(
         pathlib.Path(_JSON_PATH.value)
     )
+  elif _SPOOL_DIR.value is not None:
+    fold_inputs = None  # Fold inputs are submitted to the spool directory.
   else:
     raise AssertionError(
-        'Exactly one of --json_path or --input_dir must be specified.'
+        'Exactly one of --json_path, --input_dir or --spool_dir must be'
+        ' specified.'
     )
 
   # Make sure we can create the output directory before running anything.
@@ -775,8 +1928,33 @@ def main(_):
         seqres_database_path=expand_path(_SEQRES_DATABASE_PATH.value),
         jackhmmer_n_cpu=_JACKHMMER_N_CPU.value,
         nhmmer_n_cpu=_NHMMER_N_CPU.value,
+        hmmsearch_n_cpu=_HMMSEARCH_N_CPU.value,
+        use_database_shards=_USE_DATABASE_SHARDS.value,
+        search_n_cpu=_SEARCH_N_CPU.value,
+        search_cpu_lock_file=_SEARCH_CPU_LOCK_FILE.value,
+        template_search_batch_size=_TEMPLATE_SEARCH_BATCH_SIZE.value,
+        template_search_batch_wait_seconds=(
+            _TEMPLATE_SEARCH_BATCH_WAIT_SECONDS.value
+        ),
+        search_cache_dir=_SEARCH_CACHE_DIR.value,
+        search_cache_max_size_bytes=int(_SEARCH_CACHE_MAX_SIZE_GB.value * 1e9),
+        template_metadata_index_path=(
+            expand_path(_TEMPLATE_METADATA_INDEX_PATH.value)
+            if _TEMPLATE_METADATA_INDEX_PATH.value is not None
+            else None
+        ),
+        database_staging_dir=_DATABASE_STAGING_DIR.value,
+        database_staging_max_size_bytes=(
+            int(_DATABASE_STAGING_MAX_SIZE_GB.value * 1e9)
+            if _DATABASE_STAGING_MAX_SIZE_GB.value is not None
+            else None
+        ),
+        warm_database_page_cache=_WARM_DATABASE_PAGE_CACHE.value,
         max_template_date=max_template_date,
     )
+    # Stage the databases and warm the page cache while the model is loaded,
+    # so that they are ready by the time they are searched.
+    pipeline.start_staging_databases(data_pipeline_config)
   else:
     data_pipeline_config = None
 
@@ -794,11 +1972,23 @@ def main(_):
                 attention.Implementation, _FLASH_ATTENTION_IMPLEMENTATION.value
             ),
             num_diffusion_samples=_NUM_DIFFUSION_SAMPLES.value,
+            num_diffusion_steps=_NUM_DIFFUSION_STEPS.value,
+            diffusion_schedule_exponent=_DIFFUSION_SCHEDULE_EXPONENT.value,
+            diffusion_solver=typing.cast(
+                Literal['euler', 'heun'], _DIFFUSION_SOLVER.value
+            ),
             num_recycles=_NUM_RECYCLES.value,
+            recycling_tolerance=_RECYCLING_TOLERANCE.value,
+            recycling_convergence_metric=typing.cast(
+                Literal['embeddings', 'distogram'],
+                _RECYCLING_CONVERGENCE_METRIC.value,
+            ),
+            min_num_recycles=_MIN_NUM_RECYCLES.value,
             return_embeddings=_SAVE_EMBEDDINGS.value,
         ),
         device=devices[_GPU_DEVICE.value],
         model_dir=pathlib.Path(MODEL_DIR.value),
+        cache_decompressed_params=_CACHE_DECOMPRESSED_MODEL_PARAMS.value,
     )
     # Check we can load the model parameters before launching anything.
     print('Checking that model parameters can be loaded...')
@@ -806,22 +1996,45 @@ def main(_):
   else:
     model_runner = None
 
-  num_fold_inputs = 0
-  for fold_input in fold_inputs:
-    if _NUM_SEEDS.value is not None:
-      print(f'Expanding fold job {fold_input.name} to {_NUM_SEEDS.value} seeds')
-      fold_input = fold_input.with_multiple_seeds(_NUM_SEEDS.value)
-    process_fold_input(
-        fold_input=fold_input,
-        data_pipeline_config=data_pipeline_config,
-        model_runner=model_runner,
-        output_dir=os.path.join(_OUTPUT_DIR.value, fold_input.sanitised_name()),
-        buckets=tuple(int(bucket) for bucket in _BUCKETS.value),
-        ref_max_modified_date=max_template_date,
-        conformer_max_iterations=_CONFORMER_MAX_ITERATIONS.value,
-        force_output_dir=_FORCE_OUTPUT_DIR.value,
-    )
-    num_fold_inputs += 1
+  with contextlib.ExitStack() as stack:
+    if model_runner is None:
+      inference_pipeline = None
+    else:
+      inference_pipeline = stack.enter_context(
+          InferencePipeline(
+              model_runner=model_runner,
+              buckets=tuple(int(bucket) for bucket in _BUCKETS.value),
+              ref_max_modified_date=max_template_date,
+              conformer_max_iterations=_CONFORMER_MAX_ITERATIONS.value,
+              conformer_cache_dir=_CONFORMER_CACHE_DIR.value,
+              featurisation_n_workers=_FEATURISATION_N_WORKERS.value,
+              featurisation_n_processes=_FEATURISATION_N_PROCESSES.value,
+              output_writer_n_workers=_OUTPUT_WRITER_N_WORKERS.value,
+              output_writer_n_processes=_OUTPUT_WRITER_N_PROCESSES.value,
+              max_queued=_MAX_QUEUED_EXAMPLES.value,
+              save_confidences_npz=_SAVE_CONFIDENCES_NPZ.value,
+          )
+      )
+
+    if fold_inputs is None:
+      if inference_pipeline is not None:
+        inference_pipeline.compile_buckets()
+      print(f'Serving fold jobs submitted to {_SPOOL_DIR.value}...')
+      num_fold_inputs = _serve(
+          spool_dir=SpoolDir(_SPOOL_DIR.value),
+          data_pipeline_config=data_pipeline_config,
+          model_runner=model_runner,
+          inference_pipeline=inference_pipeline,
+          max_template_date=max_template_date,
+      )
+    else:
+      num_fold_inputs = _process_fold_inputs(
+          fold_inputs=fold_inputs,
+          data_pipeline_config=data_pipeline_config,
+          model_runner=model_runner,
+          inference_pipeline=inference_pipeline,
+          max_template_date=max_template_date,
+      )
 
   print(f'Done running {num_fold_inputs} fold jobs.')
 
@@ -10,7 +10,9 @@
 
 """Tests the AlphaFold 3 data pipeline."""
 
+from collections.abc import Sequence
 import contextlib
+import dataclasses
 import datetime
 import difflib
 import functools
@@ -28,8 +30,21 @@ from alphafold3.common import folding_input
 from alphafold3.common import resources
 from alphafold3.common.testing import data as testing_data
 from alphafold3.constants import chemical_components
+from alphafold3.constants import mmcif_names
+from alphafold3.cpp import cif_dict
+from alphafold3.data import database_shards
+from alphafold3.data import database_staging
 from alphafold3.data import featurisation
+from alphafold3.data import msa_features
+from alphafold3.data import parsers
 from alphafold3.data import pipeline
+from alphafold3.data import search_cache
+from alphafold3.data import search_scheduler
+from alphafold3.data import template_metadata_index
+from alphafold3.data.tools import jackhmmer
+from alphafold3.model import conformer_cache
+from alphafold3.model import features
+from alphafold3.model import template_cache
 from alphafold3.model.atom_layout import atom_layout
 from alphafold3.structure import test_utils
 import jax
@@ -98,6 +113,37 @@ def _generate_diff(actual: str, expected: str) -> str:
   )
 
 
+def _gather_idxs_by_lookup(
+    source_layout: atom_layout.AtomLayout,
+    target_layout: atom_layout.AtomLayout,
+) -> tuple[np.ndarray, np.ndarray]:
+  """Gather indices and mask of the uids, looked up one atom at a time."""
+  source_uid_to_idx = {
+      uid: idx
+      for idx, uid in enumerate(
+          zip(
+              source_layout.chain_id.ravel(),
+              source_layout.res_id.ravel(),
+              source_layout.atom_name.ravel(),
+          )
+      )
+  }
+  target_uids = list(
+      zip(
+          target_layout.chain_id.ravel(),
+          target_layout.res_id.ravel(),
+          target_layout.atom_name.ravel(),
+      )
+  )
+  gather_idxs = [source_uid_to_idx.get(uid, 0) for uid in target_uids]
+  gather_mask = [uid in source_uid_to_idx for uid in target_uids]
+  target_shape = target_layout.atom_name.shape
+  return (
+      np.array(gather_idxs, dtype=int).reshape(target_shape),
+      np.array(gather_mask, dtype=bool).reshape(target_shape),
+  )
+
+
 class DataPipelineTest(test_utils.StructureTestCase):
   """Test AlphaFold 3 inference."""
 
@@ -190,6 +236,33 @@ class DataPipelineTest(test_utils.StructureTestCase):
 
     self.assertEqual(diff, "", f"Result differs from golden:\n{diff}")
 
+  def _process_test_input(
+      self, rng_seeds: Sequence[int] | None = None
+  ) -> folding_input.Input:
+    """Returns the test input with the results of the data pipeline."""
+    fold_input = folding_input.Input.from_json(self._test_input_json)
+    if rng_seeds is not None:
+      fold_input = dataclasses.replace(fold_input, rng_seeds=rng_seeds)
+    return pipeline.DataPipeline(self._data_pipeline_config).process(
+        fold_input
+    )
+
+  def _featurise(
+      self, full_fold_input: folding_input.Input, **kwargs
+  ) -> list[features.BatchDict]:
+    return featurisation.featurise_input(
+        full_fold_input,
+        ccd=chemical_components.cached_ccd(),
+        buckets=None,
+        **kwargs,
+    )
+
+  def assert_features_equal(self, actual: Any, expected: Any) -> None:
+    self.assertEqual(
+        jax.tree_util.tree_map(_hash_data, actual),
+        jax.tree_util.tree_map(_hash_data, expected),
+    )
+
   def test_config(self):
     model_config = run_alphafold.make_model_config()
     model_config_as_str = json.dumps(
@@ -222,6 +295,200 @@ class DataPipelineTest(test_utils.StructureTestCase):
       )
     self.compare_golden(result_path)
 
+  def test_featurisation_shares_seed_invariant_features(self):
+    """Multi-seed featurisation matches the golden single seed featurisation."""
+    fold_input = folding_input.Input.from_json(self._test_input_json)
+    (golden_seed,) = fold_input.rng_seeds
+    # The golden seed is not the first one, so that it is featurised from the
+    # seed-invariant features shared with the previous seed.
+    rng_seeds = [42, golden_seed, 7]
+    full_fold_input = self._process_test_input(rng_seeds=rng_seeds)
+
+    batches = self._featurise(full_fold_input)
+
+    self.assertLen(batches, len(rng_seeds))
+    golden_path = testing_data.Data(
+        resources.ROOT / 'test_data/featurised_example.json'
+    ).path()
+    with open(golden_path, 'r') as golden_file:
+      (golden_hashes,) = json.load(golden_file)
+    for rng_seed, batch in zip(rng_seeds, batches, strict=True):
+      del batch['ref_pos']  # Depends on specific RDKit version.
+      if rng_seed == golden_seed:
+        self.assertEqual(
+            jax.tree_util.tree_map(_hash_data, batch), golden_hashes
+        )
+      else:
+        # Featurising the seed alone doesn't share seed-invariant features.
+        (expected_batch,) = self._featurise(
+            dataclasses.replace(full_fold_input, rng_seeds=[rng_seed])
+        )
+        del expected_batch['ref_pos']
+        self.assert_features_equal(batch, expected_batch)
+
+  def test_conformer_cache_reuses_conformers(self):
+    full_fold_input = self._process_test_input()
+    cache_dir = self.create_tempdir().full_path
+    expected = self._featurise(full_fold_input)
+
+    # Populate the persistent cache.
+    self._featurise(full_fold_input, conformer_cache_dir=cache_dir)
+    self.assertNotEmpty(list(pathlib.Path(cache_dir).glob('*/*.npz')))
+
+    # A new cache instance reads all conformers from disk.
+    conformer_cache.get_cache.cache_clear()
+    actual = self._featurise(full_fold_input, conformer_cache_dir=cache_dir)
+
+    self.assert_features_equal(actual, expected)
+    stats = conformer_cache.get_cache(cache_dir).stats
+    self.assertEqual(stats.misses, 0)
+    self.assertGreater(stats.disk_hits, 0)
+
+  def test_template_cache_reuses_template_features(self):
+    full_fold_input = self._process_test_input()
+    template_cache.get_cache.cache_clear()
+    expected = self._featurise(full_fold_input)
+    misses = template_cache.get_cache().stats.misses
+    self.assertGreater(misses, 0)
+
+    # The features of all templates are cached by the first featurisation.
+    actual = self._featurise(full_fold_input)
+
+    self.assert_features_equal(actual, expected)
+    stats = template_cache.get_cache().stats
+    self.assertEqual(stats.misses, misses)
+    self.assertGreater(stats.hits, 0)
+
+  def test_featurisation_in_process_pool_matches_serial(self):
+    full_fold_input = self._process_test_input()
+    expected = self._featurise(full_fold_input)
+
+    # A new cache directory, so that all conformers are generated in the pool.
+    actual = self._featurise(
+        full_fold_input,
+        conformer_cache_dir=self.create_tempdir().full_path,
+        n_worker_processes=2,
+    )
+
+    self.assert_features_equal(actual, expected)
+
+  @parameterized.parameters('str', 'object', 'int')
+  def test_compute_gather_idxs_matches_lookup(self, chain_id_dtype):
+    rng = np.random.default_rng(0)
+
+    def random_layout(shape: tuple[int, ...]) -> atom_layout.AtomLayout:
+      chain_id = rng.choice(['A', 'B', 'AB'], shape)
+      if chain_id_dtype == 'object':
+        chain_id = chain_id.astype(object)
+      elif chain_id_dtype == 'int':
+        chain_id = rng.integers(0, 3, shape)
+      return atom_layout.AtomLayout(
+          atom_name=rng.choice(['N', 'CA', 'C', ''], shape).astype(object),
+          res_id=rng.integers(1, 6, shape),
+          chain_id=chain_id,
+      )
+
+    # Uids repeat in the source layout, and some are missing from it.
+    source_layout = random_layout((60,))
+    target_layout = random_layout((20, 3))
+
+    gather_info = atom_layout.compute_gather_idxs(
+        source_layout=source_layout, target_layout=target_layout
+    )
+
+    expected_idxs, expected_mask = _gather_idxs_by_lookup(
+        source_layout, target_layout
+    )
+    np.testing.assert_array_equal(gather_info.gather_idxs, expected_idxs)
+    np.testing.assert_array_equal(gather_info.gather_mask, expected_mask)
+    self.assertTrue(expected_mask.any())
+    self.assertFalse(expected_mask.all())
+
+  @parameterized.named_parameters(
+      ('protein', mmcif_names.PROTEIN_CHAIN, ['MKV-A', 'MqqK-VAr', 'M-aKVA']),
+      ('rna', mmcif_names.RNA_CHAIN, ['ACGU', 'A-cGUu', 'aaAC-U']),
+      ('dna', mmcif_names.DNA_CHAIN, ['ACGT', 'AC-Tt', 'tAgCGT']),
+      ('non_ascii', mmcif_names.PROTEIN_CHAIN, ['MKV', 'MéKV']),
+  )
+  def test_extract_msa_features_matches_python(
+      self, chain_poly_type, msa_sequences
+  ):
+    actual = msa_features.extract_msa_features(msa_sequences, chain_poly_type)
+
+    # pylint: disable=protected-access
+    expected = msa_features._extract_msa_features_python(
+        msa_sequences, msa_features._get_char_map(chain_poly_type)
+    )
+    # pylint: enable=protected-access
+    for actual_arr, expected_arr in zip(actual, expected, strict=True):
+      np.testing.assert_array_equal(actual_arr, expected_arr)
+      self.assertEqual(actual_arr.dtype, expected_arr.dtype)
+
+  @parameterized.named_parameters(
+      ('unknown_residue', ['MKV', 'MK*']),
+      ('inconsistent_length', ['MKV', 'MK']),
+  )
+  def test_extract_msa_features_invalid_msa(self, msa_sequences):
+    # pylint: disable=protected-access
+    with self.assertRaises(ValueError) as expected:
+      msa_features._extract_msa_features_python(
+          msa_sequences, msa_features._PROTEIN_TO_ID
+      )
+    # pylint: enable=protected-access
+    with self.assertRaisesWithLiteralMatch(
+        ValueError, str(expected.exception)
+    ):
+      msa_features.extract_msa_features(
+          msa_sequences, mmcif_names.PROTEIN_CHAIN
+      )
+
+  def test_ccd_store_matches_pickle(self):
+    ccd = chemical_components.cached_ccd()
+    components = {name: ccd[name] for name in ('ALA', 'GLY', '7BU', 'HEM')}
+    tmp_dir = self.create_tempdir().full_path
+    ccd_pickle_path = os.path.join(tmp_dir, 'ccd.pickle')
+    with open(ccd_pickle_path, 'wb') as f:
+      pickle.dump(components, f, protocol=pickle.HIGHEST_PROTOCOL)
+    ccd_store_path = os.path.join(tmp_dir, 'ccd.store')
+    chemical_components.write_ccd_store(components.items(), ccd_store_path)
+    # Overrides a CCD component and adds a new one.
+    user_ccd = (
+        "data_GLY\n_chem_comp.id GLY\n_chem_comp.name 'USER GLYCINE'\n#\n"
+        "data_USR\n_chem_comp.id USR\n_chem_comp.name 'USER LIGAND'\n#\n"
+    )
+
+    for user_ccd in (None, user_ccd):
+      # The CCD used to be a dict updated with the user CCD.
+      expected = dict(components)
+      if user_ccd is not None:
+        expected.update({
+            key: {k: tuple(v) for k, v in value.items()}
+            for key, value in cif_dict.parse_multi_data_cif(user_ccd).items()
+        })
+      for ccd_path in (ccd_pickle_path, ccd_store_path):
+        with self.subTest(
+            user_ccd=user_ccd is not None, ccd=os.path.basename(ccd_path)
+        ):
+          if ccd_path == ccd_pickle_path:
+            actual = chemical_components.Ccd(
+                ccd_pickle_path=ccd_path, user_ccd=user_ccd
+            )
+          else:
+            # A single cached component, so that components are decoded again.
+            actual = chemical_components.Ccd(
+                ccd_store_path=ccd_path,
+                user_ccd=user_ccd,
+                max_cached_components=1,
+            )
+          self.assertEqual(list(actual.items()), list(expected.items()))
+          # Evicted components are read again from the store.
+          self.assertEqual(list(actual.items()), list(expected.items()))
+          self.assertLen(actual, len(expected))
+          self.assertEqual('USR' in actual, 'USR' in expected)
+          self.assertIsNone(actual.get('MISSING'))
+          with self.assertRaises(KeyError):
+            _ = actual['MISSING']
+
   def test_write_input_json(self):
     fold_input = folding_input.Input.from_json(self._test_input_json)
     output_dir = self.create_tempdir().full_path
@@ -251,6 +518,282 @@ class DataPipelineTest(test_utils.StructureTestCase):
 
     featurisation.validate_fold_input(actual_fold_input)
 
+  def test_process_many_matches_process(self):
+    fold_input = folding_input.Input.from_json(self._test_input_json)
+    # A second fold input with a renamed copy of the protein chain, which must
+    # be processed only once and then assigned its own chain ID.
+    protein_chain = fold_input.protein_chains[0]
+    renamed_chain = folding_input.ProteinChain(
+        id='Q', sequence=protein_chain.sequence, ptms=protein_chain.ptms
+    )
+    other_fold_input = dataclasses.replace(
+        fold_input, name='other', chains=[renamed_chain]
+    )
+    data_pipeline = pipeline.DataPipeline(self._data_pipeline_config)
+
+    actual = list(
+        data_pipeline.process_many(
+            [fold_input, other_fold_input], max_workers=2
+        )
+    )
+
+    expected = [
+        data_pipeline.process(fold_input),
+        data_pipeline.process(other_fold_input),
+    ]
+    self.assertEqual(actual, expected)
+
+  def test_batched_template_search_matches_unbatched(self):
+    fold_input = folding_input.Input.from_json(self._test_input_json)
+    # A second fold input with a different protein chain, whose template
+    # search is batched with that of the first one.
+    protein_chain = fold_input.protein_chains[0]
+    other_chain = folding_input.ProteinChain(
+        id='P', sequence=protein_chain.sequence[:60], ptms=[]
+    )
+    other_fold_input = dataclasses.replace(
+        fold_input, name='other', chains=[other_chain]
+    )
+    expected = list(
+        pipeline.DataPipeline(self._data_pipeline_config).process_many(
+            [fold_input, other_fold_input], max_workers=2
+        )
+    )
+
+    batched_config = dataclasses.replace(
+        self._data_pipeline_config,
+        template_search_batch_size=2,
+        template_search_batch_wait_seconds=600.0,
+    )
+    actual = list(
+        pipeline.DataPipeline(batched_config).process_many(
+            [fold_input, other_fold_input], max_workers=2
+        )
+    )
+
+    self.assertEqual(actual, expected)
+
+  def test_search_cache_reuses_results(self):
+    fold_input = folding_input.Input.from_json(self._test_input_json)
+    cache_dir = self.create_tempdir().full_path
+    expected = pipeline.DataPipeline(self._data_pipeline_config).process(
+        fold_input
+    )
+
+    # Populate the persistent cache.
+    populate_config = dataclasses.replace(
+        self._data_pipeline_config, search_cache_dir=cache_dir
+    )
+    pipeline.DataPipeline(populate_config).process(fold_input)
+    # 4 protein MSAs and the protein templates.
+    self.assertLen(list(pathlib.Path(cache_dir).glob('*/*.zst')), 5)
+
+    # A different cache size gives a new cache instance, which bypasses the
+    # in-memory caches of the data pipeline.
+    reuse_config = dataclasses.replace(
+        populate_config, search_cache_max_size_bytes=10**12
+    )
+    actual = pipeline.DataPipeline(reuse_config).process(fold_input)
+
+    self.assertEqual(actual, expected)
+    cache = search_cache.get_cache(cache_dir, 10**12)
+    self.assertEqual((cache.hits, cache.misses), (5, 0))
+
+  def test_search_cache_invalidates_rewritten_templates(self):
+    fold_input = folding_input.Input.from_json(self._test_input_json)
+    pdb_database_path = os.path.join(self.create_tempdir().full_path, 'pdb')
+    shutil.copytree(
+        self._data_pipeline_config.pdb_database_path, pdb_database_path
+    )
+    populate_config = dataclasses.replace(
+        self._data_pipeline_config,
+        pdb_database_path=pdb_database_path,
+        search_cache_dir=self.create_tempdir().full_path,
+    )
+    pipeline.DataPipeline(populate_config).process(fold_input)
+
+    # Rewriting the mmCIFs in place doesn't change the directory mtime.
+    for path in pathlib.Path(pdb_database_path).glob('*.cif'):
+      stat = path.stat()
+      os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    reuse_config = dataclasses.replace(
+        populate_config, search_cache_max_size_bytes=10**12
+    )
+    pipeline.DataPipeline(reuse_config).process(fold_input)
+
+    cache = search_cache.get_cache(populate_config.search_cache_dir, 10**12)
+    # Only the protein templates are searched again.
+    self.assertEqual((cache.hits, cache.misses), (4, 1))
+
+  @parameterized.parameters(
+      'small_bfd_database_path',
+      'mgnify_database_path',
+      'uniprot_cluster_annot_database_path',
+      'uniref90_database_path',
+  )
+  def test_stockholm_file_to_a3m_matches_python(self, database_field):
+    fold_input = folding_input.Input.from_json(self._test_input_json)
+    tmp_dir = self.create_tempdir().full_path
+    input_fasta_path = os.path.join(tmp_dir, 'query.fasta')
+    with open(input_fasta_path, 'wt') as f:
+      f.write(f'>query\n{fold_input.protein_chains[0].sequence}\n')
+    stockholm_path = os.path.join(tmp_dir, 'output.sto')
+    jackhmmer.Jackhmmer(
+        binary_path=_JACKHMMER_BINARY_PATH,
+        database_path=getattr(self._data_pipeline_config, database_field),
+        n_cpu=2,
+        n_iter=1,
+    ).search(input_fasta_path, stockholm_path)
+
+    for max_sequences in (None, 1, 10):
+      for remove_first_row_gaps in (True, False):
+        for linewidth in (None, 60):
+          with self.subTest(
+              max_sequences=max_sequences,
+              remove_first_row_gaps=remove_first_row_gaps,
+              linewidth=linewidth,
+          ):
+            with open(stockholm_path, 'rt') as f:
+              expected = parsers.convert_stockholm_to_a3m(
+                  f,
+                  max_sequences=max_sequences,
+                  remove_first_row_gaps=remove_first_row_gaps,
+                  linewidth=linewidth,
+              )
+            actual = parsers.convert_stockholm_file_to_a3m(
+                stockholm_path,
+                max_sequences=max_sequences,
+                remove_first_row_gaps=remove_first_row_gaps,
+                linewidth=linewidth,
+            )
+            self.assertEqual(actual, expected)
+
+  def test_stockholm_file_to_a3m_missing_file(self):
+    missing_path = os.path.join(self.create_tempdir().full_path, 'missing.sto')
+    with self.assertRaises(FileNotFoundError):
+      parsers.convert_stockholm_file_to_a3m(missing_path)
+
+  def test_host_cpu_ledger_never_grants_more_than_host(self):
+    lock_file_path = os.path.join(self.create_tempdir().full_path, 'cpus')
+    # The parent process stands in for another process sharing the host.
+    ledger = search_scheduler._HostCpuLedger(lock_file_path, n_cpu=4)
+    other_ledger = search_scheduler._HostCpuLedger(
+        lock_file_path, n_cpu=4, pid=os.getppid()
+    )
+
+    self.assertEqual(ledger.acquire(3), 3)
+    self.assertEqual(other_ledger.acquire(3), 1)
+    self.assertEqual(other_ledger.acquire(1), 0)
+    self.assertEqual(ledger.acquire(1), 0)
+    ledger.release(3)
+    self.assertEqual(other_ledger.acquire(3), 3)
+
+  def test_cpu_budget_releases_host_cpus_on_exit(self):
+    lock_file_path = os.path.join(self.create_tempdir().full_path, 'cpus')
+    n_cpu = search_scheduler.host_cpu_count()
+    budget = search_scheduler.CpuBudget(n_cpu, lock_file_path=lock_file_path)
+    other_ledger = search_scheduler._HostCpuLedger(
+        lock_file_path, n_cpu=n_cpu, pid=os.getppid()
+    )
+
+    with budget.reserve(n_cpu) as granted:
+      self.assertEqual(granted, n_cpu)
+      self.assertEqual(other_ledger.acquire(1), 0)
+    self.assertEqual(other_ledger.acquire(n_cpu), n_cpu)
+
+  def test_sharded_search_matches_unsharded(self):
+    fold_input = folding_input.Input.from_json(self._test_input_json)
+    # Shard copies of the databases, as the shards are written next to them.
+    db_dir = self.create_tempdir().full_path
+    database_paths = {}
+    for field in (
+        'small_bfd_database_path',
+        'mgnify_database_path',
+        'uniprot_cluster_annot_database_path',
+        'uniref90_database_path',
+    ):
+      path = getattr(self._data_pipeline_config, field)
+      database_paths[field] = shutil.copy(path, db_dir)
+      database_shards.build_shards(database_paths[field], num_shards=3)
+    unsharded_config = dataclasses.replace(
+        self._data_pipeline_config, **database_paths
+    )
+    expected = pipeline.DataPipeline(unsharded_config).process(fold_input)
+
+    sharded_config = dataclasses.replace(
+        unsharded_config, use_database_shards=True
+    )
+    actual = pipeline.DataPipeline(sharded_config).process(fold_input)
+
+    self.assertEqual(actual, expected)
+
+  def test_staged_databases_match_unstaged(self):
+    fold_input = folding_input.Input.from_json(self._test_input_json)
+    expected = pipeline.DataPipeline(self._data_pipeline_config).process(
+        fold_input
+    )
+
+    staging_dir = self.create_tempdir().full_path
+    staging_config = dataclasses.replace(
+        self._data_pipeline_config,
+        database_staging_dir=staging_dir,
+        warm_database_page_cache=True,
+    )
+    staged_config = pipeline.stage_databases(staging_config)
+    self.assertTrue(
+        staged_config.uniref90_database_path.startswith(staging_dir + os.sep)
+    )
+    actual = pipeline.DataPipeline(staging_config).process(fold_input)
+
+    self.assertEqual(actual, expected)
+
+  def test_database_stager_stages_every_file(self):
+    # Two databases with the same file name, one of them sharded.
+    database_paths = []
+    for contents in ('>a\nACDE\n>b\nFGHI\n>c\nKLMN\n', '>x\nPQRS\n'):
+      path = os.path.join(self.create_tempdir().full_path, 'db.fasta')
+      with open(path, 'wt') as f:
+        f.write(contents)
+      database_paths.append(path)
+    database_shards.build_shards(database_paths[0], num_shards=2)
+    staging_dir = self.create_tempdir().full_path
+
+    stager = database_staging.DatabaseStager(staging_dir)
+    staged_paths = [stager.stage(path) for path in database_paths]
+
+    self.assertLen(set(staged_paths), 2)
+    for path, staged_path in zip(database_paths, staged_paths, strict=True):
+      self.assertTrue(staged_path.startswith(staging_dir + os.sep))
+      with open(path, 'rt') as f, open(staged_path, 'rt') as staged_f:
+        self.assertEqual(staged_f.read(), f.read())
+    staged_shards = database_shards.load_manifest(staged_paths[0]).shards
+    self.assertLen(staged_shards, 2)
+
+    # A partially staged database is not reused, but staged again.
+    os.remove(staged_shards[-1].path)
+    stager = database_staging.DatabaseStager(staging_dir)
+    self.assertEqual(stager.stage(database_paths[0]), staged_paths[0])
+    self.assertTrue(os.path.exists(staged_shards[-1].path))
+
+  def test_template_metadata_index_matches_mmcif_parsing(self):
+    fold_input = folding_input.Input.from_json(self._test_input_json)
+    expected = pipeline.DataPipeline(self._data_pipeline_config).process(
+        fold_input
+    )
+
+    index_path = os.path.join(self.create_tempdir().full_path, 'metadata.idx')
+    template_metadata_index.update_index(
+        index_path, self._data_pipeline_config.pdb_database_path, n_workers=2
+    )
+    index = template_metadata_index.TemplateMetadataIndex(index_path)
+    self.assertNotEmpty(index)
+    index_config = dataclasses.replace(
+        self._data_pipeline_config, template_metadata_index_path=index_path
+    )
+    actual = pipeline.DataPipeline(index_config).process(fold_input)
+
+    self.assertEqual(actual, expected)
+
   @parameterized.product(num_db_dirs=tuple(range(1, 3)))
   def test_replace_db_dir(self, num_db_dirs: int) -> None:
     """Test that the db_dir is replaced correctly."""
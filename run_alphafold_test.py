@@ -19,18 +19,31 @@ import json
 import os
 import pathlib
 import pickle
+import threading
+import types
 
 from absl import logging
 from absl.testing import absltest
+from absl.testing import flagsaver
 from absl.testing import parameterized
+from alphafold3 import structure
 from alphafold3.common import folding_input
 from alphafold3.common import resources
 from alphafold3.common.testing import data as testing_data
 from alphafold3.data import pipeline
+from alphafold3.model import confidence_types
+from alphafold3.model import confidences
+from alphafold3.model import mmcif_metadata
+from alphafold3.model import params
+from alphafold3.model import post_processing
+from alphafold3.model.network import diffusion_head
 from alphafold3.model.scoring import alignment
 from alphafold3.structure import test_utils
+import haiku as hk
 import jax
 import numpy as np
+from scipy import spatial
+import zstandard
 
 import run_alphafold
 import shutil
@@ -52,6 +65,19 @@ def _output(name: str):
 jax.config.update('jax_enable_compilation_cache', False)
 
 
+class _StopWhenIdleSpoolDir(run_alphafold.SpoolDir):
+  """Stops the server once no jobs are left."""
+
+  def __init__(self, path: os.PathLike[str] | str):
+    super().__init__(path, poll_interval_seconds=0.01)
+    self.path = pathlib.Path(path)
+
+  def finish(self, job: run_alphafold.SpoolJob, error: str | None = None):
+    super().finish(job, error)
+    if not list((self.path / 'incoming').glob('*.json')):
+      (self.path / 'stop').touch()
+
+
 def _generate_diff(actual: str, expected: str) -> str:
   return '\n'.join(
       difflib.unified_diff(
@@ -64,6 +90,25 @@ def _generate_diff(actual: str, expected: str) -> str:
   )
 
 
+def _per_atom_has_clash_by_lookup(
+    struc: structure.Structure, cutoff_radius: float
+) -> np.ndarray:
+  """Whether each atom clashes, looked up one atom at a time."""
+  coords = struc.coords
+  clashes_per_atom = spatial.cKDTree(coords).query_ball_point(
+      coords, p=2.0, r=cutoff_radius
+  )
+  per_atom_has_clash = np.zeros(len(coords), dtype=bool)
+  for atom_idx, clashing_indices in enumerate(clashes_per_atom):
+    for clashing_idx in clashing_indices:
+      if np.abs(struc.res_id[atom_idx] - struc.res_id[clashing_idx]) > 1 or (
+          struc.chain_id[atom_idx] != struc.chain_id[clashing_idx]
+      ):
+        per_atom_has_clash[atom_idx] = True
+        break
+  return per_atom_has_clash
+
+
 class InferenceTest(test_utils.StructureTestCase):
   """Test AlphaFold 3 inference."""
 
@@ -167,6 +212,395 @@ class InferenceTest(test_utils.StructureTestCase):
     )
     self.assertLen(embeddings, 2)
 
+  def test_compiled_model_matches_jitted(self):
+    featurised_examples = pickle.loads(
+        (resources.ROOT / 'test_data' / 'featurised_example.pkl').read_bytes()
+    )
+    model_config = run_alphafold.make_model_config(
+        flash_attention_implementation='triton',
+        num_diffusion_samples=1,
+        num_diffusion_steps=20,
+        num_recycles=1,
+    )
+    results = []
+    for compile_ahead_of_time in (False, True):
+      runner = run_alphafold.ModelRunner(
+          config=model_config,
+          device=jax.local_devices()[0],
+          model_dir=pathlib.Path(run_alphafold.MODEL_DIR.value),
+      )
+      if compile_ahead_of_time:
+        runner.compile(featurised_examples[0])
+      results.append(
+          runner.run_inference(featurised_examples[0], jax.random.PRNGKey(0))
+      )
+    np.testing.assert_allclose(
+        results[1]['diffusion_samples']['atom_positions'],
+        results[0]['diffusion_samples']['atom_positions'],
+        atol=1e-3,
+    )
+
+  @parameterized.product(
+      (
+          {'recycling_tolerance': float('inf'), 'expected_num_recycles': 1},
+          {'recycling_tolerance': 0.0, 'expected_num_recycles': 3},
+      ),
+      recycling_convergence_metric=('embeddings', 'distogram'),
+  )
+  def test_adaptive_recycling(
+      self,
+      recycling_tolerance,
+      expected_num_recycles,
+      recycling_convergence_metric,
+  ):
+    featurised_examples = pickle.loads(
+        (resources.ROOT / 'test_data' / 'featurised_example.pkl').read_bytes()
+    )
+    runner = run_alphafold.ModelRunner(
+        config=run_alphafold.make_model_config(
+            flash_attention_implementation='triton',
+            num_recycles=3,
+            recycling_tolerance=recycling_tolerance,
+            recycling_convergence_metric=recycling_convergence_metric,
+            min_num_recycles=1,
+        ),
+        device=jax.local_devices()[0],
+        model_dir=pathlib.Path(run_alphafold.MODEL_DIR.value),
+    )
+    result = runner.run_inference(featurised_examples[0], jax.random.PRNGKey(0))
+    self.assertEqual(int(result['num_recycles']), expected_num_recycles)
+
+  def test_confidences_npz_matches_json(self):
+    featurised_examples = pickle.loads(
+        (resources.ROOT / 'test_data' / 'featurised_example.pkl').read_bytes()
+    )
+    featurised_example = featurised_examples[0]
+    result = self._runner.run_inference(
+        featurised_example, jax.random.PRNGKey(0)
+    )
+    inference_results, _ = (
+        self._runner.extract_inference_results_and_maybe_embeddings(
+            batch=featurised_example, result=result, target_name='target'
+        )
+    )
+    output_dir = self.create_tempdir().full_path
+    post_processing.write_output(
+        inference_result=inference_results[0],
+        output_dir=output_dir,
+        save_confidences_npz=True,
+    )
+    with open(os.path.join(output_dir, 'confidences.json'), 'rt') as f:
+      confidences_json = f.read()
+    with open(os.path.join(output_dir, 'confidences.npz'), 'rb') as f:
+      confidences_npz = confidence_types.StructureConfidenceFull.from_npz(
+          f.read()
+      )
+
+    # The JSON matches encoding the rounded values with the json module.
+    pae = confidence_types.StructureConfidenceFull.from_inference_result(
+        inference_results[0]
+    ).pae
+    pae = np.round(np.clip(pae.astype(np.float64), 0.0, 99.9), 1)
+    expected_pae_json = json.dumps(pae.tolist(), separators=(',', ':'))
+    self.assertIn(
+        f'"pae": {expected_pae_json.replace("NaN", "null")},', confidences_json
+    )
+
+    confidences = json.loads(confidences_json)
+    for key in ('pae', 'contact_probs', 'atom_plddts'):
+      np.testing.assert_array_equal(
+          np.asarray(confidences[key], dtype=np.float64),
+          getattr(confidences_npz, key),
+          err_msg=key,
+      )
+    for key in ('token_chain_ids', 'token_res_ids', 'atom_chain_ids'):
+      self.assertEqual(confidences[key], getattr(confidences_npz, key))
+
+  def test_mmcif_writer_matches_cif_dict(self):
+    rng = np.random.default_rng(0)
+    mmcif_paths = sorted(
+        (resources.ROOT / 'test_data/miniature_databases/pdb_mmcif').glob(
+            '*.cif'
+        )
+    )
+    self.assertNotEmpty(mmcif_paths)
+    for mmcif_path in mmcif_paths:
+      with self.subTest(mmcif_path.name):
+        struc = structure.from_mmcif(mmcif_path.read_text())
+        struc = struc.copy_and_update_atoms(
+            atom_b_factor=rng.uniform(0, 100, struc.num_atoms)
+        )
+        self.assertEqual(struc.to_mmcif(), struc.to_mmcif_dict().to_string())
+        self.assertEqual(
+            struc.to_mmcif(coords_decimal_places=2),
+            struc.to_mmcif_dict(coords_decimal_places=2).to_string(),
+        )
+        self.assertEqual(
+            mmcif_metadata.to_mmcif_with_metadata(
+                struc, version='test', model_id=b'test'
+            ),
+            mmcif_metadata.add_metadata_to_mmcif(
+                old_cif=struc.to_mmcif_dict(), version='test', model_id=b'test'
+            ).to_string(),
+        )
+
+  def test_mmap_params_round_trip(self):
+    records = [
+        ('diffuser/~/a', 'weights', np.arange(12, dtype=np.float32)),
+        ('diffuser/~/a', 'offset', np.array(7, dtype=np.int32)),
+        ('diffuser/~/b', 'scale', np.ones((2, 3, 5), dtype=np.float16)),
+    ]
+    sources = [{'name': 'af3.bin.zst', 'size': 1, 'mtime_ns': 2}]
+    path = pathlib.Path(self.create_tempdir().full_path) / 'af3.bin.mmap'
+
+    num_params = params.write_mmap_params(iter(records), path, sources)
+    actual, actual_sources = params.read_mmap_params(path)
+
+    self.assertEqual(num_params, len(records))
+    self.assertEqual(actual_sources, sources)
+    self.assertEqual(
+        {(scope, name) for scope, name, _ in records},
+        {(scope, name) for scope in actual for name in actual[scope]},
+    )
+    for scope, name, arr in records:
+      self.assertEqual(actual[scope][name].dtype, arr.dtype)
+      np.testing.assert_array_equal(actual[scope][name], arr)
+
+  def test_cache_decompressed_params(self):
+    model_dir = pathlib.Path(self.create_tempdir().full_path)
+    model_path = model_dir / 'af3.bin.zst'
+    device = jax.local_devices(backend='cpu')[0]
+
+    def write_model(value: float) -> None:
+      record = params.encode_record(
+          'diffuser/~/a', 'weights', np.full((2, 3), value, dtype=np.float32)
+      )
+      model_path.write_bytes(zstandard.ZstdCompressor().compress(record))
+
+    def load(cache_decompressed: bool) -> np.ndarray:
+      model_params = params.get_model_haiku_params(
+          model_dir, device=device, cache_decompressed=cache_decompressed
+      )
+      return np.asarray(model_params['diffuser/~/a']['weights'])
+
+    def source_identity() -> list[dict[str, int | str]]:
+      stat = model_path.stat()
+      return [{
+          'name': model_path.name,
+          'size': stat.st_size,
+          'mtime_ns': stat.st_mtime_ns,
+      }]
+
+    write_model(1.0)
+    np.testing.assert_array_equal(load(cache_decompressed=True), 1.0)
+    mmap_path = model_dir / f'af3{params.MMAP_SUFFIX}'
+    _, sources = params.read_mmap_params(mmap_path)
+    self.assertEqual(sources, source_identity())
+    np.testing.assert_array_equal(load(cache_decompressed=False), 1.0)
+
+    # Updating the model files makes the memory-mapped file stale, so it is
+    # ignored, and rebuilt if caching.
+    write_model(2.0)
+    os.utime(model_path, ns=(0, sources[0]['mtime_ns'] + 1))
+    np.testing.assert_array_equal(load(cache_decompressed=False), 2.0)
+    _, sources = params.read_mmap_params(mmap_path)
+    self.assertNotEqual(sources, source_identity())
+    np.testing.assert_array_equal(load(cache_decompressed=True), 2.0)
+    _, sources = params.read_mmap_params(mmap_path)
+    self.assertEqual(sources, source_identity())
+
+  def test_prefetch_matches_sequential(self):
+    fold_input = pipeline.DataPipeline(self._data_pipeline_config).process(
+        folding_input.Input.from_json(self._test_input_json)
+    )
+    fold_inputs = [
+        dataclasses.replace(fold_input, name='first', rng_seeds=[1, 2]),
+        dataclasses.replace(fold_input, name='second', rng_seeds=[3]),
+    ]
+    model_runner = run_alphafold.ModelRunner(
+        config=run_alphafold.make_model_config(
+            flash_attention_implementation='triton',
+            num_diffusion_samples=1,
+            num_diffusion_steps=20,
+            num_recycles=1,
+        ),
+        device=jax.local_devices()[0],
+        model_dir=pathlib.Path(run_alphafold.MODEL_DIR.value),
+    )
+
+    with run_alphafold.InferencePipeline(
+        model_runner=model_runner, max_queued=1
+    ) as inference_pipeline:
+      expected = [
+          inference_pipeline.predict_structure(fold_input)
+          for fold_input in fold_inputs
+      ]
+    with run_alphafold.InferencePipeline(
+        model_runner=model_runner, max_queued=1
+    ) as inference_pipeline:
+      actual = [
+          inference_pipeline.predict_structure(fold_input)
+          for fold_input in run_alphafold._prefetch_next(
+              fold_inputs, inference_pipeline
+          )
+      ]
+
+    self.assertLen(actual, len(expected))
+    for actual_results, expected_results in zip(actual, expected, strict=True):
+      self.assertEqual(
+          [results.seed for results in actual_results],
+          [results.seed for results in expected_results],
+      )
+      for actual_seed, expected_seed in zip(
+          actual_results, expected_results, strict=True
+      ):
+        self.assertEqual(
+            actual_seed.full_fold_input.name, expected_seed.full_fold_input.name
+        )
+        for actual_inf, expected_inf in zip(
+            actual_seed.inference_results,
+            expected_seed.inference_results,
+            strict=True,
+        ):
+          np.testing.assert_allclose(
+              actual_inf.predicted_structure.coords,
+              expected_inf.predicted_structure.coords,
+              atol=1e-3,
+          )
+
+  def test_prefetch_next_cancels_prefetches_when_closed(self):
+    fold_input = pipeline.DataPipeline(self._data_pipeline_config).process(
+        folding_input.Input.from_json(self._test_input_json)
+    )
+    fold_inputs = [
+        dataclasses.replace(fold_input, name=name, rng_seeds=[1])
+        for name in ('first', 'second', 'third')
+    ]
+
+    with run_alphafold.InferencePipeline(
+        model_runner=None, max_queued=1
+    ) as inference_pipeline:
+      prefetching = run_alphafold._prefetch_next(
+          fold_inputs, inference_pipeline
+      )
+      self.assertEqual(next(prefetching).name, 'first')
+      # As if processing the first fold input failed.
+      prefetching.close()
+
+      self.assertEmpty(inference_pipeline._prefetched)
+      self.assertEmpty(inference_pipeline._deferred_prefetches)
+      for thread in threading.enumerate():
+        if thread.name == 'fold_input_prefetch':
+          thread.join(timeout=60)
+          self.assertFalse(thread.is_alive())
+
+  def test_serve_spool_dir(self):
+    spool_path = pathlib.Path(self.create_tempdir().full_path)
+    output_dir = self.create_tempdir().full_path
+    spool_dir = _StopWhenIdleSpoolDir(spool_path)
+    (spool_path / 'incoming' / 'good.json').write_text(self._test_input_json)
+    (spool_path / 'incoming' / 'bad.json').write_text('{')
+
+    with flagsaver.flagsaver(output_dir=output_dir):
+      num_fold_inputs = run_alphafold._serve(
+          spool_dir=spool_dir,
+          data_pipeline_config=None,
+          model_runner=None,
+          inference_pipeline=None,
+          max_template_date=datetime.date(2021, 9, 30),
+      )
+
+    self.assertEqual(num_fold_inputs, 1)
+    self.assertTrue(os.path.exists(os.path.join(output_dir, '5tgy')))
+    self.assertTrue((spool_path / 'done' / 'good.json').exists())
+    self.assertTrue((spool_path / 'failed' / 'bad.json').exists())
+    self.assertTrue((spool_path / 'failed' / 'bad.json.error').exists())
+    self.assertEmpty(list((spool_path / 'running').iterdir()))
+    status = json.loads((spool_path / 'status.json').read_text())
+    self.assertEqual(status['queue_depth'], 0)
+    self.assertEqual(status['num_done'], 1)
+    self.assertEqual(status['num_failed'], 1)
+    self.assertIsNone(status['running'])
+    self.assertCountEqual(
+        [(job['name'], job['status']) for job in status['recent_jobs']],
+        [('good.json', 'done'), ('bad.json', 'failed')],
+    )
+
+  @parameterized.parameters(0.0, 1.0)
+  def test_has_clash_matches_lookup(self, noise_std):
+    mmcif_path = (
+        resources.ROOT / 'test_data/miniature_databases/pdb_mmcif/5y2e.cif'
+    )
+    struc = structure.from_mmcif(mmcif_path.read_text())
+    struc = struc.filter_to_entity_type(protein=True, rna=True, dna=True)
+    rng = np.random.default_rng(0)
+    struc = struc.copy_and_update_coords(
+        struc.coords + rng.normal(scale=noise_std, size=struc.coords.shape)
+    )
+    _, chain_index = np.unique(struc.chain_id, return_inverse=True)
+
+    # pylint: disable=protected-access
+    actual = confidences._get_per_atom_has_clash(
+        spatial.cKDTree(struc.coords),
+        res_id=struc.res_id,
+        chain_index=chain_index,
+        cutoff_radius=1.1,
+    )
+    # pylint: enable=protected-access
+
+    expected = _per_atom_has_clash_by_lookup(struc, cutoff_radius=1.1)
+    np.testing.assert_array_equal(actual, expected)
+    if noise_std:
+      self.assertTrue(expected.any())
+    num_clashes = max(
+        np.sum(expected[struc.chain_id == chain_id])
+        for chain_id in struc.chains
+    )
+    for min_clashes_for_overlap in (num_clashes - 1, num_clashes):
+      with self.subTest(min_clashes_for_overlap=min_clashes_for_overlap):
+        self.assertEqual(
+            confidences.has_clash(
+                struc,
+                min_clashes_for_overlap=min_clashes_for_overlap,
+                min_fraction_for_overlap=1.0,
+            ),
+            num_clashes > min_clashes_for_overlap,
+        )
+
+  def test_noise_schedule_float_exponent(self):
+    t = np.linspace(0, 1, 11)
+    np.testing.assert_allclose(
+        diffusion_head.noise_schedule(t, p=7.0),
+        diffusion_head.noise_schedule(t, p=7),
+        rtol=1e-5,
+    )
+
+  @parameterized.parameters('euler', 'heun')
+  def test_diffusion_sample_solver(self, solver):
+    num_tokens, max_atoms_per_token = 4, 3
+    batch = types.SimpleNamespace(
+        predicted_structure_info=types.SimpleNamespace(
+            atom_mask=np.ones((num_tokens, max_atoms_per_token), np.float32)
+        )
+    )
+
+    @hk.transform
+    def sample(key):
+      return diffusion_head.sample(
+          # Denoises towards the origin.
+          denoising_step=lambda positions, noise_level: 0.5 * positions,
+          batch=batch,
+          key=key,
+          config=diffusion_head.SampleConfig(
+              steps=4, num_samples=2, schedule_exponent=5.5, solver=solver
+          ),
+      )
+
+    key = jax.random.PRNGKey(0)
+    positions = sample.apply({}, key, key)['atom_positions']
+    self.assertEqual(positions.shape, (2, num_tokens, max_atoms_per_token, 3))
+    self.assertTrue(np.all(np.isfinite(positions)))
+
   def test_process_fold_input_runs_only_inference(self):
     with self.assertRaisesRegex(ValueError, 'missing unpaired MSA.'):
       run_alphafold.process_fold_input(
@@ -314,6 +748,26 @@ class InferenceTest(test_utils.StructureTestCase):
     if not all(scores_ok):
       self.fail(f'{ranking_scores=} are not in expected range [0.66, 0.76]')
 
+    # The top ranked sample is post-processed once, its files are reused.
+    top_sample_index = int(np.argmax(ranking_scores))
+    top_sample_prefix = (
+        f'{fold_input.sanitised_name()}_seed-{seed}_sample-{top_sample_index}'
+    )
+    for suffix in ('model.cif', 'confidences.json', 'summary_confidences.json'):
+      sample_path = os.path.join(
+          output_dir,
+          f'{prefix}_sample-{top_sample_index}',
+          f'{top_sample_prefix}_{suffix}',
+      )
+      top_ranked_path = os.path.join(
+          output_dir, f'{fold_input.sanitised_name()}_{suffix}'
+      )
+      self.assertEqual(
+          pathlib.Path(top_ranked_path).read_bytes(),
+          pathlib.Path(sample_path).read_bytes(),
+          msg=suffix,
+      )
+
     with open(os.path.join(output_dir, 'TERMS_OF_USE.md'), 'rt') as f:
       actual_terms_of_use = f.read()
     self.assertStartsWith(
@@ -365,6 +819,8 @@ class InferenceTest(test_utils.StructureTestCase):
             actual_inf.metadata['token_chain_ids'],
             ['P'] * len(fold_input.protein_chains[0].sequence) + ['LL'] * 41,
         )
+        # Only set with adaptive recycling.
+        self.assertNotIn('num_recycles', actual_inf.metadata)
         # All atom occupancies should be 1.0.
         np.testing.assert_array_equal(
             actual_inf.predicted_structure.atom_occupancy,
@@ -30,11 +30,11 @@ def build_data():
     raise ValueError('Could not find components.cif')
 
   out_root = resources.files(alphafold3.constants.converters)
-  ccd_pickle_path = out_root.joinpath('ccd.pickle')
+  ccd_store_path = out_root.joinpath('ccd.store')
   chemical_component_sets_pickle_path = out_root.joinpath(
       'chemical_component_sets.pickle'
   )
-  ccd_pickle_gen.main(['', str(cif_path), str(ccd_pickle_path)])
+  ccd_pickle_gen.main(['', str(cif_path), str(ccd_store_path)])
   chemical_component_sets_gen.main(
       ['', str(chemical_component_sets_pickle_path)]
   )
@@ -8,13 +8,23 @@
 # if received directly from Google. Use is subject to terms of use available at
 # https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
 
-"""Chemical Components found in PDB (CCD) constants."""
+"""Chemical Components found in PDB (CCD) constants.
 
-from collections.abc import ItemsView, Iterator, KeysView, Mapping, Sequence, ValuesView
+The CCD is built by `build_data` into an indexed store file, from which
+components are decoded lazily, as a typical input only uses a few of the tens
+of thousands of components. A CCD pickle can still be loaded instead.
+"""
+
+from collections.abc import ItemsView, Iterable, Iterator, KeysView, Mapping, Sequence, ValuesView
 import dataclasses
 import functools
+import json
+import mmap
 import os
+import pathlib
 import pickle
+import struct
+import tempfile
 
 from alphafold3.common import resources
 from alphafold3.cpp import cif_dict
@@ -23,6 +33,110 @@ from alphafold3.cpp import cif_dict
 _CCD_PICKLE_FILE = resources.filename(
     resources.ROOT / 'constants/converters/ccd.pickle'
 )
+_CCD_STORE_FILE = resources.filename(
+    resources.ROOT / 'constants/converters/ccd.store'
+)
+
+_CCD_STORE_MAGIC = b'AF3CCDST'
+_CCD_STORE_VERSION = 1
+# Offset of the index and magic string at the end of the file.
+_CCD_STORE_FOOTER = struct.Struct('<Q8s')
+
+# Number of decoded components kept in memory by each CCD.
+_DEFAULT_MAX_CACHED_COMPONENTS = 4096
+
+
+def write_ccd_store(
+    components: Iterable[tuple[str, Mapping[str, Sequence[str]]]],
+    output_path: os.PathLike[str] | str,
+) -> int:
+  """Atomically writes CCD components to an indexed store file.
+
+  The file starts with a magic string, followed by every component pickled
+  separately, then by a JSON index of the offset and size of each component,
+  and ends with the offset of the index and the magic string.
+
+  Args:
+    components: The (name, component) pairs, component being a mapping from
+      mmCIF field to its values.
+    output_path: The path of the store file.
+
+  Returns:
+    The number of written components.
+  """
+  output_path = pathlib.Path(output_path)
+  index = {}
+  with tempfile.NamedTemporaryFile(
+      dir=output_path.parent, prefix=f'.{output_path.name}.', delete=False
+  ) as f:
+    try:
+      f.write(_CCD_STORE_MAGIC)
+      for name, component in components:
+        record = pickle.dumps(
+            {k: tuple(v) for k, v in component.items()},
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        index[name] = (f.tell(), len(record))
+        f.write(record)
+      index_offset = f.tell()
+      f.write(
+          json.dumps(
+              {'version': _CCD_STORE_VERSION, 'components': index}
+          ).encode('utf-8')
+      )
+      f.write(_CCD_STORE_FOOTER.pack(index_offset, _CCD_STORE_MAGIC))
+    except BaseException:
+      os.unlink(f.name)
+      raise
+  os.chmod(f.name, 0o644)
+  os.replace(f.name, output_path)
+  return len(index)
+
+
+class _CcdStore(Mapping[str, Mapping[str, Sequence[str]]]):
+  """Read-only mapping of a CCD store file, decoding components on access."""
+
+  __slots__ = ('_buffer', '_index', '_load')
+
+  def __init__(self, path: os.PathLike[str] | str, max_cached_components: int):
+    with open(path, 'rb') as f:
+      self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    footer_offset = len(self._buffer) - _CCD_STORE_FOOTER.size
+    if footer_offset < len(_CCD_STORE_MAGIC):
+      raise ValueError(f'Truncated CCD store file: {path}')
+    index_offset, magic = _CCD_STORE_FOOTER.unpack_from(
+        self._buffer, footer_offset
+    )
+    if (
+        self._buffer[: len(_CCD_STORE_MAGIC)] != _CCD_STORE_MAGIC
+        or magic != _CCD_STORE_MAGIC
+    ):
+      raise ValueError(f'Not a CCD store file, invalid magic: {path}')
+    index = json.loads(self._buffer[index_offset:footer_offset])
+    if index['version'] != _CCD_STORE_VERSION:
+      raise ValueError(f'Unsupported CCD store {index["version"]=}: {path}')
+    self._index: dict[str, list[int]] = index['components']
+    self._load = functools.lru_cache(maxsize=max_cached_components)(
+        self._decode
+    )
+
+  def _decode(self, key: str) -> Mapping[str, Sequence[str]]:
+    offset, size = self._index[key]
+    return pickle.loads(self._buffer[offset : offset + size])
+
+  def __getitem__(self, key: str) -> Mapping[str, Sequence[str]]:
+    if key not in self._index:
+      raise KeyError(key)
+    return self._load(key)
+
+  def __contains__(self, key: str) -> bool:
+    return key in self._index
+
+  def __iter__(self) -> Iterator[str]:
+    return iter(self._index)
+
+  def __len__(self) -> int:
+    return len(self._index)
 
 
 class Ccd(Mapping[str, Mapping[str, Sequence[str]]]):
@@ -34,47 +148,73 @@ class Ccd(Mapping[str, Mapping[str, Sequence[str]]]):
   Wraps the dict to prevent accidental mutation.
   """
 
-  __slots__ = ('_dict', '_ccd_pickle_path')
+  __slots__ = ('_ccd', '_user_ccd_dict')
 
   def __init__(
       self,
       ccd_pickle_path: os.PathLike[str] | None = None,
       user_ccd: str | None = None,
+      *,
+      ccd_store_path: os.PathLike[str] | None = None,
+      max_cached_components: int = _DEFAULT_MAX_CACHED_COMPONENTS,
   ):
     """Initialises the chemical components dictionary.
 
     Args:
-      ccd_pickle_path: Path to the CCD pickle file. If None, uses the default
-        CCD pickle file included in the source code.
+      ccd_pickle_path: Path to a CCD pickle file, which is fully loaded. Can't
+        be set together with `ccd_store_path`.
       user_ccd: A string containing the user-provided CCD. This has to conform
         to the same format as the CCD, see https://www.wwpdb.org/data/ccd. If
         provided, takes precedence over the CCD for the the same key. This can
         be used to override specific entries in the CCD if desired.
+      ccd_store_path: Path to a CCD store file written by `write_ccd_store`,
+        from which components are read on access. If neither this nor
+        `ccd_pickle_path` is set, uses the default CCD store file built by
+        `build_data`, or the default CCD pickle file if there is no store file.
+      max_cached_components: The maximum number of components read from the
+        CCD store file that are kept in memory.
     """
-    self._ccd_pickle_path = ccd_pickle_path or _CCD_PICKLE_FILE
-    with open(self._ccd_pickle_path, 'rb') as f:
-      self._dict = pickle.loads(f.read())
-
+    if ccd_pickle_path is not None and ccd_store_path is not None:
+      raise ValueError(
+          'Only one of ccd_pickle_path and ccd_store_path can be set.'
+      )
+    if ccd_pickle_path is None and ccd_store_path is None:
+      if os.path.exists(_CCD_STORE_FILE):
+        ccd_store_path = _CCD_STORE_FILE
+      else:
+        ccd_pickle_path = _CCD_PICKLE_FILE
+
+    if ccd_store_path is not None:
+      self._ccd = _CcdStore(ccd_store_path, max_cached_components)
+    else:
+      with open(ccd_pickle_path, 'rb') as f:
+        self._ccd = pickle.loads(f.read())
+
+    self._user_ccd_dict = {}
     if user_ccd is not None:
       if not user_ccd:
         raise ValueError('User CCD cannot be an empty string.')
-      user_ccd_cifs = {
+      self._user_ccd_dict = {
           key: {k: tuple(v) for k, v in value.items()}
           for key, value in cif_dict.parse_multi_data_cif(user_ccd).items()
       }
-      self._dict.update(user_ccd_cifs)
 
   def __getitem__(self, key: str) -> Mapping[str, Sequence[str]]:
-    return self._dict[key]
+    if key in self._user_ccd_dict:
+      return self._user_ccd_dict[key]
+    return self._ccd[key]
 
   def __contains__(self, key: str) -> bool:
-    return key in self._dict
+    return key in self._user_ccd_dict or key in self._ccd
 
   def __iter__(self) -> Iterator[str]:
-    return self._dict.__iter__()
+    yield from self._ccd
+    yield from (key for key in self._user_ccd_dict if key not in self._ccd)
 
   def __len__(self) -> int:
-    return len(self._dict)
+    return len(self._ccd) + sum(
+        key not in self._ccd for key in self._user_ccd_dict
+    )
 
   def __hash__(self) -> int:
     return id(self)  # Ok since this is immutable.
@@ -82,16 +222,20 @@ class Ccd(Mapping[str, Mapping[str, Sequence[str]]]):
   def get(
       self, key: str, default: None | Mapping[str, Sequence[str]] = None
   ) -> Mapping[str, Sequence[str]] | None:
-    return self._dict.get(key, default)
+    if key in self._user_ccd_dict:
+      return self._user_ccd_dict[key]
+    if key in self._ccd:
+      return self._ccd[key]
+    return default
 
   def items(self) -> ItemsView[str, Mapping[str, Sequence[str]]]:
-    return self._dict.items()
+    return ItemsView(self)
 
   def values(self) -> ValuesView[Mapping[str, Sequence[str]]]:
-    return self._dict.values()
+    return ValuesView(self)
 
   def keys(self) -> KeysView[str]:
-    return self._dict.keys()
+    return KeysView(self)
 
 
 @functools.cache
@@ -0,0 +1,133 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Benchmarks loading the CCD from the store file against the pickle file.
+
+Each format is loaded in a fresh subprocess, which then looks up a few
+components as a typical input would, and reports its time and peak RSS. If no
+CCD pickle file is given, one is written from the CCD store file.
+
+Usage:
+  python -m alphafold3.constants.chemical_components_benchmark
+"""
+
+import json
+import os
+import pickle
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from absl import app
+from absl import flags
+from alphafold3.common import resources
+from alphafold3.constants import chemical_components
+
+
+_CCD_STORE_PATH = flags.DEFINE_string(
+    'ccd_store_path',
+    None,
+    'Path to the CCD store file. Defaults to the one built by build_data.',
+)
+_CCD_PICKLE_PATH = flags.DEFINE_string(
+    'ccd_pickle_path',
+    None,
+    'Path to the CCD pickle file. Defaults to one written from the store file.',
+)
+_NUM_COMPONENTS = flags.DEFINE_integer(
+    'num_components', 50, 'Number of random components to look up.'
+)
+_SEED = flags.DEFINE_integer('seed', 0, 'Random seed of the components.')
+
+
+def _load(file_format: str, path: str, components: str) -> None:
+  """Loads the CCD, looks up the components and prints the measurements."""
+  start_rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  start = time.perf_counter()
+  if file_format == 'store':
+    ccd = chemical_components.Ccd(ccd_store_path=path)
+  else:
+    ccd = chemical_components.Ccd(ccd_pickle_path=path)
+  load_time = time.perf_counter() - start
+  start = time.perf_counter()
+  for name in components.split(','):
+    chemical_components.mmcif_to_info(ccd[name])
+  lookup_time = time.perf_counter() - start
+  end_rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  print(
+      json.dumps({
+          'load_time': load_time,
+          'lookup_time': lookup_time,
+          'rss_mib': (end_rss_kib - start_rss_kib) / 1024,
+      })
+  )
+
+
+def _load_in_subprocess(
+    file_format: str, path: str, components: list[str]
+) -> dict[str, float]:
+  output = subprocess.run(
+      [
+          sys.executable,
+          __file__,
+          '--load',
+          file_format,
+          path,
+          ','.join(components),
+      ],
+      check=True,
+      capture_output=True,
+      text=True,
+  ).stdout
+  return json.loads(output.splitlines()[-1])
+
+
+def main(_):
+  store_path = _CCD_STORE_PATH.value or resources.filename(
+      resources.ROOT / 'constants/converters/ccd.store'
+  )
+  store_ccd = chemical_components.Ccd(ccd_store_path=store_path)
+  components = random.Random(_SEED.value).sample(
+      sorted(store_ccd), _NUM_COMPONENTS.value
+  )
+
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    pickle_path = _CCD_PICKLE_PATH.value
+    if pickle_path is None:
+      pickle_path = os.path.join(tmp_dir, 'ccd.pickle')
+      with open(pickle_path, 'wb') as f:
+        pickle.dump(
+            {name: dict(component) for name, component in store_ccd.items()},
+            f,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+
+    print(
+        f'{len(store_ccd)} components, looking up {len(components)}. Store'
+        f' {os.path.getsize(store_path) / 2**20:.0f} MiB, pickle'
+        f' {os.path.getsize(pickle_path) / 2**20:.0f} MiB.'
+    )
+    for file_format, path in (('store', store_path), ('pickle', pickle_path)):
+      result = _load_in_subprocess(file_format, path, components)
+      print(
+          f'{file_format}: load {result["load_time"]:.3f} s, lookups'
+          f' {result["lookup_time"]:.4f} s, RSS increase'
+          f' {result["rss_mib"]:.0f} MiB'
+      )
+
+
+if __name__ == '__main__':
+  if len(sys.argv) == 5 and sys.argv[1] == '--load':
+    _load(*sys.argv[2:])
+  else:
+    app.run(main)
@@ -8,13 +8,18 @@
 # if received directly from Google. Use is subject to terms of use available at
 # https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
 
-"""Reads Chemical Components gz file and generates a CCD pickle file."""
+"""Reads Chemical Components gz file and generates a CCD store or pickle file.
+
+The output is a CCD pickle file if the output file ends with `.pickle`, and
+otherwise an indexed CCD store file, see `chemical_components.write_ccd_store`.
+"""
 
 from collections.abc import Sequence
 import gzip
 import pickle
 import sys
 
+from alphafold3.constants import chemical_components
 from alphafold3.cpp import cif_dict
 import tqdm
 
@@ -42,8 +47,11 @@ def main(argv: Sequence[str]) -> None:
   assert len(result) == whole_file.count(b'data_')
 
   print(f'Writing {output_file}', flush=True)
-  with open(output_file, 'wb') as f:
-    pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+  if output_file.endswith('.pickle'):
+    with open(output_file, 'wb') as f:
+      pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+  else:
+    chemical_components.write_ccd_store(result.items(), output_file)
   print('Done', flush=True)
 
 if __name__ == '__main__':
@@ -16,15 +16,10 @@ import pickle
 import re
 import sys
 
-from alphafold3.common import resources
+from alphafold3.constants import chemical_components
 import tqdm
 
 
-_CCD_PICKLE_FILE = resources.filename(
-    'constants/converters/ccd.pickle'
-)
-
-
 def find_ions_and_glycans_in_ccd(
     ccd: Mapping[str, Mapping[str, Sequence[str]]],
 ) -> dict[str, frozenset[str]]:
@@ -63,9 +58,8 @@ def main(argv: Sequence[str]) -> None:
         'Directory to write to must be specified as a command-line arguments.'
     )
 
-  print(f'Loading {_CCD_PICKLE_FILE}', flush=True)
-  with open(_CCD_PICKLE_FILE, 'rb') as f:
-    ccd: Mapping[str, Mapping[str, Sequence[str]]] = pickle.load(f)
+  print('Loading the CCD', flush=True)
+  ccd = chemical_components.Ccd()
   output_path = pathlib.Path(argv[1])
   output_path.parent.mkdir(exist_ok=True)
   print('Finding ions and glycans', flush=True)
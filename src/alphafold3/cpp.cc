@@ -19,6 +19,7 @@
 #include "alphafold3/structure/cpp/mmcif_layout_pybind.h"
 #include "alphafold3/structure/cpp/mmcif_struct_conn_pybind.h"
 #include "alphafold3/structure/cpp/mmcif_utils_pybind.h"
+#include "alphafold3/structure/cpp/mmcif_writer_pybind.h"
 #include "alphafold3/structure/cpp/string_array_pybind.h"
 #include "pybind11/pybind11.h"
 
@@ -39,6 +40,7 @@ PYBIND11_MODULE(cpp, m) {
   RegisterModuleMmcifAtomSite(m.def_submodule("mmcif_atom_site"));
   RegisterModuleMkdssp(m.def_submodule("mkdssp"));
   RegisterModuleMsaProfile(m.def_submodule("msa_profile"));
+  RegisterModuleMmcifWriter(m.def_submodule("mmcif_writer"));
 }
 
 }  // namespace
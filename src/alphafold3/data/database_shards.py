@@ -0,0 +1,224 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Shards of a FASTA sequence database, searched concurrently.
+
+A single Jackhmmer search doesn't scale beyond a few threads. Splitting a
+database into shards of contiguous sequences with about the same number of
+residues lets a search run one Jackhmmer per shard concurrently. The manifest
+records the total number of sequences of the database, which is passed as the
+Z-value of every shard search so that E-values are those of the whole database.
+
+Build the shards of a database (written to `<database_path>.shards`) with:
+
+  python -m alphafold3.data.database_shards <database_path> <num_shards>
+"""
+
+from collections.abc import Sequence
+import dataclasses
+import json
+import os
+import sys
+import time
+
+_MANIFEST_NAME = 'manifest.json'
+
+
+@dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
+class Shard:
+  """A shard of a sequence database.
+
+  Attributes:
+    path: The path of the shard FASTA file.
+    num_sequences: The number of sequences in the shard.
+    num_residues: The number of residues in the shard.
+  """
+
+  path: str
+  num_sequences: int
+  num_residues: int
+
+
+@dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
+class Manifest:
+  """The shards of a sequence database.
+
+  Attributes:
+    database_size: The size in bytes of the database the shards were built
+      from, used to detect stale shards.
+    database_mtime_ns: The modification time of the database.
+    num_sequences: The total number of sequences of all shards.
+    shards: The shards, in the order of their sequences in the database.
+  """
+
+  database_size: int
+  database_mtime_ns: int
+  num_sequences: int
+  shards: tuple[Shard, ...]
+
+
+def shard_dir(database_path: str) -> str:
+  return f'{database_path}.shards'
+
+
+def has_shards(database_path: str) -> bool:
+  return os.path.exists(os.path.join(shard_dir(database_path), _MANIFEST_NAME))
+
+
+def load_manifest(database_path: str) -> Manifest:
+  """Loads the manifest of the shards of a database.
+
+  Args:
+    database_path: The path of the sharded FASTA database.
+
+  Returns:
+    The manifest, with absolute shard paths.
+
+  Raises:
+    ValueError: If the database was modified after the shards were built.
+  """
+  directory = shard_dir(database_path)
+  with open(os.path.join(directory, _MANIFEST_NAME), 'rt') as f:
+    manifest = json.load(f)
+
+  stat = os.stat(database_path)
+  if (stat.st_size, stat.st_mtime_ns) != (
+      manifest['database_size'],
+      manifest['database_mtime_ns'],
+  ):
+    raise ValueError(
+        f'The shards in {directory} are stale, {database_path} was modified'
+        ' after they were built. Rebuild them with `python -m'
+        ' alphafold3.data.database_shards`.'
+    )
+  return Manifest(
+      database_size=manifest['database_size'],
+      database_mtime_ns=manifest['database_mtime_ns'],
+      num_sequences=manifest['num_sequences'],
+      shards=tuple(
+          Shard(
+              path=os.path.join(directory, shard['path']),
+              num_sequences=shard['num_sequences'],
+              num_residues=shard['num_residues'],
+          )
+          for shard in manifest['shards']
+      ),
+  )
+
+
+def _count_residues(database_path: str) -> tuple[int, int]:
+  """Returns the number of sequences and residues of a FASTA file."""
+  num_sequences = num_residues = 0
+  with open(database_path, 'rb') as f:
+    for line in f:
+      if line.startswith(b'>'):
+        num_sequences += 1
+      else:
+        num_residues += len(line.strip())
+  return num_sequences, num_residues
+
+
+def build_shards(database_path: str, num_shards: int) -> Manifest:
+  """Splits a FASTA database into shards with about as many residues each.
+
+  The database is streamed twice, first to count its residues and then to
+  write the shards, so its size is not limited by the available memory.
+
+  Args:
+    database_path: The path of the FASTA database.
+    num_shards: The number of shards. Fewer shards are written if the database
+      has too few sequences to fill them.
+
+  Returns:
+    The manifest of the shards, with shard paths relative to `shard_dir`.
+
+  Raises:
+    ValueError: If the database has no sequences.
+  """
+  if num_shards < 1:
+    raise ValueError(f'num_shards must be at least 1: {num_shards}')
+  start_time = time.time()
+  stat = os.stat(database_path)
+  total_sequences, total_residues = _count_residues(database_path)
+  if not total_sequences:
+    raise ValueError(f'No sequences in {database_path}')
+  num_shards = min(num_shards, total_sequences)
+
+  directory = shard_dir(database_path)
+  os.makedirs(directory, exist_ok=True)
+  basename = os.path.basename(database_path)
+  shard_names = [f'{basename}-{i:05d}' for i in range(num_shards)]
+
+  shard_sequences = [0] * num_shards
+  shard_residues = [0] * num_shards
+  shard_idx = -1
+  num_residues = 0
+  out = None
+  try:
+    with open(database_path, 'rb') as f:
+      for line in f:
+        if line.startswith(b'>'):
+          # Start the next shard at the first sequence past its share of the
+          # residues, keeping at least one sequence in every shard.
+          next_start = (shard_idx + 1) * total_residues / num_shards
+          if shard_idx < num_shards - 1 and (
+              shard_idx < 0
+              or (shard_sequences[shard_idx] and num_residues >= next_start)
+          ):
+            if out is not None:
+              out.close()
+            shard_idx += 1
+            out = open(os.path.join(directory, shard_names[shard_idx]), 'wb')
+          shard_sequences[shard_idx] += 1
+        else:
+          residues = len(line.strip())
+          num_residues += residues
+          shard_residues[shard_idx] += residues
+        out.write(line)
+  finally:
+    if out is not None:
+      out.close()
+  # A few very long sequences at the end can leave the last shards empty.
+  num_shards = shard_idx + 1
+
+  manifest = Manifest(
+      database_size=stat.st_size,
+      database_mtime_ns=stat.st_mtime_ns,
+      num_sequences=total_sequences,
+      shards=tuple(
+          Shard(path=name, num_sequences=n_seq, num_residues=n_res)
+          for name, n_seq, n_res in zip(
+              shard_names[:num_shards],
+              shard_sequences[:num_shards],
+              shard_residues[:num_shards],
+              strict=True,
+          )
+      ),
+  )
+  manifest_path = os.path.join(directory, _MANIFEST_NAME)
+  with open(f'{manifest_path}.tmp', 'wt') as f:
+    json.dump(dataclasses.asdict(manifest), f, indent=1)
+  os.replace(f'{manifest_path}.tmp', manifest_path)
+  print(
+      f'Wrote {num_shards} shards of {total_sequences} sequences of'
+      f' {database_path} to {directory} in {time.time() - start_time:.2f}'
+      ' seconds.'
+  )
+  return manifest
+
+
+def main(argv: Sequence[str]) -> None:
+  if len(argv) != 3:
+    raise ValueError('Must specify database_path and num_shards')
+  build_shards(database_path=argv[1], num_shards=int(argv[2]))
+
+
+if __name__ == '__main__':
+  main(sys.argv)
@@ -0,0 +1,295 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Staging of genetic databases on fast storage and page cache warming.
+
+Genetic search reads every database in full, so its speed is bound by the read
+throughput of the storage. Databases can be copied to a staging directory on
+fast storage, e.g. a tmpfs or a local SSD, within a size budget, and read once
+in the background to load them into the page cache before they are searched.
+"""
+
+from collections.abc import Sequence
+import dataclasses
+import functools
+import hashlib
+import os
+import queue
+import shutil
+import threading
+import time
+
+from absl import logging
+from alphafold3.data import database_shards
+
+# Size of the reads that load a database into the page cache.
+_READ_CHUNK_BYTES = 16 * 1024 * 1024
+# Size of the start of a database that is read again to measure the throughput
+# of reads from the page cache.
+_WARM_READ_BYTES = 256 * 1024 * 1024
+
+
+@dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
+class ReadThroughput:
+  """Read throughput of a database before and after warming the page cache.
+
+  Attributes:
+    path: The path of the database.
+    cold_bytes: The number of bytes read to warm the page cache.
+    cold_seconds: The time it took to read them.
+    warm_bytes: The number of bytes read again after warming the page cache.
+    warm_seconds: The time it took to read them again.
+  """
+
+  path: str
+  cold_bytes: int
+  cold_seconds: float
+  warm_bytes: int
+  warm_seconds: float
+
+  @property
+  def cold_bytes_per_second(self) -> float:
+    return self.cold_bytes / max(self.cold_seconds, 1e-9)
+
+  @property
+  def warm_bytes_per_second(self) -> float:
+    return self.warm_bytes / max(self.warm_seconds, 1e-9)
+
+
+def _database_files(path: str) -> list[str]:
+  """Returns the database file and the files of its shards, if any."""
+  files = [path]
+  if database_shards.has_shards(path):
+    shard_dir = database_shards.shard_dir(path)
+    files.extend(
+        os.path.join(shard_dir, name) for name in sorted(os.listdir(shard_dir))
+    )
+  return files
+
+
+def _staged_file_path(path: str, staged_path: str, file_path: str) -> str:
+  """Returns where a file of the database at `path` is staged."""
+  relative_path = os.path.relpath(file_path, os.path.dirname(path))
+  return os.path.join(os.path.dirname(staged_path), relative_path)
+
+
+def _read_file(path: str, max_bytes: int | None = None) -> tuple[int, float]:
+  """Reads a file sequentially, returns the bytes read and the time taken."""
+  start_time = time.perf_counter()
+  num_bytes = 0
+  buffer = bytearray(_READ_CHUNK_BYTES)
+  with open(path, 'rb', buffering=0) as f:
+    if hasattr(os, 'posix_fadvise'):
+      os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+      os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+    while max_bytes is None or num_bytes < max_bytes:
+      n = f.readinto(buffer)
+      if not n:
+        break
+      num_bytes += n
+  return num_bytes, time.perf_counter() - start_time
+
+
+def warm_page_cache(path: str) -> ReadThroughput:
+  """Reads a database to load it into the page cache, measuring throughput.
+
+  Args:
+    path: The path of the database.
+
+  Returns:
+    The throughput of reading the whole database, and of reading its start
+    again from the page cache.
+  """
+  cold_bytes = cold_seconds = 0
+  for file_path in _database_files(path):
+    num_bytes, seconds = _read_file(file_path)
+    cold_bytes += num_bytes
+    cold_seconds += seconds
+  warm_bytes, warm_seconds = _read_file(path, max_bytes=_WARM_READ_BYTES)
+  return ReadThroughput(
+      path=path,
+      cold_bytes=cold_bytes,
+      cold_seconds=cold_seconds,
+      warm_bytes=warm_bytes,
+      warm_seconds=warm_seconds,
+  )
+
+
+class PageCacheWarmer:
+  """Warms the page cache with databases in a background thread.
+
+  Databases are read one at a time, in the order they were submitted, as
+  concurrent sequential reads are slower on most storage. The thread is a
+  daemon, so it doesn't keep the process alive.
+  """
+
+  def __init__(self):
+    self._queue: queue.Queue[str] = queue.Queue()
+    self._submitted: set[str] = set()
+    self._throughputs: list[ReadThroughput] = []
+    self._lock = threading.Lock()
+    self._thread = threading.Thread(
+        target=self._run, name='page_cache_warmer', daemon=True
+    )
+    self._thread.start()
+
+  @property
+  def throughputs(self) -> Sequence[ReadThroughput]:
+    """The throughputs of the databases warmed so far."""
+    with self._lock:
+      return tuple(self._throughputs)
+
+  def warm(self, path: str) -> None:
+    """Schedules a database to be read into the page cache, at most once."""
+    with self._lock:
+      if path in self._submitted:
+        return
+      self._submitted.add(path)
+    self._queue.put(path)
+
+  def wait(self) -> None:
+    """Blocks until all submitted databases have been read."""
+    self._queue.join()
+
+  def _run(self) -> None:
+    while True:
+      path = self._queue.get()
+      try:
+        throughput = warm_page_cache(path)
+      except OSError as e:
+        logging.warning('Failed to warm the page cache with %s: %s', path, e)
+      else:
+        with self._lock:
+          self._throughputs.append(throughput)
+        print(
+            f'Warmed page cache with {path}:'
+            f' {throughput.cold_bytes / 1e9:.2f} GB in'
+            f' {throughput.cold_seconds:.1f} seconds'
+            f' ({throughput.cold_bytes_per_second / 1e6:.0f} MB/s cold,'
+            f' {throughput.warm_bytes_per_second / 1e6:.0f} MB/s warm).'
+        )
+      finally:
+        self._queue.task_done()
+
+
+class DatabaseStager:
+  """Copies databases to a staging directory on fast storage.
+
+  A database is copied together with its shards, if any, to a subdirectory
+  named after a hash of its absolute path, so that databases with the same
+  file name don't overwrite each other. Copies keep the modification times of
+  the files, and a copy whose files all have the same size and modification
+  time as the originals, e.g. staged by an earlier run, is reused.
+  Databases that don't fit in the budget or in the free space of the staging
+  directory are not staged.
+  """
+
+  def __init__(self, staging_dir: str, max_size_bytes: int | None = None):
+    """Initializes the stager.
+
+    Args:
+      staging_dir: The directory the databases are copied to.
+      max_size_bytes: The maximum total size of the staged databases. If None,
+        only limited by the free space in the staging directory.
+    """
+    self._staging_dir = os.path.abspath(staging_dir)
+    self._max_size_bytes = max_size_bytes
+    self._staged_size_bytes = 0
+    self._staged_paths: dict[str, str] = {}
+    self._lock = threading.Lock()
+    os.makedirs(self._staging_dir, exist_ok=True)
+
+  def _staged_path(self, path: str) -> str:
+    path = os.path.abspath(path)
+    path_hash = hashlib.sha256(path.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(self._staging_dir, path_hash, os.path.basename(path))
+
+  def _is_staged_copy(
+      self, path: str, staged_path: str, files: Sequence[str]
+  ) -> bool:
+    """Whether all files of the database are staged and up to date."""
+    for file_path in files:
+      staged_file_path = _staged_file_path(path, staged_path, file_path)
+      if not os.path.exists(staged_file_path):
+        return False
+      stat, staged_stat = os.stat(file_path), os.stat(staged_file_path)
+      if (stat.st_size, stat.st_mtime_ns) != (
+          staged_stat.st_size,
+          staged_stat.st_mtime_ns,
+      ):
+        return False
+    return True
+
+  def stage(self, path: str) -> str:
+    """Copies a database to the staging directory if it fits.
+
+    Args:
+      path: The path of the database.
+
+    Returns:
+      The path of the staged copy of the database, or the original path if it
+      wasn't staged.
+    """
+    with self._lock:
+      if path in self._staged_paths:
+        return self._staged_paths[path]
+      abs_path = os.path.abspath(path)
+      if os.path.commonpath([abs_path, self._staging_dir]) == self._staging_dir:
+        return path
+
+      files = _database_files(path)
+      size_bytes = sum(os.path.getsize(f) for f in files)
+      staged_path = self._staged_path(path)
+      if self._is_staged_copy(path, staged_path, files):
+        logging.info('Reusing staged copy %s of %s', staged_path, path)
+      else:
+        free_bytes = shutil.disk_usage(self._staging_dir).free
+        if size_bytes > free_bytes or (
+            self._max_size_bytes is not None
+            and self._staged_size_bytes + size_bytes > self._max_size_bytes
+        ):
+          print(
+              f'Not staging {path} ({size_bytes / 1e9:.2f} GB), it does not'
+              f' fit in {self._staging_dir}.'
+          )
+          self._staged_paths[path] = path
+          return path
+        start_time = time.time()
+        self._copy(path, staged_path, files)
+        print(
+            f'Staged {path} ({size_bytes / 1e9:.2f} GB) to {staged_path} in'
+            f' {time.time() - start_time:.1f} seconds.'
+        )
+      self._staged_size_bytes += size_bytes
+      self._staged_paths[path] = staged_path
+      return staged_path
+
+  def _copy(self, path: str, staged_path: str, files: Sequence[str]) -> None:
+    """Copies the database files, the database last as it marks completion."""
+    for file_path in files[1:]:
+      staged_file_path = _staged_file_path(path, staged_path, file_path)
+      os.makedirs(os.path.dirname(staged_file_path), exist_ok=True)
+      shutil.copy2(file_path, staged_file_path)
+    os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+    tmp_path = f'{staged_path}.tmp{os.getpid()}'
+    shutil.copy2(path, tmp_path)
+    os.replace(tmp_path, staged_path)
+
+
+@functools.cache
+def get_stager(staging_dir: str, max_size_bytes: int | None) -> DatabaseStager:
+  """Returns a stager shared by all data pipelines in the process."""
+  return DatabaseStager(staging_dir, max_size_bytes=max_size_bytes)
+
+
+@functools.cache
+def get_page_cache_warmer() -> PageCacheWarmer:
+  """Returns the page cache warmer shared by all data pipelines."""
+  return PageCacheWarmer()
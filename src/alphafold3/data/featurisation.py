@@ -18,7 +18,6 @@ from alphafold3.common import folding_input
 from alphafold3.constants import chemical_components
 from alphafold3.model import features
 from alphafold3.model.pipeline import pipeline
-import numpy as np
 
 
 def validate_fold_input(fold_input: folding_input.Input):
@@ -35,6 +34,56 @@ def validate_fold_input(fold_input: folding_input.Input):
       raise ValueError(f'RNA chain {i + 1} is missing unpaired MSA.')
 
 
+class SeedFeaturiser:
+  """Featurises a fold input for any number of random seeds.
+
+  The seed-independent features are computed once on construction and shared by
+  the batches of all seeds.
+  """
+
+  def __init__(
+      self,
+      fold_input: folding_input.Input,
+      ccd: chemical_components.Ccd,
+      buckets: Sequence[int] | None,
+      ref_max_modified_date: datetime.date | None = None,
+      conformer_max_iterations: int | None = None,
+      conformer_cache_dir: str | None = None,
+      n_worker_processes: int = 1,
+  ):
+    """Validates the fold input and computes the seed-independent features.
+
+    Args:
+      fold_input: The input to featurise.
+      ccd: The chemical components dictionary.
+      buckets: See `featurise_input`.
+      ref_max_modified_date: See `featurise_input`.
+      conformer_max_iterations: See `featurise_input`.
+      conformer_cache_dir: See `featurise_input`.
+      n_worker_processes: See `featurise_input`.
+    """
+    validate_fold_input(fold_input)
+    self._ccd = ccd
+    self._data_pipeline = pipeline.WholePdbPipeline(
+        config=pipeline.WholePdbPipeline.Config(
+            buckets=buckets,
+            ref_max_modified_date=ref_max_modified_date,
+            conformer_max_iterations=conformer_max_iterations,
+            conformer_cache_dir=conformer_cache_dir,
+            n_worker_processes=n_worker_processes,
+        ),
+    )
+    self._seed_invariant = self._data_pipeline.process_seed_invariant(
+        fold_input=fold_input, ccd=ccd
+    )
+
+  def featurise(self, rng_seed: int) -> features.BatchDict:
+    """Returns the featurised batch for the given random seed."""
+    return self._data_pipeline.process_seed(
+        seed_invariant=self._seed_invariant, ccd=self._ccd, random_seed=rng_seed
+    )
+
+
 def featurise_input(
     fold_input: folding_input.Input,
     ccd: chemical_components.Ccd,
@@ -42,6 +91,8 @@ def featurise_input(
     ref_max_modified_date: datetime.date | None = None,
     conformer_max_iterations: int | None = None,
     verbose: bool = False,
+    conformer_cache_dir: str | None = None,
+    n_worker_processes: int = 1,
 ) -> Sequence[features.BatchDict]:
   """Featurise the folding input.
 
@@ -61,32 +112,40 @@ def featurise_input(
     conformer_max_iterations: Optional override for maximum number of iterations
       to run for RDKit conformer search.
     verbose: Whether to print progress messages.
+    conformer_cache_dir: Optional directory of a persistent cache of the
+      reference conformers, shared across runs.
+    n_worker_processes: Number of worker processes to generate the reference
+      conformers in. If 1, they are generated in the calling process. The
+      features are identical either way.
 
   Returns:
-    A featurised batch for each rng_seed in the input.
+    A featurised batch for each rng_seed in the input. The seed-independent
+    features are computed once and shared by all batches.
   """
-  validate_fold_input(fold_input)
-
-  # Set up data pipeline for single use.
-  data_pipeline = pipeline.WholePdbPipeline(
-      config=pipeline.WholePdbPipeline.Config(
-          buckets=buckets,
-          ref_max_modified_date=ref_max_modified_date,
-          conformer_max_iterations=conformer_max_iterations,
-      ),
+  featurisation_start_time = time.time()
+  if verbose:
+    print('Featurising seed-independent data.')
+  featuriser = SeedFeaturiser(
+      fold_input=fold_input,
+      ccd=ccd,
+      buckets=buckets,
+      ref_max_modified_date=ref_max_modified_date,
+      conformer_max_iterations=conformer_max_iterations,
+      conformer_cache_dir=conformer_cache_dir,
+      n_worker_processes=n_worker_processes,
   )
+  if verbose:
+    print(
+        'Featurising seed-independent data took'
+        f' {time.time() - featurisation_start_time:.2f} seconds.'
+    )
 
   batches = []
   for rng_seed in fold_input.rng_seeds:
     featurisation_start_time = time.time()
     if verbose:
       print(f'Featurising data with seed {rng_seed}.')
-    batch = data_pipeline.process_item(
-        fold_input=fold_input,
-        ccd=ccd,
-        random_state=np.random.RandomState(rng_seed),
-        random_seed=rng_seed,
-    )
+    batch = featuriser.featurise(rng_seed)
     if verbose:
       print(
           f'Featurising data with seed {rng_seed} took'
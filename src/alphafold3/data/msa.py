@@ -16,12 +16,14 @@ from typing import Self
 
 from absl import logging
 from alphafold3.constants import mmcif_names
+from alphafold3.data import database_shards
 from alphafold3.data import msa_config
 from alphafold3.data import msa_features
 from alphafold3.data import parsers
 from alphafold3.data.tools import jackhmmer
 from alphafold3.data.tools import msa_tool
 from alphafold3.data.tools import nhmmer
+from alphafold3.data.tools import sharded_jackhmmer
 import numpy as np
 
 
@@ -290,7 +292,24 @@ def get_msa_tool(
   """Returns the requested MSA tool."""
 
   match msa_tool_config:
+    case msa_config.JackhmmerConfig(use_database_shards=True) if (
+        database_shards.has_shards(msa_tool_config.database_config.path)
+    ):
+      return sharded_jackhmmer.ShardedJackhmmer(
+          binary_path=msa_tool_config.binary_path,
+          database_path=msa_tool_config.database_config.path,
+          n_cpu=msa_tool_config.n_cpu,
+          n_iter=msa_tool_config.n_iter,
+          e_value=msa_tool_config.e_value,
+          z_value=msa_tool_config.z_value,
+          max_sequences=msa_tool_config.max_sequences,
+      )
     case msa_config.JackhmmerConfig():
+      if msa_tool_config.use_database_shards:
+        logging.warning(
+            'No shards of %s, searching the whole database.',
+            msa_tool_config.database_config.path,
+        )
       return jackhmmer.Jackhmmer(
           binary_path=msa_tool_config.binary_path,
           database_path=msa_tool_config.database_config.path,
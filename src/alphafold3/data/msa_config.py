@@ -45,6 +45,8 @@ class JackhmmerConfig:
       z_value: The Z-value representing the number of comparisons done (i.e
         correct database size) for E-value calculation.
       max_sequences: Max sequences to return in MSA.
+      use_database_shards: Whether to search the shards of the database
+        concurrently, if it has been sharded, see `database_shards`.
   """
 
   binary_path: str
@@ -54,6 +56,7 @@ class JackhmmerConfig:
   e_value: float
   z_value: float | int | None
   max_sequences: int
+  use_database_shards: bool = False
 
 
 @dataclasses.dataclass(frozen=True, kw_only=True, slots=True)
@@ -120,6 +123,7 @@ class HmmsearchConfig:
   filter_f2: float | None = None
   filter_f3: float | None = None
   filter_max: bool = False
+  n_cpu: int = 8
 
 
 @dataclasses.dataclass(frozen=True, kw_only=True, slots=True)
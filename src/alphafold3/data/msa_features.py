@@ -10,7 +10,7 @@
 
 """Utilities for computing MSA features."""
 
-from collections.abc import Sequence
+from collections.abc import Mapping, Sequence
 import re
 from alphafold3.constants import mmcif_names
 import numpy as np
@@ -68,6 +68,42 @@ _DNA_TO_ID = {
 }
 
 
+def _get_char_map(chain_poly_type: str) -> Mapping[str, int]:
+  """Selects the appropriate character map based on the chain type."""
+  if chain_poly_type == mmcif_names.RNA_CHAIN:
+    return _RNA_TO_ID
+  elif chain_poly_type == mmcif_names.DNA_CHAIN:
+    return _DNA_TO_ID
+  elif chain_poly_type == mmcif_names.PROTEIN_CHAIN:
+    return _PROTEIN_TO_ID
+  else:
+    raise ValueError(f'{chain_poly_type=} invalid.')
+
+
+def _make_lookup_table(char_map: Mapping[str, int]) -> np.ndarray:
+  """Returns a table mapping ASCII codes to residue type IDs, -1 if unknown."""
+  table = np.full(128, -1, dtype=np.int8)
+  for char, residue_id in char_map.items():
+    table[ord(char)] = residue_id
+  return table
+
+
+def _make_unknown_table(char_map: Mapping[str, int]) -> np.ndarray:
+  """Returns a table of ASCII codes that are neither residues nor deletions."""
+  return np.array([
+      chr(code) not in char_map and not chr(code).islower()
+      for code in range(128)
+  ])
+
+
+_PROTEIN_LOOKUP_TABLE = _make_lookup_table(_PROTEIN_TO_ID)
+_RNA_LOOKUP_TABLE = _make_lookup_table(_RNA_TO_ID)
+_DNA_LOOKUP_TABLE = _make_lookup_table(_DNA_TO_ID)
+_PROTEIN_UNKNOWN_TABLE = _make_unknown_table(_PROTEIN_TO_ID)
+_RNA_UNKNOWN_TABLE = _make_unknown_table(_RNA_TO_ID)
+_DNA_UNKNOWN_TABLE = _make_unknown_table(_DNA_TO_ID)
+
+
 def extract_msa_features(
     msa_sequences: Sequence[str], chain_poly_type: str
 ) -> tuple[np.ndarray, np.ndarray]:
@@ -97,16 +133,7 @@ def extract_msa_features(
   Raises:
     ValueError if any of the preconditions are not met.
   """
-
-  # Select the appropriate character map based on the chain type.
-  if chain_poly_type == mmcif_names.RNA_CHAIN:
-    char_map = _RNA_TO_ID
-  elif chain_poly_type == mmcif_names.DNA_CHAIN:
-    char_map = _DNA_TO_ID
-  elif chain_poly_type == mmcif_names.PROTEIN_CHAIN:
-    char_map = _PROTEIN_TO_ID
-  else:
-    raise ValueError(f'{chain_poly_type=} invalid.')
+  char_map = _get_char_map(chain_poly_type)
 
   # Handle empty MSA.
   if not msa_sequences:
@@ -114,6 +141,71 @@ def extract_msa_features(
     empty_deletions = np.array([], dtype=np.int32).reshape((0, 0))
     return empty_msa, empty_deletions
 
+  all_residues = ''.join(msa_sequences)
+  if not all_residues.isascii():
+    return _extract_msa_features_python(msa_sequences, char_map)
+
+  if chain_poly_type == mmcif_names.RNA_CHAIN:
+    lookup_table, unknown_table = _RNA_LOOKUP_TABLE, _RNA_UNKNOWN_TABLE
+  elif chain_poly_type == mmcif_names.DNA_CHAIN:
+    lookup_table, unknown_table = _DNA_LOOKUP_TABLE, _DNA_UNKNOWN_TABLE
+  else:
+    lookup_table, unknown_table = _PROTEIN_LOOKUP_TABLE, _PROTEIN_UNKNOWN_TABLE
+
+  # Process all sequences at once as a single flat array of ASCII codes.
+  num_rows = len(msa_sequences)
+  codes = np.frombuffer(all_residues.encode('ascii'), dtype=np.uint8)
+  row_lengths = np.fromiter(
+      (len(seq) for seq in msa_sequences), dtype=np.int64, count=num_rows
+  )
+  row_ends = np.cumsum(row_lengths)
+  row_starts = row_ends - row_lengths
+
+  residue_ids = lookup_table[codes]
+  residue_positions = np.flatnonzero(residue_ids >= 0)
+  residues_per_row = np.diff(
+      np.searchsorted(residue_positions, row_ends), prepend=0
+  )
+  num_cols = int(residues_per_row[0])
+
+  # All rows must have as many residues as the first row and no unknown
+  # characters. Otherwise, rerun the slow path to raise the detailed error.
+  if np.any(residues_per_row != num_cols) or np.any(unknown_table[codes]):
+    return _extract_msa_features_python(msa_sequences, char_map)
+
+  msa_arr = residue_ids[residue_positions].reshape((num_rows, num_cols))
+
+  # Everything between two residues of a row is a deletion, so the number of
+  # deletions left of the j-th residue of a row is its position in the row
+  # minus j. The differences of these running counts are the deletions.
+  deletions_before = residue_positions.reshape((num_rows, num_cols))
+  deletions_before -= row_starts[:, None]
+  deletions_before -= np.arange(num_cols)
+  deletions_arr = np.diff(deletions_before, axis=1, prepend=0)
+
+  return msa_arr.astype(np.int32), deletions_arr.astype(np.int32)
+
+
+def _extract_msa_features_python(
+    msa_sequences: Sequence[str], char_map: Mapping[str, int]
+) -> tuple[np.ndarray, np.ndarray]:
+  """Extracts MSA features one character at a time.
+
+  Slow reference implementation of `extract_msa_features`, used for non-ASCII
+  MSAs and to produce detailed error messages for invalid MSAs.
+
+  Args:
+    msa_sequences: A non-empty list of strings, each with one MSA sequence.
+    char_map: Mapping from MSA characters to residue type IDs.
+
+  Returns:
+    The MSA and deletions arrays, see `extract_msa_features`.
+
+  Raises:
+    ValueError if any of the preconditions of `extract_msa_features` are not
+    met.
+  """
+
   # Get the number of rows and columns in the MSA.
   num_rows = len(msa_sequences)
   num_cols = sum(1 for c in msa_sequences[0] if c in char_map)
@@ -0,0 +1,103 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Benchmarks MSA featurisation against the per-character reference.
+
+Usage:
+  python -m alphafold3.data.msa_features_benchmark --num_rows=10000 \
+      --num_cols=1500
+"""
+
+import time
+
+from absl import app
+from absl import flags
+from alphafold3.constants import mmcif_names
+from alphafold3.data import msa_features
+import numpy as np
+
+
+_NUM_ROWS = flags.DEFINE_integer(
+    'num_rows', 10_000, 'Number of sequences in the MSA.'
+)
+_NUM_COLS = flags.DEFINE_integer(
+    'num_cols', 1500, 'Number of residues in the query sequence.'
+)
+_INSERTION_RATE = flags.DEFINE_float(
+    'insertion_rate', 0.1, 'Fraction of residues preceded by an insertion.'
+)
+_NUM_REPEATS = flags.DEFINE_integer(
+    'num_repeats', 3, 'Number of timed runs, the fastest one is reported.'
+)
+_SEED = flags.DEFINE_integer('seed', 0, 'Random seed of the generated MSA.')
+
+
+def _random_msa(
+    rng: np.random.Generator,
+    num_rows: int,
+    num_cols: int,
+    insertion_rate: float,
+) -> list[str]:
+  """Generates a random protein A3M MSA with gaps and insertions."""
+  residues = np.array(list('ACDEFGHIKLMNPQRSTVWY-'))
+  insertions = np.array(list('acdefghiklmnpqrstvwy'))
+  msa = [''.join(rng.choice(residues[:-1], size=num_cols))]
+  for _ in range(num_rows - 1):
+    row = rng.choice(residues, size=num_cols).astype(object)
+    has_insertion = rng.random(num_cols) < insertion_rate
+    for col in np.flatnonzero(has_insertion):
+      row[col] = ''.join(rng.choice(insertions, size=rng.integers(1, 5))) + (
+          row[col]
+      )
+    msa.append(''.join(row))
+  return msa
+
+
+def _time(fn, num_repeats: int) -> float:
+  times = []
+  for _ in range(num_repeats):
+    start = time.perf_counter()
+    fn()
+    times.append(time.perf_counter() - start)
+  return min(times)
+
+
+def main(_):
+  rng = np.random.default_rng(_SEED.value)
+  msa = _random_msa(
+      rng, _NUM_ROWS.value, _NUM_COLS.value, _INSERTION_RATE.value
+  )
+  print(f'MSA with {len(msa)} sequences of {_NUM_COLS.value} residues.')
+
+  def vectorized():
+    return msa_features.extract_msa_features(
+        msa, mmcif_names.PROTEIN_CHAIN
+    )
+
+  # pylint: disable=protected-access
+  def reference():
+    return msa_features._extract_msa_features_python(
+        msa, msa_features._PROTEIN_TO_ID
+    )
+  # pylint: enable=protected-access
+
+  for actual, expected in zip(vectorized(), reference(), strict=True):
+    np.testing.assert_array_equal(actual, expected)
+    assert actual.dtype == expected.dtype
+
+  vectorized_time = _time(vectorized, _NUM_REPEATS.value)
+  reference_time = _time(reference, _NUM_REPEATS.value)
+  print(f'Vectorized: {vectorized_time:.3f} seconds')
+  print(f'Reference:  {reference_time:.3f} seconds')
+  print(f'Speedup:    {reference_time / vectorized_time:.1f}x')
+
+
+if __name__ == '__main__':
+  app.run(main)
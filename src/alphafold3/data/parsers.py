@@ -176,3 +176,39 @@ def convert_stockholm_to_a3m(
       fasta_chunks.append(seq)
 
   return '\n'.join(fasta_chunks) + '\n'  # Include terminating newline.
+
+
+def convert_stockholm_file_to_a3m(
+    stockholm_path: str,
+    max_sequences: int | None = None,
+    remove_first_row_gaps: bool = True,
+    linewidth: int | None = None,
+) -> str:
+  """Converts an MSA file in Stockholm format to the A3M format.
+
+  Equivalent to `convert_stockholm_to_a3m` on the opened file, but the file is
+  streamed in a single pass in C++ and rows of sequences beyond `max_sequences`
+  are skipped without being stored. This keeps the memory use bounded for the
+  multi-GB Stockholm files produced by searches of large databases.
+
+  Args:
+    stockholm_path: The path of the Stockholm file.
+    max_sequences: The maximum number of sequences to keep, including the query.
+      If None or 0, all sequences are kept.
+    remove_first_row_gaps: Whether to remove the columns with a gap in the query
+      (the first sequence).
+    linewidth: If set, the maximum length of the sequence lines.
+
+  Returns:
+    The MSA in A3M format.
+
+  Raises:
+    FileNotFoundError: If the file can't be opened.
+    ValueError: If the file can't be read or isn't a valid Stockholm MSA.
+  """
+  return msa_conversion.convert_stockholm_to_a3m(
+      stockholm_path,
+      max_sequences=max_sequences,
+      remove_first_row_gaps=remove_first_row_gaps,
+      linewidth=linewidth,
+  )
@@ -0,0 +1,155 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Benchmarks the Stockholm to A3M conversion on a synthetic Stockholm file.
+
+The streaming C++ converter and the Python converter are run in separate
+subprocesses so that their peak memory use can be compared.
+
+Usage:
+  python -m alphafold3.data.parsers_benchmark --size_gb=1 --max_sequences=10000
+"""
+
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from absl import app
+from absl import flags
+from alphafold3.data import parsers
+
+
+_SIZE_GB = flags.DEFINE_float(
+    'size_gb', 1.0, 'Approximate size of the synthetic Stockholm file in GB.'
+)
+_NUM_COLUMNS = flags.DEFINE_integer(
+    'num_columns', 1000, 'Number of columns of the synthetic alignment.'
+)
+_BLOCK_WIDTH = flags.DEFINE_integer(
+    'block_width', 200, 'Number of columns per interleaved alignment block.'
+)
+_MAX_SEQUENCES = flags.DEFINE_integer(
+    'max_sequences', 10_000, 'Maximum number of sequences to convert.'
+)
+_SEED = flags.DEFINE_integer('seed', 0, 'Random seed of the alignment.')
+
+_RESIDUES = 'ACDEFGHIKLMNPQRSTVWY'
+
+
+def _write_stockholm(
+    path: str, size_bytes: int, num_columns: int, block_width: int, seed: int
+) -> int:
+  """Writes a HMMER-like Stockholm file, returns the number of sequences."""
+  rng = random.Random(seed)
+  row_bytes = num_columns + 2 * (num_columns // block_width + 1) * 40
+  num_sequences = max(2, size_bytes // row_bytes)
+  names = [f'UniRef90_{i:09d}/1-{num_columns}' for i in range(num_sequences)]
+  name_width = max(len(name) for name in names)
+  # Uppercase query without gaps, hits with gaps, insertions and deletions.
+  query = ''.join(rng.choices(_RESIDUES, k=num_columns))
+  alphabet = _RESIDUES + _RESIDUES.lower() + '-' * 10 + '.' * 5
+  hit_rows = [''.join(rng.choices(alphabet, k=num_columns)) for _ in range(64)]
+
+  with open(path, 'w') as f:
+    f.write('# STOCKHOLM 1.0\n\n')
+    for name in names:
+      f.write(f'#=GS {name} DE Synthetic protein {name}\n')
+    f.write('\n')
+    for start in range(0, num_columns, block_width):
+      end = start + block_width
+      f.write(f'{names[0]:<{name_width}} {query[start:end]}\n')
+      for i, name in enumerate(names[1:]):
+        row = hit_rows[i % len(hit_rows)]
+        f.write(f'{name:<{name_width}} {row[start:end]}\n')
+      f.write(f'{"#=GC RF":<{name_width}} {"x" * len(query[start:end])}\n\n')
+    f.write('//\n')
+  return num_sequences
+
+
+def _convert_in_subprocess(
+    implementation: str, path: str, max_sequences: int
+) -> tuple[float, int, str]:
+  """Returns the time, peak RSS in KiB and output path of a conversion."""
+  output_path = f'{path}.{implementation}.a3m'
+  start = time.perf_counter()
+  subprocess.run(
+      [
+          sys.executable,
+          __file__,
+          '--convert',
+          implementation,
+          path,
+          str(max_sequences),
+          output_path,
+      ],
+      check=True,
+  )
+  elapsed = time.perf_counter() - start
+  max_rss_kib = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+  return elapsed, max_rss_kib, output_path
+
+
+def _convert(
+    implementation: str, path: str, max_sequences: str, output_path: str
+) -> None:
+  if implementation == 'cpp':
+    a3m = parsers.convert_stockholm_file_to_a3m(
+        path, max_sequences=int(max_sequences)
+    )
+  else:
+    with open(path) as f:
+      a3m = parsers.convert_stockholm_to_a3m(
+          f, max_sequences=int(max_sequences)
+      )
+  with open(output_path, 'w') as f:
+    f.write(a3m)
+
+
+def main(_):
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    path = os.path.join(tmp_dir, 'msa.sto')
+    num_sequences = _write_stockholm(
+        path,
+        size_bytes=int(_SIZE_GB.value * 1e9),
+        num_columns=_NUM_COLUMNS.value,
+        block_width=_BLOCK_WIDTH.value,
+        seed=_SEED.value,
+    )
+    print(
+        f'Stockholm file: {os.path.getsize(path) / 1e9:.2f} GB,'
+        f' {num_sequences} sequences, converting {_MAX_SEQUENCES.value}.'
+    )
+
+    # ru_maxrss of the children is the maximum over all waited for children, so
+    # run the implementation expected to use less memory first.
+    outputs = {}
+    for implementation in ('cpp', 'python'):
+      elapsed, max_rss_kib, outputs[implementation] = _convert_in_subprocess(
+          implementation, path, _MAX_SEQUENCES.value
+      )
+      print(
+          f'{implementation}: {elapsed:.2f} s, peak RSS'
+          f' {max_rss_kib / 1024:.0f} MiB'
+      )
+
+    with open(outputs['cpp']) as cpp_f, open(outputs['python']) as python_f:
+      assert cpp_f.read() == python_f.read(), 'Outputs differ.'
+    print('Outputs are identical.')
+
+
+if __name__ == '__main__':
+  if len(sys.argv) == 6 and sys.argv[1] == '--convert':
+    _convert(*sys.argv[2:])
+  else:
+    app.run(main)
@@ -10,63 +10,243 @@
 
 """Functions for running the MSA and template tools for the AlphaFold model."""
 
+from collections.abc import Callable, Hashable, Iterable, Iterator, Sequence
+import concurrent.futures
 import dataclasses
 import datetime
 import functools
 import logging
+import threading
 import time
+from typing import ParamSpec, TypeVar
 
 from alphafold3.common import folding_input
 from alphafold3.constants import mmcif_names
+from alphafold3.data import database_staging
 from alphafold3.data import msa
 from alphafold3.data import msa_config
+from alphafold3.data import search_cache
+from alphafold3.data import search_scheduler
 from alphafold3.data import structure_stores
+from alphafold3.data import template_metadata_index
+from alphafold3.data import template_search_batcher
 from alphafold3.data import templates as templates_lib
 
 
+_P = ParamSpec('_P')
+_T = TypeVar('_T')
+
+_Chain = (
+    folding_input.ProteinChain
+    | folding_input.RnaChain
+    | folding_input.DnaChain
+    | folding_input.Ligand
+)
+
+
+def _concurrent_cache(fn: Callable[_P, _T]) -> Callable[_P, _T]:
+  """Like functools.cache, but safe to call concurrently from many threads.
+
+  Concurrent calls with the same arguments run the function only once, the
+  other callers wait for and share its result. Exceptions are not cached.
+
+  Args:
+    fn: The function to cache. All its arguments must be hashable.
+
+  Returns:
+    The cached function.
+  """
+  futures: dict[Hashable, concurrent.futures.Future[_T]] = {}
+  lock = threading.Lock()
+
+  @functools.wraps(fn)
+  def cached_fn(*args: _P.args, **kwargs: _P.kwargs) -> _T:
+    key = (args, tuple(sorted(kwargs.items())))
+    with lock:
+      future = futures.get(key)
+      is_owner = future is None
+      if is_owner:
+        future = futures[key] = concurrent.futures.Future()
+    if not is_owner:
+      return future.result()
+
+    try:
+      result = fn(*args, **kwargs)
+    except BaseException as e:
+      with lock:
+        del futures[key]
+      future.set_exception(e)
+      raise
+    future.set_result(result)
+    return result
+
+  return cached_fn
+
+
 # Cache to avoid re-running template search for the same sequence in homomers.
-@functools.cache
+@_concurrent_cache
 def _get_protein_templates(
     sequence: str,
     input_msa_a3m: str,
     run_template_search: bool,
     templates_config: msa_config.TemplatesConfig,
     pdb_database_path: str,
+    batcher: template_search_batcher.TemplateSearchBatcher,
+    cache: search_cache.SearchCache | None = None,
+    metadata_index: template_metadata_index.TemplateMetadataIndex | None = None,
 ) -> templates_lib.Templates:
-  """Searches for templates for a single protein chain."""
-  if run_template_search:
-    templates_start_time = time.time()
-    logging.info('Getting protein templates for sequence %s', sequence)
-    protein_templates = templates_lib.Templates.from_seq_and_a3m(
+  """Searches for templates for a single protein chain.
+
+  Hmmsearch is run by the batcher on the search scheduler, possibly together
+  with the template searches of other chains.
+
+  Args:
+    sequence: The query sequence.
+    input_msa_a3m: The MSA the profile of the template search is built from.
+    run_template_search: Whether to search for templates at all.
+    templates_config: The template search configuration.
+    pdb_database_path: The PDB database directory with mmCIF files.
+    batcher: The batcher to run Hmmsearch with.
+    cache: Optional persistent cache of search results. If it has the result,
+      no search is run.
+    metadata_index: Optional metadata index of the PDB database.
+
+  Returns:
+    The template hits.
+  """
+  structure_store = structure_stores.StructureStore(pdb_database_path)
+  if not run_template_search:
+    logging.info('Skipping template search for sequence %s', sequence)
+    return templates_lib.Templates(
         query_sequence=sequence,
-        msa_a3m=input_msa_a3m,
+        hits=[],
         max_template_date=templates_config.filter_config.max_template_date,
-        database_path=templates_config.template_tool_config.database_path,
-        hmmsearch_config=templates_config.template_tool_config.hmmsearch_config,
-        max_a3m_query_sequences=None,
-        chain_poly_type=mmcif_names.PROTEIN_CHAIN,
-        structure_store=structure_stores.StructureStore(pdb_database_path),
-        filter_config=templates_config.filter_config,
+        structure_store=structure_store,
     )
+
+  templates_start_time = time.time()
+  cache_key = cached_hits = None
+  if cache is not None:
+    cache_key = search_cache.templates_key(
+        sequence=sequence,
+        input_msa_a3m=input_msa_a3m,
+        templates_config=templates_config,
+        pdb_database_path=pdb_database_path,
+        metadata_index_path=(
+            metadata_index.path if metadata_index is not None else None
+        ),
+    )
+    if (cached_entry := cache.get(cache_key)) is not None:
+      cached_hits, structures = search_cache.decode_template_hits(cached_entry)
+      # mmCIF files can be rewritten in place, unlike the databases.
+      if structures != search_cache.structure_identities(
+          pdb_database_path, structures
+      ):
+        cached_hits = None
     logging.info(
-        'Getting %d protein templates took %.2f seconds for sequence %s',
-        protein_templates.num_hits,
-        time.time() - templates_start_time,
+        'Search cache %s for protein templates of sequence %s',
+        'miss' if cached_hits is None else 'hit',
         sequence,
     )
-  else:
-    logging.info('Skipping template search for sequence %s', sequence)
+
+  if cached_hits is not None:
     protein_templates = templates_lib.Templates(
         query_sequence=sequence,
-        hits=[],
+        hits=cached_hits,
+        max_template_date=templates_config.filter_config.max_template_date,
+        structure_store=structure_store,
+    )
+  else:
+    logging.info('Getting protein templates for sequence %s', sequence)
+    hmmsearch_a3m = batcher.search(
+        a3m=input_msa_a3m,
+        database_path=templates_config.template_tool_config.database_path,
+        hmmsearch_config=templates_config.template_tool_config.hmmsearch_config,
+    )
+    protein_templates = templates_lib.Templates.from_hmmsearch_a3m(
+        query_sequence=sequence,
+        a3m=hmmsearch_a3m,
         max_template_date=templates_config.filter_config.max_template_date,
-        structure_store=structure_stores.StructureStore(pdb_database_path),
+        chain_poly_type=mmcif_names.PROTEIN_CHAIN,
+        structure_store=structure_store,
+        filter_config=templates_config.filter_config,
+        metadata_index=metadata_index,
     )
+    if cache is not None:
+      structures = search_cache.structure_identities(
+          pdb_database_path, templates_lib.get_hit_pdb_ids(hmmsearch_a3m)
+      )
+      cache.put(
+          cache_key,
+          search_cache.encode_template_hits(protein_templates.hits, structures),
+      )
+
+  logging.info(
+      'Getting %d protein templates took %.2f seconds for sequence %s',
+      protein_templates.num_hits,
+      time.time() - templates_start_time,
+      sequence,
+  )
   return protein_templates
 
 
+def _submit_msa_search(
+    scheduler: search_scheduler.SearchScheduler,
+    cache: search_cache.SearchCache | None,
+    sequence: str,
+    run_config: msa_config.RunConfig,
+    chain_poly_type: str,
+) -> tuple[concurrent.futures.Future[msa.Msa], bool]:
+  """Schedules an MSA search, using only the CPUs granted by the scheduler.
+
+  Args:
+    scheduler: The scheduler to run the search with.
+    cache: Optional persistent cache of search results. If it has the result,
+      no search is run.
+    sequence: The query sequence.
+    run_config: The MSA search configuration.
+    chain_poly_type: The polymer type of the query sequence.
+
+  Returns:
+    A future holding the MSA and whether the MSA was found in the cache.
+  """
+  to_msa = lambda a3m: msa.Msa.from_a3m(
+      query_sequence=sequence,
+      chain_poly_type=chain_poly_type,
+      a3m=a3m,
+      max_depth=run_config.crop_size,
+      deduplicate=False,
+  )
+
+  cache_key = None
+  if cache is not None:
+    cache_key = search_cache.msa_key(sequence, run_config)
+    if (cached_a3m := cache.get(cache_key)) is not None:
+      future = concurrent.futures.Future()
+      future.set_result(to_msa(cached_a3m.decode('utf-8')))
+      return future, True
+
+  def search(n_cpu: int) -> msa.Msa:
+    tool_config = dataclasses.replace(run_config.config, n_cpu=n_cpu)
+    a3m = msa.get_msa_tool(tool_config).query(sequence).a3m
+    if cache is not None:
+      cache.put(cache_key, a3m.encode('utf-8'))
+    return to_msa(a3m)
+
+  return scheduler.submit(search, n_cpu=run_config.config.n_cpu), False
+
+
+def _log_cache_stats(sequence: str, cache_hits: Sequence[bool]) -> None:
+  logging.info(
+      'Search cache: %d hits, %d misses for MSAs of sequence %s',
+      sum(cache_hits),
+      len(cache_hits) - sum(cache_hits),
+      sequence,
+  )
+
+
 # Cache to avoid re-running the MSA tools for the same sequence in homomers.
-@functools.cache
+@_concurrent_cache
 def _get_protein_msa_and_templates(
     sequence: str,
     run_template_search: bool,
@@ -76,96 +256,128 @@ def _get_protein_msa_and_templates(
     uniprot_msa_config: msa_config.RunConfig,
     templates_config: msa_config.TemplatesConfig,
     pdb_database_path: str,
+    scheduler: search_scheduler.SearchScheduler,
+    batcher: template_search_batcher.TemplateSearchBatcher,
+    cache: search_cache.SearchCache | None = None,
+    metadata_index: template_metadata_index.TemplateMetadataIndex | None = None,
 ) -> tuple[msa.Msa, msa.Msa, templates_lib.Templates]:
   """Processes a single protein chain."""
   logging.info('Getting protein MSAs for sequence %s', sequence)
   msa_start_time = time.time()
 
-  uniref90_msa = msa.get_msa(
-      target_sequence=sequence,
-      run_config=uniref90_msa_config,
-      chain_poly_type=mmcif_names.PROTEIN_CHAIN,
+  # All searches run concurrently. The template search only needs the unpaired
+  # MSA, so it is started as soon as that is ready, without waiting for the
+  # (usually slowest) UniProt search used for the paired MSA.
+  uniref90_msa_future, uniref90_cache_hit = _submit_msa_search(
+      scheduler, cache, sequence, uniref90_msa_config, mmcif_names.PROTEIN_CHAIN
   )
-  mgnify_msa = msa.get_msa(
-      target_sequence=sequence,
-      run_config=mgnify_msa_config,
-      chain_poly_type=mmcif_names.PROTEIN_CHAIN,
+  mgnify_msa_future, mgnify_cache_hit = _submit_msa_search(
+      scheduler, cache, sequence, mgnify_msa_config, mmcif_names.PROTEIN_CHAIN
   )
-  small_bfd_msa = msa.get_msa(
-      target_sequence=sequence,
-      run_config=small_bfd_msa_config,
-      chain_poly_type=mmcif_names.PROTEIN_CHAIN,
+  small_bfd_msa_future, small_bfd_cache_hit = _submit_msa_search(
+      scheduler,
+      cache,
+      sequence,
+      small_bfd_msa_config,
+      mmcif_names.PROTEIN_CHAIN,
   )
-  uniprot_msa = msa.get_msa(
-      target_sequence=sequence,
-      run_config=uniprot_msa_config,
-      chain_poly_type=mmcif_names.PROTEIN_CHAIN,
+  uniprot_msa_future, uniprot_cache_hit = _submit_msa_search(
+      scheduler, cache, sequence, uniprot_msa_config, mmcif_names.PROTEIN_CHAIN
   )
+  if cache is not None:
+    _log_cache_stats(
+        sequence,
+        [
+            uniref90_cache_hit,
+            mgnify_cache_hit,
+            small_bfd_cache_hit,
+            uniprot_cache_hit,
+        ],
+    )
+
+  uniref90_msa = uniref90_msa_future.result()
+  mgnify_msa = mgnify_msa_future.result()
+  small_bfd_msa = small_bfd_msa_future.result()
 
   logging.info(
-      'Getting protein MSAs took %.2f seconds for sequence %s',
+      'Getting unpaired protein MSAs took %.2f seconds for sequence %s',
       time.time() - msa_start_time,
       sequence,
   )
 
-  logging.info('Deduplicating MSAs for sequence %s', sequence)
+  logging.info('Deduplicating unpaired MSAs for sequence %s', sequence)
   msa_dedupe_start_time = time.time()
   unpaired_protein_msa = msa.Msa.from_multiple_msas(
       msas=[uniref90_msa, small_bfd_msa, mgnify_msa],
       deduplicate=True,
   )
-  paired_protein_msa = msa.Msa.from_multiple_msas(
-      msas=[uniprot_msa], deduplicate=False
-  )
   logging.info(
-      'Deduplicating MSAs took %.2f seconds for sequence %s, found %d unpaired'
-      ' sequences, %d paired sequences',
+      'Deduplicating unpaired MSAs took %.2f seconds for sequence %s, found %d'
+      ' unpaired sequences',
       time.time() - msa_dedupe_start_time,
       sequence,
       unpaired_protein_msa.depth,
-      paired_protein_msa.depth,
   )
 
+  # Runs while the UniProt search, if still running, proceeds on the scheduler.
   protein_templates = _get_protein_templates(
       sequence=sequence,
       input_msa_a3m=unpaired_protein_msa.to_a3m(),
       run_template_search=run_template_search,
       templates_config=templates_config,
       pdb_database_path=pdb_database_path,
+      batcher=batcher,
+      cache=cache,
+      metadata_index=metadata_index,
+  )
+
+  paired_protein_msa = msa.Msa.from_multiple_msas(
+      msas=[uniprot_msa_future.result()], deduplicate=False
+  )
+  logging.info(
+      'Getting protein MSAs took %.2f seconds for sequence %s, found %d'
+      ' paired sequences',
+      time.time() - msa_start_time,
+      sequence,
+      paired_protein_msa.depth,
   )
 
   return unpaired_protein_msa, paired_protein_msa, protein_templates
 
 
 # Cache to avoid re-running the Nhmmer for the same sequence in homomers.
-@functools.cache
+@_concurrent_cache
 def _get_rna_msa(
     sequence: str,
     nt_rna_msa_config: msa_config.NhmmerConfig,
     rfam_msa_config: msa_config.NhmmerConfig,
     rnacentral_msa_config: msa_config.NhmmerConfig,
+    scheduler: search_scheduler.SearchScheduler,
+    cache: search_cache.SearchCache | None = None,
 ) -> msa.Msa:
   """Processes a single RNA chain."""
   logging.info('Getting RNA MSAs for sequence %s', sequence)
   rna_msa_start_time = time.time()
 
-  nt_rna_msa = msa.get_msa(
-      target_sequence=sequence,
-      run_config=nt_rna_msa_config,
-      chain_poly_type=mmcif_names.RNA_CHAIN,
+  nt_rna_msa_future, nt_rna_cache_hit = _submit_msa_search(
+      scheduler, cache, sequence, nt_rna_msa_config, mmcif_names.RNA_CHAIN
   )
-  rfam_msa = msa.get_msa(
-      target_sequence=sequence,
-      run_config=rfam_msa_config,
-      chain_poly_type=mmcif_names.RNA_CHAIN,
+  rfam_msa_future, rfam_cache_hit = _submit_msa_search(
+      scheduler, cache, sequence, rfam_msa_config, mmcif_names.RNA_CHAIN
   )
-  rnacentral_msa = msa.get_msa(
-      target_sequence=sequence,
-      run_config=rnacentral_msa_config,
-      chain_poly_type=mmcif_names.RNA_CHAIN,
+  rnacentral_msa_future, rnacentral_cache_hit = _submit_msa_search(
+      scheduler, cache, sequence, rnacentral_msa_config, mmcif_names.RNA_CHAIN
   )
+  if cache is not None:
+    _log_cache_stats(
+        sequence, [nt_rna_cache_hit, rfam_cache_hit, rnacentral_cache_hit]
+    )
   rna_msa = msa.Msa.from_multiple_msas(
-      msas=[rfam_msa, rnacentral_msa, nt_rna_msa],
+      msas=[
+          rfam_msa_future.result(),
+          rnacentral_msa_future.result(),
+          nt_rna_msa_future.result(),
+      ],
       deduplicate=True,
   )
   logging.info(
@@ -178,6 +390,31 @@ def _get_rna_msa(
   return rna_msa
 
 
+def _replace_chain_id(
+    chain: folding_input.ProteinChain | folding_input.RnaChain, chain_id: str
+) -> folding_input.ProteinChain | folding_input.RnaChain:
+  """Returns a copy of the processed chain with a different chain ID."""
+  match chain:
+    case folding_input.ProteinChain():
+      return folding_input.ProteinChain(
+          id=chain_id,
+          sequence=chain.sequence,
+          ptms=chain.ptms,
+          unpaired_msa=chain.unpaired_msa,
+          paired_msa=chain.paired_msa,
+          templates=chain.templates,
+      )
+    case folding_input.RnaChain():
+      return folding_input.RnaChain(
+          id=chain_id,
+          sequence=chain.sequence,
+          modifications=chain.modifications,
+          unpaired_msa=chain.unpaired_msa,
+      )
+    case _:
+      raise ValueError(f'Unsupported chain type: {type(chain)}')
+
+
 @dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
 class DataPipelineConfig:
   """The configuration for the data pipeline.
@@ -205,8 +442,46 @@ class DataPipelineConfig:
     seqres_database_path: PDB sequence database path, used for template search.
     pdb_database_path: PDB database directory with mmCIF files path, used for
       template search.
-    jackhmmer_n_cpu: Number of CPUs to use for Jackhmmer.
-    nhmmer_n_cpu: Number of CPUs to use for Nhmmer.
+    jackhmmer_n_cpu: Maximum number of CPUs to use for a single Jackhmmer
+      search.
+    nhmmer_n_cpu: Maximum number of CPUs to use for a single Nhmmer search.
+    hmmsearch_n_cpu: Maximum number of CPUs to use for a single Hmmsearch
+      template search.
+    use_database_shards: Whether to search the shards of the Jackhmmer
+      databases concurrently, for the databases that have been sharded with
+      `database_shards`. The CPUs of a search are split among its shards, so
+      jackhmmer_n_cpu can usefully be set much higher than 8.
+    search_n_cpu: Total number of CPUs shared by all MSA and template searches
+      running concurrently. Searches are granted fewer CPUs than
+      jackhmmer_n_cpu/nhmmer_n_cpu/hmmsearch_n_cpu if they would otherwise
+      exceed this budget. If None, defaults to the number of CPUs on the host.
+    search_cpu_lock_file: Optional path of a lock file shared by the data
+      pipelines of all processes on the host. If set, their searches together
+      use at most as many CPUs as the host has.
+    template_search_batch_size: The maximum number of template searches, of
+      chains processed concurrently, run as a single Hmmsearch over the seqres
+      database. The template hits are the same as with 1, i.e. no batching.
+    template_search_batch_wait_seconds: How long the first template search of
+      a batch waits for others to join it, if template_search_batch_size > 1.
+    search_cache_dir: Optional directory of a persistent cache of MSA and
+      template search results, which can be shared by many processes. If None,
+      search results are cached only in memory, for the lifetime of the
+      process.
+    search_cache_max_size_bytes: The maximum size of the persistent search
+      cache. Least recently used results are evicted when exceeded. If None,
+      the size of the cache is unbounded.
+    database_staging_dir: Optional directory on fast storage, e.g. a tmpfs or
+      a local SSD, the sequence databases are copied to before they are
+      searched. Databases that don't fit are searched in place.
+    database_staging_max_size_bytes: The maximum total size of the databases
+      copied to database_staging_dir. If None, limited only by its free space.
+    warm_database_page_cache: Whether to read the sequence databases in the
+      background to load them into the page cache before they are searched.
+    template_metadata_index_path: Optional path of a template metadata index
+      built from the mmCIF files in pdb_database_path, see
+      `template_metadata_index`. Used to get the release date, sequence and
+      unresolved residues of template hits without parsing their mmCIF files.
+      Hits missing from the index fall back to parsing the mmCIF files.
     max_template_date: The latest date of templates to use.
   """
 
@@ -233,15 +508,101 @@ class DataPipelineConfig:
   # Optional configuration for MSA tools.
   jackhmmer_n_cpu: int = 8
   nhmmer_n_cpu: int = 8
+  hmmsearch_n_cpu: int = 8
+  use_database_shards: bool = False
+  search_n_cpu: int | None = None
+  search_cpu_lock_file: str | None = None
+  template_search_batch_size: int = 1
+  template_search_batch_wait_seconds: float = 30.0
+
+  # Optional persistent cache of search results.
+  search_cache_dir: str | None = None
+  search_cache_max_size_bytes: int | None = None
+
+  # Optional staging of the databases on fast storage.
+  database_staging_dir: str | None = None
+  database_staging_max_size_bytes: int | None = None
+  warm_database_page_cache: bool = False
+
+  # Optional precomputed metadata of the PDB database.
+  template_metadata_index_path: str | None = None
 
   max_template_date: datetime.date
 
 
+# Sequence databases that are staged, in the order they are staged in, the same
+# as in scripts/copy_to_ssd.sh. Databases that don't fit are skipped.
+_STAGED_DATABASE_FIELDS = (
+    'seqres_database_path',
+    'uniprot_cluster_annot_database_path',
+    'mgnify_database_path',
+    'uniref90_database_path',
+    'small_bfd_database_path',
+    'rfam_database_path',
+    'ntrna_database_path',
+    'rna_central_database_path',
+)
+
+
+def stage_databases(
+    data_pipeline_config: DataPipelineConfig,
+) -> DataPipelineConfig:
+  """Stages the databases of a data pipeline configuration.
+
+  Copies the sequence databases to the staging directory and starts warming
+  the page cache with them in the background, as configured. Calling this
+  early, e.g. before the model is compiled, lets the databases be warm by the
+  time they are searched. Staging the same databases again is a no-op.
+
+  Args:
+    data_pipeline_config: The data pipeline configuration.
+
+  Returns:
+    The configuration with the paths of the staged databases.
+  """
+  config = data_pipeline_config
+  if config.database_staging_dir is not None:
+    stager = database_staging.get_stager(
+        config.database_staging_dir, config.database_staging_max_size_bytes
+    )
+    config = dataclasses.replace(
+        config,
+        **{
+            field: stager.stage(getattr(config, field))
+            for field in _STAGED_DATABASE_FIELDS
+        },
+    )
+  if config.warm_database_page_cache:
+    warmer = database_staging.get_page_cache_warmer()
+    for field in _STAGED_DATABASE_FIELDS:
+      warmer.warm(getattr(config, field))
+  return config
+
+
+def start_staging_databases(data_pipeline_config: DataPipelineConfig) -> None:
+  """Stages the databases in a background thread, see `stage_databases`.
+
+  Lets the databases be copied while e.g. the model is loaded and compiled.
+  `DataPipeline` stages the databases too, which waits for the copies started
+  here to finish before the first search.
+
+  Args:
+    data_pipeline_config: The data pipeline configuration.
+  """
+  threading.Thread(
+      target=stage_databases,
+      args=(data_pipeline_config,),
+      name='database_stager',
+      daemon=True,
+  ).start()
+
+
 class DataPipeline:
   """Runs the alignment tools and assembles the input features."""
 
   def __init__(self, data_pipeline_config: DataPipelineConfig):
     """Initializes the data pipeline with default configurations."""
+    data_pipeline_config = stage_databases(data_pipeline_config)
     self._uniref90_msa_config = msa_config.RunConfig(
         config=msa_config.JackhmmerConfig(
             binary_path=data_pipeline_config.jackhmmer_binary_path,
@@ -254,6 +615,7 @@ class DataPipeline:
             e_value=1e-4,
             z_value=None,
             max_sequences=10_000,
+            use_database_shards=data_pipeline_config.use_database_shards,
         ),
         chain_poly_type=mmcif_names.PROTEIN_CHAIN,
         crop_size=None,
@@ -270,6 +632,7 @@ class DataPipeline:
             e_value=1e-4,
             z_value=None,
             max_sequences=5_000,
+            use_database_shards=data_pipeline_config.use_database_shards,
         ),
         chain_poly_type=mmcif_names.PROTEIN_CHAIN,
         crop_size=None,
@@ -288,6 +651,7 @@ class DataPipeline:
             # In practice, this has minimal impact on predicted structures.
             z_value=None,
             max_sequences=5_000,
+            use_database_shards=data_pipeline_config.use_database_shards,
         ),
         chain_poly_type=mmcif_names.PROTEIN_CHAIN,
         crop_size=None,
@@ -304,6 +668,7 @@ class DataPipeline:
             e_value=1e-4,
             z_value=None,
             max_sequences=50_000,
+            use_database_shards=data_pipeline_config.use_database_shards,
         ),
         chain_poly_type=mmcif_names.PROTEIN_CHAIN,
         crop_size=None,
@@ -375,6 +740,7 @@ class DataPipeline:
                 dom_e=100,
                 incdom_e=100,
                 alphabet='amino',
+                n_cpu=data_pipeline_config.hmmsearch_n_cpu,
             ),
         ),
         filter_config=msa_config.TemplateFilterConfig(
@@ -387,6 +753,33 @@ class DataPipeline:
         ),
     )
     self._pdb_database_path = data_pipeline_config.pdb_database_path
+    # Shared across pipelines so that the caches above, which are keyed also
+    # on the scheduler, are reused across fold inputs.
+    self._scheduler = search_scheduler.get_scheduler(
+        n_cpu=(
+            data_pipeline_config.search_n_cpu
+            or search_scheduler.host_cpu_count()
+        ),
+        lock_file_path=data_pipeline_config.search_cpu_lock_file,
+    )
+    self._template_search_batcher = template_search_batcher.get_batcher(
+        self._scheduler,
+        data_pipeline_config.template_search_batch_size,
+        data_pipeline_config.template_search_batch_wait_seconds,
+    )
+    if data_pipeline_config.search_cache_dir is not None:
+      self._search_cache = search_cache.get_cache(
+          cache_dir=data_pipeline_config.search_cache_dir,
+          max_size_bytes=data_pipeline_config.search_cache_max_size_bytes,
+      )
+    else:
+      self._search_cache = None
+    if data_pipeline_config.template_metadata_index_path is not None:
+      self._template_metadata_index = template_metadata_index.get_index(
+          data_pipeline_config.template_metadata_index_path
+      )
+    else:
+      self._template_metadata_index = None
 
   def process_protein_chain(
       self, chain: folding_input.ProteinChain
@@ -407,6 +800,10 @@ class DataPipeline:
           uniprot_msa_config=self._uniprot_msa_config,
           templates_config=self._templates_config,
           pdb_database_path=self._pdb_database_path,
+          scheduler=self._scheduler,
+          batcher=self._template_search_batcher,
+          cache=self._search_cache,
+          metadata_index=self._template_metadata_index,
       )
       unpaired_msa = unpaired_msa.to_a3m()
       paired_msa = paired_msa.to_a3m()
@@ -431,6 +828,9 @@ class DataPipeline:
           run_template_search=True,
           templates_config=self._templates_config,
           pdb_database_path=self._pdb_database_path,
+          batcher=self._template_search_batcher,
+          cache=self._search_cache,
+          metadata_index=self._template_metadata_index,
       )
       templates = [
           folding_input.Template(
@@ -499,6 +899,8 @@ class DataPipeline:
           nt_rna_msa_config=self._nt_rna_msa_config,
           rfam_msa_config=self._rfam_msa_config,
           rnacentral_msa_config=self._rnacentral_msa_config,
+          scheduler=self._scheduler,
+          cache=self._search_cache,
       ).to_a3m()
     return folding_input.RnaChain(
         id=chain.id,
@@ -507,22 +909,77 @@ class DataPipeline:
         unpaired_msa=unpaired_msa,
     )
 
+  def process_chain(self, chain: _Chain) -> _Chain:
+    """Processes a single chain of any type."""
+    print(f'Running data pipeline for chain {chain.id}...')
+    process_chain_start_time = time.time()
+    match chain:
+      case folding_input.ProteinChain():
+        processed_chain = self.process_protein_chain(chain)
+      case folding_input.RnaChain():
+        processed_chain = self.process_rna_chain(chain)
+      case _:
+        processed_chain = chain
+    print(
+        f'Running data pipeline for chain {chain.id} took'
+        f' {time.time() - process_chain_start_time:.2f} seconds',
+    )
+    return processed_chain
+
   def process(self, fold_input: folding_input.Input) -> folding_input.Input:
     """Runs MSA and template tools and returns a new Input with the results."""
-    processed_chains = []
-    for chain in fold_input.chains:
-      print(f'Running data pipeline for chain {chain.id}...')
-      process_chain_start_time = time.time()
-      match chain:
-        case folding_input.ProteinChain():
-          processed_chains.append(self.process_protein_chain(chain))
-        case folding_input.RnaChain():
-          processed_chains.append(self.process_rna_chain(chain))
-        case _:
-          processed_chains.append(chain)
+    processed_chains = [self.process_chain(c) for c in fold_input.chains]
+    return dataclasses.replace(fold_input, chains=processed_chains)
+
+  def process_many(
+      self, fold_inputs: Iterable[folding_input.Input], max_workers: int
+  ) -> Iterator[folding_input.Input]:
+    """Runs MSA and template tools on many inputs with chains run in parallel.
+
+    Chains that are identical up to their chain ID are processed only once,
+    even if they come from different fold inputs. The distinct chains of all
+    fold inputs are processed concurrently by a pool of workers, in the order
+    in which they first appear.
+
+    Args:
+      fold_inputs: The fold inputs to process. All of them are read before any
+        chain is processed.
+      max_workers: The maximum number of chains processed concurrently.
+
+    Yields:
+      New Inputs with the results, in the same order as `fold_inputs`. Each is
+      yielded as soon as all of its chains have been processed.
+    """
+    fold_inputs = list(fold_inputs)
+    searched_chain_types = (folding_input.ProteinChain, folding_input.RnaChain)
+    # Keyed on the full chain with a constant ID, not on hash_without_id, so
+    # that chains with colliding hashes are never merged. The type comes first,
+    # so that chains of different types are never compared.
+    dedup_key = lambda chain: (type(chain), _replace_chain_id(chain, ''))
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix='data_pipeline'
+    ) as executor:
+      chain_futures = {}
+      for fold_input in fold_inputs:
+        for chain in fold_input.chains:
+          if isinstance(chain, searched_chain_types):
+            key = dedup_key(chain)
+            if key not in chain_futures:
+              chain_futures[key] = executor.submit(self.process_chain, chain)
       print(
-          f'Running data pipeline for chain {chain.id} took'
-          f' {time.time() - process_chain_start_time:.2f} seconds',
+          f'Running data pipeline for {len(chain_futures)} unique chains of'
+          f' {len(fold_inputs)} fold inputs with {max_workers} workers...'
       )
 
-    return dataclasses.replace(fold_input, chains=processed_chains)
+      for fold_input in fold_inputs:
+        processed_chains = []
+        for chain in fold_input.chains:
+          if isinstance(chain, searched_chain_types):
+            processed_chain = chain_futures[dedup_key(chain)].result()
+            if processed_chain.id != chain.id:
+              processed_chain = _replace_chain_id(processed_chain, chain.id)
+          else:
+            processed_chain = chain
+          processed_chains.append(processed_chain)
+        yield dataclasses.replace(fold_input, chains=processed_chains)
@@ -0,0 +1,307 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Persistent on-disk cache of MSA and template search results.
+
+Entries are content-addressed: the key is a hash of the query sequence, the
+search configuration and the identity (name, size and modification time) of the
+searched databases, so an entry is never reused after a database is updated.
+Template hits also record the identity of the mmCIF file of every hit, as files
+can be rewritten in place without changing their directory.
+Entries are written atomically, hence the cache can be shared by many processes,
+also on shared network storage. The cache is bounded in size, least recently
+used entries are evicted first.
+"""
+
+from collections.abc import Iterable, Mapping, Sequence
+import contextlib
+import dataclasses
+import datetime
+import fcntl
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+from typing import Any
+
+from absl import logging
+from alphafold3.data import msa_config
+from alphafold3.data import templates as templates_lib
+import zstandard
+
+
+# Fields of the search configs that don't change the search results.
+_IGNORED_CONFIG_FIELDS = frozenset({
+    'n_cpu',
+    'binary_path',
+    'hmmalign_binary_path',
+    'hmmbuild_binary_path',
+    'hmmsearch_binary_path',
+    'database_path',
+    'path',
+})
+# Bump when the format of the cache entries changes.
+_CACHE_VERSION = 2
+
+
+def _path_identity(path: str) -> Mapping[str, Any]:
+  """Identifies a database by its name, size and modification time."""
+  stat = os.stat(path)
+  return {
+      'name': os.path.basename(os.path.normpath(path)),
+      'size': stat.st_size,
+      'mtime_ns': stat.st_mtime_ns,
+  }
+
+
+def _config_to_dict(config: Any) -> Any:
+  """Converts a config to a dict without fields that don't change results."""
+  if dataclasses.is_dataclass(config):
+    return {
+        field.name: _config_to_dict(getattr(config, field.name))
+        for field in dataclasses.fields(config)
+        if field.name not in _IGNORED_CONFIG_FIELDS
+    }
+  return config
+
+
+def _hash_key(key: Mapping[str, Any]) -> str:
+  key_json = json.dumps(
+      {'version': _CACHE_VERSION, **key}, sort_keys=True, default=str
+  )
+  return hashlib.sha256(key_json.encode('utf-8')).hexdigest()
+
+
+def msa_key(sequence: str, run_config: msa_config.RunConfig) -> str:
+  """Returns the cache key of an MSA search, before cropping."""
+  tool_config = run_config.config
+  return _hash_key({
+      'kind': 'msa',
+      'sequence': sequence,
+      'chain_poly_type': run_config.chain_poly_type,
+      'database': _path_identity(tool_config.database_config.path),
+      'config': _config_to_dict(tool_config),
+  })
+
+
+def templates_key(
+    sequence: str,
+    input_msa_a3m: str,
+    templates_config: msa_config.TemplatesConfig,
+    pdb_database_path: str,
+    metadata_index_path: str | None = None,
+) -> str:
+  """Returns the cache key of a filtered template search."""
+  tool_config = templates_config.template_tool_config
+  return _hash_key({
+      'kind': 'templates',
+      'sequence': sequence,
+      'input_msa_sha256': hashlib.sha256(
+          input_msa_a3m.encode('utf-8')
+      ).hexdigest(),
+      'seqres_database': _path_identity(tool_config.database_path),
+      'pdb_database': _path_identity(pdb_database_path),
+      'metadata_index': (
+          _path_identity(metadata_index_path)
+          if metadata_index_path is not None
+          else None
+      ),
+      'config': _config_to_dict(templates_config),
+  })
+
+
+def structure_identities(
+    pdb_database_path: str, pdb_ids: Iterable[str]
+) -> dict[str, list[int] | None]:
+  """Identifies the mmCIF files of PDB entries by their size and mtime.
+
+  Args:
+    pdb_database_path: The PDB database, a directory of mmCIF files or a tar
+      file.
+    pdb_ids: The PDB IDs of the entries.
+
+  Returns:
+    The size and modification time of the mmCIF file of each entry, or None if
+    it doesn't exist. Empty for a tar file, which is identified as a whole.
+  """
+  if not os.path.isdir(pdb_database_path):
+    return {}
+  identities = {}
+  for pdb_id in sorted(set(pdb_ids)):
+    try:
+      stat = os.stat(os.path.join(pdb_database_path, f'{pdb_id}.cif'))
+    except FileNotFoundError:
+      identities[pdb_id] = None
+    else:
+      identities[pdb_id] = [stat.st_size, stat.st_mtime_ns]
+  return identities
+
+
+def encode_template_hits(
+    hits: Sequence[templates_lib.Hit],
+    structures: Mapping[str, list[int] | None],
+) -> bytes:
+  """Serialises template hits and the identities of their mmCIFs to bytes.
+
+  Args:
+    hits: The template hits.
+    structures: The identities of the mmCIF files of all hits found by the
+      search, see `structure_identities`, including those filtered out.
+
+  Returns:
+    The serialised hits.
+  """
+  encoded_hits = []
+  for hit in hits:
+    encoded_hit = dataclasses.asdict(hit)
+    encoded_hit['release_date'] = hit.release_date.isoformat()
+    if hit.unresolved_res_indices is not None:
+      encoded_hit['unresolved_res_indices'] = [
+          int(i) for i in hit.unresolved_res_indices
+      ]
+    encoded_hits.append(encoded_hit)
+  return json.dumps({'hits': encoded_hits, 'structures': structures}).encode(
+      'utf-8'
+  )
+
+
+def decode_template_hits(
+    data: bytes,
+) -> tuple[list[templates_lib.Hit], dict[str, list[int] | None]]:
+  """Deserialises template hits serialised with `encode_template_hits`."""
+  decoded = json.loads(data)
+  hits = []
+  for hit in decoded['hits']:
+    hit['release_date'] = datetime.date.fromisoformat(hit['release_date'])
+    hits.append(templates_lib.Hit(**hit))
+  return hits, decoded['structures']
+
+
+class SearchCache:
+  """A size-bounded, content-addressed on-disk cache safe across processes."""
+
+  def __init__(
+      self,
+      cache_dir: str | os.PathLike[str],
+      max_size_bytes: int | None = None,
+  ):
+    """Initializes the cache.
+
+    Args:
+      cache_dir: The directory to store the cache entries in. Created if it
+        doesn't exist.
+      max_size_bytes: The maximum total size of all cache entries. Least
+        recently used entries are evicted when exceeded. If None, the size of
+        the cache is unbounded.
+    """
+    self._cache_dir = pathlib.Path(cache_dir)
+    self._cache_dir.mkdir(parents=True, exist_ok=True)
+    self._max_size_bytes = max_size_bytes
+    self._lock = threading.Lock()
+    self._hits = 0
+    self._misses = 0
+
+  @property
+  def hits(self) -> int:
+    return self._hits
+
+  @property
+  def misses(self) -> int:
+    return self._misses
+
+  def _entry_path(self, key: str) -> pathlib.Path:
+    return self._cache_dir / key[:2] / f'{key}.zst'
+
+  def get(self, key: str) -> bytes | None:
+    """Returns the cached data for the key, or None on a miss."""
+    path = self._entry_path(key)
+    try:
+      with open(path, 'rb') as f:
+        data = zstandard.ZstdDecompressor().decompress(f.read())
+    except FileNotFoundError:
+      data = None
+    except zstandard.ZstdError:
+      logging.warning('Removing corrupted search cache entry %s', path)
+      with contextlib.suppress(FileNotFoundError):
+        path.unlink()
+      data = None
+
+    with self._lock:
+      if data is None:
+        self._misses += 1
+      else:
+        self._hits += 1
+
+    if data is not None:
+      # Mark as recently used for the eviction. Access times are not reliable,
+      # e.g. on filesystems mounted with noatime.
+      with contextlib.suppress(FileNotFoundError):
+        os.utime(path)
+    return data
+
+  def put(self, key: str, data: bytes) -> None:
+    """Atomically stores the data for the key, then evicts if over budget."""
+    path = self._entry_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    compressed = zstandard.ZstdCompressor().compress(data)
+    # Write to a temporary file and rename, so that concurrent readers never
+    # see a partially written entry.
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f'.{key}.', delete=False
+    ) as f:
+      try:
+        f.write(compressed)
+      except BaseException:
+        os.unlink(f.name)
+        raise
+    # Temporary files are only readable by the owner, but the cache may be
+    # shared by many users.
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, path)
+    self._maybe_evict()
+
+  def _maybe_evict(self) -> None:
+    """Evicts the least recently used entries if the cache is over budget."""
+    if self._max_size_bytes is None:
+      return
+
+    with open(self._cache_dir / '.lock', 'a') as lock_file:
+      try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+      except BlockingIOError:
+        return  # Another process is already evicting.
+
+      try:
+        entries = []
+        for path in self._cache_dir.glob('*/*.zst'):
+          try:
+            stat = path.stat()
+          except FileNotFoundError:
+            continue
+          entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+          if total_size <= self._max_size_bytes:
+            break
+          with contextlib.suppress(FileNotFoundError):
+            path.unlink()
+          total_size -= size
+      finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@functools.cache
+def get_cache(cache_dir: str, max_size_bytes: int | None) -> SearchCache:
+  """Returns a cache shared by all data pipelines using the same directory."""
+  return SearchCache(cache_dir=cache_dir, max_size_bytes=max_size_bytes)
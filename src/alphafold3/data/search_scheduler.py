@@ -0,0 +1,245 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Runs MSA and template search tools concurrently under a CPU budget."""
+
+from collections.abc import Callable, Iterator
+import concurrent.futures
+import contextlib
+import fcntl
+import functools
+import json
+import os
+import threading
+from typing import TypeVar
+
+_T = TypeVar('_T')
+
+# How often a tool waiting for CPUs held by other processes checks the ledger.
+_LEDGER_POLL_INTERVAL_SECONDS = 1.0
+
+
+def host_cpu_count() -> int:
+  """Returns the number of CPUs this process is allowed to run on."""
+  try:
+    return len(os.sched_getaffinity(0))
+  except AttributeError:  # Not available on e.g. macOS.
+    return os.cpu_count() or 1
+
+
+def _is_alive(pid: int) -> bool:
+  try:
+    os.kill(pid, 0)
+  except ProcessLookupError:
+    return False
+  except PermissionError:  # Owned by another user, but running.
+    return True
+  return True
+
+
+class _HostCpuLedger:
+  """Accounts for the CPUs used by search tools across processes on a host.
+
+  The number of CPUs held by every process is stored as JSON in a file that is
+  locked while it is read and updated. Entries of processes that are no longer
+  running are dropped, so a process that crashed doesn't leak its CPUs.
+  """
+
+  def __init__(self, lock_file_path: str, n_cpu: int, pid: int | None = None):
+    """Initializes the ledger.
+
+    Args:
+      lock_file_path: The path of the file shared by all processes.
+      n_cpu: The number of CPUs of the host.
+      pid: The process the CPUs are accounted to. Defaults to this process.
+    """
+    self._lock_file_path = lock_file_path
+    self._n_cpu = n_cpu
+    self._pid = os.getpid() if pid is None else pid
+
+  @contextlib.contextmanager
+  def _locked_entries(self) -> Iterator[dict[int, int]]:
+    """Yields the CPUs held by each running process, saved back on exit."""
+    with open(self._lock_file_path, 'a+') as f:
+      fcntl.flock(f, fcntl.LOCK_EX)
+      try:
+        f.seek(0)
+        content = f.read()
+        entries = {int(k): v for k, v in json.loads(content or '{}').items()}
+        entries = {
+            pid: n
+            for pid, n in entries.items()
+            if pid == self._pid or _is_alive(pid)
+        }
+        yield entries
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps({str(k): v for k, v in entries.items() if v > 0}))
+        f.flush()
+      finally:
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+  def acquire(self, n_cpu: int) -> int:
+    """Returns the number of CPUs granted, at most n_cpu, possibly 0."""
+    with self._locked_entries() as entries:
+      available = self._n_cpu - sum(entries.values())
+      granted = max(0, min(n_cpu, available))
+      entries[self._pid] = entries.get(self._pid, 0) + granted
+      return granted
+
+  def release(self, n_cpu: int) -> None:
+    with self._locked_entries() as entries:
+      entries[self._pid] = max(0, entries.get(self._pid, 0) - n_cpu)
+
+
+class CpuBudget:
+  """A thread-safe pool of CPUs shared by concurrently running search tools.
+
+  Each tool asks for the number of CPUs it would like to use and is granted at
+  most its fair share of the budget, i.e. the budget divided by the number of
+  tools that are running or waiting to run. This splits the budget evenly when
+  many tools are scheduled at once while still letting a tool that runs alone
+  use as many CPUs as it asked for.
+
+  Optionally, the budget is also shared with other processes on the same host
+  through a lock file, so that their tools together don't use more CPUs than
+  the host has.
+  """
+
+  def __init__(self, n_cpu: int, lock_file_path: str | None = None):
+    """Initializes the budget.
+
+    Args:
+      n_cpu: The number of CPUs in the budget of this process.
+      lock_file_path: Optional path of a file accounting for the CPUs used by
+        the tools of all processes that share it. If set, a tool is granted
+        only CPUs that are free both in this budget and on the host.
+    """
+    if n_cpu < 1:
+      raise ValueError(f'n_cpu must be at least 1: {n_cpu}')
+    self._n_cpu = n_cpu
+    if lock_file_path is not None:
+      self._ledger = _HostCpuLedger(lock_file_path, n_cpu=host_cpu_count())
+    else:
+      self._ledger = None
+    self._available = n_cpu
+    self._num_running = 0
+    self._num_pending = 0
+    self._condition = threading.Condition()
+
+  @property
+  def n_cpu(self) -> int:
+    return self._n_cpu
+
+  def enqueue(self) -> None:
+    """Announces a tool that will call `acquire(..., enqueued=True)` later."""
+    with self._condition:
+      self._num_pending += 1
+
+  def acquire(self, n_cpu: int, enqueued: bool = False) -> int:
+    """Blocks until at least one CPU is free, returns the number granted."""
+    if n_cpu < 1:
+      raise ValueError(f'n_cpu must be at least 1: {n_cpu}')
+    with self._condition:
+      if not enqueued:
+        self._num_pending += 1
+      while True:
+        if self._available >= 1:
+          fair_share = self._n_cpu // (self._num_running + self._num_pending)
+          granted = max(1, min(n_cpu, self._available, fair_share))
+          if self._ledger is not None:
+            granted = self._ledger.acquire(granted)
+          if granted >= 1:
+            break
+        # CPUs released by other processes are not notified, poll for them.
+        self._condition.wait(
+            timeout=None
+            if self._ledger is None
+            else _LEDGER_POLL_INTERVAL_SECONDS
+        )
+      self._available -= granted
+      self._num_pending -= 1
+      self._num_running += 1
+      return granted
+
+  def release(self, n_cpu: int) -> None:
+    """Returns CPUs previously granted by `acquire` to the pool."""
+    with self._condition:
+      if self._ledger is not None:
+        self._ledger.release(n_cpu)
+      self._available += n_cpu
+      self._num_running -= 1
+      self._condition.notify_all()
+
+  @contextlib.contextmanager
+  def reserve(self, n_cpu: int, enqueued: bool = False) -> Iterator[int]:
+    """Context manager around `acquire` and `release`."""
+    granted = self.acquire(n_cpu, enqueued=enqueued)
+    try:
+      yield granted
+    finally:
+      self.release(granted)
+
+
+class SearchScheduler:
+  """Runs search tools in a thread pool, sharing a single CPU budget.
+
+  The tools themselves are external binaries, so running them from threads is
+  enough to run them in parallel. Every submitted function is called with the
+  number of CPUs it has been granted and must not use more than that.
+  """
+
+  def __init__(self, n_cpu: int, lock_file_path: str | None = None):
+    """Initializes the scheduler.
+
+    Args:
+      n_cpu: The total number of CPUs that all concurrently running tools
+        scheduled by this scheduler may use.
+      lock_file_path: Optional path of a file shared by the schedulers of all
+        processes on the host, see `CpuBudget`.
+    """
+    self._budget = CpuBudget(n_cpu, lock_file_path=lock_file_path)
+    # Every running tool holds at least one CPU, so there is never a need for
+    # more threads than CPUs in the budget.
+    self._executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=n_cpu, thread_name_prefix='search_scheduler'
+    )
+
+  @property
+  def budget(self) -> CpuBudget:
+    return self._budget
+
+  def submit(
+      self, fn: Callable[[int], _T], n_cpu: int
+  ) -> concurrent.futures.Future[_T]:
+    """Schedules `fn(granted_n_cpu)` to run once CPUs are available.
+
+    Args:
+      fn: The function to run, called with the number of CPUs granted to it.
+      n_cpu: The number of CPUs the function would like to use. The function
+        may be granted fewer CPUs if other tools are running concurrently.
+
+    Returns:
+      A future holding the result of the function.
+    """
+    self._budget.enqueue()
+    return self._executor.submit(self._run, fn, n_cpu)
+
+  def _run(self, fn: Callable[[int], _T], n_cpu: int) -> _T:
+    with self._budget.reserve(n_cpu, enqueued=True) as granted:
+      return fn(granted)
+
+
+@functools.cache
+def get_scheduler(
+    n_cpu: int, lock_file_path: str | None = None
+) -> SearchScheduler:
+  """Returns a scheduler shared by all data pipelines with the same budget."""
+  return SearchScheduler(n_cpu=n_cpu, lock_file_path=lock_file_path)
@@ -0,0 +1,391 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Precomputed index of the template metadata of a PDB mmCIF directory.
+
+Template search needs the release date, the full author chain sequence and the
+unresolved residue IDs of every hit. Getting these from the mmCIF requires
+parsing the whole structure, which dominates the template search time when
+there are many hits. The index stores this metadata for every polymer chain of
+every mmCIF in a single memory-mapped file, so a lookup is a binary search.
+
+Build or incrementally update the index (only new or modified mmCIFs are
+parsed) with:
+
+  python -m alphafold3.data.template_metadata_index \
+      <db_dir>/mmcif_files <db_dir>/mmcif_files_metadata.idx [n_workers]
+"""
+
+from collections.abc import Collection, Iterable, Mapping, Sequence
+import concurrent.futures
+import functools
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import time
+from typing import TypeAlias
+
+from absl import logging
+from alphafold3 import structure
+from alphafold3.structure import mmcif
+import numpy as np
+
+
+# Release date (None if missing), author chain sequence and unresolved residue
+# IDs of a polymer chain.
+ChainMetadata: TypeAlias = tuple[str | None, str, np.ndarray]
+
+_MAGIC = b'AF3TMIDX'
+# Bump when the format of the index changes.
+_INDEX_VERSION = 1
+_ALIGNMENT = 64
+_KEY_SEPARATOR = '\t'
+
+
+def parse_metadata(
+    mmcif_string: str, auth_chain_ids: Collection[str] | None = None
+) -> Mapping[str, ChainMetadata]:
+  """Parses the template metadata of polymer chains from an mmCIF.
+
+  Args:
+    mmcif_string: The mmCIF to parse.
+    auth_chain_ids: The author chain IDs to get the metadata of. If None, all
+      polymer chains are returned.
+
+  Returns:
+    Mapping from author chain ID to the metadata of the chain.
+
+  Raises:
+    KeyError: If any of the requested chains isn't a polymer chain.
+  """
+  cif = mmcif.from_string(mmcif_string)
+  release_date = mmcif.get_release_date(cif)
+
+  try:
+    struc = structure.from_parsed_mmcif(
+        cif,
+        model_id=structure.ModelID.ALL,
+        include_water=True,
+        include_other=True,
+        include_bonds=False,
+    )
+  except ValueError:
+    struc = structure.from_parsed_mmcif(
+        cif,
+        model_id=structure.ModelID.FIRST,
+        include_water=True,
+        include_other=True,
+        include_bonds=False,
+    )
+
+  sequences = struc.polymer_author_chain_single_letter_sequence(
+      include_missing_residues=True,
+      protein=True,
+      dna=True,
+      rna=True,
+      other=True,
+  )
+  if auth_chain_ids is None:
+    auth_chain_ids = sequences.keys()
+
+  metadata = {}
+  for auth_chain_id in auth_chain_ids:
+    sequence = sequences[auth_chain_id]
+    unresolved_res_ids = struc.filter(
+        chain_auth_asym_id=auth_chain_id
+    ).unresolved_residues.id
+    metadata[auth_chain_id] = (release_date, sequence, unresolved_res_ids)
+  return metadata
+
+
+def _make_key(pdb_id: str, auth_chain_id: str) -> bytes:
+  return f'{pdb_id}{_KEY_SEPARATOR}{auth_chain_id}'.encode('utf-8')
+
+
+def _concatenate(
+    values: Sequence[np.ndarray], dtype: np.dtype
+) -> tuple[np.ndarray, np.ndarray]:
+  """Concatenates arrays, returns the result and the start offsets."""
+  offsets = np.zeros(len(values) + 1, dtype=np.int64)
+  np.cumsum([len(value) for value in values], out=offsets[1:])
+  if values:
+    concatenated = np.concatenate(values).astype(dtype, copy=False)
+  else:
+    concatenated = np.zeros(0, dtype=dtype)
+  return concatenated, offsets
+
+
+def _write_arrays(path: pathlib.Path, arrays: Mapping[str, np.ndarray]) -> None:
+  """Atomically writes arrays to a file which can be memory-mapped."""
+  header = {'version': _INDEX_VERSION, 'arrays': {}}
+  offset = 0
+  for name, array in arrays.items():
+    header['arrays'][name] = {
+        'dtype': array.dtype.str,
+        'shape': array.shape,
+        'offset': offset,
+    }
+    offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+  header_bytes = json.dumps(header).encode('utf-8')
+  header_size = len(_MAGIC) + 8 + len(header_bytes)
+  data_start = -(-header_size // _ALIGNMENT) * _ALIGNMENT
+
+  path.parent.mkdir(parents=True, exist_ok=True)
+  with tempfile.NamedTemporaryFile(
+      dir=path.parent, prefix=f'.{path.name}.', delete=False
+  ) as f:
+    try:
+      f.write(_MAGIC)
+      f.write(len(header_bytes).to_bytes(8, 'little'))
+      f.write(header_bytes)
+      for name, array in arrays.items():
+        f.seek(data_start + header['arrays'][name]['offset'])
+        f.write(np.ascontiguousarray(array).tobytes())
+    except BaseException:
+      os.unlink(f.name)
+      raise
+  os.chmod(f.name, 0o644)
+  os.replace(f.name, path)
+
+
+def _read_arrays(path: str | os.PathLike[str]) -> Mapping[str, np.ndarray]:
+  """Memory-maps the arrays of a file written by `_write_arrays`."""
+  buffer = np.memmap(path, dtype=np.uint8, mode='r')
+  if buffer[: len(_MAGIC)].tobytes() != _MAGIC:
+    raise ValueError(f'{path} is not a template metadata index.')
+  header_start = len(_MAGIC) + 8
+  header_size = int.from_bytes(
+      buffer[len(_MAGIC) : header_start].tobytes(), 'little'
+  )
+  header = json.loads(
+      buffer[header_start : header_start + header_size].tobytes()
+  )
+  if header['version'] != _INDEX_VERSION:
+    raise ValueError(
+        f'{path} has index version {header["version"]}, expected'
+        f' {_INDEX_VERSION}. Rebuild the index.'
+    )
+  data_start = -(-(header_start + header_size) // _ALIGNMENT) * _ALIGNMENT
+
+  arrays = {}
+  for name, spec in header['arrays'].items():
+    dtype = np.dtype(spec['dtype'])
+    shape = tuple(spec['shape'])
+    start = data_start + spec['offset']
+    end = start + dtype.itemsize * int(np.prod(shape))
+    arrays[name] = buffer[start:end].view(dtype).reshape(shape)
+  return arrays
+
+
+class TemplateMetadataIndex:
+  """Read-only, memory-mapped template metadata index, safe across threads."""
+
+  def __init__(self, index_path: str | os.PathLike[str]):
+    """Memory-maps the index, only the pages needed for lookups are read."""
+    self._path = os.fspath(index_path)
+    arrays = _read_arrays(index_path)
+    self._keys = arrays['keys']
+    self._release_dates = arrays['release_dates']
+    self._sequences = arrays['sequences']
+    self._sequence_offsets = arrays['sequence_offsets']
+    self._unresolved_res_ids = arrays['unresolved_res_ids']
+    self._unresolved_offsets = arrays['unresolved_offsets']
+    self._source_names = arrays['source_names']
+    self._source_sizes = arrays['source_sizes']
+    self._source_mtimes_ns = arrays['source_mtimes_ns']
+
+  @property
+  def path(self) -> str:
+    return self._path
+
+  def __len__(self) -> int:
+    return len(self._keys)
+
+  def _find(self, key: bytes) -> int | None:
+    i = int(np.searchsorted(self._keys, key))
+    if i < len(self._keys) and self._keys[i] == key:
+      return i
+    return None
+
+  def get(self, pdb_id: str, auth_chain_id: str) -> ChainMetadata | None:
+    """Returns the metadata of a chain, or None if it isn't in the index."""
+    i = self._find(_make_key(pdb_id, auth_chain_id))
+    if i is None:
+      return None
+    release_date = self._release_dates[i].decode('ascii') or None
+    sequence = self._sequences[
+        self._sequence_offsets[i] : self._sequence_offsets[i + 1]
+    ].tobytes().decode('utf-8')
+    unresolved_res_ids = np.array(
+        self._unresolved_res_ids[
+            self._unresolved_offsets[i] : self._unresolved_offsets[i + 1]
+        ]
+    )
+    return release_date, sequence, unresolved_res_ids
+
+  def sources(self) -> Mapping[str, tuple[int, int]]:
+    """Returns the size and mtime of each indexed mmCIF at indexing time."""
+    return {
+        name.decode('utf-8'): (int(size), int(mtime_ns))
+        for name, size, mtime_ns in zip(
+            self._source_names,
+            self._source_sizes,
+            self._source_mtimes_ns,
+            strict=True,
+        )
+    }
+
+  def items(self) -> Iterable[tuple[str, str, ChainMetadata]]:
+    """Yields the PDB ID, author chain ID and metadata of all chains."""
+    for key in self._keys:
+      pdb_id, auth_chain_id = key.decode('utf-8').split(_KEY_SEPARATOR)
+      yield pdb_id, auth_chain_id, self.get(pdb_id, auth_chain_id)
+
+
+@functools.cache
+def get_index(index_path: str) -> TemplateMetadataIndex:
+  """Returns an index shared by all data pipelines using the same file."""
+  return TemplateMetadataIndex(index_path)
+
+
+def _index_mmcif(
+    path: pathlib.Path,
+) -> tuple[str, int, int, Mapping[str, ChainMetadata] | None]:
+  """Parses an mmCIF, returns its identity and metadata or None on failure."""
+  stat = path.stat()
+  try:
+    metadata = parse_metadata(path.read_text())
+  except Exception:  # pylint: disable=broad-exception-caught
+    # Not indexed, so lookups fall back to parsing, which raises the error.
+    logging.exception('Failed to index %s', path)
+    metadata = None
+  return path.stem, stat.st_size, stat.st_mtime_ns, metadata
+
+
+def update_index(
+    index_path: str | os.PathLike[str],
+    pdb_database_path: str | os.PathLike[str],
+    n_workers: int | None = None,
+) -> None:
+  """Builds or incrementally updates the index of an mmCIF directory.
+
+  Only mmCIFs that are new or whose size or modification time changed since
+  the last update are parsed. Metadata of removed mmCIFs is dropped.
+
+  Args:
+    index_path: Path of the index file. Created if it doesn't exist.
+    pdb_database_path: Directory with the mmCIF files, named `<pdb_id>.cif`.
+    n_workers: Number of processes parsing mmCIFs. Defaults to the number of
+      CPUs.
+  """
+  index_path = pathlib.Path(index_path)
+  pdb_database_path = pathlib.Path(pdb_database_path)
+  if not pdb_database_path.is_dir():
+    raise ValueError(
+        f'{pdb_database_path} must be a directory with mmCIF files.'
+    )
+  start_time = time.time()
+
+  old_index = None
+  old_sources = {}
+  if index_path.exists():
+    old_index = TemplateMetadataIndex(index_path)
+    old_sources = old_index.sources()
+
+  sources = {}
+  to_parse = []
+  for path in pdb_database_path.glob('*.cif'):
+    stat = path.stat()
+    sources[path.stem] = (stat.st_size, stat.st_mtime_ns)
+    if old_sources.get(path.stem) != sources[path.stem]:
+      to_parse.append(path)
+  print(
+      f'Indexing {len(to_parse)} new or modified of {len(sources)} mmCIFs in'
+      f' {pdb_database_path}.'
+  )
+
+  # Keep the metadata of unchanged mmCIFs.
+  chains: dict[bytes, ChainMetadata] = {}
+  if old_index is not None:
+    for pdb_id, auth_chain_id, metadata in old_index.items():
+      if old_sources.get(pdb_id) == sources.get(pdb_id):
+        chains[_make_key(pdb_id, auth_chain_id)] = metadata
+
+  num_failed = 0
+  with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as pool:
+    for pdb_id, size, mtime_ns, metadata in pool.map(
+        _index_mmcif, to_parse, chunksize=16
+    ):
+      # Store the identity at parsing time, in case the file changed since.
+      sources[pdb_id] = (size, mtime_ns)
+      if metadata is None:
+        num_failed += 1
+        del sources[pdb_id]  # Retried on the next update.
+        continue
+      for auth_chain_id, chain_metadata in metadata.items():
+        chains[_make_key(pdb_id, auth_chain_id)] = chain_metadata
+
+  keys = sorted(chains)
+  sequences, sequence_offsets = _concatenate(
+      [np.frombuffer(chains[k][1].encode('utf-8'), np.uint8) for k in keys],
+      dtype=np.uint8,
+  )
+  unresolved_res_ids, unresolved_offsets = _concatenate(
+      [np.asarray(chains[k][2]) for k in keys], dtype=np.int64
+  )
+  source_names = sorted(sources)
+  _write_arrays(
+      index_path,
+      {
+          'keys': np.array(keys, dtype=bytes),
+          'release_dates': np.array(
+              [(chains[k][0] or '').encode('ascii') for k in keys],
+              dtype=bytes,
+          ),
+          'sequences': sequences,
+          'sequence_offsets': sequence_offsets,
+          'unresolved_res_ids': unresolved_res_ids,
+          'unresolved_offsets': unresolved_offsets,
+          'source_names': np.array(
+              [name.encode('utf-8') for name in source_names], dtype=bytes
+          ),
+          'source_sizes': np.array(
+              [sources[name][0] for name in source_names], dtype=np.int64
+          ),
+          'source_mtimes_ns': np.array(
+              [sources[name][1] for name in source_names], dtype=np.int64
+          ),
+      },
+  )
+  print(
+      f'Wrote index of {len(keys)} chains of {len(source_names)} mmCIFs to'
+      f' {index_path} in {time.time() - start_time:.2f} seconds,'
+      f' {num_failed} mmCIFs failed to parse.'
+  )
+
+
+def main(argv: Sequence[str]) -> None:
+  if len(argv) not in (3, 4):
+    raise ValueError(
+        'Must specify pdb_database_path, index_path and optionally n_workers'
+    )
+  pdb_database_path, index_path = argv[1:3]
+  n_workers = int(argv[3]) if len(argv) == 4 else None
+  update_index(
+      index_path=index_path,
+      pdb_database_path=pdb_database_path,
+      n_workers=n_workers,
+  )
+
+
+if __name__ == '__main__':
+  main(sys.argv)
@@ -0,0 +1,165 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Batches concurrent template searches into a single Hmmsearch run.
+
+Every template search reads the whole PDB seqres database. When the data
+pipeline processes many chains concurrently, the template searches that are
+requested within a short time window are run as a single Hmmsearch with many
+query profiles, which reads the database only once. The hits of every query are
+identical to those of a search on its own.
+"""
+
+import concurrent.futures
+import dataclasses
+import functools
+import threading
+import time
+
+from absl import logging
+from alphafold3.data import msa_config
+from alphafold3.data import search_scheduler
+from alphafold3.data import templates
+
+
+@dataclasses.dataclass(slots=True)
+class _Batch:
+  """Template searches with the same configuration, run together."""
+
+  a3ms: list[str] = dataclasses.field(default_factory=list)
+  futures: list[concurrent.futures.Future[str]] = dataclasses.field(
+      default_factory=list
+  )
+  closed: threading.Event = dataclasses.field(default_factory=threading.Event)
+
+
+class TemplateSearchBatcher:
+  """Runs template searches requested concurrently as a single Hmmsearch.
+
+  The first search of a batch waits for up to `max_wait_seconds` for other
+  searches with the same configuration to join it, or until the batch is full,
+  then runs the batch on the search scheduler. With `max_batch_size=1`, every
+  search runs on its own, without waiting.
+  """
+
+  def __init__(
+      self,
+      scheduler: search_scheduler.SearchScheduler,
+      max_batch_size: int = 1,
+      max_wait_seconds: float = 0.0,
+  ):
+    """Initializes the batcher.
+
+    Args:
+      scheduler: The scheduler to run Hmmsearch with.
+      max_batch_size: The maximum number of searches run together.
+      max_wait_seconds: How long the first search of a batch waits for others
+        to join it.
+    """
+    if max_batch_size < 1:
+      raise ValueError(f'max_batch_size must be at least 1: {max_batch_size}')
+    self._scheduler = scheduler
+    self._max_batch_size = max_batch_size
+    self._max_wait_seconds = max_wait_seconds
+    self._pending: dict[
+        tuple[str, msa_config.HmmsearchConfig, int | None], _Batch
+    ] = {}
+    self._lock = threading.Lock()
+
+  def search(
+      self,
+      *,
+      a3m: str,
+      database_path: str,
+      hmmsearch_config: msa_config.HmmsearchConfig,
+      max_a3m_query_sequences: int | None = None,
+  ) -> str:
+    """Searches for templates, see `templates.run_hmmsearch_with_a3m`.
+
+    Args:
+      a3m: The MSA the profile of the search is built from.
+      database_path: A path to the sequence database to search for templates.
+      hmmsearch_config: Config with Hmmsearch settings. Its n_cpu is the number
+        of CPUs requested from the scheduler for the whole batch.
+      max_a3m_query_sequences: The maximum number of sequences of the a3m to use
+        to construct the profile. If None, all sequences are used.
+
+    Returns:
+      The a3m string of hits.
+    """
+    key = (database_path, hmmsearch_config, max_a3m_query_sequences)
+    future = concurrent.futures.Future()
+    with self._lock:
+      batch = self._pending.get(key)
+      is_leader = batch is None
+      if is_leader:
+        batch = self._pending[key] = _Batch()
+      batch.a3ms.append(a3m)
+      batch.futures.append(future)
+      if len(batch.a3ms) >= self._max_batch_size:
+        del self._pending[key]
+        batch.closed.set()
+
+    if is_leader:
+      batch.closed.wait(timeout=self._max_wait_seconds)
+      with self._lock:
+        if self._pending.get(key) is batch:
+          del self._pending[key]
+      self._run(batch, *key)
+    return future.result()
+
+  def _run(
+      self,
+      batch: _Batch,
+      database_path: str,
+      hmmsearch_config: msa_config.HmmsearchConfig,
+      max_a3m_query_sequences: int | None,
+  ) -> None:
+    """Runs the searches of a closed batch and sets their results."""
+
+    def search(n_cpu: int) -> list[str]:
+      start_time = time.time()
+      a3ms_out = templates.run_hmmsearch_with_a3ms(
+          database_path=database_path,
+          hmmsearch_config=dataclasses.replace(hmmsearch_config, n_cpu=n_cpu),
+          max_a3m_query_sequences=max_a3m_query_sequences,
+          a3ms=batch.a3ms,
+      )
+      logging.info(
+          'Hmmsearch of %d queries took %.2f seconds',
+          len(batch.a3ms),
+          time.time() - start_time,
+      )
+      return a3ms_out
+
+    try:
+      a3ms_out = self._scheduler.submit(
+          search, n_cpu=hmmsearch_config.n_cpu
+      ).result()
+    except BaseException as e:
+      for future in batch.futures:
+        future.set_exception(e)
+      raise
+    for future, a3m_out in zip(batch.futures, a3ms_out, strict=True):
+      future.set_result(a3m_out)
+
+
+@functools.cache
+def get_batcher(
+    scheduler: search_scheduler.SearchScheduler,
+    max_batch_size: int,
+    max_wait_seconds: float,
+) -> TemplateSearchBatcher:
+  """Returns a batcher shared by all data pipelines with the same settings."""
+  return TemplateSearchBatcher(
+      scheduler,
+      max_batch_size=max_batch_size,
+      max_wait_seconds=max_wait_seconds,
+  )
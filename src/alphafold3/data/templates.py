@@ -27,6 +27,7 @@ from alphafold3.constants import residue_names
 from alphafold3.data import msa_config
 from alphafold3.data import parsers
 from alphafold3.data import structure_stores
+from alphafold3.data import template_metadata_index
 from alphafold3.data import template_realign
 from alphafold3.data.tools import hmmsearch
 from alphafold3.structure import mmcif
@@ -440,6 +441,9 @@ class Templates:
       filter_config: msa_config.TemplateFilterConfig | None = None,
       query_release_date: datetime.date | None = None,
       chain_poly_type: str = mmcif_names.PROTEIN_CHAIN,
+      metadata_index: (
+          template_metadata_index.TemplateMetadataIndex | None
+      ) = None,
   ) -> Self:
     """Creates templates from a run of hmmsearch tool against a custom a3m.
 
@@ -461,6 +465,8 @@ class Templates:
         to filter templates for training, ensuring that they do not leak
         structure information from the future.
       chain_poly_type: The polymer type of the templates.
+      metadata_index: Optional index of the template metadata of the structure
+        store, to avoid parsing the mmCIF of every hit.
 
     Returns:
       Templates object containing a list of Hits initialised from the
@@ -480,6 +486,7 @@ class Templates:
         chain_poly_type=chain_poly_type,
         structure_store=structure_store,
         filter_config=filter_config,
+        metadata_index=metadata_index,
     )
 
   @classmethod
@@ -493,6 +500,9 @@ class Templates:
       filter_config: msa_config.TemplateFilterConfig | None = None,
       query_release_date: datetime.date | None = None,
       chain_poly_type: str = mmcif_names.PROTEIN_CHAIN,
+      metadata_index: (
+          template_metadata_index.TemplateMetadataIndex | None
+      ) = None,
   ) -> Self:
     """Creates Templates from a Hmmsearch A3M.
 
@@ -510,6 +520,8 @@ class Templates:
         to filter templates for training, ensuring that they do not leak
         structure information from the future.
       chain_poly_type: The polymer type of the templates.
+      metadata_index: Optional index of the template metadata of the structure
+        store, to avoid parsing the mmCIF of every hit.
 
     Returns:
       Templates object containing a list of Hits initialised from the
@@ -526,7 +538,7 @@ class Templates:
         )
 
         release_date, sequence, unresolved_res_ids = _parse_hit_metadata(
-            structure_store, pdb_id, auth_chain_id
+            structure_store, pdb_id, auth_chain_id, metadata_index
         )
         if unresolved_res_ids is None:
           continue
@@ -752,6 +764,14 @@ class Templates:
       )
 
 
+def get_hit_pdb_ids(a3m: str) -> list[str]:
+  """Returns the PDB IDs of the hits of an Hmmsearch A3M, in order."""
+  return [
+      _parse_hit_description(hit_desc)[0]
+      for _, hit_desc in parsers.lazy_parse_fasta_string(a3m)
+  ]
+
+
 def _parse_hit_description(description: str) -> tuple[str, str, int, int, int]:
   """Parses the hmmsearch A3M sequence description line."""
   # Example lines (protein, nucleic, no description):
@@ -774,48 +794,29 @@ def _parse_hit_metadata(
     structure_store: structure_stores.StructureStore,
     pdb_id: str,
     auth_chain_id: str,
+    metadata_index: template_metadata_index.TemplateMetadataIndex | None = None,
 ) -> tuple[Any, str | None, Sequence[int] | None]:
-  """Parse hit metadata by parsing mmCIF from structure store."""
+  """Gets hit metadata from the index, or by parsing mmCIF from the store."""
+  if metadata_index is not None:
+    if (metadata := metadata_index.get(pdb_id, auth_chain_id)) is not None:
+      return metadata
+    logging.info(
+        'Template metadata index miss for %s (author chain %s).',
+        pdb_id,
+        auth_chain_id,
+    )
+
   try:
-    cif = mmcif.from_string(structure_store.get_mmcif_str(pdb_id))
+    mmcif_string = structure_store.get_mmcif_str(pdb_id)
   except structure_stores.NotFoundError:
     logging.warning(
         'Failed to get mmCIF for %s (author chain %s).', pdb_id, auth_chain_id
     )
     return None, None, None
-  release_date = mmcif.get_release_date(cif)
-
-  try:
-    struc = structure.from_parsed_mmcif(
-        cif,
-        model_id=structure.ModelID.ALL,
-        include_water=True,
-        include_other=True,
-        include_bonds=False,
-    )
-  except ValueError:
-    struc = structure.from_parsed_mmcif(
-        cif,
-        model_id=structure.ModelID.FIRST,
-        include_water=True,
-        include_other=True,
-        include_bonds=False,
-    )
-
-  sequence = struc.polymer_author_chain_single_letter_sequence(
-      include_missing_residues=True,
-      protein=True,
-      dna=True,
-      rna=True,
-      other=True,
+  return template_metadata_index.parse_metadata(
+      mmcif_string, auth_chain_ids=(auth_chain_id,)
   )[auth_chain_id]
 
-  unresolved_res_ids = struc.filter(
-      chain_auth_asym_id=auth_chain_id
-  ).unresolved_residues.id
-
-  return release_date, sequence, unresolved_res_ids
-
 
 def get_polymer_features(
     *,
@@ -946,15 +947,11 @@ def _resolve_path(path: os.PathLike[str] | str) -> str:
     return str(path)
 
 
-def run_hmmsearch_with_a3m(
-    *,
+def _make_hmmsearch(
     database_path: os.PathLike[str] | str,
     hmmsearch_config: msa_config.HmmsearchConfig,
-    max_a3m_query_sequences: int | None,
-    a3m: str | None,
-) -> str:
-  """Runs Hmmsearch to get a3m string of hits."""
-  searcher = hmmsearch.Hmmsearch(
+) -> hmmsearch.Hmmsearch:
+  return hmmsearch.Hmmsearch(
       binary_path=hmmsearch_config.hmmsearch_binary_path,
       hmmbuild_binary_path=hmmsearch_config.hmmbuild_binary_path,
       database_path=_resolve_path(database_path),
@@ -967,7 +964,47 @@ def run_hmmsearch_with_a3m(
       filter_f2=hmmsearch_config.filter_f2,
       filter_f3=hmmsearch_config.filter_f3,
       filter_max=hmmsearch_config.filter_max,
+      n_cpu=hmmsearch_config.n_cpu,
   )
+
+
+def run_hmmsearch_with_a3m(
+    *,
+    database_path: os.PathLike[str] | str,
+    hmmsearch_config: msa_config.HmmsearchConfig,
+    max_a3m_query_sequences: int | None,
+    a3m: str | None,
+) -> str:
+  """Runs Hmmsearch to get a3m string of hits."""
+  searcher = _make_hmmsearch(database_path, hmmsearch_config)
   # STO enables us to annotate query non-gap columns as reference columns.
   sto = parsers.convert_a3m_to_stockholm(a3m, max_a3m_query_sequences)
   return searcher.query_with_sto(sto, model_construction='hand')
+
+
+def run_hmmsearch_with_a3ms(
+    *,
+    database_path: os.PathLike[str] | str,
+    hmmsearch_config: msa_config.HmmsearchConfig,
+    max_a3m_query_sequences: int | None,
+    a3ms: Sequence[str],
+) -> list[str]:
+  """Runs Hmmsearch for many a3ms in a single pass over the database.
+
+  Args:
+    database_path: A path to the sequence database to search for templates.
+    hmmsearch_config: Config with Hmmsearch settings.
+    max_a3m_query_sequences: The maximum number of sequences of each a3m to use
+      to construct its profile.
+    a3ms: The a3ms to construct the profiles the database is searched with.
+
+  Returns:
+    The a3m string of hits of every a3m, identical to those returned by
+    `run_hmmsearch_with_a3m` for that a3m.
+  """
+  searcher = _make_hmmsearch(database_path, hmmsearch_config)
+  stos = [
+      parsers.convert_a3m_to_stockholm(a3m, max_a3m_query_sequences)
+      for a3m in a3ms
+  ]
+  return searcher.query_with_stos(stos, model_construction='hand')
@@ -28,6 +28,7 @@ class Hmmbuild(object):
       binary_path: str,
       singlemx: bool = False,
       alphabet: str | None = None,
+      n_cpu: int | None = None,
   ):
     """Initializes the Python hmmbuild wrapper.
 
@@ -37,6 +38,8 @@ class Hmmbuild(object):
         just use a common substitution score matrix.
       alphabet: The alphabet to assert when building a profile. Useful when
         hmmbuild cannot guess the alphabet. If None, no alphabet is asserted.
+      n_cpu: The number of CPUs to use. If None, hmmbuild uses all CPUs of the
+        host.
 
     Raises:
       RuntimeError: If hmmbuild binary not found within the path.
@@ -44,6 +47,7 @@ class Hmmbuild(object):
     self.binary_path = binary_path
     self.singlemx = singlemx
     self.alphabet = alphabet
+    self.n_cpu = n_cpu
 
     subprocess_utils.check_binary_exists(path=self.binary_path, name='hmmbuild')
 
@@ -125,6 +129,8 @@ class Hmmbuild(object):
         cmd_flags.append('--singlemx')
       if self.alphabet:
         cmd_flags.append(f'--{self.alphabet}')
+      if self.n_cpu is not None:
+        cmd_flags.extend(('--cpu', str(self.n_cpu)))
 
       cmd_flags.extend([output_hmm_path, input_msa_path])
 
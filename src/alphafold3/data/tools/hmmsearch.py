@@ -10,7 +10,9 @@
 
 """A Python wrapper for hmmsearch - search profile against a sequence db."""
 
+from collections.abc import Sequence
 import os
+import re
 import tempfile
 
 from absl import logging
@@ -18,6 +20,43 @@ from alphafold3.data import parsers
 from alphafold3.data.tools import hmmbuild
 from alphafold3.data.tools import subprocess_utils
 
+_HMM_NAME_RE = re.compile(r'^NAME .*$', re.MULTILINE)
+
+
+def _split_stockholm_file(path: str, output_dir: str) -> dict[str, str]:
+  """Splits a file of many Stockholm MSAs into one file per MSA.
+
+  Args:
+    path: The path of the file with the Stockholm MSAs.
+    output_dir: The directory the MSAs are written to.
+
+  Returns:
+    The paths of the MSA files, keyed by the name (#=GF ID) of the MSA.
+  """
+  paths = {}
+  if not os.path.exists(path):
+    return paths
+  msa_idx = 0
+  msa_path = os.path.join(output_dir, f'msa_{msa_idx}.sto')
+  out = None
+  try:
+    with open(path) as f:
+      for line in f:
+        if out is None:
+          out = open(msa_path, 'w')
+        out.write(line)
+        if line.startswith('#=GF ID '):
+          paths[line.split(maxsplit=2)[2].strip()] = msa_path
+        elif line.rstrip() == '//':
+          out.close()
+          out = None
+          msa_idx += 1
+          msa_path = os.path.join(output_dir, f'msa_{msa_idx}.sto')
+  finally:
+    if out is not None:
+      out.close()
+  return paths
+
 
 class Hmmsearch(object):
   """Python wrapper of the hmmsearch binary."""
@@ -37,6 +76,7 @@ class Hmmsearch(object):
       dom_e: float | None = None,
       incdom_e: float | None = None,
       filter_max: bool = False,
+      n_cpu: int = 8,
   ):
     """Initializes the Python hmmsearch wrapper.
 
@@ -55,14 +95,16 @@ class Hmmsearch(object):
       incdom_e: Domain e-value criteria for inclusion of domains in MSA/next
         round.
       filter_max: Remove all filters, will ignore all filter_f* settings.
+      n_cpu: The number of CPUs to use, also when building the hmm.
 
     Raises:
       RuntimeError: If hmmsearch binary not found within the path.
     """
     self.binary_path = binary_path
     self.hmmbuild_runner = hmmbuild.Hmmbuild(
-        alphabet=alphabet, binary_path=hmmbuild_binary_path
+        alphabet=alphabet, binary_path=hmmbuild_binary_path, n_cpu=n_cpu
     )
+    self.n_cpu = n_cpu
     self.database_path = database_path
     flags = []
     if filter_max:
@@ -94,6 +136,29 @@ class Hmmsearch(object):
       logging.error('Could not find hmmsearch database %s', database_path)
       raise ValueError(f'Could not find hmmsearch database {database_path}')
 
+  def _run(self, hmm_input_path: str, sto_out_path: str) -> None:
+    cmd = [
+        self.binary_path,
+        '--noali',  # Don't include the alignment in stdout.
+        *('--cpu', str(self.n_cpu)),
+    ]
+    # If adding flags, we have to do so before the output and input:
+    if self.flags:
+      cmd.extend(self.flags)
+    cmd.extend([
+        *('-A', sto_out_path),
+        hmm_input_path,
+        self.database_path,
+    ])
+
+    subprocess_utils.run(
+        cmd=cmd,
+        cmd_name=f'Hmmsearch ({os.path.basename(self.database_path)})',
+        log_stdout=False,
+        log_stderr=True,
+        log_on_process_error=True,
+    )
+
   def query_with_hmm(self, hmm: str) -> str:
     """Queries the database using hmmsearch using a given hmm."""
     with tempfile.TemporaryDirectory() as query_tmp_dir:
@@ -102,35 +167,55 @@ class Hmmsearch(object):
       with open(hmm_input_path, 'w') as f:
         f.write(hmm)
 
-      cmd = [
-          self.binary_path,
-          '--noali',  # Don't include the alignment in stdout.
-          *('--cpu', '8'),
-      ]
-      # If adding flags, we have to do so before the output and input:
-      if self.flags:
-        cmd.extend(self.flags)
-      cmd.extend([
-          *('-A', sto_out_path),
-          hmm_input_path,
-          self.database_path,
-      ])
-
-      subprocess_utils.run(
-          cmd=cmd,
-          cmd_name=f'Hmmsearch ({os.path.basename(self.database_path)})',
-          log_stdout=False,
-          log_stderr=True,
-          log_on_process_error=True,
-      )
+      self._run(hmm_input_path, sto_out_path)
 
-      with open(sto_out_path) as f:
-        a3m_out = parsers.convert_stockholm_to_a3m(
-            f, remove_first_row_gaps=False, linewidth=60
-        )
+      a3m_out = parsers.convert_stockholm_file_to_a3m(
+          sto_out_path, remove_first_row_gaps=False, linewidth=60
+      )
 
     return a3m_out
 
+  def query_with_hmms(self, hmms: Sequence[str]) -> list[str]:
+    """Queries the database with many hmms in a single pass over it.
+
+    Hmmsearch searches the database for every hmm independently, so the hits of
+    every hmm are identical to those of `query_with_hmm`, but the database is
+    read only once.
+
+    Args:
+      hmms: The hmms to query the database with.
+
+    Returns:
+      The hits of every hmm, in the same format as `query_with_hmm`.
+    """
+    # Hmmsearch writes the alignment of the hits of each hmm, if it has any, as
+    # a separate Stockholm MSA named after the hmm.
+    query_names = [f'query_{i}' for i in range(len(hmms))]
+    with tempfile.TemporaryDirectory() as query_tmp_dir:
+      hmm_input_path = os.path.join(query_tmp_dir, 'query.hmm')
+      sto_out_path = os.path.join(query_tmp_dir, 'output.sto')
+      with open(hmm_input_path, 'w') as f:
+        for query_name, hmm in zip(query_names, hmms, strict=True):
+          f.write(_HMM_NAME_RE.sub(f'NAME  {query_name}', hmm, count=1))
+
+      self._run(hmm_input_path, sto_out_path)
+
+      sto_paths = _split_stockholm_file(sto_out_path, query_tmp_dir)
+      a3ms_out = []
+      for query_name in query_names:
+        if query_name in sto_paths:
+          a3ms_out.append(
+              parsers.convert_stockholm_file_to_a3m(
+                  sto_paths[query_name],
+                  remove_first_row_gaps=False,
+                  linewidth=60,
+              )
+          )
+        else:
+          a3ms_out.append('')  # No hits.
+
+    return a3ms_out
+
   def query_with_a3m(self, a3m_in: str) -> str:
     """Query the database using hmmsearch using a given a3m."""
 
@@ -147,3 +232,15 @@ class Hmmsearch(object):
         msa_sto, model_construction=model_construction
     )
     return self.query_with_hmm(hmm)
+
+  def query_with_stos(
+      self, msa_stos: Sequence[str], model_construction: str = 'fast'
+  ) -> list[str]:
+    """Queries the database with many stockholm msas in a single pass."""
+    hmms = [
+        self.hmmbuild_runner.build_profile_from_sto(
+            msa_sto, model_construction=model_construction
+        )
+        for msa_sto in msa_stos
+    ]
+    return self.query_with_hmms(hmms)
@@ -73,6 +73,61 @@ class Jackhmmer(msa_tool.MsaTool):
     self.filter_f2 = filter_f2
     self.filter_f3 = filter_f3
 
+  def search(
+      self,
+      input_fasta_path: str,
+      output_sto_path: str,
+      tblout_path: str | None = None,
+  ) -> None:
+    """Runs Jackhmmer, writing the alignment of the hits to output_sto_path.
+
+    Args:
+      input_fasta_path: The path of the FASTA file with the query sequence.
+      output_sto_path: The path the Stockholm alignment of the query and its
+        hits is written to.
+      tblout_path: Optional path the per-sequence hit table is written to.
+    """
+    # The F1/F2/F3 are the expected proportion to pass each of the filtering
+    # stages (which get progressively more expensive), reducing these
+    # speeds up the pipeline at the expensive of sensitivity.  They are
+    # currently set very low to make querying Mgnify run in a reasonable
+    # amount of time.
+    cmd_flags = [
+        *('-o', '/dev/null'),  # Don't pollute stdout with Jackhmmer output.
+        *('-A', output_sto_path),
+        '--noali',
+        *('--F1', str(self.filter_f1)),
+        *('--F2', str(self.filter_f2)),
+        *('--F3', str(self.filter_f3)),
+        *('--cpu', str(self.n_cpu)),
+        *('-N', str(self.n_iter)),
+    ]
+
+    # Report only sequences with E-values <= x in per-sequence output.
+    if self.e_value is not None:
+      cmd_flags.extend(['-E', str(self.e_value)])
+
+      # Use the same value as the reporting e-value (`-E` flag).
+      cmd_flags.extend(['--incE', str(self.e_value)])
+
+    if self.z_value is not None:
+      cmd_flags.extend(['-Z', str(self.z_value)])
+
+    if tblout_path is not None:
+      cmd_flags.extend(['--tblout', tblout_path])
+
+    cmd = (
+        [self.binary_path] + cmd_flags + [input_fasta_path, self.database_path]
+    )
+
+    subprocess_utils.run(
+        cmd=cmd,
+        cmd_name=f'Jackhmmer ({os.path.basename(self.database_path)})',
+        log_stdout=False,
+        log_stderr=True,
+        log_on_process_error=True,
+    )
+
   def query(self, target_sequence: str) -> msa_tool.MsaToolResult:
     """Queries the database using Jackhmmer."""
     logging.info('Query sequence: %s', target_sequence)
@@ -83,52 +138,12 @@ class Jackhmmer(msa_tool.MsaTool):
       )
 
       output_sto_path = os.path.join(query_tmp_dir, 'output.sto')
+      self.search(input_fasta_path, output_sto_path)
 
-      # The F1/F2/F3 are the expected proportion to pass each of the filtering
-      # stages (which get progressively more expensive), reducing these
-      # speeds up the pipeline at the expensive of sensitivity.  They are
-      # currently set very low to make querying Mgnify run in a reasonable
-      # amount of time.
-      cmd_flags = [
-          *('-o', '/dev/null'),  # Don't pollute stdout with Jackhmmer output.
-          *('-A', output_sto_path),
-          '--noali',
-          *('--F1', str(self.filter_f1)),
-          *('--F2', str(self.filter_f2)),
-          *('--F3', str(self.filter_f3)),
-          *('--cpu', str(self.n_cpu)),
-          *('-N', str(self.n_iter)),
-      ]
-
-      # Report only sequences with E-values <= x in per-sequence output.
-      if self.e_value is not None:
-        cmd_flags.extend(['-E', str(self.e_value)])
-
-        # Use the same value as the reporting e-value (`-E` flag).
-        cmd_flags.extend(['--incE', str(self.e_value)])
-
-      if self.z_value is not None:
-        cmd_flags.extend(['-Z', str(self.z_value)])
-
-      cmd = (
-          [self.binary_path]
-          + cmd_flags
-          + [input_fasta_path, self.database_path]
+      a3m = parsers.convert_stockholm_file_to_a3m(
+          output_sto_path, max_sequences=self.max_sequences
       )
 
-      subprocess_utils.run(
-          cmd=cmd,
-          cmd_name=f'Jackhmmer ({os.path.basename(self.database_path)})',
-          log_stdout=False,
-          log_stderr=True,
-          log_on_process_error=True,
-      )
-
-      with open(output_sto_path) as f:
-        a3m = parsers.convert_stockholm_to_a3m(
-            f, max_sequences=self.max_sequences
-        )
-
     return msa_tool.MsaToolResult(
         target_sequence=target_sequence, a3m=a3m, e_value=self.e_value
     )
@@ -133,18 +133,21 @@ class Nhmmer(msa_tool.MsaTool):
       )
 
       if os.path.getsize(output_sto_path) > 0:
-        with open(output_sto_path) as f:
-          a3m_out = parsers.convert_stockholm_to_a3m(
-              f, max_sequences=self._max_sequences - 1  # Query not included.
-          )
+        a3m_out = parsers.convert_stockholm_file_to_a3m(
+            output_sto_path,
+            max_sequences=self._max_sequences - 1,  # Query not included.
+        )
         # Nhmmer hits are generally shorter than the query sequence. To get MSA
         # of width equal to the query sequence, align hits to the query profile.
         logging.info('Aligning output a3m of size %d bytes', len(a3m_out))
 
+        # Hmmalign is single-threaded, hence within the CPUs of this search.
         aligner = hmmalign.Hmmalign(self._hmmalign_binary_path)
         target_sequence_fasta = f'>query\n{target_sequence}\n'
         profile_builder = hmmbuild.Hmmbuild(
-            binary_path=self._hmmbuild_binary_path, alphabet=self._alphabet
+            binary_path=self._hmmbuild_binary_path,
+            alphabet=self._alphabet,
+            n_cpu=self._n_cpu,
         )
         profile = profile_builder.build_profile_from_a3m(target_sequence_fasta)
         a3m_out = aligner.align_sequences_to_profile(
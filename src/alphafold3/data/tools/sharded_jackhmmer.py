@@ -0,0 +1,187 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Runs Jackhmmer on the shards of a database concurrently."""
+
+import concurrent.futures
+import functools
+import math
+import os
+import tempfile
+
+from absl import logging
+from alphafold3.data import database_shards
+from alphafold3.data import parsers
+from alphafold3.data.tools import jackhmmer
+from alphafold3.data.tools import msa_tool
+from alphafold3.data.tools import subprocess_utils
+
+
+def _parse_tblout_scores(tblout_path: str) -> dict[str, tuple[float, float]]:
+  """Returns the (score, E-value) of every target in a Jackhmmer tblout."""
+  scores = {}
+  with open(tblout_path, 'rt') as f:
+    for line in f:
+      if line.startswith('#'):
+        continue
+      columns = line.split(maxsplit=6)
+      # target name, accession, query name, accession, E-value, score, ...
+      scores[columns[0]] = (float(columns[5]), float(columns[4]))
+  return scores
+
+
+def _a3m_records(a3m: str) -> list[tuple[str, str]]:
+  """Splits a single-line-per-sequence A3M into (header, sequence) lines."""
+  lines = a3m.splitlines()
+  return list(zip(lines[0::2], lines[1::2], strict=True))
+
+
+class ShardedJackhmmer(msa_tool.MsaTool):
+  """Searches the shards of a database, see `database_shards`, concurrently.
+
+  Every shard is searched with the Z-value of the whole database, so the
+  E-values and hence the hits are those of a search of the whole database. The
+  hits of all shards are merged in the order of their scores, which is the
+  order of the hits of a search of the whole database, up to hits with equal
+  reported scores.
+
+  Domain E-values are computed by Jackhmmer from the number of significant
+  sequences, which is counted per shard. In rare cases a shard search may thus
+  include an additional, borderline domain of a multi-domain hit.
+  """
+
+  def __init__(
+      self,
+      *,
+      binary_path: str,
+      database_path: str,
+      n_cpu: int = 8,
+      n_iter: int = 1,
+      e_value: float | None = 1e-3,
+      z_value: float | int | None = None,
+      max_sequences: int = 5000,
+      filter_f1: float = 5e-4,
+      filter_f2: float = 5e-5,
+      filter_f3: float = 5e-7,
+  ):
+    """Initializes the sharded Jackhmmer wrapper.
+
+    Args:
+      binary_path: The path to the jackhmmer executable.
+      database_path: The path to the sharded jackhmmer database (FASTA format).
+      n_cpu: The total number of CPUs to give the Jackhmmer processes of all
+        shards.
+      n_iter: The number of Jackhmmer iterations, only 1 is supported as the
+        profile of later iterations is built from the hits of all shards.
+      e_value: The E-value, see Jackhmmer docs for more details.
+      z_value: The Z-value representing the number of comparisons done (i.e
+        correct database size) for E-value calculation. If None, the number of
+        sequences of the whole database.
+      max_sequences: Maximum number of sequences to return in the MSA.
+      filter_f1: MSV and biased composition pre-filter, set to >1.0 to turn off.
+      filter_f2: Viterbi pre-filter, set to >1.0 to turn off.
+      filter_f3: Forward pre-filter, set to >1.0 to turn off.
+
+    Raises:
+      RuntimeError: If Jackhmmer binary not found within the path.
+      ValueError: If n_iter isn't 1 or the shards are stale.
+    """
+    if n_iter != 1:
+      raise ValueError(f'Sharded Jackhmmer supports only n_iter=1: {n_iter}')
+    subprocess_utils.check_binary_exists(path=binary_path, name='Jackhmmer')
+
+    self.database_path = database_path
+    self.max_sequences = max_sequences
+    manifest = database_shards.load_manifest(database_path)
+    self.n_cpu = n_cpu
+    self.num_parallel = min(len(manifest.shards), n_cpu)
+    self.shard_runners = [
+        jackhmmer.Jackhmmer(
+            binary_path=binary_path,
+            database_path=shard.path,
+            n_cpu=max(1, n_cpu // self.num_parallel),
+            n_iter=n_iter,
+            e_value=e_value,
+            z_value=manifest.num_sequences if z_value is None else z_value,
+            max_sequences=max_sequences,
+            filter_f1=filter_f1,
+            filter_f2=filter_f2,
+            filter_f3=filter_f3,
+        )
+        for shard in manifest.shards
+    ]
+    self.e_value = e_value
+
+  def _search_shard(
+      self, shard_idx: int, input_fasta_path: str, tmp_dir: str
+  ) -> tuple[list[tuple[str, str]], dict[str, tuple[float, float]]]:
+    """Returns the A3M records and the target scores of a shard."""
+    output_sto_path = os.path.join(tmp_dir, f'output-{shard_idx}.sto')
+    tblout_path = os.path.join(tmp_dir, f'output-{shard_idx}.tbl')
+    self.shard_runners[shard_idx].search(
+        input_fasta_path, output_sto_path, tblout_path=tblout_path
+    )
+    if not os.path.exists(output_sto_path):
+      return [], {}
+    a3m = parsers.convert_stockholm_file_to_a3m(
+        output_sto_path, max_sequences=self.max_sequences
+    )
+    return _a3m_records(a3m), _parse_tblout_scores(tblout_path)
+
+  def query(self, target_sequence: str) -> msa_tool.MsaToolResult:
+    """Queries all shards of the database using Jackhmmer."""
+    logging.info(
+        'Query sequence: %s, searching %d shards of %s',
+        target_sequence,
+        len(self.shard_runners),
+        self.database_path,
+    )
+    with tempfile.TemporaryDirectory() as query_tmp_dir:
+      input_fasta_path = os.path.join(query_tmp_dir, 'query.fasta')
+      subprocess_utils.create_query_fasta_file(
+          sequence=target_sequence, path=input_fasta_path
+      )
+      search_shard = functools.partial(
+          self._search_shard,
+          input_fasta_path=input_fasta_path,
+          tmp_dir=query_tmp_dir,
+      )
+      with concurrent.futures.ThreadPoolExecutor(self.num_parallel) as pool:
+        shard_results = list(
+            pool.map(search_shard, range(len(self.shard_runners)))
+        )
+
+    # The first record of every shard is the query. The domains of a target
+    # share its score, so they stay together and in their order in the shard.
+    query_record = None
+    hits = []
+    for shard_idx, (records, scores) in enumerate(shard_results):
+      if not records:
+        continue
+      query_record = query_record or records[0]
+      for position, (header, sequence) in enumerate(records[1:]):
+        # Hits are named <target name>/<start>-<end>.
+        name = header[1:].split(' ', maxsplit=1)[0]
+        target_name = name.rsplit('/', maxsplit=1)[0]
+        score, e_value = scores.get(target_name, (-math.inf, math.inf))
+        hits.append(((-score, e_value, shard_idx, position), header, sequence))
+    hits.sort(key=lambda hit: hit[0])
+
+    if query_record is None:
+      a3m = ''
+    else:
+      records = [query_record] + [(header, seq) for _, header, seq in hits]
+      if self.max_sequences:
+        records = records[: self.max_sequences]
+      a3m = ''.join(f'{header}\n{seq}\n' for header, seq in records)
+
+    return msa_tool.MsaToolResult(
+        target_sequence=target_sequence, a3m=a3m, e_value=self.e_value
+    )
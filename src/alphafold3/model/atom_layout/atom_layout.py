@@ -863,6 +863,64 @@ def make_flat_atom_layout(
   )
 
 
+def _factorize(values: np.ndarray) -> tuple[np.ndarray, int]:
+  """Returns integer codes of the values, and an upper bound of the codes.
+
+  Equal values get equal codes, different values get different codes.
+
+  Args:
+    values: The values, flattened.
+  """
+  if values.dtype == object:
+    values = values.tolist()
+    codes_by_value = {value: i for i, value in enumerate(dict.fromkeys(values))}
+    codes = np.fromiter(
+        map(codes_by_value.__getitem__, values), dtype=int, count=len(values)
+    )
+    return codes, len(codes_by_value)
+  if not values.size:
+    return np.zeros(0, dtype=int), 1
+  if values.dtype.kind not in 'biu':
+    # E.g. fixed-size strings.
+    uniques, codes = np.unique(values, return_inverse=True)
+    return codes.ravel(), len(uniques)
+  values = values.astype(int)
+  min_value, max_value = int(values.min()), int(values.max())
+  if max_value - min_value >= 2**31:
+    uniques, codes = np.unique(values, return_inverse=True)
+    return codes.ravel(), len(uniques)
+  return values - min_value, max_value - min_value + 1
+
+
+def _uid_keys(*layouts: AtomLayout) -> list[np.ndarray]:
+  """Integer keys of the (chain_id, res_id, atom_name) uids of the layouts.
+
+  Atoms of any of the layouts get equal keys if and only if they have equal
+  uids.
+
+  Args:
+    *layouts: The atom layouts.
+
+  Returns:
+    The keys of each layout, flattened.
+  """
+  sizes = [layout.atom_name.size for layout in layouts]
+  keys = np.zeros(sum(sizes), dtype=np.int64)
+  num_keys = 1
+  for field in ('chain_id', 'res_id', 'atom_name'):
+    codes, num_codes = _factorize(
+        np.concatenate([getattr(layout, field).ravel() for layout in layouts])
+    )
+    if num_keys * num_codes >= 2**62:
+      # Renumber the keys densely so that the combined keys don't overflow.
+      uniques, keys = np.unique(keys, return_inverse=True)
+      keys = keys.ravel()
+      num_keys = len(uniques)
+    keys = keys * num_codes + codes
+    num_keys *= num_codes
+  return np.split(keys, np.cumsum(sizes[:-1]))
+
+
 def compute_gather_idxs(
     *,
     source_layout: AtomLayout,
@@ -870,35 +928,25 @@ def compute_gather_idxs(
     fill_value: int = 0,
 ) -> GatherInfo:
   """Produce gather indices and mask to convert from source layout to target."""
-  source_uid_to_idx = {
-      uid: idx
-      for idx, uid in enumerate(
-          zip(
-              source_layout.chain_id.ravel(),
-              source_layout.res_id.ravel(),
-              source_layout.atom_name.ravel(),
-              strict=True,
-          )
-      )
-  }
-  gather_idxs = []
-  gather_mask = []
-  for uid in zip(
-      target_layout.chain_id.ravel(),
-      target_layout.res_id.ravel(),
-      target_layout.atom_name.ravel(),
-      strict=True,
-  ):
-    if uid in source_uid_to_idx:
-      gather_idxs.append(source_uid_to_idx[uid])
-      gather_mask.append(True)
-    else:
-      gather_idxs.append(fill_value)
-      gather_mask.append(False)
+  source_keys, target_keys = _uid_keys(source_layout, target_layout)
+  # Join on the uid keys. If a uid is in the source layout more than once, its
+  # last atom is gathered.
+  source_order = np.argsort(source_keys, kind='stable')
+  sorted_source_keys = source_keys[source_order]
+  positions = (
+      np.searchsorted(sorted_source_keys, target_keys, side='right') - 1
+  )
+  gather_mask = positions >= 0
+  if sorted_source_keys.size:
+    positions = np.maximum(positions, 0)
+    gather_mask &= sorted_source_keys[positions] == target_keys
+    gather_idxs = np.where(gather_mask, source_order[positions], fill_value)
+  else:
+    gather_idxs = np.full(target_keys.shape, fill_value)
   target_shape = target_layout.atom_name.shape
   return GatherInfo(
-      gather_idxs=np.array(gather_idxs, dtype=int).reshape(target_shape),
-      gather_mask=np.array(gather_mask, dtype=bool).reshape(target_shape),
+      gather_idxs=gather_idxs.astype(int).reshape(target_shape),
+      gather_mask=gather_mask.reshape(target_shape),
       input_shape=np.array(source_layout.atom_name.shape),
   )
 
@@ -12,6 +12,8 @@
 
 import dataclasses
 import enum
+import io
+import itertools
 import json
 from typing import Any, Self
 
@@ -21,6 +23,115 @@ import jax
 import numpy as np
 
 
+# The upper bound and the number of decimals the full confidences are rounded
+# to in the output.
+_ATOM_PLDDT_ROUNDING = (99.99, 2)
+_CONTACT_PROBS_ROUNDING = (1.0, 2)
+_PAE_ROUNDING = (99.9, 1)
+# Number of values formatted at a time when encoding them as JSON.
+_ENCODE_CHUNK_SIZE = 1 << 18
+
+
+def _round(values: Any, rounding: tuple[float, int]) -> np.ndarray:
+  """Clips values to [0, max_value] and rounds them to the given decimals."""
+  max_value, decimals = rounding
+  # Cast to np.float64 before rounding, since casting to Python float will
+  # cast to a 64 bit float, potentially undoing np.float32 rounding.
+  return np.round(
+      np.clip(np.asarray(values, dtype=np.float64), 0.0, max_value), decimals
+  )
+
+
+def _quantise(rounded: np.ndarray, decimals: int) -> np.ndarray:
+  """Returns rounded values as integer multiples of 10**-decimals, NaN as -1."""
+  nan = np.isnan(rounded)
+  codes = np.rint(np.where(nan, 0.0, rounded) * 10.0**decimals)
+  codes = codes.astype(np.int64)
+  codes[nan] = -1
+  return codes
+
+
+def _quantise_as(
+    values: Any, rounding: tuple[float, int], dtype: type[np.integer]
+) -> np.ndarray:
+  """Returns quantised rounded values as `dtype`, NaN as its maximum."""
+  codes = _quantise(_round(values, rounding), decimals=rounding[1])
+  codes[codes < 0] = np.iinfo(dtype).max
+  return codes.astype(dtype)
+
+
+def _dequantise(codes: np.ndarray, decimals: int) -> np.ndarray:
+  """Inverse of `_quantise_as`."""
+  values = codes / 10.0**decimals
+  values[codes == np.iinfo(codes.dtype).max] = np.nan
+  return values
+
+
+def _encode_rounded(rounded: np.ndarray, decimals: int) -> str:
+  """Encodes a 1D or 2D array of rounded values as a JSON (nested) list.
+
+  The output is the same as that of `json.JSONEncoder` with compact separators
+  on the values as Python floats, with NaN encoded as null. The values are
+  rounded, so there are only a few distinct ones. Each of them is formatted
+  once, and the output is assembled from the formatted values with NumPy.
+
+  Args:
+    rounded: Non-negative values rounded to `decimals` decimals.
+    decimals: The number of decimals the values are rounded to.
+
+  Returns:
+    The JSON list of the values.
+
+  Raises:
+    ValueError: If the values are not rounded to `decimals` decimals.
+  """
+  if not rounded.size:
+    return json.dumps(rounded.tolist(), separators=(',', ':'))
+  if rounded.ndim == 1:
+    prefix, suffixes = '[', (',', ']', ']')
+    rounded = rounded[None]
+  else:
+    # The suffixes of a value in a row, at the end of a row, and of the last.
+    prefix, suffixes = '[[', (',', '],[', ']]')
+
+  scale = 10.0**decimals
+  values = np.arange(int(np.rint(np.nanmax(rounded, initial=0.0) * scale)) + 1)
+  # The same operations as np.round, so that the values are bitwise equal.
+  values = values / scale
+  # Formatted with repr like json.JSONEncoder, -0.0 and NaN have own tokens.
+  tokens = [repr(float(value)) for value in values] + ['-0.0', 'null']
+  negative_zero_code, nan_code = len(values), len(values) + 1
+
+  width = max(map(len, tokens)) + max(map(len, suffixes))
+  table = np.zeros((len(tokens) * len(suffixes), width), dtype=np.uint8)
+  lengths = np.zeros(len(tokens) * len(suffixes), dtype=np.int64)
+  for i, (token, suffix) in enumerate(itertools.product(tokens, suffixes)):
+    encoded = (token + suffix).encode('ascii')
+    table[i, : len(encoded)] = np.frombuffer(encoded, dtype=np.uint8)
+    lengths[i] = len(encoded)
+
+  num_rows, num_cols = rounded.shape
+  suffix_idxs = np.zeros(num_cols, dtype=np.int64)
+  suffix_idxs[-1] = 1
+  rows_per_chunk = max(1, _ENCODE_CHUNK_SIZE // num_cols)
+  encoded_chunks = [prefix.encode('ascii')]
+  for start in range(0, num_rows, rows_per_chunk):
+    chunk = rounded[start : start + rows_per_chunk]
+    codes = _quantise(chunk, decimals)
+    not_nan = codes >= 0
+    if not np.array_equal(values[codes[not_nan]], chunk[not_nan]):
+      raise ValueError(f'Values are not rounded to {decimals} decimals.')
+    codes[(chunk == 0.0) & np.signbit(chunk)] = negative_zero_code
+    codes[~not_nan] = nan_code
+    idxs = codes * len(suffixes) + suffix_idxs
+    if start + rows_per_chunk >= num_rows:
+      idxs[-1, -1] += 1
+    idxs = idxs.ravel()
+    mask = np.arange(width) < lengths[idxs][:, None]
+    encoded_chunks.append(table[idxs][mask].tobytes())
+  return b''.join(encoded_chunks).decode('ascii')
+
+
 class StructureConfidenceFullEncoder(json.JSONEncoder):
   """JSON encoder for serializing confidence types."""
 
@@ -28,17 +139,6 @@ class StructureConfidenceFullEncoder(json.JSONEncoder):
     super().__init__(**(kwargs | dict(separators=(',', ':'))))
 
   def encode(self, o: 'StructureConfidenceFull'):
-    # Cast to np.float64 before rounding, since casting to Python float will
-    # cast to a 64 bit float, potentially undoing np.float32 rounding.
-    atom_plddts = np.round(
-        np.clip(np.asarray(o.atom_plddts, dtype=np.float64), 0.0, 99.99), 2
-    ).astype(float)
-    contact_probs = np.round(
-        np.clip(np.asarray(o.contact_probs, dtype=np.float64), 0.0, 1.0), 2
-    ).astype(float)
-    pae = np.round(
-        np.clip(np.asarray(o.pae, dtype=np.float64), 0.0, 99.9), 1
-    ).astype(float)
     return """\
 {
   "atom_chain_ids": %s,
@@ -49,9 +149,17 @@ class StructureConfidenceFullEncoder(json.JSONEncoder):
   "token_res_ids": %s
 }""" % (
         super().encode(o.atom_chain_ids),
-        super().encode(list(atom_plddts)).replace('NaN', 'null'),
-        super().encode([list(x) for x in contact_probs]).replace('NaN', 'null'),
-        super().encode([list(x) for x in pae]).replace('NaN', 'null'),
+        _encode_rounded(
+            _round(o.atom_plddts, _ATOM_PLDDT_ROUNDING),
+            decimals=_ATOM_PLDDT_ROUNDING[1],
+        ),
+        _encode_rounded(
+            _round(o.contact_probs, _CONTACT_PROBS_ROUNDING),
+            decimals=_CONTACT_PROBS_ROUNDING[1],
+        ),
+        _encode_rounded(
+            _round(o.pae, _PAE_ROUNDING), decimals=_PAE_ROUNDING[1]
+        ),
         super().encode(o.token_chain_ids),
         super().encode(o.token_res_ids),
     )
@@ -196,6 +304,8 @@ class StructureConfidenceSummary:
    chain_pair_iptm: [num_chains, num_chains] Chain pair ipTM.
    chain_ptm: [num_chains] Chain pTM.
    chain_iptm: [num_chains] Mean cross chain ipTM for a chain.
+   num_recycles: The number of recycles of the trunk, which can be fewer than
+     configured with adaptive recycling. None without adaptive recycling.
   """
 
   ptm: float
@@ -207,6 +317,7 @@ class StructureConfidenceSummary:
   chain_pair_iptm: np.ndarray
   chain_ptm: np.ndarray
   chain_iptm: np.ndarray
+  num_recycles: int | None = None
 
   @classmethod
   def from_inference_result(
@@ -225,6 +336,7 @@ class StructureConfidenceSummary:
         chain_pair_iptm=inference_result.metadata['chain_pair_iptm'],
         chain_ptm=inference_result.metadata['iptm_ichain'],
         chain_iptm=inference_result.metadata['iptm_xchain'],
+        num_recycles=inference_result.metadata.get('num_recycles'),
     )
 
   @classmethod
@@ -238,11 +350,16 @@ class StructureConfidenceSummary:
         # Cast to np.float64 before rounding, since casting to Python float will
         # cast to a 64 bit float, potentially undoing np.float32 rounding.
         rounded_data = np.round(data.astype(np.float64), decimals=2).tolist()
+      elif isinstance(data, int):
+        rounded_data = data
       else:
         rounded_data = np.round(data, decimals=2)
       return rounded_data
 
-    return _dump_json(jax.tree.map(convert, dataclasses.asdict(self)), indent=1)
+    output = dataclasses.asdict(self)
+    if self.num_recycles is None:
+      del output['num_recycles']
+    return _dump_json(jax.tree.map(convert, output), indent=1)
 
 
 @dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
@@ -299,3 +416,51 @@ class StructureConfidenceFull:
   def to_json(self) -> str:
     """Converts StructureConfidenceFull to json string."""
     return json.dumps(self, cls=StructureConfidenceFullEncoder)
+
+  @classmethod
+  def from_npz(cls, npz_bytes: bytes) -> Self:
+    """Returns a new instance from the bytes of an npz file, see `to_npz`."""
+    with np.load(io.BytesIO(npz_bytes)) as npz:
+      return cls(
+          pae=_dequantise(npz['pae'], int(npz['pae_decimals'])),
+          token_chain_ids=npz['token_chain_ids'].tolist(),
+          token_res_ids=npz['token_res_ids'].tolist(),
+          atom_plddts=_dequantise(
+              npz['atom_plddts'], int(npz['atom_plddts_decimals'])
+          ).tolist(),
+          atom_chain_ids=npz['atom_chain_ids'].tolist(),
+          contact_probs=_dequantise(
+              npz['contact_probs'], int(npz['contact_probs_decimals'])
+          ),
+      )
+
+  def to_npz(self) -> bytes:
+    """Converts StructureConfidenceFull to the bytes of a compact npz file.
+
+    The confidences are rounded as in the JSON and stored as integer multiples
+    of 10**-decimals, with the number of decimals stored as `<key>_decimals`:
+    `pae` and `atom_plddts` as uint16 and `contact_probs` as uint8, with the
+    maximum value of the type for NaN. The npz is not compressed, so it is
+    loaded without parsing or decompression.
+
+    Returns:
+      The bytes of the npz file.
+    """
+    output = io.BytesIO()
+    np.savez(
+        output,
+        pae=_quantise_as(self.pae, _PAE_ROUNDING, np.uint16),
+        pae_decimals=_PAE_ROUNDING[1],
+        token_chain_ids=np.asarray(self.token_chain_ids, dtype=str),
+        token_res_ids=np.asarray(self.token_res_ids, dtype=np.int32),
+        atom_plddts=_quantise_as(
+            self.atom_plddts, _ATOM_PLDDT_ROUNDING, np.uint16
+        ),
+        atom_plddts_decimals=_ATOM_PLDDT_ROUNDING[1],
+        atom_chain_ids=np.asarray(self.atom_chain_ids, dtype=str),
+        contact_probs=_quantise_as(
+            self.contact_probs, _CONTACT_PROBS_ROUNDING, np.uint8
+        ),
+        contact_probs_decimals=_CONTACT_PROBS_ROUNDING[1],
+    )
+    return output.getvalue()
@@ -154,32 +154,60 @@ def has_clash(
   struc = struc.filter_to_entity_type(protein=True, rna=True, dna=True)
   if not struc.chains:
     return False
-  coords = struc.coords
-  coord_kdtree = spatial.cKDTree(coords)
-  clashes_per_atom = coord_kdtree.query_ball_point(
-      coords, p=2.0, r=cutoff_radius
+  chain_ids, chain_index = np.unique(struc.chain_id, return_inverse=True)
+  coord_kdtree = spatial.cKDTree(struc.coords)
+  per_atom_has_clash = _get_per_atom_has_clash(
+      coord_kdtree,
+      res_id=struc.res_id,
+      chain_index=chain_index,
+      cutoff_radius=cutoff_radius,
   )
-  per_atom_has_clash = np.zeros(len(coords), dtype=np.int32)
-  for atom_idx, clashing_indices in enumerate(clashes_per_atom):
-    for clashing_idx in clashing_indices:
-      if np.abs(struc.res_id[atom_idx] - struc.res_id[clashing_idx]) > 1 or (
-          struc.chain_id[atom_idx] != struc.chain_id[clashing_idx]
-      ):
-        per_atom_has_clash[atom_idx] = True
-        break
-  for chain_id in struc.chains:
-    mask = struc.chain_id == chain_id
-    num_atoms = np.sum(mask)
-    if num_atoms == 0:
-      continue
-    num_clashes = np.sum(per_atom_has_clash * mask)
-    frac_clashes = num_clashes / num_atoms
-    if (
-        num_clashes > min_clashes_for_overlap
-        or frac_clashes > min_fraction_for_overlap
-    ):
-      return True
-  return False
+  num_atoms = np.bincount(chain_index, minlength=len(chain_ids))
+  num_clashes = np.bincount(
+      chain_index, weights=per_atom_has_clash, minlength=len(chain_ids)
+  )
+  frac_clashes = num_clashes / num_atoms
+  return bool(
+      np.any(
+          (num_clashes > min_clashes_for_overlap)
+          | (frac_clashes > min_fraction_for_overlap)
+      )
+  )
+
+
+def _get_per_atom_has_clash(
+    coord_kdtree: spatial.cKDTree,
+    res_id: np.ndarray,
+    chain_index: np.ndarray,
+    cutoff_radius: float,
+) -> np.ndarray:
+  """Returns whether each atom clashes with an atom of a non-adjacent residue.
+
+  Atoms of the same or of sequence-adjacent residues of the same chain are
+  close to each other by construction, so they are not considered clashing.
+
+  Args:
+    coord_kdtree: A KD-tree of the atom coordinates, can be shared with other
+      distance-based metrics of the same structure.
+    res_id: The residue ID of each atom.
+    chain_index: An integer identifying the chain of each atom.
+    cutoff_radius: Atom distances under this threshold are considered a clash.
+
+  Returns:
+    A boolean array with whether each atom has a clash.
+  """
+  pairs = coord_kdtree.query_pairs(
+      r=cutoff_radius, p=2.0, output_type='ndarray'
+  )
+  i, j = pairs[:, 0], pairs[:, 1]
+  is_clash = (np.abs(res_id[i].astype(np.int64) - res_id[j]) > 1) | (
+      chain_index[i] != chain_index[j]
+  )
+  per_atom_has_clash = np.zeros(coord_kdtree.n, dtype=bool)
+  # Clashes are symmetric, but each pair is reported only once.
+  per_atom_has_clash[i[is_clash]] = True
+  per_atom_has_clash[j[is_clash]] = True
+  return per_atom_has_clash
 
 
 def get_ranking_score(
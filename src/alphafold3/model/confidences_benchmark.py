@@ -0,0 +1,137 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Benchmarks clash detection against the per-atom reference.
+
+Usage:
+  python -m alphafold3.model.confidences_benchmark --noise_std=1.0
+"""
+
+import pathlib
+import time
+
+from absl import app
+from absl import flags
+from alphafold3 import structure
+from alphafold3.common import resources
+from alphafold3.model import confidences
+import numpy as np
+from scipy import spatial
+
+
+_MMCIF_PATHS = flags.DEFINE_list(
+    'mmcif_paths',
+    None,
+    'Paths of the mmCIF files to benchmark on. Defaults to the PDB structures'
+    ' in the test data.',
+)
+_NOISE_STD = flags.DEFINE_float(
+    'noise_std',
+    1.0,
+    'Standard deviation in Angstrom of the noise added to the coordinates of'
+    ' a perturbed copy of each structure, to benchmark also structures with'
+    ' clashes.',
+)
+_NUM_REPEATS = flags.DEFINE_integer(
+    'num_repeats', 3, 'Number of timed runs, the fastest one is reported.'
+)
+_SEED = flags.DEFINE_integer('seed', 0, 'Random seed of the noise.')
+
+
+def _has_clash_reference(
+    struc: structure.Structure,
+    cutoff_radius: float = 1.1,
+    min_clashes_for_overlap: int = 100,
+    min_fraction_for_overlap: float = 0.5,
+) -> bool:
+  """The original implementation of `confidences.has_clash`."""
+  struc = struc.filter_to_entity_type(protein=True, rna=True, dna=True)
+  if not struc.chains:
+    return False
+  coords = struc.coords
+  coord_kdtree = spatial.cKDTree(coords)
+  clashes_per_atom = coord_kdtree.query_ball_point(
+      coords, p=2.0, r=cutoff_radius
+  )
+  per_atom_has_clash = np.zeros(len(coords), dtype=np.int32)
+  for atom_idx, clashing_indices in enumerate(clashes_per_atom):
+    for clashing_idx in clashing_indices:
+      if np.abs(struc.res_id[atom_idx] - struc.res_id[clashing_idx]) > 1 or (
+          struc.chain_id[atom_idx] != struc.chain_id[clashing_idx]
+      ):
+        per_atom_has_clash[atom_idx] = True
+        break
+  for chain_id in struc.chains:
+    mask = struc.chain_id == chain_id
+    num_atoms = np.sum(mask)
+    if num_atoms == 0:
+      continue
+    num_clashes = np.sum(per_atom_has_clash * mask)
+    frac_clashes = num_clashes / num_atoms
+    if (
+        num_clashes > min_clashes_for_overlap
+        or frac_clashes > min_fraction_for_overlap
+    ):
+      return True
+  return False
+
+
+def _time(fn, num_repeats: int) -> float:
+  times = []
+  for _ in range(num_repeats):
+    start = time.perf_counter()
+    fn()
+    times.append(time.perf_counter() - start)
+  return min(times)
+
+
+def main(_):
+  if _MMCIF_PATHS.value:
+    mmcif_paths = [pathlib.Path(path) for path in _MMCIF_PATHS.value]
+  else:
+    mmcif_paths = sorted(
+        (resources.ROOT / 'test_data/miniature_databases/pdb_mmcif').glob(
+            '*.cif'
+        )
+    )
+
+  rng = np.random.default_rng(_SEED.value)
+  for mmcif_path in mmcif_paths:
+    struc = structure.from_mmcif(mmcif_path.read_text())
+    noisy_struc = struc.copy_and_update_coords(
+        struc.coords
+        + rng.normal(scale=_NOISE_STD.value, size=struc.coords.shape)
+    )
+    for name, benchmarked_struc in (
+        (mmcif_path.name, struc),
+        (f'{mmcif_path.name} + noise', noisy_struc),
+    ):
+      actual = confidences.has_clash(benchmarked_struc)
+      expected = _has_clash_reference(benchmarked_struc)
+      assert actual == expected, (name, actual, expected)
+
+      vectorized_time = _time(
+          lambda s=benchmarked_struc: confidences.has_clash(s),
+          _NUM_REPEATS.value,
+      )
+      reference_time = _time(
+          lambda s=benchmarked_struc: _has_clash_reference(s),
+          _NUM_REPEATS.value,
+      )
+      print(
+          f'{name} ({benchmarked_struc.num_atoms} atoms, has_clash={actual}):'
+          f' vectorized {vectorized_time:.4f} s, reference'
+          f' {reference_time:.4f} s, speedup'
+          f' {reference_time / vectorized_time:.1f}x'
+      )
+
+
+if __name__ == '__main__':
+  app.run(main)
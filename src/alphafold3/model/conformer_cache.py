@@ -0,0 +1,236 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Cache of RDKit reference conformers.
+
+Conformer generation is deterministic given the component, the random seed and
+the maximum number of iterations, so generated conformers are cached under a
+hash of these and of the RDKit version. Conformers are kept in an in-memory LRU
+cache shared by all featurisations in the process, and optionally persisted to
+an on-disk cache shared across processes and runs.
+"""
+
+from collections.abc import Mapping, Sequence
+import collections
+import contextlib
+import dataclasses
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+
+from absl import logging
+import numpy as np
+import rdkit
+
+
+# Bump when the way conformers are generated or stored changes.
+_CACHE_VERSION = 1
+# Number of conformers kept in memory.
+_DEFAULT_MAX_IN_MEMORY = 16384
+
+
+@dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
+class Conformer:
+  """Atoms and positions of a reference conformer generated by RDKit."""
+
+  atom_names: tuple[str, ...]
+  elements: tuple[int, ...]
+  charges: tuple[int, ...]
+  # Array with positions, float32, shape [num_atoms, 3].
+  positions: np.ndarray
+
+
+@dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
+class CacheStats:
+  """Number of conformer lookups by where the conformer was found."""
+
+  memory_hits: int
+  disk_hits: int
+  misses: int
+
+  @property
+  def hit_rate(self) -> float:
+    lookups = self.memory_hits + self.disk_hits + self.misses
+    return (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+
+
+def conformer_key(
+    component: Mapping[str, Sequence[str]] | str,
+    random_seed: int,
+    max_iterations: int | None,
+) -> str:
+  """Returns the cache key of a conformer.
+
+  Args:
+    component: The CCD mmCIF data block of the component, or its SMILES string
+      if it has no CCD entry.
+    random_seed: The random seed of the conformer search.
+    max_iterations: The maximum number of iterations of the conformer search.
+  """
+  if isinstance(component, str):
+    component_json = {'smiles': component}
+  else:
+    component_json = {'ccd_cif': {k: list(v) for k, v in component.items()}}
+  key_json = json.dumps(
+      {
+          'version': _CACHE_VERSION,
+          'rdkit_version': rdkit.__version__,
+          'component': component_json,
+          'random_seed': random_seed,
+          'max_iterations': max_iterations,
+      },
+      sort_keys=True,
+  )
+  return hashlib.sha256(key_json.encode('utf-8')).hexdigest()
+
+
+class ConformerCache:
+  """An in-memory LRU cache of conformers, optionally backed by a disk cache.
+
+  Failures to generate a conformer are cached as well, since they are as
+  deterministic and as expensive as successes.
+  """
+
+  def __init__(
+      self,
+      cache_dir: str | os.PathLike[str] | None = None,
+      max_in_memory: int = _DEFAULT_MAX_IN_MEMORY,
+  ):
+    """Initializes the cache.
+
+    Args:
+      cache_dir: The directory to persist the conformers in, created if it
+        doesn't exist. If None, conformers are only cached in memory.
+      max_in_memory: The maximum number of conformers kept in memory.
+    """
+    self._cache_dir = None
+    if cache_dir is not None:
+      self._cache_dir = pathlib.Path(cache_dir)
+      self._cache_dir.mkdir(parents=True, exist_ok=True)
+    self._max_in_memory = max_in_memory
+    self._in_memory: collections.OrderedDict[str, Conformer | None] = (
+        collections.OrderedDict()
+    )
+    self._lock = threading.Lock()
+    self._memory_hits = 0
+    self._disk_hits = 0
+    self._misses = 0
+
+  @property
+  def stats(self) -> CacheStats:
+    with self._lock:
+      return CacheStats(
+          memory_hits=self._memory_hits,
+          disk_hits=self._disk_hits,
+          misses=self._misses,
+      )
+
+  def _entry_path(self, key: str) -> pathlib.Path:
+    return self._cache_dir / key[:2] / f'{key}.npz'
+
+  def _read(self, key: str) -> tuple[bool, Conformer | None]:
+    """Returns whether the key is on disk, and the conformer if it is."""
+    path = self._entry_path(key)
+    try:
+      with np.load(path) as entry:
+        if entry['failed']:
+          return True, None
+        return True, Conformer(
+            atom_names=tuple(str(name) for name in entry['atom_names']),
+            elements=tuple(int(element) for element in entry['elements']),
+            charges=tuple(int(charge) for charge in entry['charges']),
+            positions=entry['positions'],
+        )
+    except FileNotFoundError:
+      return False, None
+    except (OSError, ValueError, KeyError):
+      logging.warning('Removing corrupted conformer cache entry %s', path)
+      with contextlib.suppress(FileNotFoundError):
+        path.unlink()
+      return False, None
+
+  def _write(self, key: str, conformer: Conformer | None) -> None:
+    """Atomically writes the conformer to the disk cache."""
+    path = self._entry_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if conformer is None:
+      arrays = {'failed': np.array(True)}
+    else:
+      arrays = {
+          'failed': np.array(False),
+          'atom_names': np.array(conformer.atom_names, dtype=str),
+          'elements': np.array(conformer.elements, dtype=np.int32),
+          'charges': np.array(conformer.charges, dtype=np.int32),
+          'positions': conformer.positions,
+      }
+    # Write to a temporary file and rename, so that concurrent readers never
+    # see a partially written entry.
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f'.{key}.', suffix='.npz', delete=False
+    ) as f:
+      try:
+        np.savez(f, **arrays)
+      except BaseException:
+        os.unlink(f.name)
+        raise
+    # Temporary files are only readable by the owner, but the cache may be
+    # shared by many users.
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, path)
+
+  def _remember(self, key: str, conformer: Conformer | None) -> None:
+    with self._lock:
+      self._in_memory[key] = conformer
+      self._in_memory.move_to_end(key)
+      while len(self._in_memory) > self._max_in_memory:
+        self._in_memory.popitem(last=False)
+
+  def lookup(self, key: str) -> tuple[bool, Conformer | None]:
+    """Returns whether the key is cached, and the conformer if it is.
+
+    A miss is counted in the stats, the caller is expected to generate the
+    conformer and `put` it.
+
+    Args:
+      key: The key of the conformer, see `conformer_key`.
+    """
+    with self._lock:
+      if key in self._in_memory:
+        self._in_memory.move_to_end(key)
+        self._memory_hits += 1
+        return True, self._in_memory[key]
+
+    if self._cache_dir is not None:
+      found, conformer = self._read(key)
+      if found:
+        with self._lock:
+          self._disk_hits += 1
+        self._remember(key, conformer)
+        return True, conformer
+
+    with self._lock:
+      self._misses += 1
+    return False, None
+
+  def put(self, key: str, conformer: Conformer | None) -> None:
+    """Caches a generated conformer, None if generation failed."""
+    if self._cache_dir is not None:
+      self._write(key, conformer)
+    self._remember(key, conformer)
+
+
+@functools.cache
+def get_cache(cache_dir: str | None = None) -> ConformerCache:
+  """Returns a cache shared by all featurisations using the same directory."""
+  return ConformerCache(cache_dir=cache_dir)
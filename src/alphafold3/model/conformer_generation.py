@@ -0,0 +1,123 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Generation of reference conformers with RDKit.
+
+Kept separate from the features so that worker processes generating conformers
+don't need to import the model.
+"""
+
+from collections.abc import Mapping, Sequence
+
+from absl import logging
+from alphafold3.data.tools import rdkit_utils
+from alphafold3.model import conformer_cache
+import numpy as np
+from rdkit import Chem
+
+
+def mol_from_component(
+    res_name: str, component: Mapping[str, Sequence[str]] | str
+) -> Chem.Mol | None:
+  """Creates the RDKit Mol of a component.
+
+  Args:
+    res_name: The name of the component, for logging.
+    component: The CCD mmCIF data block of the component, or its SMILES string
+      if it has no CCD entry.
+
+  Returns:
+    The Mol with hydrogens, or None if it could not be constructed from the CCD
+    entry.
+
+  Raises:
+    ValueError: If the Mol could not be constructed from the SMILES string.
+  """
+  if not isinstance(component, str):
+    try:
+      return rdkit_utils.mol_from_ccd_cif(component, remove_hydrogens=False)
+    except rdkit_utils.MolFromMmcifError:
+      logging.warning('Failed to construct mol from ccd_cif for: %s', res_name)
+      return None
+
+  mol = Chem.MolFromSmiles(component)
+  if mol is None:
+    # In this case the model will not have any information about this molecule
+    # and will not be able to predict anything about it.
+    raise ValueError(
+        f'Failed to construct RDKit Mol for {res_name} from SMILES string: '
+        f'{component} . This is likely due to an issue with the SMILES '
+        'string. Note that the userCCD input format provides an alternative '
+        'way to define custom molecules directly without RDKit or SMILES.'
+    )
+  mol = Chem.AddHs(mol)
+  # No existing names, we assign them from the graph.
+  return rdkit_utils.assign_atom_names_from_graph(mol)
+
+
+def generate_conformer(
+    mol: Chem.Mol,
+    random_seed: int,
+    max_iterations: int | None,
+    logging_name: str,
+) -> conformer_cache.Conformer | None:
+  """Generates a conformer with RDKit, returns None if generation failed."""
+  conformer = rdkit_utils.get_random_conformer(
+      mol=mol,
+      random_seed=random_seed,
+      max_iterations=max_iterations,
+      logging_name=logging_name,
+  )
+  if conformer is None:
+    return None
+  atoms = mol.GetAtoms()
+  positions = []
+  for idx in range(len(atoms)):
+    coords = conformer.GetAtomPosition(idx)
+    positions.append([coords.x, coords.y, coords.z])
+  return conformer_cache.Conformer(
+      atom_names=tuple(atom.GetProp('atom_name') for atom in atoms),
+      elements=tuple(atom.GetAtomicNum() for atom in atoms),
+      charges=tuple(atom.GetFormalCharge() for atom in atoms),
+      positions=np.array(positions, dtype=np.float32),
+  )
+
+
+def generate_component_conformer(
+    res_name: str,
+    component: Mapping[str, Sequence[str]] | str,
+    random_seed: int,
+    max_iterations: int | None,
+) -> conformer_cache.Conformer | None:
+  """Generates a conformer of a component, e.g. in a worker process.
+
+  RDKit Mols don't keep their atom names when pickled, so the Mol is
+  constructed again from the component. This is deterministic, hence the
+  conformer is identical to the one generated from the original Mol.
+
+  Args:
+    res_name: The name of the component.
+    component: The CCD mmCIF data block of the component, or its SMILES string
+      if it has no CCD entry. Its Mol must not be None.
+    random_seed: The random seed of the conformer search.
+    max_iterations: The maximum number of iterations of the conformer search.
+
+  Returns:
+    The conformer, or None if generation failed.
+  """
+  mol = mol_from_component(res_name, component)
+  if mol is None:
+    raise ValueError(f'Failed to construct mol for: {res_name}')
+  return generate_conformer(
+      mol=mol,
+      random_seed=random_seed,
+      max_iterations=max_iterations,
+      logging_name=res_name,
+  )
@@ -0,0 +1,193 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Benchmarks diffusion samplers against the default 200 step sampler.
+
+Runs model inference on a featurised example with the reference sampler and
+with each benchmarked sampler, from the same random seed, and reports the
+inference time and the aligned RMSD of every sample to the corresponding
+reference sample. The RMSD between the reference samples of two seeds is
+reported for comparison. Inference times include the trunk and the confidence
+head, which take the same time for all samplers. Runs on CPU by default, so
+benchmark small examples, e.g. the featurised example written by
+run_alphafold_data_test. Run from the repository root, as it uses run_alphafold.
+
+Usage:
+  python -m alphafold3.model.diffusion_benchmark --model_dir=<MODEL_DIR> \
+      --samplers=euler:100,euler:50,heun:50,heun:25
+"""
+
+from collections.abc import Callable
+import pathlib
+import pickle
+import time
+
+from absl import app
+from absl import flags
+from alphafold3.common import resources
+from alphafold3.model import features
+from alphafold3.model import model
+from alphafold3.model import params
+from alphafold3.model.components import utils
+from alphafold3.model.scoring import alignment
+import haiku as hk
+import jax
+from jax import numpy as jnp
+import numpy as np
+
+import run_alphafold
+
+
+_FEATURISED_EXAMPLE_PATH = flags.DEFINE_string(
+    'featurised_example_path',
+    None,
+    'Path of a pickled list of featurised examples, the first one is used.'
+    ' Defaults to the one written to the test data by run_alphafold_data_test.',
+)
+_SAMPLERS = flags.DEFINE_list(
+    'samplers',
+    ['euler:100', 'euler:50', 'heun:50', 'heun:25'],
+    'Benchmarked samplers as solver:steps or solver:steps:schedule_exponent,'
+    ' see --diffusion_solver, --num_diffusion_steps and'
+    ' --diffusion_schedule_exponent of run_alphafold.',
+)
+_BENCHMARK_NUM_RECYCLES = flags.DEFINE_integer(
+    'benchmark_num_recycles',
+    1,
+    'Number of recycles of the trunk, the same for all samplers.',
+    lower_bound=0,
+)
+_BENCHMARK_NUM_SAMPLES = flags.DEFINE_integer(
+    'benchmark_num_samples', 5, 'Number of samples per run.', lower_bound=1
+)
+_BENCHMARK_DEVICE = flags.DEFINE_enum(
+    'benchmark_device', 'cpu', ['cpu', 'gpu'], 'Device to run inference on.'
+)
+_NUM_REPEATS = flags.DEFINE_integer(
+    'num_repeats', 3, 'Number of timed runs, the fastest one is reported.'
+)
+_SEED = flags.DEFINE_integer('seed', 0, 'Random seed of the diffusion.')
+
+
+def _parse_sampler(sampler: str) -> dict[str, str | int | float]:
+  """Parses solver:steps[:schedule_exponent] into make_model_config kwargs."""
+  solver, steps, *schedule_exponent = sampler.split(':')
+  if solver not in ('euler', 'heun') or len(schedule_exponent) > 1:
+    raise ValueError(f'Invalid sampler: {sampler}')
+  return {
+      'diffusion_solver': solver,
+      'num_diffusion_steps': int(steps),
+      'diffusion_schedule_exponent': float(
+          schedule_exponent[0] if schedule_exponent else 7.0
+      ),
+  }
+
+
+def _time(
+    fn: Callable[[jax.Array], model.ModelResult], seed: int
+) -> tuple[float, model.ModelResult]:
+  """Returns the best wall time of `fn`, excluding compilation, and output."""
+  key = jax.random.PRNGKey(seed)
+  jax.block_until_ready(fn(key))  # Compile.
+  best_time = float('inf')
+  for _ in range(_NUM_REPEATS.value):
+    start_time = time.perf_counter()
+    result = jax.block_until_ready(fn(key))
+    best_time = min(best_time, time.perf_counter() - start_time)
+  return best_time, result
+
+
+def _sample_rmsds(
+    result: model.ModelResult, reference: model.ModelResult
+) -> np.ndarray:
+  """Returns the aligned RMSD of every sample to the reference sample."""
+  positions = np.asarray(result['diffusion_samples']['atom_positions'])
+  reference_positions = np.asarray(
+      reference['diffusion_samples']['atom_positions']
+  )
+  mask = np.asarray(reference['diffusion_samples']['mask']) > 0
+  return np.array([
+      alignment.rmsd_from_coords(
+          decoy_coords=positions[i][mask[i]],
+          gt_coords=reference_positions[i][mask[i]],
+      )
+      for i in range(len(mask))
+  ])
+
+
+def main(_):
+  if _FEATURISED_EXAMPLE_PATH.value:
+    featurised_example_path = pathlib.Path(_FEATURISED_EXAMPLE_PATH.value)
+  else:
+    featurised_example_path = (
+        resources.ROOT / 'test_data' / 'featurised_example.pkl'
+    )
+  featurised_example: features.BatchDict = pickle.loads(
+      featurised_example_path.read_bytes()
+  )[0]
+  device = jax.local_devices(backend=_BENCHMARK_DEVICE.value)[0]
+  batch = jax.device_put(
+      jax.tree.map(
+          jnp.asarray, utils.remove_invalidly_typed_feats(featurised_example)
+      ),
+      device,
+  )
+  model_params = params.get_model_haiku_params(
+      model_dir=pathlib.Path(run_alphafold.MODEL_DIR.value), device=device
+  )
+  flash_attention_implementation = (
+      'triton' if _BENCHMARK_DEVICE.value == 'gpu' else 'xla'
+  )
+
+  def make_model(**sampler_kwargs) -> Callable[[jax.Array], model.ModelResult]:
+    config = run_alphafold.make_model_config(
+        flash_attention_implementation=flash_attention_implementation,
+        num_diffusion_samples=_BENCHMARK_NUM_SAMPLES.value,
+        num_recycles=_BENCHMARK_NUM_RECYCLES.value,
+        **sampler_kwargs,
+    )
+
+    @hk.transform
+    def forward_fn(batch):
+      return model.Model(config)(batch)
+
+    forward = jax.jit(forward_fn.apply, device=device)
+    return lambda key: forward(model_params, key, batch)
+
+  num_tokens = batch['token_index'].shape[0]
+  print(
+      f'{featurised_example_path.name}: {num_tokens} padded tokens,'
+      f' {_BENCHMARK_NUM_SAMPLES.value} samples,'
+      f' {_BENCHMARK_NUM_RECYCLES.value} recycles, on {device}.'
+  )
+
+  reference_fn = make_model()
+  reference_time, reference = _time(reference_fn, _SEED.value)
+  other_seed_reference = reference_fn(jax.random.PRNGKey(_SEED.value + 1))
+  seed_rmsds = _sample_rmsds(other_seed_reference, reference)
+  print(
+      f'euler:200 (reference): {reference_time:.2f} s. Reference of another'
+      f' seed: RMSD mean {seed_rmsds.mean():.2f} A, max {seed_rmsds.max():.2f}'
+      ' A.'
+  )
+  for sampler in _SAMPLERS.value:
+    sampler_time, result = _time(
+        make_model(**_parse_sampler(sampler)), _SEED.value
+    )
+    rmsds = _sample_rmsds(result, reference)
+    print(
+        f'{sampler}: {sampler_time:.2f} s'
+        f' ({reference_time / sampler_time:.2f}x), RMSD to reference mean'
+        f' {rmsds.mean():.2f} A, max {rmsds.max():.2f} A.'
+    )
+
+
+if __name__ == '__main__':
+  app.run(main)
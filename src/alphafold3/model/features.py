@@ -10,6 +10,8 @@
 
 """Data-side of the input features processing."""
 
+from collections.abc import Sequence
+import concurrent.futures
 import dataclasses
 import datetime
 import itertools
@@ -26,10 +28,13 @@ from alphafold3.cpp import cif_dict
 from alphafold3.data import msa as msa_module
 from alphafold3.data import templates
 from alphafold3.data.tools import rdkit_utils
+from alphafold3.model import conformer_cache as conformer_cache_lib
+from alphafold3.model import conformer_generation
 from alphafold3.model import data3
 from alphafold3.model import data_constants
 from alphafold3.model import merging_features
 from alphafold3.model import msa_pairing
+from alphafold3.model import template_cache as template_cache_lib
 from alphafold3.model.atom_layout import atom_layout
 from alphafold3.structure import chemical_components as struc_chem_comps
 import chex
@@ -186,94 +191,95 @@ def tokenizer(
       standard_token_idxs: The token index that each token would have if not
         flattening non standard resiudes.
   """
-  # Select  the representative atom for each token.
-  token_idxs = []
-  single_atom_token = []
-  standard_token_idxs = []
-  current_standard_token_id = 0
-  # Iterate over residues, and provide a group_iter over the atoms of each
-  # residue.
-  for key, group_iter in itertools.groupby(
-      zip(
-          flat_output_layout.chain_type,
-          flat_output_layout.chain_id,
-          flat_output_layout.res_id,
-          flat_output_layout.res_name,
-          flat_output_layout.atom_name,
-          np.arange(flat_output_layout.shape[0]),
-      ),
-      key=lambda x: x[:3],
-  ):
-
-    # Get chain type and chain id of this residue
-    chain_type, chain_id, _ = key
-
-    # Get names and global idxs for all atoms of this residue
-    _, _, _, res_names, atom_names, idxs = zip(*group_iter)
+  num_atoms = flat_output_layout.shape[0]
+  atom_idxs = np.arange(num_atoms)
+
+  # Residues are runs of atoms with the same chain type, chain id and residue
+  # id.
+  chain_type = flat_output_layout.chain_type
+  chain_id = flat_output_layout.chain_id
+  res_id = flat_output_layout.res_id
+  is_res_start = np.ones(num_atoms, dtype=bool)
+  is_res_start[1:] = (
+      (chain_type[1:] != chain_type[:-1])
+      | (chain_id[1:] != chain_id[:-1])
+      | (res_id[1:] != res_id[:-1])
+  )
+  res_starts = np.flatnonzero(is_res_start)
+  res_sizes = np.diff(res_starts, append=num_atoms)
+  atom_res_idxs = np.cumsum(is_res_start) - 1
+  res_chain_types = chain_type[res_starts]
+  res_names = flat_output_layout.res_name[res_starts]
+
+  is_peptide = np.isin(res_chain_types, list(mmcif_names.PEPTIDE_CHAIN_TYPES))
+  # As of March 2023, all OTHER CHAINs in pdb are artificial nucleics.
+  is_nucleic_backbone = ~is_peptide & np.isin(
+      res_chain_types,
+      [*mmcif_names.NUCLEIC_ACID_CHAIN_TYPES, mmcif_names.OTHER_CHAIN],
+  )
+  is_polymer = is_peptide | is_nucleic_backbone
+  is_ligand = ~is_polymer & np.isin(
+      res_chain_types, list(mmcif_names.NON_POLYMER_CHAIN_TYPES)
+  )
+  for res_idx in np.flatnonzero(~is_polymer & ~is_ligand):
+    # Chain type that we don't handle yet.
+    logging.warning(
+        '%s: ignoring chain %s with chain type %s.',
+        logging_name,
+        chain_id[res_starts[res_idx]],
+        res_chain_types[res_idx],
+    )
 
-    # As of March 2023, all OTHER CHAINs in pdb are artificial nucleics.
-    is_nucleic_backbone = (
-        chain_type in mmcif_names.NUCLEIC_ACID_CHAIN_TYPES
-        or chain_type == mmcif_names.OTHER_CHAIN
+  # Standard polymer residues have one token, with a representative atom. For
+  # non-standard polymer residues and for non-polymers take all atoms.
+  # NOTE: This may get very large if we include hydrogens.
+  if flatten_non_standard_residues:
+    is_standard = np.where(
+        is_peptide,
+        np.isin(
+            res_names,
+            [*residue_names.PROTEIN_TYPES_WITH_UNKNOWN, residue_names.MSE],
+        ),
+        np.isin(res_names, list(residue_names.NUCLEIC_TYPES_WITH_2_UNKS)),
     )
-    if chain_type in mmcif_names.PEPTIDE_CHAIN_TYPES:
-      res_name = res_names[0]
-      if (
-          flatten_non_standard_residues
-          and res_name not in residue_names.PROTEIN_TYPES_WITH_UNKNOWN
-          and res_name != residue_names.MSE
-      ):
-        # For non-standard protein residues take all atoms.
-        # NOTE: This may get very large if we include hydrogens.
-        token_idxs.extend(idxs)
-        single_atom_token += [True] * len(idxs)
-        standard_token_idxs.extend([current_standard_token_id] * len(idxs))
-      else:
-        # For standard protein residues take 'CA' if it exists, else first atom.
-        if 'CA' in atom_names:
-          token_idxs.append(idxs[atom_names.index('CA')])
-        else:
-          token_idxs.append(idxs[0])
-        single_atom_token += [False]
-        standard_token_idxs.append(current_standard_token_id)
-      current_standard_token_id += 1
-    elif is_nucleic_backbone:
-      res_name = res_names[0]
-      if (
-          flatten_non_standard_residues
-          and res_name not in residue_names.NUCLEIC_TYPES_WITH_2_UNKS
-      ):
-        # For non-standard nucleic residues take all atoms.
-        token_idxs.extend(idxs)
-        single_atom_token += [True] * len(idxs)
-        standard_token_idxs.extend([current_standard_token_id] * len(idxs))
-      else:
-        # For standard nucleic residues take C1' if it exists, else first atom.
-        if "C1'" in atom_names:
-          token_idxs.append(idxs[atom_names.index("C1'")])
-        else:
-          token_idxs.append(idxs[0])
-        single_atom_token += [False]
-        standard_token_idxs.append(current_standard_token_id)
-      current_standard_token_id += 1
-    elif chain_type in mmcif_names.NON_POLYMER_CHAIN_TYPES:
-      # For non-polymers take all atoms
-      token_idxs.extend(idxs)
-      single_atom_token += [True] * len(idxs)
-      standard_token_idxs.extend([current_standard_token_id] * len(idxs))
-      current_standard_token_id += len(idxs)
-    else:
-      # Chain type that we don't handle yet.
-      logging.warning(
-          '%s: ignoring chain %s with chain type %s.',
-          logging_name,
-          chain_id,
-          chain_type,
+    has_representative = is_polymer & is_standard
+  else:
+    has_representative = is_polymer
+  takes_all_atoms = (is_polymer & ~has_representative) | is_ligand
+
+  # Take 'CA' for protein residues and C1' for nucleic residues if they exist,
+  # else the first atom.
+  is_representative_name = np.where(
+      is_peptide[atom_res_idxs],
+      flat_output_layout.atom_name == 'CA',
+      flat_output_layout.atom_name == "C1'",
+  )
+  representative_idxs = res_starts.copy()
+  named_idxs = np.flatnonzero(is_representative_name)
+  named_res_idxs, first_named = np.unique(
+      atom_res_idxs[named_idxs], return_index=True
+  )
+  representative_idxs[named_res_idxs] = named_idxs[first_named]
+
+  # Select the representative atom for each token.
+  token_idxs = np.flatnonzero(
+      takes_all_atoms[atom_res_idxs]
+      | (
+          has_representative[atom_res_idxs]
+          & (atom_idxs == representative_idxs[atom_res_idxs])
       )
+  )
+  token_res_idxs = atom_res_idxs[token_idxs]
+  single_atom_token = takes_all_atoms[token_res_idxs]
 
-  assert len(token_idxs) == len(single_atom_token)
-  assert len(token_idxs) == len(standard_token_idxs)
-  standard_token_idxs = np.array(standard_token_idxs, dtype=np.int32)
+  # The tokens of a residue share the standard token index of its first token.
+  # Non-polymers have one standard token per atom, polymers one per residue.
+  num_standard_tokens = np.where(
+      is_polymer, 1, np.where(is_ligand, res_sizes, 0)
+  )
+  standard_token_idxs = (np.cumsum(num_standard_tokens) - num_standard_tokens)[
+      token_res_idxs
+  ].astype(np.int32)
 
   # Create the list of all tokens, represented as a flat AtomLayout with 1
   # representative atom per token.
@@ -281,111 +287,107 @@ def tokenizer(
 
   # Create the 2D atoms_per_token layout
   num_tokens = all_tokens.shape[0]
-
-  # Target lists.
-  target_atom_names = []
-  target_atom_elements = []
-  target_res_ids = []
-  target_res_names = []
-  target_chain_ids = []
-  target_chain_types = []
-
-  # uids of all atoms in the flat layout, to check whether the dense atoms
-  # exist -- This is necessary for terminal atoms (e.g. 'OP3' or 'OXT')
-  all_atoms_uids = set(
-      zip(
-          flat_output_layout.chain_id,
-          flat_output_layout.res_id,
-          flat_output_layout.atom_name,
-      )
+  trg_shape = (num_tokens, max_atoms_per_token)
+  target_atom_names = np.full(trg_shape, '', dtype=object)
+  target_atom_elements = np.full(trg_shape, '', dtype=object)
+
+  # ligands have only 1 atom per token
+  target_atom_names[single_atom_token, 0] = all_tokens.atom_name[
+      single_atom_token
+  ]
+  target_atom_elements[single_atom_token, 0] = all_tokens.atom_element[
+      single_atom_token
+  ]
+
+  # Standard protein and nucleic residues have many atoms per token, in the
+  # order of the CCD entry of the residue.
+  multi_atom_token_idxs = np.flatnonzero(~single_atom_token)
+  ccd_atoms_by_res_name = {}
+  for res_name in dict.fromkeys(all_tokens.res_name[multi_atom_token_idxs]):
+    res_atoms = struc_chem_comps.get_all_atoms_in_entry(
+        ccd=ccd, res_name=res_name
+    )
+    ccd_atoms_by_res_name[res_name] = np.array(
+        list(
+            zip(
+                res_atoms['_chem_comp_atom.atom_id'],
+                res_atoms['_chem_comp_atom.type_symbol'],
+                strict=True,
+            )
+        ),
+        dtype=object,
+    ).reshape(-1, 2)
+  token_ccd_atoms = [
+      ccd_atoms_by_res_name[res_name]
+      for res_name in all_tokens.res_name[multi_atom_token_idxs]
+  ]
+  ccd_atoms = np.concatenate(
+      [np.zeros((0, 2), dtype=object), *token_ccd_atoms]
   )
+  ccd_atom_token_idxs = np.repeat(
+      multi_atom_token_idxs, [len(atoms) for atoms in token_ccd_atoms]
+  ).astype(int)
+
+  # Check whether the dense atoms exist in the flat layout -- This is
+  # necessary for terminal atoms (e.g. 'OP3' or 'OXT')
+  exists = atom_layout.compute_gather_idxs(
+      source_layout=flat_output_layout,
+      target_layout=atom_layout.AtomLayout(
+          atom_name=ccd_atoms[:, 0],
+          res_id=all_tokens.res_id[ccd_atom_token_idxs],
+          chain_id=all_tokens.chain_id[ccd_atom_token_idxs],
+      ),
+  ).gather_mask
+  # Remove hydrogens if they are not in flat layout, leave spaces for OXT etc.
+  keep = exists | ~np.isin(ccd_atoms[:, 1], ['H', 'D'])
+  kept_atom_names = np.where(exists, ccd_atoms[:, 0], '')[keep]
+  kept_atom_elements = np.where(exists, ccd_atoms[:, 1], '')[keep]
+  kept_token_idxs = ccd_atom_token_idxs[keep]
+  num_kept = np.bincount(kept_token_idxs, minlength=num_tokens)
+  slot_idxs = np.arange(len(kept_token_idxs)) - (
+      np.cumsum(num_kept) - num_kept
+  )[kept_token_idxs]
+
+  for token_idx in np.flatnonzero(num_kept > max_atoms_per_token):
+    dropped = (kept_token_idxs == token_idx) & (
+        slot_idxs >= max_atoms_per_token
+    )
+    logging.warning(
+        'Atom list for chain %s '
+        'residue %s %s is too long and will be truncated: '
+        '%s to the max atoms limit %s. Dropped atoms: %s',
+        all_tokens.chain_id[token_idx],
+        all_tokens.res_id[token_idx],
+        all_tokens.res_name[token_idx],
+        num_kept[token_idx],
+        max_atoms_per_token,
+        list(
+            zip(
+                kept_atom_names[dropped],
+                kept_atom_elements[dropped],
+                strict=True,
+            )
+        ),
+    )
 
-  for idx, single_atom in enumerate(single_atom_token):
-    if not single_atom:
-      # Standard protein and nucleic residues have many atoms per token
-      chain_id = all_tokens.chain_id[idx]
-      res_id = all_tokens.res_id[idx]
-      res_name = all_tokens.res_name[idx]
-      atom_names = []
-      atom_elements = []
-
-      res_atoms = struc_chem_comps.get_all_atoms_in_entry(
-          ccd=ccd, res_name=res_name
-      )
-      atom_names_elements = list(
-          zip(
-              res_atoms['_chem_comp_atom.atom_id'],
-              res_atoms['_chem_comp_atom.type_symbol'],
-              strict=True,
-          )
-      )
-
-      for atom_name, atom_element in atom_names_elements:
-        # Remove hydrogens if they are not in flat layout.
-        if atom_element in ['H', 'D'] and (
-            (chain_id, res_id, atom_name) not in all_atoms_uids
-        ):
-          continue
-        elif (chain_id, res_id, atom_name) in all_atoms_uids:
-          atom_names.append(atom_name)
-          atom_elements.append(atom_element)
-        # Leave spaces for OXT etc.
-        else:
-          atom_names.append('')
-          atom_elements.append('')
-
-      if len(atom_names) > max_atoms_per_token:
-        logging.warning(
-            'Atom list for chain %s '
-            'residue %s %s is too long and will be truncated: '
-            '%s to the max atoms limit %s. Dropped atoms: %s',
-            chain_id,
-            res_id,
-            res_name,
-            len(atom_names),
-            max_atoms_per_token,
-            list(
-                zip(
-                    atom_names[max_atoms_per_token:],
-                    atom_elements[max_atoms_per_token:],
-                    strict=True,
-                )
-            ),
-        )
-        atom_names = atom_names[:max_atoms_per_token]
-        atom_elements = atom_elements[:max_atoms_per_token]
-
-      num_pad = max_atoms_per_token - len(atom_names)
-      atom_names.extend([''] * num_pad)
-      atom_elements.extend([''] * num_pad)
+  in_token = slot_idxs < max_atoms_per_token
+  target_atom_names[kept_token_idxs[in_token], slot_idxs[in_token]] = (
+      kept_atom_names[in_token]
+  )
+  target_atom_elements[kept_token_idxs[in_token], slot_idxs[in_token]] = (
+      kept_atom_elements[in_token]
+  )
 
-    else:
-      # ligands have only 1 atom per token
-      padding = [''] * (max_atoms_per_token - 1)
-      atom_names = [all_tokens.atom_name[idx]] + padding
-      atom_elements = [all_tokens.atom_element[idx]] + padding
-
-    # Append the atoms to the target lists.
-    target_atom_names.append(atom_names)
-    target_atom_elements.append(atom_elements)
-    target_res_names.append([all_tokens.res_name[idx]] * max_atoms_per_token)
-    target_res_ids.append([all_tokens.res_id[idx]] * max_atoms_per_token)
-    target_chain_ids.append([all_tokens.chain_id[idx]] * max_atoms_per_token)
-    target_chain_types.append(
-        [all_tokens.chain_type[idx]] * max_atoms_per_token
-    )
+  def _per_token(values: np.ndarray) -> np.ndarray:
+    return np.repeat(values[:, None], max_atoms_per_token, axis=1)
 
-  # Make sure to get the right shape also for 0 tokens
-  trg_shape = (num_tokens, max_atoms_per_token)
   all_token_atoms_layout = atom_layout.AtomLayout(
-      atom_name=np.array(target_atom_names, dtype=object).reshape(trg_shape),
-      atom_element=np.array(target_atom_elements, dtype=object).reshape(
-          trg_shape
-      ),
-      res_name=np.array(target_res_names, dtype=object).reshape(trg_shape),
-      res_id=np.array(target_res_ids, dtype=int).reshape(trg_shape),
-      chain_id=np.array(target_chain_ids, dtype=object).reshape(trg_shape),
-      chain_type=np.array(target_chain_types, dtype=object).reshape(trg_shape),
+      atom_name=target_atom_names,
+      atom_element=target_atom_elements,
+      res_name=_per_token(all_tokens.res_name).astype(object),
+      res_id=_per_token(all_tokens.res_id).astype(int),
+      chain_id=_per_token(all_tokens.chain_id).astype(object),
+      chain_type=_per_token(all_tokens.chain_type).astype(object),
   )
 
   return all_tokens, all_token_atoms_layout, standard_token_idxs
@@ -708,8 +710,13 @@ class Templates:
       fold_input: folding_input.Input,
       max_templates: int,
       logging_name: str,
+      template_cache: template_cache_lib.TemplateCache | None = None,
   ) -> Self:
-    """Compute the template features."""
+    """Compute the template features.
+
+    The features of each template are looked up in `template_cache` if given,
+    which is shared across seeds and fold inputs, else computed from its mmCIF.
+    """
 
     seen_entities = {}
     polymer_entity_features = {True: {}, False: {}}
@@ -755,20 +762,14 @@ class Templates:
 
           sorted_features = []
           for template in chain.templates:
-            struc = structure.from_mmcif(
-                template.mmcif,
-                fix_mse_residues=True,
-                fix_arginines=True,
-                include_bonds=False,
-                include_water=False,
-                include_other=True,  # For non-standard polymer chains.
-            )
-            hit_features = templates.get_polymer_features(
-                chain=struc,
-                chain_poly_type=mmcif_names.PROTEIN_CHAIN,
-                query_sequence_length=len(chain.sequence),
-                query_to_hit_mapping=dict(template.query_to_template_map),
-            )
+            if template_cache is not None:
+              hit_features = template_cache.hit_features(
+                  template, query_sequence_length=len(chain.sequence)
+              )
+            else:
+              hit_features = template_cache_lib.compute_hit_features(
+                  template, query_sequence_length=len(chain.sequence)
+              )
             sorted_features.append(hit_features)
 
           template_features = templates.package_template_features(
@@ -1419,19 +1420,24 @@ def random_rotation(random_state: np.random.RandomState) -> np.ndarray:
   return np.stack([e0, e1, e2])
 
 
+def _augment(
+    positions: np.ndarray, rot: np.ndarray, translation: np.ndarray
+) -> np.ndarray:
+  """Center then apply the given translation and rotation."""
+  center = np.mean(positions, axis=0)
+  positions_target = np.einsum('ij,kj->ki', rot, positions - center)
+  positions_target = positions_target + translation
+  return positions_target
+
+
 def random_augmentation(
     positions: np.ndarray,
     random_state: np.random.RandomState,
 ) -> np.ndarray:
   """Center then apply random translation and rotation."""
-
-  center = np.mean(positions, axis=0)
   rot = random_rotation(random_state)
-  positions_target = np.einsum('ij,kj->ki', rot, positions - center)
-
   translation = random_state.normal(size=(3,))
-  positions_target = positions_target + translation
-  return positions_target
+  return _augment(positions, rot, translation)
 
 
 def _get_reference_positions_from_ccd_cif(
@@ -1473,42 +1479,39 @@ def _get_reference_positions_from_ccd_cif(
   return np.array(pos, dtype=np.float32)
 
 
-def get_reference(
-    res_name: str,
-    chemical_components_data: struc_chem_comps.ChemicalComponentsData,
-    ccd: chemical_components.Ccd,
-    random_state: np.random.RandomState,
-    ref_max_modified_date: datetime.date,
-    conformer_max_iterations: int | None,
-) -> tuple[dict[str, Any], Any, Any]:
-  """Reference structure for residue from CCD or SMILES.
+@dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
+class _ReferencePlan:
+  """The inputs of the reference structure of a residue, drawn in order.
 
-  Uses CCD entry if available, otherwise uses SMILES from chemical components
-  data. Conformer generation is done using RDKit, with a fallback to CCD ideal
-  or reference coordinates if RDKit fails and those coordinates are supplied.
+  All random numbers of a residue are drawn when planning, so that conformers
+  can be generated in any order, or in parallel, with the results of drawing
+  them in the order the residues are processed.
+  """
 
-  Args:
-    res_name: ccd code of the residue.
-    chemical_components_data: ChemicalComponentsData for making ref structure.
-    ccd: The chemical components dictionary.
-    random_state: Numpy RandomState
-    ref_max_modified_date: date beyond which reference structures must not be
-      modified to be allowed to use reference coordinates.
-    conformer_max_iterations: Optional override for maximum number of iterations
-      to run for RDKit conformer search.
+  res_name: str
+  # The CCD entry, or a temporary one with just atoms and bonds for SMILES.
+  ccd_cif: Any
+  # The CCD entry or the SMILES string the Mol is constructed from.
+  component: Any
+  mol: Chem.Mol | None
+  # None if there is no Mol to generate a conformer from.
+  conformer_random_seed: int | None
+  rotation: np.ndarray
+  translation: np.ndarray
 
-  Returns:
-    Mapping from atom names to features, from_atoms, dest_atoms.
-  """
 
+def _plan_reference(
+    res_name: str,
+    chemical_components_data: struc_chem_comps.ChemicalComponentsData,
+    ccd: chemical_components.Ccd,
+    random_state: np.random.RandomState,
+) -> _ReferencePlan:
+  """Constructs the Mol of a residue and draws its random numbers."""
   ccd_cif = ccd.get(res_name)
 
-  mol = None
   if ccd_cif:
-    try:
-      mol = rdkit_utils.mol_from_ccd_cif(ccd_cif, remove_hydrogens=False)
-    except rdkit_utils.MolFromMmcifError:
-      logging.warning('Failed to construct mol from ccd_cif for: %s', res_name)
+    component = ccd_cif
+    mol = conformer_generation.mol_from_component(res_name, component)
   else:  # No CCD entry, use SMILES from chemical components data.
     if not (
         chemical_components_data.chem_comp
@@ -1516,54 +1519,121 @@ def get_reference(
         and chemical_components_data.chem_comp[res_name].pdbx_smiles
     ):
       raise ValueError(f'No CCD entry or SMILES for {res_name}.')
-    smiles_string = chemical_components_data.chem_comp[res_name].pdbx_smiles
-    logging.info('Using SMILES for: %s - %s', res_name, smiles_string)
-
-    mol = Chem.MolFromSmiles(smiles_string)
-    if mol is None:
-      # In this case the model will not have any information about this molecule
-      # and will not be able to predict anything about it.
-      raise ValueError(
-          f'Failed to construct RDKit Mol for {res_name} from SMILES string: '
-          f'{smiles_string} . This is likely due to an issue with the SMILES '
-          'string. Note that the userCCD input format provides an alternative '
-          'way to define custom molecules directly without RDKit or SMILES.'
-      )
-    mol = Chem.AddHs(mol)
-    # No existing names, we assign them from the graph.
-    mol = rdkit_utils.assign_atom_names_from_graph(mol)
+    component = chemical_components_data.chem_comp[res_name].pdbx_smiles
+    logging.info('Using SMILES for: %s - %s', res_name, component)
+    mol = conformer_generation.mol_from_component(res_name, component)
     # Temporary CCD cif with just atom and bond information, no coordinates.
     ccd_cif = rdkit_utils.mol_to_ccd_cif(mol, component_id='fake_cif')
 
-  conformer = None
-  atom_names = []
-  elements = []
-  charges = []
-  pos = []
-
   # If mol is not None (must be True for SMILES case), then we try and generate
   # an RDKit conformer.
+  conformer_random_seed = None
   if mol is not None:
     conformer_random_seed = int(random_state.randint(1, 1 << 31))
-    conformer = rdkit_utils.get_random_conformer(
-        mol=mol,
-        random_seed=conformer_random_seed,
+  # Drawn in the same order as by `random_augmentation`.
+  rotation = random_rotation(random_state)
+  translation = random_state.normal(size=(3,))
+  return _ReferencePlan(
+      res_name=res_name,
+      ccd_cif=ccd_cif,
+      component=component,
+      mol=mol,
+      conformer_random_seed=conformer_random_seed,
+      rotation=rotation,
+      translation=translation,
+  )
+
+
+def _generate_conformers(
+    plans: Sequence[_ReferencePlan],
+    conformer_max_iterations: int | None,
+    conformer_cache: conformer_cache_lib.ConformerCache | None,
+    executor: concurrent.futures.Executor | None,
+) -> list[conformer_cache_lib.Conformer | None]:
+  """Generates the conformers of the planned references.
+
+  Conformers of the same component with the same seed are generated once, and
+  only if they are not cached.
+
+  Args:
+    plans: The planned references.
+    conformer_max_iterations: Optional override for maximum number of
+      iterations to run for RDKit conformer search.
+    conformer_cache: Optional cache of the generated conformers.
+    executor: Optional executor, typically a process pool, to generate the
+      conformers in. If None, they are generated in the calling thread.
+
+  Returns:
+    The conformer of each plan, None if there is no Mol or generation failed.
+  """
+
+  def generate(plan: _ReferencePlan) -> conformer_cache_lib.Conformer | None:
+    return conformer_generation.generate_conformer(
+        mol=plan.mol,
+        random_seed=plan.conformer_random_seed,
         max_iterations=conformer_max_iterations,
-        logging_name=res_name,
+        logging_name=plan.res_name,
+    )
+
+  if conformer_cache is None and executor is None:
+    return [None if plan.mol is None else generate(plan) for plan in plans]
+
+  keys = [
+      None
+      if plan.mol is None
+      else conformer_cache_lib.conformer_key(
+          component=plan.component,
+          random_seed=plan.conformer_random_seed,
+          max_iterations=conformer_max_iterations,
+      )
+      for plan in plans
+  ]
+  conformers = {}
+  plans_to_generate = {}
+  for key, plan in zip(keys, plans, strict=True):
+    if key is None or key in conformers or key in plans_to_generate:
+      continue
+    if conformer_cache is not None:
+      found, conformer = conformer_cache.lookup(key)
+      if found:
+        conformers[key] = conformer
+        continue
+    plans_to_generate[key] = plan
+
+  if executor is None:
+    generated = map(generate, plans_to_generate.values())
+  else:
+    generated = executor.map(
+        conformer_generation.generate_component_conformer,
+        [plan.res_name for plan in plans_to_generate.values()],
+        [plan.component for plan in plans_to_generate.values()],
+        [plan.conformer_random_seed for plan in plans_to_generate.values()],
+        itertools.repeat(conformer_max_iterations),
     )
-    if conformer:
-      for idx, atom in enumerate(mol.GetAtoms()):
-        atom_names.append(atom.GetProp('atom_name'))
-        elements.append(atom.GetAtomicNum())
-        charges.append(atom.GetFormalCharge())
-        coords = conformer.GetAtomPosition(idx)
-        pos.append([coords.x, coords.y, coords.z])
-      pos = np.array(pos, dtype=np.float32)
-
-  # If no mol could be generated (can only happen when using CCD), or no
-  # conformer could be generated from the mol (can happen in either case), then
-  # use CCD cif instead (which will have zero coordinates for SMILES case).
-  if conformer is None:
+  for key, conformer in zip(plans_to_generate, generated, strict=True):
+    conformers[key] = conformer
+    if conformer_cache is not None:
+      conformer_cache.put(key, conformer)
+  return [None if key is None else conformers[key] for key in keys]
+
+
+def _reference_features(
+    plan: _ReferencePlan,
+    conformer: conformer_cache_lib.Conformer | None,
+    ref_max_modified_date: datetime.date,
+) -> tuple[dict[str, Any], Any, Any]:
+  """Reference structure for a planned residue and its conformer."""
+  ccd_cif = plan.ccd_cif
+  if conformer is not None:
+    atom_names = list(conformer.atom_names)
+    elements = list(conformer.elements)
+    charges = list(conformer.charges)
+    pos = conformer.positions
+  else:
+    # If no mol could be generated (can only happen when using CCD), or no
+    # conformer could be generated from the mol (can happen in either case),
+    # then use CCD cif instead (which will have zero coordinates for SMILES
+    # case).
     atom_names = ccd_cif['_chem_comp_atom.atom_id']
     charges = ccd_cif['_chem_comp_atom.charge']
     type_symbols = ccd_cif['_chem_comp_atom.type_symbol']
@@ -1574,11 +1644,11 @@ def get_reference(
     pos = _get_reference_positions_from_ccd_cif(
         ccd_cif=ccd_cif,
         ref_max_modified_date=ref_max_modified_date,
-        logging_name=res_name,
+        logging_name=plan.res_name,
     )
 
   # Augment reference positions.
-  pos = random_augmentation(pos, random_state)
+  pos = _augment(pos, plan.rotation, plan.translation)
 
   # Extract atom and bond information from CCD cif.
   from_atom = ccd_cif.get('_chem_comp_bond.atom_id_1', None)
@@ -1599,6 +1669,50 @@ def get_reference(
   return features, from_atom, dest_atom
 
 
+def get_reference(
+    res_name: str,
+    chemical_components_data: struc_chem_comps.ChemicalComponentsData,
+    ccd: chemical_components.Ccd,
+    random_state: np.random.RandomState,
+    ref_max_modified_date: datetime.date,
+    conformer_max_iterations: int | None,
+    conformer_cache: conformer_cache_lib.ConformerCache | None = None,
+) -> tuple[dict[str, Any], Any, Any]:
+  """Reference structure for residue from CCD or SMILES.
+
+  Uses CCD entry if available, otherwise uses SMILES from chemical components
+  data. Conformer generation is done using RDKit, with a fallback to CCD ideal
+  or reference coordinates if RDKit fails and those coordinates are supplied.
+
+  Args:
+    res_name: ccd code of the residue.
+    chemical_components_data: ChemicalComponentsData for making ref structure.
+    ccd: The chemical components dictionary.
+    random_state: Numpy RandomState
+    ref_max_modified_date: date beyond which reference structures must not be
+      modified to be allowed to use reference coordinates.
+    conformer_max_iterations: Optional override for maximum number of iterations
+      to run for RDKit conformer search.
+    conformer_cache: Optional cache of the generated conformers.
+
+  Returns:
+    Mapping from atom names to features, from_atoms, dest_atoms.
+  """
+  plan = _plan_reference(
+      res_name=res_name,
+      chemical_components_data=chemical_components_data,
+      ccd=ccd,
+      random_state=random_state,
+  )
+  (conformer,) = _generate_conformers(
+      [plan],
+      conformer_max_iterations=conformer_max_iterations,
+      conformer_cache=conformer_cache,
+      executor=None,
+  )
+  return _reference_features(plan, conformer, ref_max_modified_date)
+
+
 @chex.dataclass(mappable_dataclass=False, frozen=True)
 class RefStructure:
   """Contains ref structure information."""
@@ -1627,8 +1741,16 @@ class RefStructure:
       ref_max_modified_date: datetime.date,
       conformer_max_iterations: int | None,
       ligand_ligand_bonds: atom_layout.AtomLayout | None = None,
+      conformer_cache: conformer_cache_lib.ConformerCache | None = None,
+      executor: concurrent.futures.Executor | None = None,
   ) -> tuple[Self, Any]:
-    """Reference structure information for each residue."""
+    """Reference structure information for each residue.
+
+    The random numbers of all residues are drawn first, in the order of the
+    residues, then the conformers of the residues are generated, in `executor`
+    if given. The features are therefore identical whether conformers are
+    generated serially or in parallel.
+    """
 
     # Get features per atom
     padded_shape = (padding_shapes.num_tokens, all_token_atoms_layout.shape[1])
@@ -1645,6 +1767,33 @@ class RefStructure:
     chain_ids_all = []
     res_ids_all = []
 
+    # Plan the reference of each residue, in the order of the residues.
+    plans = {}
+    for idx in np.ndindex(all_token_atoms_layout.shape):
+      chain_id = all_token_atoms_layout.chain_id[idx]
+      res_id = all_token_atoms_layout.res_id[idx]
+      if all_token_atoms_layout.atom_name[idx] and (
+          (chain_id, res_id) not in plans
+      ):
+        plans[(chain_id, res_id)] = _plan_reference(
+            res_name=all_token_atoms_layout.res_name[idx],
+            chemical_components_data=chemical_components_data,
+            ccd=ccd,
+            random_state=random_state,
+        )
+    conformers = dict(
+        zip(
+            plans,
+            _generate_conformers(
+                list(plans.values()),
+                conformer_max_iterations=conformer_max_iterations,
+                conformer_cache=conformer_cache,
+                executor=executor,
+            ),
+            strict=True,
+        )
+    )
+
     # Cache reference conformations for each residue.
     conformations = {}
     ref_space_uids = {}
@@ -1658,13 +1807,10 @@ class RefStructure:
         ref = _DEFAULT_BLANK_REF
       else:
         if (chain_id, res_id) not in conformations:
-          conf, from_atom, dest_atom = get_reference(
-              res_name=res_name,
-              chemical_components_data=chemical_components_data,
-              ccd=ccd,
-              random_state=random_state,
-              ref_max_modified_date=ref_max_modified_date,
-              conformer_max_iterations=conformer_max_iterations,
+          conf, from_atom, dest_atom = _reference_features(
+              plans[(chain_id, res_id)],
+              conformers[(chain_id, res_id)],
+              ref_max_modified_date,
           )
           conformations[(chain_id, res_id)] = conf
 
@@ -0,0 +1,198 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Benchmarks tokenization and atom layout gathers on a synthetic input.
+
+The synthetic input has a protein chain, an RNA chain and a ligand chain, with
+one token per polymer residue and per ligand atom. The gathers computed by the
+featurisation are checked against a dictionary lookup of every atom.
+
+Usage:
+  python -m alphafold3.model.features_benchmark --num_protein_residues=4000
+"""
+
+from collections.abc import Callable
+import functools
+import random
+import time
+from typing import Any
+
+from absl import app
+from absl import flags
+from alphafold3.constants import chemical_components
+from alphafold3.constants import mmcif_names
+from alphafold3.constants import residue_names
+from alphafold3.model import features
+from alphafold3.model.atom_layout import atom_layout
+from alphafold3.structure import chemical_components as struc_chem_comps
+import numpy as np
+
+
+_NUM_PROTEIN_RESIDUES = flags.DEFINE_integer(
+    'num_protein_residues', 4000, 'Number of residues of the protein chain.'
+)
+_NUM_RNA_RESIDUES = flags.DEFINE_integer(
+    'num_rna_residues', 500, 'Number of residues of the RNA chain.'
+)
+_NUM_LIGAND_ATOMS = flags.DEFINE_integer(
+    'num_ligand_atoms', 500, 'Number of atoms of the ligand chain.'
+)
+_NUM_REPEATS = flags.DEFINE_integer(
+    'num_repeats', 5, 'Number of times each step is timed, the best is kept.'
+)
+_SEED = flags.DEFINE_integer('seed', 0, 'Random seed of the residues.')
+
+
+def _make_flat_layout(
+    ccd: chemical_components.Ccd, seed: int
+) -> atom_layout.AtomLayout:
+  """Returns the flat layout of the heavy atoms of the synthetic input."""
+  rng = random.Random(seed)
+  protein = rng.choices(
+      residue_names.PROTEIN_TYPES, k=_NUM_PROTEIN_RESIDUES.value
+  )
+  rna = rng.choices(residue_names.RNA_TYPES, k=_NUM_RNA_RESIDUES.value)
+  chains = (
+      ('A', mmcif_names.PROTEIN_CHAIN, protein),
+      ('B', mmcif_names.RNA_CHAIN, rna),
+  )
+  atoms = []
+  for chain_id, chain_type, sequence in chains:
+    for res_id, res_name in enumerate(sequence, start=1):
+      res_atoms = struc_chem_comps.get_all_atoms_in_entry(ccd, res_name)
+      for atom_name, element in zip(
+          res_atoms['_chem_comp_atom.atom_id'],
+          res_atoms['_chem_comp_atom.type_symbol'],
+          strict=True,
+      ):
+        if element not in ('H', 'D'):
+          atoms.append(
+              (atom_name, element, res_name, res_id, chain_id, chain_type)
+          )
+  for i in range(_NUM_LIGAND_ATOMS.value):
+    atoms.append((f'C{i}', 'C', 'LIG', 1, 'C', mmcif_names.NON_POLYMER_CHAIN))
+  atom_name, atom_element, res_name, res_id, chain_id, chain_type = zip(*atoms)
+  return atom_layout.AtomLayout(
+      atom_name=np.array(atom_name, dtype=object),
+      atom_element=np.array(atom_element, dtype=object),
+      res_name=np.array(res_name, dtype=object),
+      res_id=np.array(res_id, dtype=int),
+      chain_id=np.array(chain_id, dtype=object),
+      chain_type=np.array(chain_type, dtype=object),
+  )
+
+
+def _lookup_gather_idxs(
+    source_layout: atom_layout.AtomLayout,
+    target_layout: atom_layout.AtomLayout,
+) -> atom_layout.GatherInfo:
+  """Computes the gather by looking up every target atom in a dictionary."""
+  source_uid_to_idx = {
+      uid: idx
+      for idx, uid in enumerate(
+          zip(
+              source_layout.chain_id.ravel(),
+              source_layout.res_id.ravel(),
+              source_layout.atom_name.ravel(),
+              strict=True,
+          )
+      )
+  }
+  gather_idxs = []
+  for uid in zip(
+      target_layout.chain_id.ravel(),
+      target_layout.res_id.ravel(),
+      target_layout.atom_name.ravel(),
+      strict=True,
+  ):
+    gather_idxs.append(source_uid_to_idx.get(uid, -1))
+  gather_idxs = np.array(gather_idxs, dtype=int)
+  target_shape = target_layout.atom_name.shape
+  return atom_layout.GatherInfo(
+      gather_idxs=np.maximum(gather_idxs, 0).reshape(target_shape),
+      gather_mask=(gather_idxs >= 0).reshape(target_shape),
+      input_shape=np.array(source_layout.atom_name.shape),
+  )
+
+
+def _best_time(fn: Callable[[], Any], num_repeats: int) -> float:
+  times = []
+  for _ in range(num_repeats):
+    start = time.perf_counter()
+    fn()
+    times.append(time.perf_counter() - start)
+  return min(times)
+
+
+def main(_):
+  ccd = chemical_components.Ccd()
+  flat_layout = _make_flat_layout(ccd, _SEED.value)
+  all_tokens, all_token_atoms_layout, _ = features.tokenizer(
+      flat_layout,
+      ccd=ccd,
+      max_atoms_per_token=24,
+      flatten_non_standard_residues=True,
+      logging_name='benchmark',
+  )
+  print(
+      f'{flat_layout.shape[0]} atoms, {all_tokens.shape[0]} tokens, token'
+      f' atoms layout {all_token_atoms_layout.shape}.'
+  )
+
+  tokenizer_time = _best_time(
+      functools.partial(
+          features.tokenizer,
+          flat_layout,
+          ccd=ccd,
+          max_atoms_per_token=24,
+          flatten_non_standard_residues=True,
+          logging_name='benchmark',
+      ),
+      _NUM_REPEATS.value,
+  )
+  print(f'tokenizer: {tokenizer_time * 1000:.1f} ms')
+
+  # The gathers between the flat and the token layouts, as computed by e.g.
+  # AtomCrossAtt and ConvertModelOutput.
+  gathers = (
+      ('flat -> token atoms', flat_layout, all_token_atoms_layout),
+      ('token atoms -> flat', all_token_atoms_layout, flat_layout),
+      ('flat -> tokens', flat_layout, all_tokens),
+  )
+  for name, source_layout, target_layout in gathers:
+    gather_info = atom_layout.compute_gather_idxs(
+        source_layout=source_layout, target_layout=target_layout
+    )
+    lookup_gather_info = _lookup_gather_idxs(source_layout, target_layout)
+    for field in ('gather_idxs', 'gather_mask', 'input_shape'):
+      assert np.array_equal(
+          getattr(gather_info, field), getattr(lookup_gather_info, field)
+      ), f'{name}: {field} differs from the dictionary lookup.'
+    gather_time = _best_time(
+        functools.partial(
+            atom_layout.compute_gather_idxs,
+            source_layout=source_layout,
+            target_layout=target_layout,
+        ),
+        _NUM_REPEATS.value,
+    )
+    lookup_time = _best_time(
+        functools.partial(_lookup_gather_idxs, source_layout, target_layout),
+        _NUM_REPEATS.value,
+    )
+    print(
+        f'compute_gather_idxs {name}: {gather_time * 1000:.1f} ms, dictionary'
+        f' lookup {lookup_time * 1000:.1f} ms'
+    )
+  print('Gathers are identical.')
+
+
+if __name__ == '__main__':
+  app.run(main)
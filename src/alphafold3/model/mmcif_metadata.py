@@ -10,8 +10,10 @@
 
 """Adds mmCIF metadata (to be ModelCIF-conformant) and author and legal info."""
 
+from collections.abc import Mapping
 from typing import Final
 
+from alphafold3 import structure
 from alphafold3.structure import mmcif
 import numpy as np
 
@@ -44,10 +46,74 @@ _MMCIF_PAPER_AUTHORS: Final[tuple[str, ...]] = (
 _MMCIF_AUTHORS: Final[tuple[str, ...]] = _MMCIF_PAPER_AUTHORS
 
 
+def _parsed_b_factors(b_factors: np.ndarray) -> np.ndarray:
+  """Returns the values of the _atom_site.B_iso_or_equiv strings as floats."""
+  # The strings are float32 values formatted with 2 decimals, rounding half to
+  # even. A float32 times 100 is exact in float64 and the division is correctly
+  # rounded, so this equals parsing the strings, without formatting them.
+  return np.rint(b_factors.astype(np.float32).astype(np.float64) * 100) / 100
+
+
+def _mean_plddt_by_res(
+    label_asym_id: np.ndarray,
+    label_seq_id: np.ndarray,
+    label_comp_id: np.ndarray,
+    atom_plddts: np.ndarray,
+) -> dict[tuple[str, str, str], float]:
+  """Returns the mean pLDDT of each residue, in the order of their atoms."""
+  num_atoms = len(atom_plddts)
+  # Residues are grouped by their label, so the atoms of a residue may not be
+  # contiguous, e.g. those of non-polymer residues with the same name.
+  is_run_start = np.ones(num_atoms, dtype=bool)
+  for column in (label_asym_id, label_seq_id, label_comp_id):
+    is_run_start[1:] |= column[1:] != column[:-1]
+  run_starts = np.flatnonzero(is_run_start).tolist()
+  runs_by_res = {}
+  for start, end in zip(run_starts, run_starts[1:] + [num_atoms]):
+    res = (label_asym_id[start], label_seq_id[start], label_comp_id[start])
+    runs_by_res.setdefault(res, []).append(atom_plddts[start:end])
+  return {
+      res: np.mean(np.concatenate(runs)) for res, runs in runs_by_res.items()
+  }
+
+
 def add_metadata_to_mmcif(
-    old_cif: mmcif.Mmcif, version: str, model_id: bytes
+    old_cif: mmcif.Mmcif,
+    version: str,
+    model_id: bytes,
+    atom_site_columns: Mapping[str, np.ndarray] | None = None,
 ) -> mmcif.Mmcif:
-  """Adds metadata to a mmCIF to make it ModelCIF-conformant."""
+  """Adds metadata to a mmCIF to make it ModelCIF-conformant.
+
+  Args:
+    old_cif: The mmCIF of the structure.
+    version: The version of AlphaFold, written to the model group name.
+    model_id: The ID of the model, written to the software version.
+    atom_site_columns: The _atom_site table of the structure as returned by
+      `Structure.to_mmcif_atom_site_columns`, if `old_cif` has no _atom_site
+      table.
+
+  Returns:
+    The mmCIF with the metadata.
+  """
+  if atom_site_columns is None:
+    atom_plddts = np.array(
+        [float(v) for v in old_cif['_atom_site.B_iso_or_equiv']]
+    )
+    atom_site_columns = {
+        key: np.array(old_cif[key], dtype=object)
+        for key in (
+            '_atom_site.label_asym_id',
+            '_atom_site.label_seq_id',
+            '_atom_site.label_comp_id',
+            '_atom_site.type_symbol',
+        )
+    }
+  else:
+    atom_plddts = _parsed_b_factors(
+        atom_site_columns['_atom_site.B_iso_or_equiv']
+    )
+
   cif = {}
 
   # ModelCIF conformation dictionary.
@@ -173,9 +239,7 @@ def add_metadata_to_mmcif(
   cif['_ma_qa_metric_global.model_id'] = ['1']
   cif['_ma_qa_metric_global.metric_id'] = ['1']
   # Mean over all atoms, since AlphaFold 3 outputs pLDDT per-atom.
-  global_plddt = np.mean(
-      [float(v) for v in old_cif['_atom_site.B_iso_or_equiv']]
-  )
+  global_plddt = np.mean(atom_plddts)
   cif['_ma_qa_metric_global.metric_value'] = [f'{global_plddt:.2f}']
 
   # Local (per residue) model confidence pLDDT value.
@@ -187,19 +251,15 @@ def add_metadata_to_mmcif(
   cif['_ma_qa_metric_local.metric_id'] = []
   cif['_ma_qa_metric_local.metric_value'] = []
 
-  plddt_grouped_by_res = {}
-  for *res, atom_plddt in zip(
-      old_cif['_atom_site.label_asym_id'],
-      old_cif['_atom_site.label_seq_id'],
-      old_cif['_atom_site.label_comp_id'],
-      old_cif['_atom_site.B_iso_or_equiv'],
-  ):
-    plddt_grouped_by_res.setdefault(tuple(res), []).append(float(atom_plddt))
-
-  for ordinal_id, ((chain_id, res_id, res_name), res_plddts) in enumerate(
-      plddt_grouped_by_res.items(), start=1
+  mean_plddt_by_res = _mean_plddt_by_res(
+      atom_site_columns['_atom_site.label_asym_id'],
+      atom_site_columns['_atom_site.label_seq_id'],
+      atom_site_columns['_atom_site.label_comp_id'],
+      atom_plddts,
+  )
+  for ordinal_id, ((chain_id, res_id, res_name), res_plddt) in enumerate(
+      mean_plddt_by_res.items(), start=1
   ):
-    res_plddt = np.mean(res_plddts)
     cif['_ma_qa_metric_local.ordinal_id'].append(str(ordinal_id))
     cif['_ma_qa_metric_local.model_id'].append('1')
     cif['_ma_qa_metric_local.label_asym_id'].append(chain_id)
@@ -208,11 +268,39 @@ def add_metadata_to_mmcif(
     cif['_ma_qa_metric_local.metric_id'].append('2')  # See _ma_qa_metric.id.
     cif['_ma_qa_metric_local.metric_value'].append(f'{res_plddt:.2f}')
 
-  cif['_atom_type.symbol'] = sorted(set(old_cif['_atom_site.type_symbol']))
+  cif['_atom_type.symbol'] = sorted(
+      set(atom_site_columns['_atom_site.type_symbol'].tolist())
+  )
 
   return old_cif.copy_and_update(cif)
 
 
+def to_mmcif_with_metadata(
+    struc: structure.Structure, version: str, model_id: bytes
+) -> str:
+  """Returns the mmCIF string of a structure with ModelCIF metadata.
+
+  The string is identical to that of `add_metadata_to_mmcif` applied to
+  `struc.to_mmcif_dict()`, but the _atom_site table is written directly from
+  the atom arrays, which is much faster for large structures.
+
+  Args:
+    struc: The structure.
+    version: The version of AlphaFold, written to the model group name.
+    model_id: The ID of the model, written to the software version.
+  """
+  atom_site_columns = struc.to_mmcif_atom_site_columns()
+  cif = add_metadata_to_mmcif(
+      old_cif=struc.to_mmcif_dict(include_atom_site=False),
+      version=version,
+      model_id=model_id,
+      atom_site_columns=atom_site_columns,
+  )
+  return cif.to_string() + struc.to_mmcif_atom_site_loop(
+      atom_site_columns=atom_site_columns
+  )
+
+
 def add_legal_comment(cif: str) -> str:
   """Adds legal comment at the top of the mmCIF."""
   # fmt: off
@@ -10,11 +10,11 @@
 
 """AlphaFold3 model."""
 
-from collections.abc import Iterable, Mapping
+from collections.abc import Callable, Iterable, Mapping
 import concurrent
 import dataclasses
 import functools
-from typing import Any, TypeAlias
+from typing import Any, Literal, TypeAlias
 
 from absl import logging
 from alphafold3 import structure
@@ -168,6 +168,16 @@ def create_target_feat_embedding(
   return target_feat
 
 
+def _relative_change(
+    new: jnp.ndarray, old: jnp.ndarray, mask: jnp.ndarray
+) -> jnp.ndarray:
+  """Returns the masked RMS of `new - old` relative to the RMS of `new`."""
+  mask = mask[..., None]
+  squared_diff = jnp.sum(mask * jnp.square(new - old))
+  squared_norm = jnp.sum(mask * jnp.square(new))
+  return jnp.sqrt(squared_diff / jnp.maximum(squared_norm, 1e-8))
+
+
 def _compute_ptm(
     result: ModelResult,
     num_tokens: int,
@@ -223,6 +233,16 @@ class Model(hk.Module):
     global_config: model_config.GlobalConfig = base_config.autocreate()
     heads: 'Model.HeadsConfig' = base_config.autocreate()
     num_recycles: int = 10
+    # Adaptive recycling. If the tolerance is set, recycling stops once the
+    # change between two trunk passes, see `recycling_convergence_metric`, is
+    # at most the tolerance, after at least `min_num_recycles` and at most
+    # `num_recycles` recycles. At least one recycle is always run, since the
+    # change needs two trunk passes.
+    recycling_tolerance: float | None = None
+    recycling_convergence_metric: Literal['embeddings', 'distogram'] = (
+        'embeddings'
+    )
+    min_num_recycles: int = 1
     return_embeddings: bool = False
 
   def __init__(self, config: Config, name: str = 'diffuser'):
@@ -256,6 +276,84 @@ class Model(hk.Module):
     )
     return sample
 
+  @hk.transparent
+  def _adaptive_recycling(
+      self,
+      *,
+      batch: feat_batch.Batch,
+      embeddings: dict[str, jnp.ndarray],
+      key: jax.Array,
+      recycle_body: Callable[[Any, Any], Any],
+      distogram_module: distogram_head.DistogramHead,
+  ) -> tuple[dict[str, jnp.ndarray], jnp.ndarray]:
+    """Recycles the trunk until its outputs converge.
+
+    Args:
+      batch: The data batch.
+      embeddings: The initial embeddings.
+      key: The random key of the first trunk pass.
+      recycle_body: A trunk pass, as in the `hk.fori_loop` of `__call__`.
+      distogram_module: The distogram head, used to measure convergence if
+        `recycling_convergence_metric` is 'distogram'.
+
+    Returns:
+      The embeddings of the last trunk pass and the number of recycles, i.e.
+      trunk passes after the first one.
+    """
+    seq_mask = batch.token_features.mask.astype(jnp.float32)
+    pair_mask = seq_mask[:, None] * seq_mask[None, :]
+    use_distogram = self.config.recycling_convergence_metric == 'distogram'
+    min_num_iter = self.config.min_num_recycles + 1
+    max_num_iter = self.config.num_recycles + 1
+
+    def cond(state):
+      num_iter, change = state['num_iter'], state['change']
+      return (num_iter < max_num_iter) & (
+          (num_iter < min_num_iter) | (change > self.config.recycling_tolerance)
+      )
+
+    def body(state):
+      prev = state['embeddings']
+      embeddings, key = recycle_body(None, (prev, state['key']))
+      if use_distogram:
+        # Mean absolute change of the contact probabilities.
+        contact_probs = distogram_module(batch, embeddings)['contact_probs']
+        change = jnp.sum(
+            pair_mask * jnp.abs(contact_probs - state['contact_probs'])
+        ) / jnp.maximum(jnp.sum(pair_mask), 1.0)
+      else:
+        contact_probs = state['contact_probs']
+        change = jnp.maximum(
+            _relative_change(embeddings['pair'], prev['pair'], pair_mask),
+            _relative_change(embeddings['single'], prev['single'], seq_mask),
+        )
+      # The first pass has no previous pass to be compared with.
+      change = jnp.where(state['num_iter'] == 0, jnp.inf, change)
+      return {
+          'embeddings': embeddings,
+          'key': key,
+          'num_iter': state['num_iter'] + 1,
+          'change': change,
+          'contact_probs': contact_probs,
+      }
+
+    num_res = batch.num_res
+    state = hk.while_loop(
+        cond,
+        body,
+        {
+            'embeddings': embeddings,
+            'key': key,
+            'num_iter': jnp.asarray(0, dtype=jnp.int32),
+            'change': jnp.asarray(jnp.inf, dtype=jnp.float32),
+            'contact_probs': jnp.zeros(
+                (num_res, num_res) if use_distogram else (0, 0),
+                dtype=jnp.float32,
+            ),
+        },
+    )
+    return state['embeddings'], state['num_iter'] - 1
+
   def __call__(
       self, batch: features.BatchDict, key: jax.Array | None = None
   ) -> ModelResult:
@@ -298,12 +396,25 @@ class Model(hk.Module):
         ),
         'target_feat': target_feat,
     }
+    distogram_module = distogram_head.DistogramHead(
+        self.config.heads.distogram, self.global_config
+    )
     if hk.running_init():
       embeddings, _ = recycle_body(None, (embeddings, key))
-    else:
+      num_recycles = None
+    elif self.config.recycling_tolerance is None:
       # Number of recycles is number of additional forward trunk passes.
       num_iter = self.config.num_recycles + 1
       embeddings, _ = hk.fori_loop(0, num_iter, recycle_body, (embeddings, key))
+      num_recycles = None
+    else:
+      embeddings, num_recycles = self._adaptive_recycling(
+          batch=batch,
+          embeddings=embeddings,
+          key=key,
+          recycle_body=recycle_body,
+          distogram_module=distogram_module,
+      )
 
     samples = self._sample_diffusion(
         batch,
@@ -325,15 +436,17 @@ class Model(hk.Module):
         in_axes=0,
     )(samples['atom_positions'])
 
-    distogram = distogram_head.DistogramHead(
-        self.config.heads.distogram, self.global_config
-    )(batch, embeddings)
+    distogram = distogram_module(batch, embeddings)
 
     output = {
         'diffusion_samples': samples,
         'distogram': distogram,
         **confidence_output,
     }
+    if num_recycles is not None:
+      # Only returned with adaptive recycling, which can use fewer recycles
+      # than configured.
+      output['num_recycles'] = num_recycles
     if self.config.return_embeddings:
       output['single_embeddings'] = embeddings['single']
       output['pair_embeddings'] = embeddings['pair']
@@ -479,7 +592,7 @@ class Model(hk.Module):
           fraction_disordered_=fraction_disordered[idx],
           has_clash_=has_clash[idx],
       )
-      yield InferenceResult(
+      inference_result = InferenceResult(
           predicted_structure=pred_structure,
           numerical_data={
               'full_pde': result['full_pde'][idx, :num_tokens, :num_tokens],
@@ -514,3 +627,6 @@ class Model(hk.Module):
           model_id=result['__identifier__'],
           debug_outputs={},
       )
+      if 'num_recycles' in result:
+        inference_result.metadata['num_recycles'] = int(result['num_recycles'])
+      yield inference_result
@@ -11,6 +11,8 @@
 """Diffusion Head."""
 
 from collections.abc import Callable
+import functools
+from typing import Literal
 
 from alphafold3.common import base_config
 from alphafold3.model import feat_batch
@@ -91,12 +93,32 @@ class ConditioningConfig(base_config.BaseConfig):
 
 
 class SampleConfig(base_config.BaseConfig):
+  """Configuration of the diffusion sampler.
+
+  Attributes:
+    steps: The number of denoising steps.
+    gamma_0: The amount of noise added back before each step, relative to the
+      noise level.
+    gamma_min: Noise is only added back above this noise level.
+    noise_scale: Scale of the noise added back.
+    step_scale: Scale of the step towards the denoised positions.
+    num_samples: The number of samples.
+    schedule_exponent: The exponent of the noise schedule, see
+      `noise_schedule`. Larger exponents spend more steps at low noise levels.
+    solver: 'euler' takes a first order step per noise level. 'heun' corrects
+      every step but the last with a second evaluation of the denoiser at the
+      next noise level, i.e. it takes 2 * steps - 1 denoiser evaluations but
+      is more accurate with few steps.
+  """
+
   steps: int
   gamma_0: float = 0.8
   gamma_min: float = 1.0
   noise_scale: float = 1.003
   step_scale: float = 1.5
   num_samples: int = 1
+  schedule_exponent: float = 7.0
+  solver: Literal['euler', 'heun'] = 'euler'
 
 
 class DiffusionHead(hk.Module):
@@ -321,7 +343,7 @@ def sample(
 
   mask = batch.predicted_structure_info.atom_mask
 
-  def apply_denoising_step(carry, noise_level):
+  def apply_denoising_step(carry, noise_level, second_order=False):
     key, positions, noise_level_prev = carry
     key, key_noise, key_aug = jax.random.split(key, 3)
 
@@ -341,12 +363,25 @@ def sample(
 
     d_t = noise_level - t_hat
     positions_out = positions_noisy + config.step_scale * d_t * grad
+    if second_order:
+      # Heun's method: average the slopes at both ends of the step.
+      positions_denoised = denoising_step(positions_out, noise_level)
+      grad_out = (positions_out - positions_denoised) / noise_level
+      positions_out = positions_noisy + config.step_scale * d_t * (
+          (grad + grad_out) / 2
+      )
 
     return (key, positions_out, noise_level), positions_out
 
   num_samples = config.num_samples
 
-  noise_levels = noise_schedule(jnp.linspace(0, 1, config.steps + 1))
+  schedule_exponent = config.schedule_exponent
+  if float(schedule_exponent).is_integer():
+    # Integer powers are computed by repeated multiplication.
+    schedule_exponent = int(schedule_exponent)
+  noise_levels = noise_schedule(
+      jnp.linspace(0, 1, config.steps + 1), p=schedule_exponent
+  )
 
   key, noise_key = jax.random.split(key)
   positions = jax.random.normal(noise_key, (num_samples,) + mask.shape + (3,))
@@ -358,10 +393,20 @@ def sample(
       jnp.tile(noise_levels[None, 0], (num_samples,)),
   )
 
-  apply_denoising_step = hk.vmap(
+  euler_step = hk.vmap(
       apply_denoising_step, in_axes=(0, None), split_rng=(not hk.running_init())
   )
-  result, _ = hk.scan(apply_denoising_step, init, noise_levels[1:], unroll=4)
+  if config.solver == 'heun' and config.steps > 1:
+    heun_step = hk.vmap(
+        functools.partial(apply_denoising_step, second_order=True),
+        in_axes=(0, None),
+        split_rng=(not hk.running_init()),
+    )
+    carry, _ = hk.scan(heun_step, init, noise_levels[1:-1], unroll=4)
+    # The last step is to noise level 0, where the slope is undefined.
+    result, _ = euler_step(carry, noise_levels[-1])
+  else:
+    result, _ = hk.scan(euler_step, init, noise_levels[1:], unroll=4)
   _, positions_out, _ = result
 
   final_dense_atom_mask = jnp.tile(mask[None], (num_samples, 1, 1))
@@ -8,22 +8,37 @@
 # if received directly from Google. Use is subject to terms of use available at
 # https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
 
-"""Model param loading."""
+"""Model param loading.
+
+Parameters are distributed as a stream of records, optionally zstd compressed
+and split into several files. Loading them requires decompressing and copying
+every parameter. They can be converted to a memory-mapped format with:
+
+  python -m alphafold3.model.params <model_dir> [<output_path>]
+
+The memory-mapped file stores every parameter uncompressed and aligned, so it is
+loaded with zero-copy views of the file and transferred straight to the device.
+It is used instead of the records if found in the model directory.
+"""
 
 import bisect
 import collections
-from collections.abc import Iterator
+from collections.abc import Iterator, Mapping, Sequence
 import contextlib
 import io
+import json
+import mmap
 import os
 import pathlib
 import re
 import struct
 import sys
-from typing import IO
+import tempfile
+from typing import IO, Any
 
+from absl import logging
 import haiku as hk
-import jax.numpy as jnp
+import jax
 import numpy as np
 import zstandard
 
@@ -198,13 +213,228 @@ def select_model_files(
   raise FileNotFoundError(f'No models matched in {model_dir}')
 
 
-def get_model_haiku_params(model_dir: pathlib.Path) -> hk.Params:
-  """Get the Haiku parameters from a model name."""
-  params: dict[str, dict[str, jnp.Array]] = {}
-  model_files, is_compressed = select_model_files(model_dir)
+# Suffix of memory-mapped parameter files, added to the model name.
+MMAP_SUFFIX = '.bin.mmap'
+_MMAP_MAGIC = b'AF3PMMAP'
+_MMAP_VERSION = 1
+# Alignment of the arrays in the memory-mapped file, in bytes.
+_MMAP_ALIGNMENT = 64
+_MMAP_FOOTER = struct.Struct('<Q8s')
+
+
+def _source_identity(
+    model_files: Sequence[pathlib.Path],
+) -> list[Mapping[str, Any]]:
+  """Identifies model files by their name, size and modification time."""
+  identity = []
+  for file in model_files:
+    stat = file.stat()
+    identity.append(
+        {'name': file.name, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    )
+  return identity
+
+
+def write_mmap_params(
+    records: Iterator[tuple[str, str, np.ndarray]],
+    output_path: pathlib.Path,
+    sources: Sequence[Mapping[str, Any]] = (),
+) -> int:
+  """Atomically writes params to a memory-mapped parameter file.
+
+  The file starts with a magic string, followed by the arrays in little-endian
+  C order, each aligned to 64 bytes, then by a JSON index of the arrays, and
+  ends with the offset of the index and the magic string. The index is written
+  last so that records are written as they are read, without holding all of
+  them in memory.
+
+  Args:
+    records: The (scope, name, array) records of the parameters.
+    output_path: The path of the memory-mapped parameter file.
+    sources: The identity of the files the records were read from, used to
+      detect a stale file when the source files are updated.
+
+  Returns:
+    The number of written parameters.
+  """
+  entries = []
+  with tempfile.NamedTemporaryFile(
+      dir=output_path.parent, prefix=f'.{output_path.name}.', delete=False
+  ) as f:
+    try:
+      f.write(_MMAP_MAGIC)
+      for scope, name, arr in records:
+        f.write(b'\0' * (-f.tell() % _MMAP_ALIGNMENT))
+        entries.append({
+            'scope': scope,
+            'name': name,
+            'dtype': str(arr.dtype),
+            'shape': list(arr.shape),
+            'offset': f.tell(),
+        })
+        # Note that this makes scalars 1-dimensional, hence the shape above.
+        arr = np.ascontiguousarray(arr)
+        if sys.byteorder == 'big':
+          arr = arr.byteswap()
+        f.write(arr.data)
+      index_offset = f.tell()
+      index = {'version': _MMAP_VERSION, 'sources': sources, 'arrays': entries}
+      f.write(json.dumps(index).encode('utf-8'))
+      f.write(_MMAP_FOOTER.pack(index_offset, _MMAP_MAGIC))
+    except BaseException:
+      os.unlink(f.name)
+      raise
+  # Temporary files are only readable by the owner, but the model directory
+  # may be shared by many users.
+  os.chmod(f.name, 0o644)
+  os.replace(f.name, output_path)
+  return len(entries)
+
+
+def _read_mmap_index(buffer: mmap.mmap) -> Mapping[str, Any]:
+  """Reads the index of a memory-mapped parameter file."""
+  if len(buffer) < len(_MMAP_MAGIC) + _MMAP_FOOTER.size:
+    raise RecordError(f'Truncated memory-mapped params: {len(buffer)=}')
+  index_offset, magic = _MMAP_FOOTER.unpack_from(
+      buffer, len(buffer) - _MMAP_FOOTER.size
+  )
+  if buffer[: len(_MMAP_MAGIC)] != _MMAP_MAGIC or magic != _MMAP_MAGIC:
+    raise RecordError('Not a memory-mapped params file, invalid magic.')
+  index = json.loads(buffer[index_offset : len(buffer) - _MMAP_FOOTER.size])
+  if index['version'] != _MMAP_VERSION:
+    raise RecordError(f'Unsupported memory-mapped params {index["version"]=}')
+  return index
+
+
+def read_mmap_params(
+    path: pathlib.Path,
+) -> tuple[dict[str, dict[str, np.ndarray]], list[Mapping[str, Any]]]:
+  """Reads a memory-mapped parameter file.
+
+  Args:
+    path: The path of the memory-mapped parameter file.
+
+  Returns:
+    A tuple of the params, as read-only views of the memory-mapped file, and of
+    the identity of the files the params were converted from.
+  """
+  with open(path, 'rb') as f:
+    # The mapping stays valid after the file is closed, as long as any of the
+    # arrays reference it.
+    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+  index = _read_mmap_index(buffer)
+  params = {}
+  for entry in index['arrays']:
+    dtype = np.dtype(entry['dtype'])
+    shape = tuple(entry['shape'])
+    arr = np.frombuffer(
+        buffer,
+        dtype=dtype,
+        count=int(np.prod(shape, dtype=np.int64)),
+        offset=entry['offset'],
+    ).reshape(shape)
+    if sys.byteorder == 'big':
+      arr = arr.byteswap()
+    params.setdefault(entry['scope'], {})[entry['name']] = arr
+  return params, index['sources']
+
+
+def _default_mmap_path(model_files: Sequence[pathlib.Path]) -> pathlib.Path:
+  """Returns the memory-mapped parameter file path next to the model files."""
+  model_name = re.sub(
+      r'(\.[0-9]+)?\.bin(\.zst)?(\.[0-9]+)?$', '', model_files[0].name
+  )
+  return model_files[0].parent / f'{model_name}{MMAP_SUFFIX}'
+
+
+def _select_mmap_file(model_dir: pathlib.Path) -> pathlib.Path | None:
+  """Selects the memory-mapped parameter file in a model directory, if any."""
+  mmap_files = sorted(model_dir.glob(f'*{MMAP_SUFFIX}'))
+  if len(mmap_files) > 1:
+    raise RuntimeError(f'Multiple memory-mapped models in {model_dir}')
+  return mmap_files[0] if mmap_files else None
+
+
+def get_model_haiku_params(
+    model_dir: pathlib.Path,
+    device: jax.Device | None = None,
+    cache_decompressed: bool = False,
+) -> hk.Params:
+  """Get the Haiku parameters from a model name.
+
+  Args:
+    model_dir: The directory with the model parameter files.
+    device: The device to put the parameters on. If None, uses the default
+      device.
+    cache_decompressed: Whether to convert compressed parameters to a
+      memory-mapped parameter file in the model directory when first loaded, so
+      that later loads skip the decompression.
+
+  Returns:
+    The Haiku parameters.
+  """
+  try:
+    model_files, is_compressed = select_model_files(model_dir)
+  except FileNotFoundError:
+    model_files, is_compressed = [], False
+  sources = _source_identity(model_files)
+
+  mmap_path = _select_mmap_file(model_dir)
+  if mmap_path is not None:
+    mmap_params, mmap_sources = read_mmap_params(mmap_path)
+    # Memory-mapped files without the source files, or converted from other
+    # files, are used as is.
+    if not model_files or not mmap_sources or mmap_sources == sources:
+      if not mmap_params:
+        raise FileNotFoundError(f'Model missing from "{mmap_path}"')
+      return jax.device_put(mmap_params, device)
+    logging.warning(
+        'Ignoring %s, it was converted from different model files.', mmap_path
+    )
+    del mmap_params
+  elif not model_files:
+    raise FileNotFoundError(f'No models matched in {model_dir}')
+
+  if cache_decompressed and is_compressed:
+    cache_path = mmap_path or _default_mmap_path(model_files)
+    try:
+      with open_for_reading(model_files, is_compressed) as stream:
+        write_mmap_params(read_records(stream), cache_path, sources)
+    except OSError as e:
+      logging.warning('Failed to cache decompressed params: %s', e)
+    else:
+      logging.info('Cached decompressed params in %s', cache_path)
+      return get_model_haiku_params(model_dir, device=device)
+
+  params: dict[str, dict[str, jax.Array]] = {}
   with open_for_reading(model_files, is_compressed) as stream:
     for scope, name, arr in read_records(stream):
-      params.setdefault(scope, {})[name] = jnp.array(arr)
+      params.setdefault(scope, {})[name] = jax.device_put(arr, device)
   if not params:
     raise FileNotFoundError(f'Model missing from "{model_dir}"')
   return params
+
+
+def main(argv: Sequence[str]) -> None:
+  if len(argv) not in (2, 3):
+    raise ValueError(
+        'Must specify the model directory and optionally the output path.\n'
+        f'Usage: {argv[0]} <model_dir> [<output_path>]'
+    )
+  model_dir = pathlib.Path(argv[1])
+  model_files, is_compressed = select_model_files(model_dir)
+  if len(argv) == 3:
+    output_path = pathlib.Path(argv[2])
+  else:
+    output_path = _default_mmap_path(model_files)
+
+  print(f'Converting {len(model_files)} model files to {output_path}')
+  with open_for_reading(model_files, is_compressed) as stream:
+    num_params = write_mmap_params(
+        read_records(stream), output_path, _source_identity(model_files)
+    )
+  print(f'Converted {num_params} parameters.')
+
+
+if __name__ == '__main__':
+  main(sys.argv)
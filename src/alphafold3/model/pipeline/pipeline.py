@@ -12,15 +12,22 @@
 
 import bisect
 from collections.abc import Sequence
+import concurrent.futures
+import dataclasses
 import datetime
+import functools
 import itertools
+import multiprocessing
 
 from absl import logging
 from alphafold3.common import base_config
 from alphafold3.common import folding_input
 from alphafold3.constants import chemical_components
+from alphafold3.model import conformer_cache
 from alphafold3.model import feat_batch
 from alphafold3.model import features
+from alphafold3.model import template_cache
+from alphafold3.model.atom_layout import atom_layout
 from alphafold3.model.pipeline import inter_chain_bonds
 from alphafold3.model.pipeline import structure_cleaning
 from alphafold3.structure import chemical_components as struc_chem_comps
@@ -30,6 +37,21 @@ import numpy as np
 _DETERMINISTIC_FRAMES_RANDOM_SEED = 12312837
 
 
+@functools.cache
+def get_process_pool(n_workers: int) -> concurrent.futures.ProcessPoolExecutor:
+  """Returns a process pool shared by all pipelines with `n_workers` workers.
+
+  Workers are spawned rather than forked, as forking a process that has
+  started threads, e.g. JAX or other featurisation threads, is unsafe.
+
+  Args:
+    n_workers: The number of worker processes.
+  """
+  return concurrent.futures.ProcessPoolExecutor(
+      max_workers=n_workers, mp_context=multiprocessing.get_context('spawn')
+  )
+
+
 def calculate_bucket_size(
     num_tokens: int, buckets: Sequence[int] | None
 ) -> int:
@@ -73,6 +95,33 @@ class MmcifNumChainsError(Exception):
   """Raised if the mmcif file contains too many / too few chains."""
 
 
+@dataclasses.dataclass(frozen=True, kw_only=True, slots=True)
+class SeedInvariantFeatures:
+  """Features of a fold input that are the same for every random seed.
+
+  Only the reference structure (and the ligand bonds derived from it) depend on
+  the random seed, everything else is computed once and shared by the batches
+  of all seeds.
+  """
+
+  fold_input_name: str
+  all_tokens: atom_layout.AtomLayout
+  all_token_atoms_layout: atom_layout.AtomLayout
+  padding_shapes: features.PaddingShapes
+  chemical_components_data: struc_chem_comps.ChemicalComponentsData
+  ligand_ligand_bonds: atom_layout.AtomLayout | None
+  msa: features.MSA
+  templates: features.Templates
+  token_features: features.TokenFeatures
+  predicted_structure_info: features.PredictedStructureInfo
+  polymer_ligand_bond_info: features.PolymerLigandBondInfo
+  pseudo_beta_info: features.PseudoBetaInfo
+  atom_cross_att: features.AtomCrossAtt
+  convert_model_output: features.ConvertModelOutput
+  # None if the frames are constructed from the seeded reference structure.
+  frames: features.Frames | None
+
+
 class WholePdbPipeline:
   """Processes an entire mmcif entity and merges the content."""
 
@@ -118,6 +167,15 @@ class WholePdbPipeline:
         symmetric polymer chains.
       deterministic_frames: Whether to use fixed-seed reference positions to
         construct deterministic frames.
+      conformer_max_iterations: Optional override for maximum number of
+        iterations to run for RDKit conformer search.
+      conformer_cache_dir: Optional directory of a persistent cache of the
+        reference conformers generated by RDKit, shared across runs. Generated
+        conformers are cached in memory regardless.
+      n_worker_processes: Number of worker processes for the CPU-bound stages
+        of featurisation, currently RDKit conformer generation. The pool is
+        shared by all pipelines with the same number of workers. If 1, these
+        stages run in the calling process.
     """
 
     max_atoms_per_token: int = 24
@@ -140,6 +198,8 @@ class WholePdbPipeline:
     remove_nonsymmetric_bonds: bool = False
     deterministic_frames: bool = True
     conformer_max_iterations: int | None = None
+    conformer_cache_dir: str | None = None
+    n_worker_processes: int = 1
 
   def __init__(self, *, config: Config):
     """Initializes WholePdb data pipeline.
@@ -148,6 +208,13 @@ class WholePdbPipeline:
       config: Pipeline configuration.
     """
     self._config = config
+    self._conformer_cache = conformer_cache.get_cache(
+        config.conformer_cache_dir
+    )
+    self._template_cache = template_cache.get_cache()
+    self._executor = None
+    if config.n_worker_processes > 1:
+      self._executor = get_process_pool(config.n_worker_processes)
 
   def process_item(
       self,
@@ -160,9 +227,29 @@ class WholePdbPipeline:
     if random_seed is None:
       random_seed = random_state.randint(2**31)
 
-    random_state = np.random.RandomState(seed=random_seed)
+    seed_invariant = self.process_seed_invariant(fold_input=fold_input, ccd=ccd)
+    return self.process_seed(
+        seed_invariant=seed_invariant, ccd=ccd, random_seed=random_seed
+    )
 
-    logging_name = f'{fold_input.name}, random_seed={random_seed}'
+  def process_seed_invariant(
+      self,
+      fold_input: folding_input.Input,
+      ccd: chemical_components.Ccd,
+  ) -> SeedInvariantFeatures:
+    """Computes all features that don't depend on the random seed.
+
+    The result can be passed to `process_seed` any number of times to get the
+    batch for each random seed.
+
+    Args:
+      fold_input: The input to featurise.
+      ccd: The chemical components dictionary.
+
+    Returns:
+      The seed-invariant features.
+    """
+    logging_name = fold_input.name
     logging.info('processing %s', logging_name)
     struct = fold_input.to_structure(ccd=ccd)
 
@@ -348,22 +435,9 @@ class WholePdbPipeline:
         fold_input=fold_input,
         max_templates=self._config.max_templates,
         logging_name=logging_name,
+        template_cache=self._template_cache,
     )
 
-    ref_max_modified_date = self._config.ref_max_modified_date
-    conformer_max_iterations = self._config.conformer_max_iterations
-    batch_ref_structure, ligand_ligand_bonds = (
-        features.RefStructure.compute_features(
-            all_token_atoms_layout=all_token_atoms_layout,
-            ccd=ccd,
-            padding_shapes=padding_shapes,
-            chemical_components_data=chemical_components_data,
-            random_state=random_state,
-            ref_max_modified_date=ref_max_modified_date,
-            conformer_max_iterations=conformer_max_iterations,
-            ligand_ligand_bonds=ligand_ligand_bonds,
-        )
-    )
     deterministic_ref_structure = None
     if self._config.deterministic_frames:
       deterministic_ref_structure, _ = features.RefStructure.compute_features(
@@ -374,9 +448,11 @@ class WholePdbPipeline:
           random_state=(
               np.random.RandomState(_DETERMINISTIC_FRAMES_RANDOM_SEED)
           ),
-          ref_max_modified_date=ref_max_modified_date,
+          ref_max_modified_date=self._config.ref_max_modified_date,
           conformer_max_iterations=None,
           ligand_ligand_bonds=ligand_ligand_bonds,
+          conformer_cache=self._conformer_cache,
+          executor=self._executor,
       )
 
     # Create ligand-polymer bond features.
@@ -386,13 +462,6 @@ class WholePdbPipeline:
         bond_layout=polymer_ligand_bonds,
         padding_shapes=padding_shapes,
     )
-    # Create ligand-ligand bond features.
-    ligand_ligand_bond_info = features.LigandLigandBondInfo.compute_features(
-        all_tokens,
-        ligand_ligand_bonds,
-        padding_shapes,
-    )
-
     # Create the Pseudo-beta layout for distogram head and distance error head.
     batch_pseudo_beta_info = features.PseudoBetaInfo.compute_features(
         all_token_atoms_layout=all_token_atoms_layout,
@@ -401,33 +470,104 @@ class WholePdbPipeline:
         logging_name=logging_name,
     )
 
-    # Frame construction.
-    batch_frames = features.Frames.compute_features(
+    # Frame construction, unless it depends on the seeded reference structure.
+    batch_frames = None
+    if self._config.deterministic_frames:
+      batch_frames = features.Frames.compute_features(
+          all_tokens=all_tokens,
+          all_token_atoms_layout=all_token_atoms_layout,
+          ref_structure=deterministic_ref_structure,
+          padding_shapes=padding_shapes,
+      )
+
+    return SeedInvariantFeatures(
+        fold_input_name=fold_input.name,
         all_tokens=all_tokens,
         all_token_atoms_layout=all_token_atoms_layout,
-        ref_structure=(
-            deterministic_ref_structure
-            if self._config.deterministic_frames
-            else batch_ref_structure
-        ),
         padding_shapes=padding_shapes,
-    )
-
-    # Assemble the Batch object.
-    batch = feat_batch.Batch(
+        chemical_components_data=chemical_components_data,
+        ligand_ligand_bonds=ligand_ligand_bonds,
         msa=batch_msa,
         templates=batch_templates,
         token_features=batch_token_features,
-        ref_structure=batch_ref_structure,
         predicted_structure_info=batch_predicted_structure_info,
         polymer_ligand_bond_info=polymer_ligand_bond_info,
-        ligand_ligand_bond_info=ligand_ligand_bond_info,
         pseudo_beta_info=batch_pseudo_beta_info,
         atom_cross_att=batch_atom_cross_att,
         convert_model_output=batch_convert_model_output,
         frames=batch_frames,
     )
 
+  def process_seed(
+      self,
+      seed_invariant: SeedInvariantFeatures,
+      ccd: chemical_components.Ccd,
+      random_seed: int,
+  ) -> features.BatchDict:
+    """Computes the seed-dependent features and assembles the batch.
+
+    Args:
+      seed_invariant: The output of `process_seed_invariant` for the input.
+      ccd: The chemical components dictionary.
+      random_seed: The random seed for the reference conformers.
+
+    Returns:
+      The featurised batch, identical to the output of `process_item` for the
+      same input and random seed.
+    """
+    random_state = np.random.RandomState(seed=random_seed)
+    fold_input_name = seed_invariant.fold_input_name
+    logging.info('processing %s, random_seed=%d', fold_input_name, random_seed)
+    all_tokens = seed_invariant.all_tokens
+    padding_shapes = seed_invariant.padding_shapes
+
+    batch_ref_structure, ligand_ligand_bonds = (
+        features.RefStructure.compute_features(
+            all_token_atoms_layout=seed_invariant.all_token_atoms_layout,
+            ccd=ccd,
+            padding_shapes=padding_shapes,
+            chemical_components_data=seed_invariant.chemical_components_data,
+            random_state=random_state,
+            ref_max_modified_date=self._config.ref_max_modified_date,
+            conformer_max_iterations=self._config.conformer_max_iterations,
+            ligand_ligand_bonds=seed_invariant.ligand_ligand_bonds,
+            conformer_cache=self._conformer_cache,
+            executor=self._executor,
+        )
+    )
+
+    # Create ligand-ligand bond features.
+    ligand_ligand_bond_info = features.LigandLigandBondInfo.compute_features(
+        all_tokens,
+        ligand_ligand_bonds,
+        padding_shapes,
+    )
+
+    # Frame construction.
+    batch_frames = seed_invariant.frames
+    if batch_frames is None:
+      batch_frames = features.Frames.compute_features(
+          all_tokens=all_tokens,
+          all_token_atoms_layout=seed_invariant.all_token_atoms_layout,
+          ref_structure=batch_ref_structure,
+          padding_shapes=padding_shapes,
+      )
+
+    # Assemble the Batch object.
+    batch = feat_batch.Batch(
+        msa=seed_invariant.msa,
+        templates=seed_invariant.templates,
+        token_features=seed_invariant.token_features,
+        ref_structure=batch_ref_structure,
+        predicted_structure_info=seed_invariant.predicted_structure_info,
+        polymer_ligand_bond_info=seed_invariant.polymer_ligand_bond_info,
+        ligand_ligand_bond_info=ligand_ligand_bond_info,
+        pseudo_beta_info=seed_invariant.pseudo_beta_info,
+        atom_cross_att=seed_invariant.atom_cross_att,
+        convert_model_output=seed_invariant.convert_model_output,
+        frames=batch_frames,
+    )
+
     np_example = batch.as_data_dict()
     if 'num_iter_recycling' in np_example:
       del np_example['num_iter_recycling']  # that does not belong here
@@ -440,7 +580,7 @@ class WholePdbPipeline:
       ):
         raise NanDataError(
             'The output of the data pipeline contained nans. '
-            f'nan feature: {name}, fold input name: {fold_input.name}, '
+            f'nan feature: {name}, fold input name: {fold_input_name}, '
             f'random_seed {random_seed}'
         )
 
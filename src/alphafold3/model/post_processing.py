@@ -34,6 +34,8 @@ class ProcessedInferenceResult:
     structure_full_data_json: Content of JSON file with structure full
       confidences calculated from CIF file.
     model_id: Identifier of the model that produced the inference result.
+    structure_full_data_npz: Content of the compact npz file with the structure
+      full confidences, if requested.
   """
 
   cif: bytes
@@ -42,26 +44,28 @@ class ProcessedInferenceResult:
   structure_confidence_summary_json: bytes
   structure_full_data_json: bytes
   model_id: bytes
+  structure_full_data_npz: bytes | None = None
 
 
 def post_process_inference_result(
     inference_result: model.InferenceResult,
+    save_confidences_npz: bool = False,
 ) -> ProcessedInferenceResult:
   """Returns cif, confidence_1d_json, confidence_2d_json, mean_confidence_1d, and ranking confidence."""
 
   # Add mmCIF metadata fields.
   timestamp = datetime.datetime.now().isoformat(sep=' ', timespec='seconds')
-  cif_with_metadata = mmcif_metadata.add_metadata_to_mmcif(
-      old_cif=inference_result.predicted_structure.to_mmcif_dict(),
+  cif_with_metadata = mmcif_metadata.to_mmcif_with_metadata(
+      inference_result.predicted_structure,
       version=f'{version.__version__} @ {timestamp}',
       model_id=inference_result.model_id,
   )
-  cif = mmcif_metadata.add_legal_comment(cif_with_metadata.to_string())
+  cif = mmcif_metadata.add_legal_comment(cif_with_metadata)
   cif = cif.encode('utf-8')
-  confidence_1d = confidence_types.AtomConfidence.from_inference_result(
-      inference_result
-  )
-  mean_confidence_1d = np.mean(confidence_1d.confidence)
+  # The mean of the per-atom confidences of `AtomConfidence`, without building
+  # its per-atom fields.
+  atom_plddts = inference_result.predicted_structure.atom_b_factor.tolist()
+  mean_confidence_1d = np.mean([round(plddt, 2) for plddt in atom_plddts])
   structure_confidence_summary_json = (
       confidence_types.StructureConfidenceSummary.from_inference_result(
           inference_result
@@ -69,13 +73,16 @@ def post_process_inference_result(
       .to_json()
       .encode('utf-8')
   )
-  structure_full_data_json = (
+  structure_full_data = (
       confidence_types.StructureConfidenceFull.from_inference_result(
           inference_result
       )
-      .to_json()
-      .encode('utf-8')
   )
+  structure_full_data_json = structure_full_data.to_json().encode('utf-8')
+  if save_confidences_npz:
+    structure_full_data_npz = structure_full_data.to_npz()
+  else:
+    structure_full_data_npz = None
   return ProcessedInferenceResult(
       cif=cif,
       mean_confidence_1d=mean_confidence_1d,
@@ -83,6 +90,7 @@ def post_process_inference_result(
       structure_confidence_summary_json=structure_confidence_summary_json,
       structure_full_data_json=structure_full_data_json,
       model_id=inference_result.model_id,
+      structure_full_data_npz=structure_full_data_npz,
   )
 
 
@@ -91,9 +99,12 @@ def write_output(
     output_dir: os.PathLike[str] | str,
     terms_of_use: str | None = None,
     name: str | None = None,
+    save_confidences_npz: bool = False,
 ) -> None:
   """Writes processed inference result to a directory."""
-  processed_result = post_process_inference_result(inference_result)
+  processed_result = post_process_inference_result(
+      inference_result, save_confidences_npz=save_confidences_npz
+  )
 
   prefix = f'{name}_' if name is not None else ''
 
@@ -108,6 +119,10 @@ def write_output(
   with open(os.path.join(output_dir, f'{prefix}confidences.json'), 'wb') as f:
     f.write(processed_result.structure_full_data_json)
 
+  if processed_result.structure_full_data_npz is not None:
+    with open(os.path.join(output_dir, f'{prefix}confidences.npz'), 'wb') as f:
+      f.write(processed_result.structure_full_data_npz)
+
   if terms_of_use is not None:
     with open(os.path.join(output_dir, 'TERMS_OF_USE.md'), 'wt') as f:
       f.write(terms_of_use)
@@ -0,0 +1,237 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Benchmarks writing the outputs of all seeds and samples of a fold input.
+
+The inference results are synthetic: copies of a structure with random
+confidences. Peak RSS is a high-water mark, so only one configuration is
+benchmarked per run. The wall time with worker processes includes starting
+them. Run from the repository root, as it uses run_alphafold.
+
+Usage:
+  python -m alphafold3.model.post_processing_benchmark --num_copies=10 \
+      --n_processes=8
+  python -m alphafold3.model.post_processing_benchmark --num_copies=10 \
+      --reference
+"""
+
+import concurrent.futures
+import multiprocessing
+import os
+import pathlib
+import resource
+import tempfile
+import time
+
+from absl import app
+from absl import flags
+from alphafold3 import structure
+from alphafold3.common import folding_input
+from alphafold3.common import resources
+from alphafold3.model import model
+from alphafold3.model import post_processing
+import numpy as np
+
+import run_alphafold
+
+
+_MMCIF_PATH = flags.DEFINE_string(
+    'mmcif_path',
+    None,
+    'Path of the mmCIF file of the predicted structure. Defaults to the largest'
+    ' PDB structure in the test data.',
+)
+_NUM_COPIES = flags.DEFINE_integer(
+    'num_copies',
+    1,
+    'Number of copies of the structure concatenated into the benchmarked one,'
+    ' to benchmark large inputs.',
+    lower_bound=1,
+)
+_NUM_RESULT_SEEDS = flags.DEFINE_integer(
+    'num_result_seeds', 5, 'Number of seeds.', lower_bound=1
+)
+_NUM_RESULT_SAMPLES = flags.DEFINE_integer(
+    'num_result_samples', 5, 'Number of samples per seed.', lower_bound=1
+)
+_N_PROCESSES = flags.DEFINE_integer(
+    'n_processes',
+    1,
+    'Number of worker processes post-processing the samples, see'
+    ' --output_writer_n_processes of run_alphafold. If 1, they are written one'
+    ' by one.',
+    lower_bound=1,
+)
+_REFERENCE = flags.DEFINE_bool(
+    'reference',
+    False,
+    'Whether to benchmark the original implementation instead, which writes'
+    ' the samples one by one and post-processes the top ranked sample again.',
+)
+_SEED = flags.DEFINE_integer('seed', 0, 'Random seed of the confidences.')
+
+
+def _make_inference_result(
+    struc: structure.Structure, rng: np.random.Generator
+) -> model.InferenceResult:
+  """Returns a result with random confidences and a token per residue."""
+  chain_id, res_id = struc.chain_id, struc.res_id
+  is_token_start = np.ones(struc.num_atoms, dtype=bool)
+  is_token_start[1:] = (chain_id[1:] != chain_id[:-1]) | (
+      res_id[1:] != res_id[:-1]
+  )
+  num_tokens = int(np.sum(is_token_start))
+  num_chains = len(struc.chains)
+  return model.InferenceResult(
+      predicted_structure=struc.copy_and_update_atoms(
+          atom_b_factor=rng.uniform(0, 100, struc.num_atoms).astype(np.float32)
+      ),
+      numerical_data={
+          'full_pae': rng.uniform(0, 32, (num_tokens, num_tokens)).astype(
+              np.float32
+          ),
+          'contact_probs': rng.uniform(0, 1, (num_tokens, num_tokens)).astype(
+              np.float32
+          ),
+      },
+      metadata={
+          'ptm': rng.uniform(),
+          'iptm': rng.uniform(),
+          'ranking_score': rng.uniform(),
+          'fraction_disordered': rng.uniform(),
+          'has_clash': 0.0,
+          'chain_pair_pae_min': rng.uniform(0, 32, (num_chains, num_chains)),
+          'chain_pair_iptm': rng.uniform(size=(num_chains, num_chains)),
+          'iptm_ichain': rng.uniform(size=num_chains),
+          'iptm_xchain': rng.uniform(size=num_chains),
+          'token_chain_ids': chain_id[is_token_start].tolist(),
+          'token_res_ids': res_id[is_token_start].tolist(),
+      },
+      model_id=b'post_processing_benchmark',
+  )
+
+
+def _write_outputs_reference(
+    all_inference_results: list[run_alphafold.ResultsForSeed],
+    output_dir: str,
+    job_name: str,
+) -> None:
+  """The original implementation of `run_alphafold.write_outputs`."""
+  max_ranking_score = None
+  max_ranking_result = None
+  for results_for_seed in all_inference_results:
+    seed = results_for_seed.seed
+    for sample_idx, result in enumerate(results_for_seed.inference_results):
+      sample_dir = os.path.join(output_dir, f'seed-{seed}_sample-{sample_idx}')
+      os.makedirs(sample_dir, exist_ok=True)
+      post_processing.write_output(
+          inference_result=result,
+          output_dir=sample_dir,
+          name=f'{job_name}_seed-{seed}_sample-{sample_idx}',
+      )
+      ranking_score = float(result.metadata['ranking_score'])
+      if max_ranking_score is None or ranking_score > max_ranking_score:
+        max_ranking_score = ranking_score
+        max_ranking_result = result
+  post_processing.write_output(
+      inference_result=max_ranking_result, output_dir=output_dir, name=job_name
+  )
+
+
+def _peak_rss_gb(who: int) -> float:
+  # ru_maxrss is in kilobytes on Linux.
+  return resource.getrusage(who).ru_maxrss / 1e6
+
+
+def main(_):
+  if _MMCIF_PATH.value:
+    mmcif_path = pathlib.Path(_MMCIF_PATH.value)
+  else:
+    mmcif_path = max(
+        (resources.ROOT / 'test_data/miniature_databases/pdb_mmcif').glob(
+            '*.cif'
+        ),
+        key=lambda path: path.stat().st_size,
+    )
+  struc = structure.from_mmcif(mmcif_path.read_text())
+  if _NUM_COPIES.value > 1:
+    struc = structure.concat([struc] * _NUM_COPIES.value)
+
+  rng = np.random.default_rng(_SEED.value)
+  fold_input = folding_input.Input(
+      name='post_processing_benchmark',
+      chains=[
+          folding_input.ProteinChain(
+              id='A',
+              sequence='G',
+              ptms=[],
+              unpaired_msa='',
+              paired_msa='',
+              templates=[],
+          )
+      ],
+      rng_seeds=list(range(_NUM_RESULT_SEEDS.value)),
+  )
+  all_inference_results = [
+      run_alphafold.ResultsForSeed(
+          seed=seed,
+          inference_results=[
+              _make_inference_result(struc, rng)
+              for _ in range(_NUM_RESULT_SAMPLES.value)
+          ],
+          full_fold_input=fold_input,
+      )
+      for seed in fold_input.rng_seeds
+  ]
+  num_tokens = len(
+      all_inference_results[0].inference_results[0].metadata['token_chain_ids']
+  )
+  print(
+      f'Writing {_NUM_RESULT_SEEDS.value} seeds x {_NUM_RESULT_SAMPLES.value}'
+      f' samples of {mmcif_path.name} x {_NUM_COPIES.value}'
+      f' ({struc.num_atoms} atoms, {num_tokens} tokens), peak RSS before'
+      f' writing {_peak_rss_gb(resource.RUSAGE_SELF):.2f} GB.'
+  )
+
+  with tempfile.TemporaryDirectory() as output_dir:
+    start_time = time.perf_counter()
+    if _REFERENCE.value:
+      name = 'reference'
+      _write_outputs_reference(
+          all_inference_results, output_dir, job_name=fold_input.name
+      )
+    elif _N_PROCESSES.value > 1:
+      name = f'{_N_PROCESSES.value} processes'
+      with concurrent.futures.ProcessPoolExecutor(
+          max_workers=_N_PROCESSES.value,
+          mp_context=multiprocessing.get_context('spawn'),
+      ) as executor:
+        run_alphafold.write_outputs(
+            all_inference_results,
+            output_dir,
+            job_name=fold_input.name,
+            executor=executor,
+        )
+    else:
+      name = 'serial'
+      run_alphafold.write_outputs(
+          all_inference_results, output_dir, job_name=fold_input.name
+      )
+    wall_time = time.perf_counter() - start_time
+
+  print(
+      f'{name}: wall time {wall_time:.2f} s, peak RSS'
+      f' {_peak_rss_gb(resource.RUSAGE_SELF):.2f} GB, peak RSS of worker'
+      f' processes {_peak_rss_gb(resource.RUSAGE_CHILDREN):.2f} GB'
+  )
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,134 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Cache of the features of structural templates.
+
+Computing the features of a template requires parsing its mmCIF. Fold inputs
+that share a protein chain, e.g. when screening ligands against a protein,
+share its templates, so their features are cached in memory under a hash of
+the mmCIF, the query sequence length and the query to template mapping, and
+shared by all featurisations in the process.
+"""
+
+from collections.abc import Mapping
+import collections
+import dataclasses
+import functools
+import hashlib
+import threading
+from typing import Any
+
+from alphafold3 import structure
+from alphafold3.common import folding_input
+from alphafold3.constants import mmcif_names
+from alphafold3.data import templates
+import numpy as np
+
+
+# Number of templates whose features are kept in memory.
+_DEFAULT_MAX_CACHED_TEMPLATES = 256
+
+
+@dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
+class CacheStats:
+  """Number of template feature lookups by whether they were cached."""
+
+  hits: int
+  misses: int
+
+
+def _template_key(
+    template: folding_input.Template, query_sequence_length: int
+) -> tuple[bytes, int, tuple[tuple[int, int], ...]]:
+  return (
+      hashlib.sha256(template.mmcif.encode('utf-8')).digest(),
+      query_sequence_length,
+      tuple(sorted(template.query_to_template_map.items())),
+  )
+
+
+def compute_hit_features(
+    template: folding_input.Template, query_sequence_length: int
+) -> Mapping[str, Any]:
+  """Parses the template mmCIF and returns its polymer features."""
+  struc = structure.from_mmcif(
+      template.mmcif,
+      fix_mse_residues=True,
+      fix_arginines=True,
+      include_bonds=False,
+      include_water=False,
+      include_other=True,  # For non-standard polymer chains.
+  )
+  return templates.get_polymer_features(
+      chain=struc,
+      chain_poly_type=mmcif_names.PROTEIN_CHAIN,
+      query_sequence_length=query_sequence_length,
+      query_to_hit_mapping=template.query_to_template_map,
+  )
+
+
+class TemplateCache:
+  """An in-memory LRU cache of the polymer features of protein templates."""
+
+  def __init__(self, max_templates: int = _DEFAULT_MAX_CACHED_TEMPLATES):
+    """Initializes the cache.
+
+    Args:
+      max_templates: The maximum number of templates whose features are kept.
+    """
+    self._max_templates = max_templates
+    self._features: collections.OrderedDict[Any, Mapping[str, Any]] = (
+        collections.OrderedDict()
+    )
+    self._lock = threading.Lock()
+    self._hits = 0
+    self._misses = 0
+
+  @property
+  def stats(self) -> CacheStats:
+    with self._lock:
+      return CacheStats(hits=self._hits, misses=self._misses)
+
+  def hit_features(
+      self, template: folding_input.Template, query_sequence_length: int
+  ) -> Mapping[str, Any]:
+    """Returns the polymer features of the template, see `get_polymer_features`.
+
+    The returned arrays are read-only, as they are shared by all callers.
+
+    Args:
+      template: The protein template.
+      query_sequence_length: The length of the query sequence.
+    """
+    key = _template_key(template, query_sequence_length)
+    with self._lock:
+      if key in self._features:
+        self._features.move_to_end(key)
+        self._hits += 1
+        return self._features[key]
+      self._misses += 1
+
+    features = dict(compute_hit_features(template, query_sequence_length))
+    for value in features.values():
+      if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+
+    with self._lock:
+      self._features[key] = features
+      self._features.move_to_end(key)
+      while len(self._features) > self._max_templates:
+        self._features.popitem(last=False)
+    return features
+
+
+@functools.cache
+def get_cache() -> TemplateCache:
+  """Returns the cache shared by all featurisations in the process."""
+  return TemplateCache()
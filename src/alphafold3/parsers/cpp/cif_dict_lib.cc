@@ -150,6 +150,8 @@ absl::StatusOr<std::vector<absl::string_view>> TokenizeInternal(
   return tokens;
 }
 
+}  // namespace
+
 absl::string_view GetEscapeQuote(const absl::string_view value) {
   // Empty values should not happen, but if so, they should be quoted.
   if (value.empty()) {
@@ -190,6 +192,8 @@ absl::string_view GetEscapeQuote(const absl::string_view value) {
   return "";
 }
 
+namespace {
+
 int RecordIndex(absl::string_view record) {
   if (record == "_entry") {
     return 0;  // _entry is always first.
@@ -303,6 +307,15 @@ struct GroupedKeys {
 
 }  // namespace
 
+bool LoopKeyLess(absl::string_view lhs, absl::string_view rhs) {
+  // Make sure we sort the _atom_site loop in the standard way.
+  if (lhs.substr(0, lhs.find('.')) == "_atom_site") {
+    return AtomSiteOrder{}(lhs, rhs);
+  }
+  // Make the key ordering within other key groups deterministic.
+  return lhs < rhs;
+}
+
 absl::StatusOr<CifDict> CifDict::FromString(absl::string_view cif_string) {
   CifDict::Dict cif;
 
@@ -449,19 +462,10 @@ absl::StatusOr<std::string> CifDict::ToString() const {
   }
 
   for (auto& [key_prefix, group_info] : grouped_keys) {
-    if (key_prefix == "_atom_site") {
-      // Make sure we sort the _atom_site loop in the standard way.
-      absl::c_sort(group_info.grouped_columns,
-                   [](const Column& lhs, const Column& rhs) {
-                     return AtomSiteOrder{}(lhs.key(), rhs.key());
-                   });
-    } else {
-      // Make the key ordering within a key group deterministic.
-      absl::c_sort(group_info.grouped_columns,
-                   [](const Column& lhs, const Column& rhs) {
-                     return lhs.key() < rhs.key();
-                   });
-    }
+    absl::c_sort(group_info.grouped_columns,
+                 [](const Column& lhs, const Column& rhs) {
+                   return LoopKeyLess(lhs.key(), rhs.key());
+                 });
 
     // Force `_atom_site` field to always be a loop. This resolves issues with
     // third party mmCIF parsers such as OpenBabel which always expect a loop
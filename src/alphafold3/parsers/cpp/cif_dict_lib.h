@@ -129,6 +129,14 @@ absl::StatusOr<std::vector<std::string>> Tokenize(absl::string_view cif_string);
 absl::StatusOr<std::vector<absl::string_view>> SplitLine(
     absl::string_view line);
 
+// Returns the quote a value must be enclosed in when written to a CIF, or an
+// empty string if the value can be written as it is.
+absl::string_view GetEscapeQuote(absl::string_view value);
+
+// Whether the key `lhs` precedes the key `rhs` of the same key group (e.g. the
+// columns of a loop) in a CIF written by `CifDict::ToString`.
+bool LoopKeyLess(absl::string_view lhs, absl::string_view rhs);
+
 // Parses a CIF string with multiple data records and returns a mapping from
 // record names to CifDict objects. For instance, the following CIF string:
 //
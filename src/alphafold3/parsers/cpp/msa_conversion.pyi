@@ -24,3 +24,11 @@ def align_sequence_to_gapless_query(
 
 
 def convert_a3m_to_stockholm(a3m_sequences: Iterable[str]) -> list[str]: ...
+
+
+def convert_stockholm_to_a3m(
+    stockholm_path: str,
+    max_sequences: int | None = None,
+    remove_first_row_gaps: bool = True,
+    linewidth: int | None = None,
+) -> str: ...
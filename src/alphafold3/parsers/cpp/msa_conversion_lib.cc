@@ -0,0 +1,259 @@
+// Copyright 2024 DeepMind Technologies Limited
+//
+// AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+// this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+//
+// To request access to the AlphaFold 3 model parameters, follow the process set
+// out at https://github.com/google-deepmind/alphafold3. You may only use these
+// if received directly from Google. Use is subject to terms of use available at
+// https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+#include "alphafold3/parsers/cpp/msa_conversion_lib.h"
+
+#include <algorithm>
+#include <cstddef>
+#include <cstdint>
+#include <cstring>
+#include <fstream>
+#include <ios>
+#include <optional>
+#include <string>
+#include <vector>
+
+#include "absl/container/flat_hash_map.h"
+#include "absl/status/status.h"
+#include "absl/status/statusor.h"
+#include "absl/strings/ascii.h"
+#include "absl/strings/match.h"
+#include "absl/strings/str_cat.h"
+#include "absl/strings/str_format.h"
+#include "absl/strings/string_view.h"
+
+namespace alphafold3 {
+namespace {
+
+// Size of the chunks the Stockholm file is read in.
+constexpr std::size_t kChunkSize = 1 << 20;
+
+// Reads lines of a file chunk by chunk. Lines are only valid until the next
+// call to `Next`.
+class LineReader {
+ public:
+  explicit LineReader(std::ifstream& stream)
+      : stream_(stream), buffer_(kChunkSize) {}
+
+  // Sets `line` to the next line without the newline. Returns false at the end
+  // of the file.
+  bool Next(absl::string_view& line) {
+    while (true) {
+      const char* start = buffer_.data() + begin_;
+      const std::size_t available = end_ - begin_;
+      if (const void* newline = std::memchr(start, '\n', available);
+          newline != nullptr) {
+        const std::size_t length = static_cast<const char*>(newline) - start;
+        line = absl::string_view(start, length);
+        begin_ += length + 1;
+        return true;
+      }
+      if (eof_) {
+        if (available == 0) {
+          return false;
+        }
+        line = absl::string_view(start, available);
+        begin_ = end_;
+        return true;
+      }
+      // Move the partial last line to the front and read the next chunk. The
+      // buffer only grows for lines longer than it.
+      std::memmove(buffer_.data(), start, available);
+      begin_ = 0;
+      end_ = available;
+      if (end_ == buffer_.size()) {
+        buffer_.resize(2 * buffer_.size());
+      }
+      stream_.read(buffer_.data() + end_, buffer_.size() - end_);
+      end_ += stream_.gcount();
+      eof_ = !stream_;
+    }
+  }
+
+  // Whether reading failed for another reason than reaching the end of file.
+  bool Failed() const { return stream_.bad(); }
+
+ private:
+  std::ifstream& stream_;
+  std::vector<char> buffer_;
+  std::size_t begin_ = 0;
+  std::size_t end_ = 0;
+  bool eof_ = false;
+};
+
+// Removes and returns the first whitespace-delimited token of `text`.
+absl::string_view ConsumeToken(absl::string_view& text) {
+  text = absl::StripLeadingAsciiWhitespace(text);
+  const std::size_t token_end =
+      std::find_if(text.begin(), text.end(), absl::ascii_isspace) -
+      text.begin();
+  absl::string_view token = text.substr(0, token_end);
+  text.remove_prefix(token_end);
+  return token;
+}
+
+}  // namespace
+
+absl::StatusOr<std::string> AlignSequenceToGaplessQuery(
+    absl::string_view sequence, absl::string_view query_sequence) {
+  if (sequence.size() != query_sequence.size()) {
+    return absl::InvalidArgumentError(
+        absl::StrFormat("The sequence (%d) and the query sequence (%d) don't "
+                        "have the same length.",
+                        sequence.size(), query_sequence.size()));
+  }
+  std::string output;
+  output.reserve(sequence.size());
+  for (std::size_t residue_index = 0, sequence_length = sequence.size();
+       residue_index < sequence_length; ++residue_index) {
+    const char query_residue = query_sequence[residue_index];
+    const char residue = sequence[residue_index];
+    if (query_residue != '-') {
+      // No gap in the query, so the residue is aligned.
+      output += residue;
+    } else if (residue == '-') {
+      // Gap in both sequence and query, simply skip.
+      continue;
+    } else {
+      // Gap only in the query, so this must be an inserted residue.
+      output += absl::ascii_tolower(residue);
+    }
+  }
+  return output;
+}
+
+absl::StatusOr<std::string> ConvertStockholmToA3m(
+    absl::string_view stockholm_path, std::optional<int64_t> max_sequences,
+    bool remove_first_row_gaps, std::optional<int64_t> linewidth) {
+  if (linewidth.has_value() && *linewidth <= 0) {
+    return absl::InvalidArgumentError("linewidth must be > 0 or None");
+  }
+  std::ifstream stream{std::string(stockholm_path), std::ios::binary};
+  if (!stream.is_open()) {
+    return absl::NotFoundError(
+        absl::StrCat("Failed to open Stockholm file: ", stockholm_path));
+  }
+
+  std::vector<std::string> names;
+  std::vector<std::string> sequences;
+  absl::flat_hash_map<std::string, std::size_t> index_by_name;
+  absl::flat_hash_map<std::string, std::string> descriptions;
+  // A limit of 0 means no limit.
+  const bool has_limit = max_sequences.has_value() && *max_sequences != 0;
+  auto reached_max_sequences = [&]() {
+    return has_limit && static_cast<int64_t>(names.size()) >= *max_sequences;
+  };
+
+  LineReader reader(stream);
+  absl::string_view line;
+  while (reader.Next(line)) {
+    line = absl::StripAsciiWhitespace(line);
+    // Ignore blank lines, markup other than descriptions and end symbols.
+    if (line.empty() || absl::StartsWith(line, "//")) {
+      continue;
+    }
+    if (line.front() == '#') {
+      if (!absl::StartsWith(line, "#=GS")) {
+        continue;
+      }
+      // Description row - example format is:
+      // #=GS UniRef90_Q9H5Z4/4-78          DE [subseq from] cDNA: FLJ22755 ...
+      absl::string_view columns = line;
+      ConsumeToken(columns);  // #=GS
+      absl::string_view name = ConsumeToken(columns);
+      absl::string_view feature = ConsumeToken(columns);
+      if (feature.empty()) {
+        return absl::InvalidArgumentError(
+            absl::StrCat("Invalid Stockholm #=GS row: ", line));
+      }
+      if (feature != "DE" ||
+          (reached_max_sequences() && !index_by_name.contains(name))) {
+        continue;
+      }
+      descriptions.insert_or_assign(
+          name, std::string(absl::StripLeadingAsciiWhitespace(columns)));
+      continue;
+    }
+
+    // Alignment row, a sequence name followed by part of its sequence.
+    absl::string_view aligned_sequence = line;
+    absl::string_view name = ConsumeToken(aligned_sequence);
+    aligned_sequence = absl::StripLeadingAsciiWhitespace(aligned_sequence);
+    if (aligned_sequence.empty()) {
+      return absl::InvalidArgumentError(
+          absl::StrCat("Invalid Stockholm alignment row: ", line));
+    }
+    auto it = index_by_name.find(name);
+    if (it == index_by_name.end()) {
+      if (reached_max_sequences()) {
+        continue;
+      }
+      it = index_by_name.emplace(name, names.size()).first;
+      names.emplace_back(name);
+      sequences.emplace_back();
+      if (reached_max_sequences()) {
+        // Descriptions of sequences that won't be kept are no longer needed.
+        absl::erase_if(descriptions, [&](const auto& name_and_description) {
+          return !index_by_name.contains(name_and_description.first);
+        });
+      }
+    }
+    absl::StrAppend(&sequences[it->second], aligned_sequence);
+  }
+  if (reader.Failed()) {
+    return absl::InternalError(
+        absl::StrCat("Failed to read Stockholm file: ", stockholm_path));
+  }
+
+  if (sequences.empty()) {
+    return "";
+  }
+
+  // The query sequence is assumed to be the first sequence.
+  const std::string query_sequence = sequences.front();
+  std::string a3m;
+  for (std::size_t i = 0; i < sequences.size(); ++i) {
+    std::string a3m_sequence;
+    if (remove_first_row_gaps) {
+      absl::StatusOr<std::string> aligned_sequence =
+          AlignSequenceToGaplessQuery(sequences[i], query_sequence);
+      if (!aligned_sequence.ok()) {
+        return aligned_sequence.status();
+      }
+      a3m_sequence = *std::move(aligned_sequence);
+    } else {
+      a3m_sequence = std::move(sequences[i]);
+    }
+    // Release the Stockholm sequence as soon as it is converted.
+    std::string().swap(sequences[i]);
+    a3m_sequence.erase(
+        std::remove(a3m_sequence.begin(), a3m_sequence.end(), '.'),
+        a3m_sequence.end());
+
+    auto description = descriptions.find(names[i]);
+    absl::StrAppend(&a3m, ">", names[i], " ",
+                    description != descriptions.end() ? description->second
+                                                      : "",
+                    "\n");
+    if (linewidth.has_value()) {
+      for (std::size_t start = 0; start < a3m_sequence.size();
+           start += *linewidth) {
+        absl::StrAppend(
+            &a3m, absl::string_view(a3m_sequence).substr(start, *linewidth),
+            "\n");
+      }
+    } else {
+      absl::StrAppend(&a3m, a3m_sequence, "\n");
+    }
+  }
+  return a3m;
+}
+
+}  // namespace alphafold3
@@ -0,0 +1,50 @@
+/*
+ * Copyright 2024 DeepMind Technologies Limited
+ *
+ * AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+ * this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+ *
+ * To request access to the AlphaFold 3 model parameters, follow the process set
+ * out at https://github.com/google-deepmind/alphafold3. You may only use these
+ * if received directly from Google. Use is subject to terms of use available at
+ * https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+ */
+
+// Conversions between MSA formats.
+#ifndef ALPHAFOLD3_SRC_ALPHAFOLD3_PARSERS_PYTHON_MSA_CONVERSION_LIB_H_
+#define ALPHAFOLD3_SRC_ALPHAFOLD3_PARSERS_PYTHON_MSA_CONVERSION_LIB_H_
+
+#include <cstdint>
+#include <optional>
+#include <string>
+
+#include "absl/status/statusor.h"
+#include "absl/strings/string_view.h"
+
+namespace alphafold3 {
+
+// Aligns a sequence to a gapless query sequence. Columns with a gap in both
+// are dropped, residues in columns with a gap only in the query are lowercased.
+// Returns an error if the sequences are not of the same length.
+absl::StatusOr<std::string> AlignSequenceToGaplessQuery(
+    absl::string_view sequence, absl::string_view query_sequence);
+
+// Converts an MSA file in Stockholm format to the A3M format.
+//
+// The file is read in a single pass, chunk by chunk, and only the first
+// `max_sequences` sequences (by order of their first row) are kept, together
+// with their `#=GS <name> DE` descriptions. Rows of all other sequences are
+// skipped without being copied, so that the memory used is bounded by the size
+// of the kept sequences, irrespective of the size of the file. Interleaved
+// alignment blocks are concatenated. If `max_sequences` is not set or 0, all
+// sequences are kept. The first sequence is the query, if
+// `remove_first_row_gaps` is set the columns with gaps in the query are removed
+// as in `AlignSequenceToGaplessQuery`. If `linewidth` is set, sequences are
+// wrapped to lines of at most `linewidth` characters.
+absl::StatusOr<std::string> ConvertStockholmToA3m(
+    absl::string_view stockholm_path, std::optional<int64_t> max_sequences,
+    bool remove_first_row_gaps, std::optional<int64_t> linewidth);
+
+}  // namespace alphafold3
+
+#endif  // ALPHAFOLD3_SRC_ALPHAFOLD3_PARSERS_PYTHON_MSA_CONVERSION_LIB_H_
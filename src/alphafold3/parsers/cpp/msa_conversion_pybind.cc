@@ -8,18 +8,28 @@
 // if received directly from Google. Use is subject to terms of use available at
 // https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
 
+#include <Python.h>
+
 #include <algorithm>
+#include <cerrno>
 #include <cstddef>
+#include <cstdint>
+#include <optional>
 #include <stdexcept>
 #include <string>
+#include <utility>
 #include <vector>
 
+#include "absl/status/status.h"
+#include "absl/status/statusor.h"
 #include "absl/strings/ascii.h"
 #include "absl/strings/str_format.h"
 #include "absl/strings/string_view.h"
+#include "alphafold3/parsers/cpp/msa_conversion_lib.h"
 #include "pybind11/pybind11.h"
 #include "pybind11/stl.h"
 
+namespace alphafold3 {
 namespace {
 
 namespace py = pybind11;
@@ -80,31 +90,33 @@ std::vector<std::string> ConvertA3MToStockholm(
   return stockholm_sequences;
 }
 
-std::string AlignSequenceToGaplessQuery(absl::string_view sequence,
-                                        absl::string_view query_sequence) {
-  if (sequence.size() != query_sequence.size()) {
-    throw py::value_error(
-        absl::StrFormat("The sequence (%d) and the query sequence (%d) don't "
-                        "have the same length.",
-                        sequence.size(), query_sequence.size()));
+std::string AlignSequenceToGaplessQueryOrThrow(
+    absl::string_view sequence, absl::string_view query_sequence) {
+  absl::StatusOr<std::string> output =
+      AlignSequenceToGaplessQuery(sequence, query_sequence);
+  if (!output.ok()) {
+    throw py::value_error(std::string(output.status().message()));
   }
-  std::string output;
-  for (std::size_t residue_index = 0, sequence_length = sequence.size();
-       residue_index < sequence_length; ++residue_index) {
-    const char query_residue = query_sequence[residue_index];
-    const char residue = sequence[residue_index];
-    if (query_residue != '-') {
-      // No gap in the query, so the residue is aligned.
-      output += residue;
-    } else if (residue == '-') {
-      // Gap in both sequence and query, simply skip.
-      continue;
-    } else {
-      // Gap only in the query, so this must be an inserted residue.
-      output += absl::ascii_tolower(residue);
-    }
+  return *std::move(output);
+}
+
+std::string ConvertStockholmToA3mOrThrow(absl::string_view stockholm_path,
+                                         std::optional<int64_t> max_sequences,
+                                         bool remove_first_row_gaps,
+                                         std::optional<int64_t> linewidth) {
+  absl::StatusOr<std::string> a3m = ConvertStockholmToA3m(
+      stockholm_path, max_sequences, remove_first_row_gaps, linewidth);
+  if (absl::IsNotFound(a3m.status())) {
+    // Raise FileNotFoundError, as opening the file in Python would.
+    errno = ENOENT;
+    PyErr_SetFromErrnoWithFilename(PyExc_OSError,
+                                   std::string(stockholm_path).c_str());
+    throw py::error_already_set();
+  }
+  if (!a3m.ok()) {
+    throw py::value_error(a3m.status().ToString());
   }
-  return output;
+  return *std::move(a3m);
 }
 
 constexpr char kConvertA3mToStockholm[] = R"(
@@ -145,18 +157,42 @@ Returns
   `query_sequence` has a gap, but the `sequence` does not.
 )";
 
-}  // namespace
+constexpr char kConvertStockholmToA3m[] = R"(
+Converts an MSA file in Stockholm format to the A3M format.
 
-namespace alphafold3 {
+The file is read in a single pass, chunk by chunk, keeping only the first
+`max_sequences` sequences and their `#=GS <name> DE` descriptions. Rows of all
+other sequences are skipped, so memory use is bounded by the size of the kept
+sequences, irrespective of the size of the file.
+
+Args:
+  stockholm_path: The path of the Stockholm file.
+  max_sequences: The maximum number of sequences to keep, the first sequence
+    being the query. If None or 0, all sequences are kept.
+  remove_first_row_gaps: Whether to remove the columns with gaps in the query,
+    as in `align_sequence_to_gapless_query`.
+  linewidth: If set, the maximum length of the sequence lines.
+
+Returns
+  The MSA in A3M format.
+)";
+
+}  // namespace
 
 void RegisterModuleMsaConversion(pybind11::module m) {
   m.def("convert_a3m_to_stockholm", &ConvertA3MToStockholm,
         py::arg("a3m_sequences"), py::call_guard<py::gil_scoped_release>(),
         py::doc(kConvertA3mToStockholm + 1));
-  m.def("align_sequence_to_gapless_query", &AlignSequenceToGaplessQuery,
-        py::arg("sequence"), py::arg("query_sequence"),
-        py::call_guard<py::gil_scoped_release>(),
+  m.def("align_sequence_to_gapless_query",
+        &AlignSequenceToGaplessQueryOrThrow, py::arg("sequence"),
+        py::arg("query_sequence"), py::call_guard<py::gil_scoped_release>(),
         py::doc(kAlignSequenceToGaplessQuery + 1));
+  m.def("convert_stockholm_to_a3m", &ConvertStockholmToA3mOrThrow,
+        py::arg("stockholm_path"), py::arg("max_sequences") = std::nullopt,
+        py::arg("remove_first_row_gaps") = true,
+        py::arg("linewidth") = std::nullopt,
+        py::call_guard<py::gil_scoped_release>(),
+        py::doc(kConvertStockholmToA3m + 1));
 }
 
 }  // namespace alphafold3
@@ -0,0 +1,74 @@
+/*
+ * Copyright 2024 DeepMind Technologies Limited
+ *
+ * AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+ * this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+ *
+ * To request access to the AlphaFold 3 model parameters, follow the process set
+ * out at https://github.com/google-deepmind/alphafold3. You may only use these
+ * if received directly from Google. Use is subject to terms of use available at
+ * https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+ */
+
+// Writes CIF loops directly from arrays of values, without building a CifDict.
+#ifndef ALPHAFOLD3_SRC_ALPHAFOLD3_STRUCTURE_PYTHON_MMCIF_WRITER_H_
+#define ALPHAFOLD3_SRC_ALPHAFOLD3_STRUCTURE_PYTHON_MMCIF_WRITER_H_
+
+#include <cstddef>
+#include <cstdint>
+#include <string>
+#include <utility>
+#include <vector>
+
+#include "absl/status/status.h"
+#include "absl/strings/string_view.h"
+#include "absl/types/span.h"
+
+namespace alphafold3 {
+
+// A column of a CIF loop. The values are stored contiguously, since loops like
+// _atom_site have millions of values.
+class LoopColumn {
+ public:
+  explicit LoopColumn(std::string key) : key_(std::move(key)) {}
+
+  absl::string_view key() const { return key_; }
+
+  // Returns the number of values in the column.
+  size_t size() const { return ends_.size(); }
+
+  absl::string_view operator[](size_t index) const {
+    const size_t start = index == 0 ? 0 : ends_[index - 1];
+    return absl::string_view(buffer_).substr(start, ends_[index] - start);
+  }
+
+  void Reserve(size_t num_values, size_t num_bytes) {
+    ends_.reserve(num_values);
+    buffer_.reserve(num_bytes);
+  }
+
+  void Append(absl::string_view value);
+
+  void AppendInt(int64_t value);
+
+  // Formats the value with the given number of decimal places, including
+  // trailing zeros, the same way as `format_float_array`.
+  void AppendFloat(float value, int num_decimal_places);
+
+ private:
+  std::string key_;
+  std::string buffer_;
+  std::vector<size_t> ends_;
+};
+
+// Appends a loop with the given columns to a CIF string. The columns are
+// written in the order of `LoopKeyLess`, and the loop is formatted byte for
+// byte as `CifDict::ToString` formats a loop with the same values, including
+// the trailing comment line. Unlike `CifDict::ToString`, a loop with a single
+// row is still written as a loop, as `CifDict::ToString` writes _atom_site.
+absl::Status AppendLoop(absl::Span<const LoopColumn> columns,
+                        std::string* output);
+
+}  // namespace alphafold3
+
+#endif  // ALPHAFOLD3_SRC_ALPHAFOLD3_STRUCTURE_PYTHON_MMCIF_WRITER_H_
@@ -0,0 +1,116 @@
+// Copyright 2024 DeepMind Technologies Limited
+//
+// AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+// this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+//
+// To request access to the AlphaFold 3 model parameters, follow the process set
+// out at https://github.com/google-deepmind/alphafold3. You may only use these
+// if received directly from Google. Use is subject to terms of use available at
+// https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+#include <algorithm>
+#include <cstddef>
+#include <cstdint>
+#include <string>
+#include <vector>
+
+#include "absl/algorithm/container.h"
+#include "absl/status/status.h"
+#include "absl/strings/match.h"
+#include "absl/strings/str_cat.h"
+#include "absl/strings/str_format.h"
+#include "absl/strings/string_view.h"
+#include "absl/types/span.h"
+#include "alphafold3/parsers/cpp/cif_dict_lib.h"
+#include "alphafold3/structure/cpp/mmcif_writer.h"
+
+namespace alphafold3 {
+
+void LoopColumn::Append(absl::string_view value) {
+  absl::StrAppend(&buffer_, value);
+  ends_.push_back(buffer_.size());
+}
+
+void LoopColumn::AppendInt(int64_t value) {
+  absl::StrAppend(&buffer_, value);
+  ends_.push_back(buffer_.size());
+}
+
+void LoopColumn::AppendFloat(float value, int num_decimal_places) {
+  absl::StrAppendFormat(&buffer_, "%.*f", num_decimal_places, value);
+  ends_.push_back(buffer_.size());
+}
+
+absl::Status AppendLoop(absl::Span<const LoopColumn> columns,
+                        std::string* output) {
+  if (columns.empty()) {
+    return absl::InvalidArgumentError("A loop must have at least one column.");
+  }
+  const size_t num_rows = columns.front().size();
+  std::vector<const LoopColumn*> sorted_columns;
+  sorted_columns.reserve(columns.size());
+  for (const LoopColumn& column : columns) {
+    if (column.size() != num_rows) {
+      return absl::InvalidArgumentError(absl::StrFormat(
+          "Values for key %s have different length (%d) than the other values "
+          "of the loop (%d).",
+          column.key(), column.size(), num_rows));
+    }
+    sorted_columns.push_back(&column);
+  }
+  absl::c_sort(sorted_columns,
+               [](const LoopColumn* lhs, const LoopColumn* rhs) {
+                 return LoopKeyLess(lhs->key(), rhs->key());
+               });
+
+  // Every value is padded to the length of the longest value of its column,
+  // quotes included, plus one space. Values with newlines aren't padded.
+  std::vector<size_t> widths;
+  widths.reserve(sorted_columns.size());
+  size_t row_length = 1;
+  for (const LoopColumn* column : sorted_columns) {
+    size_t max_value_length = 0;
+    for (size_t i = 0; i < num_rows; ++i) {
+      const absl::string_view value = (*column)[i];
+      if (!absl::StrContains(value, '\n')) {
+        max_value_length = std::max(
+            max_value_length, value.size() + GetEscapeQuote(value).size() * 2);
+      }
+    }
+    widths.push_back(max_value_length + 1);
+    row_length += max_value_length + 1;
+  }
+
+  output->reserve(output->size() + num_rows * row_length);
+  absl::StrAppend(output, "loop_\n");
+  for (const LoopColumn* column : sorted_columns) {
+    absl::StrAppend(output, column->key(), "\n");
+  }
+  const size_t last_column_index = sorted_columns.size() - 1;
+  for (size_t i = 0; i < num_rows; ++i) {
+    for (size_t column_index = 0; column_index < sorted_columns.size();
+         ++column_index) {
+      const absl::string_view value = (*sorted_columns[column_index])[i];
+      if (absl::StrContains(value, '\n')) {
+        // Multi-line, laid out as in CifDict::ToString.
+        if (column_index == 0) {
+          absl::StrAppend(output, ";", value, "\n;\n");
+        } else if (column_index == last_column_index) {
+          absl::StrAppend(output, "\n;", value, "\n;");
+        } else {
+          absl::StrAppend(output, "\n;", value, "\n;\n");
+        }
+      } else {
+        const absl::string_view quote = GetEscapeQuote(value);
+        absl::StrAppend(output, quote, value, quote);
+        output->append(
+            widths[column_index] - value.size() - quote.size() * 2, ' ');
+      }
+    }
+    output->push_back('\n');
+  }
+  absl::StrAppend(output, "#\n");  // Comment token after every key group.
+  return absl::OkStatus();
+}
+
+}  // namespace alphafold3
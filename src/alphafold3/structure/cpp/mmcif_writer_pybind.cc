@@ -0,0 +1,175 @@
+// Copyright 2024 DeepMind Technologies Limited
+//
+// AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+// this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+//
+// To request access to the AlphaFold 3 model parameters, follow the process set
+// out at https://github.com/google-deepmind/alphafold3. You may only use these
+// if received directly from Google. Use is subject to terms of use available at
+// https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+#include <Python.h>
+
+#include <cstddef>
+#include <cstdint>
+#include <string>
+#include <vector>
+
+#include "absl/container/flat_hash_map.h"
+#include "absl/status/status.h"
+#include "absl/strings/str_cat.h"
+#include "absl/strings/string_view.h"
+#include "absl/types/span.h"
+#include "alphafold3/structure/cpp/mmcif_writer.h"
+#include "pybind11/cast.h"
+#include "pybind11/gil.h"
+#include "pybind11/numpy.h"
+#include "pybind11/pybind11.h"
+#include "pybind11/pytypes.h"
+#include "pybind11_abseil/absl_casters.h"
+
+namespace {
+
+namespace py = pybind11;
+
+using alphafold3::LoopColumn;
+
+using FloatArray =
+    py::array_t<float, py::array::c_style | py::array::forcecast>;
+using IntArray =
+    py::array_t<int64_t, py::array::c_style | py::array::forcecast>;
+using ObjectArray = py::array_t<PyObject*, py::array::c_style>;
+
+struct FloatColumn {
+  size_t column_index;
+  FloatArray values;
+  int num_decimal_places;
+};
+
+struct IntColumn {
+  size_t column_index;
+  IntArray values;
+};
+
+std::string FormatLoop(
+    const py::dict& columns,
+    const absl::flat_hash_map<std::string, int>& num_decimal_places) {
+  std::vector<LoopColumn> loop_columns;
+  loop_columns.reserve(columns.size());
+  // Strings are read with the GIL held, numbers are formatted without it.
+  std::vector<FloatColumn> float_columns;
+  std::vector<IntColumn> int_columns;
+  for (const auto& [key, values] : columns) {
+    const size_t column_index = loop_columns.size();
+    LoopColumn& column = loop_columns.emplace_back(py::cast<std::string>(key));
+    py::array array = py::array::ensure(values);
+    if (!array || array.ndim() != 1) {
+      throw py::value_error(
+          absl::StrCat("The values of ", column.key(), " must be a 1D array."));
+    }
+    switch (array.dtype().kind()) {
+      case 'O': {
+        ObjectArray objects = ObjectArray::ensure(array);
+        column.Reserve(objects.size(), objects.size() * 4);
+        for (PyObject* value :
+             absl::Span<PyObject* const>(objects.data(), objects.size())) {
+          if (!PyUnicode_Check(value)) {
+            throw py::type_error(absl::StrCat(
+                "The values of ", column.key(), " must be strings, got ",
+                Py_TYPE(value)->tp_name, "."));
+          }
+          Py_ssize_t size;
+          const char* data = PyUnicode_AsUTF8AndSize(value, &size);
+          if (data == nullptr) {
+            throw py::error_already_set();
+          }
+          column.Append(absl::string_view(data, size));
+        }
+        break;
+      }
+      case 'b':
+      case 'i':
+      case 'u':
+        int_columns.push_back({column_index, IntArray::ensure(array)});
+        break;
+      case 'f': {
+        auto it = num_decimal_places.find(column.key());
+        if (it == num_decimal_places.end()) {
+          throw py::key_error(absl::StrCat(
+              "Missing the number of decimal places of ", column.key(), "."));
+        }
+        float_columns.push_back(
+            {column_index, FloatArray::ensure(array), it->second});
+        break;
+      }
+      default:
+        throw py::type_error(absl::StrCat(
+            "The values of ", column.key(),
+            " must be an array of objects, integers or floats."));
+    }
+  }
+
+  std::string output;
+  absl::Status status;
+  {
+    py::gil_scoped_release gil_release;
+    for (const FloatColumn& float_column : float_columns) {
+      LoopColumn& column = loop_columns[float_column.column_index];
+      const size_t num_values = float_column.values.size();
+      column.Reserve(num_values, num_values * 8);
+      for (const float value :
+           absl::Span<const float>(float_column.values.data(), num_values)) {
+        column.AppendFloat(value, float_column.num_decimal_places);
+      }
+    }
+    for (const IntColumn& int_column : int_columns) {
+      LoopColumn& column = loop_columns[int_column.column_index];
+      const size_t num_values = int_column.values.size();
+      column.Reserve(num_values, num_values * 6);
+      for (const int64_t value :
+           absl::Span<const int64_t>(int_column.values.data(), num_values)) {
+        column.AppendInt(value);
+      }
+    }
+    status = alphafold3::AppendLoop(loop_columns, &output);
+  }
+  if (!status.ok()) {
+    throw py::value_error(status.ToString());
+  }
+  return output;
+}
+
+constexpr char kFormatLoop[] = R"(
+Formats a CIF loop directly from arrays of values.
+
+The loop is formatted byte for byte as CifDict.to_string() formats a loop with
+the same values, i.e. the columns are sorted in the same order and the values
+are quoted and padded the same way. This is much faster than converting every
+value to a Python string and building a CifDict, which makes it suitable for
+writing large _atom_site tables. The loop is written even if it has a single
+row, as CifDict.to_string() writes _atom_site.
+
+Args:
+  columns: A mapping from the keys of the loop, e.g. '_atom_site.id', to 1D
+    arrays with their values, all of the same length. Arrays of objects must
+    hold strings, arrays of integers are formatted as decimal integers and
+    arrays of floats are cast to float32 and formatted as format_float_array
+    formats them.
+  num_decimal_places: A mapping from the keys of float columns to the number of
+    decimal places to format their values with, including trailing zeros.
+
+Returns:
+  The loop, starting with the loop_ line and ending with a comment line, to be
+  appended to a CIF string.
+)";
+
+}  // namespace
+
+namespace alphafold3 {
+
+void RegisterModuleMmcifWriter(py::module m) {
+  m.def("format_loop", &FormatLoop, py::arg("columns"),
+        py::arg("num_decimal_places"), py::doc(kFormatLoop + 1));
+}
+
+}  // namespace alphafold3
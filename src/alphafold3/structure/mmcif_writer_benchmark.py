@@ -0,0 +1,116 @@
+# Copyright 2024 DeepMind Technologies Limited
+#
+# AlphaFold 3 source code is licensed under CC BY-NC-SA 4.0. To view a copy of
+# this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+# To request access to the AlphaFold 3 model parameters, follow the process set
+# out at https://github.com/google-deepmind/alphafold3. You may only use these
+# if received directly from Google. Use is subject to terms of use available at
+# https://github.com/google-deepmind/alphafold3/blob/main/WEIGHTS_TERMS_OF_USE.md
+
+"""Benchmarks writing mmCIF strings of large structures.
+
+Compares writing the _atom_site table directly from the atom arrays with
+formatting it into an Mmcif first, for a structure and for a structure with
+ModelCIF metadata as written for predictions, and checks the strings are
+identical. The structure is made of copies of a structure concatenated until it
+has at least the requested number of atoms.
+
+Usage:
+  python -m alphafold3.structure.mmcif_writer_benchmark --num_atoms=100000
+"""
+
+from collections.abc import Callable
+import pathlib
+import time
+
+from absl import app
+from absl import flags
+from alphafold3 import structure
+from alphafold3.common import resources
+from alphafold3.model import mmcif_metadata
+import numpy as np
+
+
+_MMCIF_PATH = flags.DEFINE_string(
+    'mmcif_path',
+    None,
+    'Path of the mmCIF file of the structure. Defaults to the largest PDB'
+    ' structure in the test data.',
+)
+_NUM_ATOMS = flags.DEFINE_integer(
+    'num_atoms',
+    100_000,
+    'Minimum number of atoms of the benchmarked structure.',
+    lower_bound=1,
+)
+_NUM_REPEATS = flags.DEFINE_integer(
+    'num_repeats', 5, 'Number of timed runs, the best is reported.'
+)
+
+
+def _time(fn: Callable[[], str]) -> tuple[float, str]:
+  """Returns the best wall time of `fn` and its output."""
+  best_time = float('inf')
+  for _ in range(_NUM_REPEATS.value):
+    start_time = time.perf_counter()
+    output = fn()
+    best_time = min(best_time, time.perf_counter() - start_time)
+  return best_time, output
+
+
+def main(_):
+  if _MMCIF_PATH.value:
+    mmcif_path = pathlib.Path(_MMCIF_PATH.value)
+  else:
+    mmcif_path = max(
+        (resources.ROOT / 'test_data/miniature_databases/pdb_mmcif').glob(
+            '*.cif'
+        ),
+        key=lambda path: path.stat().st_size,
+    )
+  struc = structure.from_mmcif(mmcif_path.read_text())
+  num_copies = -(-_NUM_ATOMS.value // struc.num_atoms)
+  if num_copies > 1:
+    struc = structure.concat([struc] * num_copies)
+  # Predicted structures have per-atom pLDDTs as B-factors.
+  rng = np.random.default_rng(0)
+  struc = struc.copy_and_update_atoms(
+      atom_b_factor=rng.uniform(0, 100, struc.num_atoms).astype(np.float32)
+  )
+  print(
+      f'{mmcif_path.name} x {num_copies}: {struc.num_atoms} atoms,'
+      f' {struc.num_residues(count_unresolved=False)} residues,'
+      f' {struc.num_chains} chains.'
+  )
+
+  benchmarks = {
+      'structure': (
+          lambda: struc.to_mmcif_dict().to_string(),
+          struc.to_mmcif,
+      ),
+      'structure with metadata': (
+          lambda: mmcif_metadata.add_metadata_to_mmcif(
+              old_cif=struc.to_mmcif_dict(),
+              version='benchmark',
+              model_id=b'benchmark',
+          ).to_string(),
+          lambda: mmcif_metadata.to_mmcif_with_metadata(
+              struc, version='benchmark', model_id=b'benchmark'
+          ),
+      ),
+  }
+  for name, (reference_fn, fn) in benchmarks.items():
+    reference_time, reference_output = _time(reference_fn)
+    direct_time, output = _time(fn)
+    if output != reference_output:
+      raise ValueError(f'The mmCIF strings of the {name} differ.')
+    print(
+        f'{name}: Mmcif {reference_time:.3f} s, direct {direct_time:.3f} s'
+        f' ({reference_time / direct_time:.1f}x),'
+        f' {len(output) / 1e6:.1f} MB.'
+    )
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -2915,33 +2915,89 @@ class Structure(table.Database):
       self,
       *,
       coords_decimal_places: int = _COORDS_DECIMAL_PLACES,
+      include_atom_site: bool = True,
   ) -> mmcif.Mmcif:
-    """Returns an Mmcif representing the structure."""
+    """Returns an Mmcif representing the structure.
+
+    Args:
+      coords_decimal_places: The number of decimal places to keep for atom
+        coordinates, including trailing zeros.
+      include_atom_site: Whether to include the _atom_site table. Without it,
+        the string of the returned Mmcif followed by `to_mmcif_atom_site_loop`
+        is the mmCIF string of the structure, see `to_mmcif`.
+    """
     header = self._to_mmcif_header()
     sequence_tables = structure_tables.to_mmcif_sequence_and_entity_tables(
         self._chains, self._residues, self._atoms.res_key
     )
-    atom_and_bond_tables = structure_tables.to_mmcif_atom_site_and_bonds_table(
-        chains=self._chains,
-        residues=self._residues,
-        atoms=self._atoms,
-        bonds=self._bonds,
-        coords_decimal_places=coords_decimal_places,
-    )
+    if include_atom_site:
+      atom_and_bond_tables = (
+          structure_tables.to_mmcif_atom_site_and_bonds_table(
+              chains=self._chains,
+              residues=self._residues,
+              atoms=self._atoms,
+              bonds=self._bonds,
+              coords_decimal_places=coords_decimal_places,
+          )
+      )
+    else:
+      atom_and_bond_tables = structure_tables.to_mmcif_bonds_table(
+          chains=self._chains,
+          residues=self._residues,
+          atoms=self._atoms,
+          bonds=self._bonds,
+      )
     return mmcif.Mmcif({**header, **sequence_tables, **atom_and_bond_tables})
 
+  def to_mmcif_atom_site_columns(self) -> Mapping[str, np.ndarray]:
+    """Returns the _atom_site table as flat arrays of unformatted values.
+
+    See `structure_tables.to_mmcif_atom_site_columns`.
+    """
+    return structure_tables.to_mmcif_atom_site_columns(
+        chains=self._chains, residues=self._residues, atoms=self._atoms
+    )
+
+  def to_mmcif_atom_site_loop(
+      self,
+      *,
+      coords_decimal_places: int = _COORDS_DECIMAL_PLACES,
+      atom_site_columns: Mapping[str, np.ndarray] | None = None,
+  ) -> str:
+    """Returns the _atom_site loop that ends the mmCIF string of the structure.
+
+    The loop is formatted directly from the atom arrays, which is much faster
+    than formatting the _atom_site table of `to_mmcif_dict` for large
+    structures.
+
+    Args:
+      coords_decimal_places: The number of decimal places to keep for atom
+        coordinates, including trailing zeros.
+      atom_site_columns: The columns returned by `to_mmcif_atom_site_columns`,
+        if already computed.
+    """
+    if atom_site_columns is None:
+      atom_site_columns = self.to_mmcif_atom_site_columns()
+    return structure_tables.to_mmcif_atom_site_loop(
+        atom_site_columns, coords_decimal_places=coords_decimal_places
+    )
+
   def to_mmcif(
       self, *, coords_decimal_places: int = _COORDS_DECIMAL_PLACES
   ) -> str:
     """Returns an mmCIF string representing the structure.
 
+    The string is identical to that of `to_mmcif_dict`, but the _atom_site
+    table is written directly from the atom arrays.
+
     Args:
       coords_decimal_places: The number of decimal places to keep for atom
         coordinates, including trailing zeros.
     """
-    return self.to_mmcif_dict(
+    cif = self.to_mmcif_dict(include_atom_site=False)
+    return cif.to_string() + self.to_mmcif_atom_site_loop(
         coords_decimal_places=coords_decimal_places
-    ).to_string()
+    )
 
 
 class _LeadingDimSlice:
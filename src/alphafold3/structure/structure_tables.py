@@ -21,6 +21,7 @@ from typing import Any, ClassVar, Self
 from alphafold3.constants import mmcif_names
 from alphafold3.constants import residue_names
 from alphafold3.cpp import aggregation
+from alphafold3.cpp import mmcif_writer
 from alphafold3.cpp import string_array
 from alphafold3.structure import bonds as bonds_module
 from alphafold3.structure import mmcif
@@ -408,50 +409,13 @@ def to_mmcif_sequence_and_entity_tables(
   return raw_mmcif
 
 
-def to_mmcif_atom_site_and_bonds_table(
+def _to_mmcif_atom_site_string_columns(
     *,
     chains: Chains,
     residues: Residues,
     atoms: Atoms,
-    bonds: Bonds,
-    coords_decimal_places: int,
-) -> Mapping[str, Sequence[str]]:
-  """Returns raw _atom_site and _struct_conn mmCIF tables."""
-  raw_mmcif = collections.defaultdict(list)
-  # Use [value] * num wherever possible since it is about 10x faster than list
-  # comprehension in such cases. Also use f-strings instead of str() - faster.
-  total_atoms = atoms.size * atoms.num_models
-  raw_mmcif['_atom_site.id'] = [f'{i}' for i in range(1, total_atoms + 1)]
-  raw_mmcif['_atom_site.label_alt_id'] = ['.'] * total_atoms
-  # Use format_float_array instead of list comprehension for performance.
-  raw_mmcif['_atom_site.Cartn_x'] = mmcif.format_float_array(
-      values=atoms.x.ravel(), num_decimal_places=coords_decimal_places
-  )
-  raw_mmcif['_atom_site.Cartn_y'] = mmcif.format_float_array(
-      values=atoms.y.ravel(), num_decimal_places=coords_decimal_places
-  )
-  raw_mmcif['_atom_site.Cartn_z'] = mmcif.format_float_array(
-      values=atoms.z.ravel(), num_decimal_places=coords_decimal_places
-  )
-
-  # atoms.b_factor or atoms.occupancy can be flat even when the coordinates have
-  # leading dimensions. In this case we tile it to match.
-  if atoms.b_factor.ndim == 1:
-    atom_b_factor = np.tile(atoms.b_factor, atoms.num_models)
-  else:
-    atom_b_factor = atoms.b_factor.ravel()
-  raw_mmcif['_atom_site.B_iso_or_equiv'] = mmcif.format_float_array(
-      values=atom_b_factor, num_decimal_places=2
-  )
-
-  if atoms.occupancy.ndim == 1:
-    atom_occupancy = np.tile(atoms.occupancy, atoms.num_models)
-  else:
-    atom_occupancy = atoms.occupancy.ravel()
-  raw_mmcif['_atom_site.occupancy'] = mmcif.format_float_array(
-      values=atom_occupancy.ravel(), num_decimal_places=2
-  )
-
+) -> dict[str, np.ndarray]:
+  """Returns the string _atom_site columns of one model as object arrays."""
   label_atom_id = atoms.name
   type_symbol = atoms.element
   label_comp_id = residues.apply_array_to_column('name', atoms.res_key)
@@ -481,22 +445,91 @@ def to_mmcif_atom_site_and_bonds_table(
   group_pdb = _residue_name_to_record_name(
       residue_name=label_comp_id, polymer_mask=~non_polymer_atom_mask
   )
+  return {
+      '_atom_site.group_PDB': group_pdb,
+      '_atom_site.label_atom_id': label_atom_id,
+      '_atom_site.type_symbol': type_symbol,
+      '_atom_site.label_comp_id': label_comp_id,
+      '_atom_site.label_asym_id': label_asym_id,
+      '_atom_site.label_entity_id': label_entity_id,
+      '_atom_site.label_seq_id': label_seq_id,
+      '_atom_site.auth_asym_id': auth_asym_id,
+      '_atom_site.auth_seq_id': auth_seq_id,
+      '_atom_site.pdbx_PDB_ins_code': pdbx_pdb_ins_code,
+  }
+
+
+def _to_mmcif_bonds_table(
+    *,
+    atoms: Atoms,
+    bonds: Bonds,
+    string_columns: Mapping[str, np.ndarray],
+) -> Mapping[str, Sequence[str]]:
+  """Returns the raw _struct_conn mmCIF table, empty if there are no bonds."""
+  if bonds.key.size == 0:
+    return {}
+  return bonds.to_mmcif_dict_from_atom_arrays(
+      atom_key=atoms.key,
+      chain_id=string_columns['_atom_site.label_asym_id'],
+      res_id=string_columns['_atom_site.label_seq_id'],
+      res_name=string_columns['_atom_site.label_comp_id'],
+      atom_name=string_columns['_atom_site.label_atom_id'],
+      auth_asym_id=string_columns['_atom_site.auth_asym_id'],
+      auth_seq_id=string_columns['_atom_site.auth_seq_id'],
+      insertion_code=np.array(string_columns['_atom_site.pdbx_PDB_ins_code']),
+  )
+
+
+def _tile_per_atom(atoms: Atoms, values: np.ndarray) -> np.ndarray:
+  """Returns per-atom values of all models, as a flat array."""
+  # atoms.b_factor or atoms.occupancy can be flat even when the coordinates have
+  # leading dimensions. In this case we tile it to match.
+  if values.ndim == 1:
+    return np.tile(values, atoms.num_models)
+  return values.ravel()
+
+
+def to_mmcif_atom_site_and_bonds_table(
+    *,
+    chains: Chains,
+    residues: Residues,
+    atoms: Atoms,
+    bonds: Bonds,
+    coords_decimal_places: int,
+) -> Mapping[str, Sequence[str]]:
+  """Returns raw _atom_site and _struct_conn mmCIF tables."""
+  raw_mmcif = collections.defaultdict(list)
+  # Use [value] * num wherever possible since it is about 10x faster than list
+  # comprehension in such cases. Also use f-strings instead of str() - faster.
+  total_atoms = atoms.size * atoms.num_models
+  raw_mmcif['_atom_site.id'] = [f'{i}' for i in range(1, total_atoms + 1)]
+  raw_mmcif['_atom_site.label_alt_id'] = ['.'] * total_atoms
+  # Use format_float_array instead of list comprehension for performance.
+  raw_mmcif['_atom_site.Cartn_x'] = mmcif.format_float_array(
+      values=atoms.x.ravel(), num_decimal_places=coords_decimal_places
+  )
+  raw_mmcif['_atom_site.Cartn_y'] = mmcif.format_float_array(
+      values=atoms.y.ravel(), num_decimal_places=coords_decimal_places
+  )
+  raw_mmcif['_atom_site.Cartn_z'] = mmcif.format_float_array(
+      values=atoms.z.ravel(), num_decimal_places=coords_decimal_places
+  )
+  raw_mmcif['_atom_site.B_iso_or_equiv'] = mmcif.format_float_array(
+      values=_tile_per_atom(atoms, atoms.b_factor), num_decimal_places=2
+  )
+  raw_mmcif['_atom_site.occupancy'] = mmcif.format_float_array(
+      values=_tile_per_atom(atoms, atoms.occupancy), num_decimal_places=2
+  )
 
-  def tile_for_models(arr: np.ndarray) -> list[str]:
+  string_columns = _to_mmcif_atom_site_string_columns(
+      chains=chains, residues=residues, atoms=atoms
+  )
+  for key, column in string_columns.items():
     if atoms.num_models == 1:
-      return arr.tolist()  # Memory optimisation: np.tile(arr, 1) does a copy.
-    return np.tile(arr, atoms.num_models).tolist()
-
-  raw_mmcif['_atom_site.group_PDB'] = tile_for_models(group_pdb)
-  raw_mmcif['_atom_site.label_atom_id'] = tile_for_models(label_atom_id)
-  raw_mmcif['_atom_site.type_symbol'] = tile_for_models(type_symbol)
-  raw_mmcif['_atom_site.label_comp_id'] = tile_for_models(label_comp_id)
-  raw_mmcif['_atom_site.label_asym_id'] = tile_for_models(label_asym_id)
-  raw_mmcif['_atom_site.label_entity_id'] = tile_for_models(label_entity_id)
-  raw_mmcif['_atom_site.label_seq_id'] = tile_for_models(label_seq_id)
-  raw_mmcif['_atom_site.auth_asym_id'] = tile_for_models(auth_asym_id)
-  raw_mmcif['_atom_site.auth_seq_id'] = tile_for_models(auth_seq_id)
-  raw_mmcif['_atom_site.pdbx_PDB_ins_code'] = tile_for_models(pdbx_pdb_ins_code)
+      # Memory optimisation: np.tile(arr, 1) does a copy.
+      raw_mmcif[key] = column.tolist()
+    else:
+      raw_mmcif[key] = np.tile(column, atoms.num_models).tolist()
   model_id = np.array(
       [str(i + 1) for i in range(atoms.num_models)], dtype=object
   )
@@ -504,22 +537,101 @@ def to_mmcif_atom_site_and_bonds_table(
       model_id, [atoms.size] * atoms.num_models
   ).tolist()
 
-  if bonds.key.size > 0:
-    raw_mmcif.update(
-        bonds.to_mmcif_dict_from_atom_arrays(
-            atom_key=atoms.key,
-            chain_id=label_asym_id,
-            res_id=label_seq_id,
-            res_name=label_comp_id,
-            atom_name=label_atom_id,
-            auth_asym_id=auth_asym_id,
-            auth_seq_id=auth_seq_id,
-            insertion_code=np.array(pdbx_pdb_ins_code),
-        )
-    )
+  raw_mmcif.update(
+      _to_mmcif_bonds_table(
+          atoms=atoms, bonds=bonds, string_columns=string_columns
+      )
+  )
   return raw_mmcif
 
 
+def to_mmcif_bonds_table(
+    *,
+    chains: Chains,
+    residues: Residues,
+    atoms: Atoms,
+    bonds: Bonds,
+) -> Mapping[str, Sequence[str]]:
+  """Returns the raw _struct_conn mmCIF table, without the _atom_site table."""
+  return _to_mmcif_bonds_table(
+      atoms=atoms,
+      bonds=bonds,
+      string_columns=_to_mmcif_atom_site_string_columns(
+          chains=chains, residues=residues, atoms=atoms
+      ),
+  )
+
+
+def to_mmcif_atom_site_columns(
+    *,
+    chains: Chains,
+    residues: Residues,
+    atoms: Atoms,
+) -> dict[str, np.ndarray]:
+  """Returns the _atom_site mmCIF table as flat arrays of unformatted values.
+
+  The string columns are object arrays of the strings in the raw table returned
+  by `to_mmcif_atom_site_and_bonds_table`. The integer and float columns hold
+  the numbers those strings are formatted from, see `to_mmcif_atom_site_loop`.
+
+  Args:
+    chains: The chains table.
+    residues: The residues table.
+    atoms: The atoms table.
+  """
+  total_atoms = atoms.size * atoms.num_models
+  string_columns = _to_mmcif_atom_site_string_columns(
+      chains=chains, residues=residues, atoms=atoms
+  )
+  if atoms.num_models > 1:
+    string_columns = {
+        key: np.tile(column, atoms.num_models)
+        for key, column in string_columns.items()
+    }
+  return {
+      **string_columns,
+      '_atom_site.id': np.arange(1, total_atoms + 1),
+      '_atom_site.label_alt_id': np.full(total_atoms, '.', dtype=object),
+      '_atom_site.Cartn_x': atoms.x.ravel(),
+      '_atom_site.Cartn_y': atoms.y.ravel(),
+      '_atom_site.Cartn_z': atoms.z.ravel(),
+      '_atom_site.B_iso_or_equiv': _tile_per_atom(atoms, atoms.b_factor),
+      '_atom_site.occupancy': _tile_per_atom(atoms, atoms.occupancy),
+      '_atom_site.pdbx_PDB_model_num': np.repeat(
+          np.arange(1, atoms.num_models + 1), atoms.size
+      ),
+  }
+
+
+def to_mmcif_atom_site_loop(
+    atom_site_columns: Mapping[str, np.ndarray],
+    *,
+    coords_decimal_places: int,
+) -> str:
+  """Returns the _atom_site loop, as written by `Mmcif.to_string`.
+
+  The loop is formatted directly from the arrays in C++, byte for byte as the
+  `Mmcif` of the raw table returned by `to_mmcif_atom_site_and_bonds_table`
+  writes it. As `Mmcif.to_string` writes _atom_site last, the mmCIF string of
+  a structure is the string of its other tables followed by this loop.
+
+  Args:
+    atom_site_columns: The columns returned by `to_mmcif_atom_site_columns`.
+    coords_decimal_places: The number of decimal places to keep for atom
+      coordinates, including trailing zeros.
+  """
+  return mmcif_writer.format_loop(
+      columns=dict(atom_site_columns),
+      num_decimal_places={
+          '_atom_site.Cartn_x': coords_decimal_places,
+          '_atom_site.Cartn_y': coords_decimal_places,
+          '_atom_site.Cartn_z': coords_decimal_places,
+          '_atom_site.B_iso_or_equiv': 2,
+          '_atom_site.occupancy': 2,
+      },
+  )
+
+
 def _flatten_author_naming_scheme_table(
     res_table: Mapping[str, Mapping[int, str]],
     chain_ids: np.ndarray,